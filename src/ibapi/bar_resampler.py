@@ -0,0 +1,153 @@
+"""Copyright (C) 2024 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+"""
+Resampling of the 5 second real time bars to longer bar sizes.
+
+A RealTimeBarResampler is set as the bar sink (see EClient.setBarSink()) of
+reqRealTimeBars() requests, so the Decoder hands it the bar fields directly.
+It keeps the bars being formed, for every request and every resolution, in
+arrays allocated once; a bar is passed to onBar as plain values, once, as
+soon as the last 5 second bar of its interval is in (or a later one comes,
+if some were missing).
+"""
+
+import array
+import logging
+import math
+import threading
+
+logger = logging.getLogger(__name__)
+
+REAL_TIME_BAR_SECONDS = 5
+
+
+class ResamplerSink:
+    """The bar sink of one request, it only adds the slot of the request."""
+
+    __slots__ = ("resampler", "slot")
+
+    def __init__(self, resampler, slot) -> None:
+        self.resampler = resampler
+        self.slot = slot
+
+    def appendBar(self, time, open_, high, low, close, volume, wap, count) -> None:
+        self.resampler.update(
+            self.slot, time, open_, high, low, close, volume, wap, count
+        )
+
+
+class RealTimeBarResampler:
+    def __init__(self, client, resolutions, onBar, maxRequests: int = 64) -> None:
+        """client:EClient - The client the real time bars come from.
+        resolutions:list - The bar sizes, in seconds, multiples of 5.
+        onBar - Called as onBar(reqId, seconds, time, open, high, low, close,
+            volume, wap, count) for each completed bar; volume is 0 and wap
+            NaN for bars without volume (eg: MIDPOINT).
+        maxRequests:int - Requests handled at once, the arrays are sized
+            for it.
+        """
+        for seconds in resolutions:
+            if seconds % REAL_TIME_BAR_SECONDS:
+                raise ValueError("%d is not a multiple of 5 seconds" % seconds)
+        self.client = client
+        self.resolutions = array.array("q", resolutions)
+        self.onBar = onBar
+        self.maxRequests = maxRequests
+        self.lock = threading.Lock()
+        self.reqIds = [None] * maxRequests
+        self.freeSlots = list(range(maxRequests - 1, -1, -1))
+        self.reqId2slot = {}
+
+        # row slot * len(resolutions) + resolution index
+        size = maxRequests * len(resolutions)
+        self.starts = array.array("q", bytes(size * 8))
+        self.opens = array.array("d", bytes(size * 8))
+        self.highs = array.array("d", bytes(size * 8))
+        self.lows = array.array("d", bytes(size * 8))
+        self.closes = array.array("d", bytes(size * 8))
+        self.volumes = array.array("d", bytes(size * 8))
+        self.notionals = array.array("d", bytes(size * 8))
+        self.counts = array.array("q", bytes(size * 8))
+        self.parts = array.array("q", bytes(size * 8))  # 5 second bars so far
+
+    def addRequest(self, reqId) -> None:
+        """Resamples the bars of the reqRealTimeBars() request reqId; call
+        before sending the request."""
+        with self.lock:
+            if not self.freeSlots:
+                raise RuntimeError("already %d requests" % self.maxRequests)
+            slot = self.freeSlots.pop()
+            self.reqIds[slot] = reqId
+            self.reqId2slot[reqId] = slot
+            base = slot * len(self.resolutions)
+            for row in range(base, base + len(self.resolutions)):
+                self.parts[row] = 0
+        self.client.setBarSink(reqId, ResamplerSink(self, slot))
+
+    def removeRequest(self, reqId) -> None:
+        """Stops resampling reqId, the bars being formed are dropped."""
+        self.client.removeBarSink(reqId)
+        with self.lock:
+            slot = self.reqId2slot.pop(reqId, None)
+            if slot is not None:
+                self.reqIds[slot] = None
+                self.freeSlots.append(slot)
+
+    def update(self, slot, time, open_, high, low, close, volume, wap, count) -> None:
+        completed = []
+        with self.lock:
+            reqId = self.reqIds[slot]
+            if reqId is None:
+                return
+            nResolutions = len(self.resolutions)
+            for i in range(nResolutions):
+                seconds = self.resolutions[i]
+                row = slot * nResolutions + i
+                start = time - time % seconds
+                if self.parts[row] and self.starts[row] != start:
+                    # bars were missing at the end of the previous interval
+                    completed.append(self.completeBar(reqId, seconds, row))
+                if self.parts[row] == 0:
+                    self.starts[row] = start
+                    self.opens[row] = open_
+                    self.highs[row] = high
+                    self.lows[row] = low
+                    self.volumes[row] = 0.0
+                    self.notionals[row] = 0.0
+                    self.counts[row] = 0
+                else:
+                    if high > self.highs[row]:
+                        self.highs[row] = high
+                    if low < self.lows[row]:
+                        self.lows[row] = low
+                self.closes[row] = close
+                if volume > 0:
+                    self.volumes[row] += volume
+                    self.notionals[row] += wap * volume
+                if count > 0:
+                    self.counts[row] += count
+                self.parts[row] += 1
+                if time + REAL_TIME_BAR_SECONDS >= start + seconds:
+                    completed.append(self.completeBar(reqId, seconds, row))
+
+        for bar in completed:
+            self.onBar(*bar)
+
+    def completeBar(self, reqId, seconds, row) -> tuple:
+        # called with self.lock held
+        self.parts[row] = 0
+        volume = self.volumes[row]
+        return (
+            reqId,
+            seconds,
+            self.starts[row],
+            self.opens[row],
+            self.highs[row],
+            self.lows[row],
+            self.closes[row],
+            volume,
+            self.notionals[row] / volume if volume else math.nan,
+            self.counts[row],
+        )
@@ -0,0 +1,227 @@
+"""Copyright (C) 2024 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+"""
+On disk storage of historical bars.
+
+Each (contract, bar size) series is a directory of memory-mapped column files,
+one per bar field, plus the row count. Bars are only appended (an update of
+the last bar overwrites it), so the time column is sorted and range queries
+are a binary search. Columns are handed out as memoryviews over the mapping,
+no copy is made; with numpy, numpy.frombuffer(view) gives an array over the
+same memory.
+
+A series can be fed by the Decoder directly, see EClient.setBarSink(): the
+bars of the request then go from the message fields to the column files
+without BarData objects nor EWrapper.historicalData() calls.
+"""
+
+import bisect
+import logging
+import math
+import mmap
+import os
+import threading
+
+from ibapi.const import UNSET_DECIMAL
+from ibapi.utils import barDateToEpoch
+
+logger = logging.getLogger(__name__)
+
+# name, array typecode
+COLUMNS = (
+    ("time", "q"),  # seconds since the epoch
+    ("open", "d"),
+    ("high", "d"),
+    ("low", "d"),
+    ("close", "d"),
+    ("volume", "d"),  # NaN when unset
+    ("wap", "d"),  # NaN when unset
+    ("barCount", "q"),
+)
+
+ITEM_SIZE = 8
+
+
+class BarSeries:
+    def __init__(self, path: str, initialCapacity: int = 4096) -> None:
+        """path:str - The directory of the column files, created if needed.
+        initialCapacity:int - Rows preallocated in a new series, the files
+            then double in size whenever full.
+        """
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+
+        self.rowsFile = self.openFile("rows")
+        if os.fstat(self.rowsFile.fileno()).st_size < ITEM_SIZE:
+            self.rowsFile.truncate(ITEM_SIZE)
+        self.rowsMap = mmap.mmap(self.rowsFile.fileno(), ITEM_SIZE)
+        self.rowsView = memoryview(self.rowsMap).cast("q")
+
+        self.files = {name: self.openFile(name + ".col") for name, _ in COLUMNS}
+        size = os.fstat(self.files["time"].fileno()).st_size
+        self.capacity = max(initialCapacity, size // ITEM_SIZE)
+        self.maps = {}
+        self.views = {}
+        self.mapColumns()
+
+    def __len__(self) -> int:
+        return self.rowsView[0]
+
+    def openFile(self, name):
+        fullName = os.path.join(self.path, name)
+        return open(fullName, "r+b" if os.path.exists(fullName) else "w+b")
+
+    def mapColumns(self) -> None:
+        for name, typecode in COLUMNS:
+            f = self.files[name]
+            if os.fstat(f.fileno()).st_size < self.capacity * ITEM_SIZE:
+                f.truncate(self.capacity * ITEM_SIZE)
+            self.maps[name] = mmap.mmap(f.fileno(), self.capacity * ITEM_SIZE)
+            self.views[name] = memoryview(self.maps[name]).cast(typecode)
+
+    def grow(self) -> None:
+        oldMaps = list(self.maps.values())
+        for view in self.views.values():
+            view.release()
+        self.capacity *= 2
+        self.mapColumns()
+        for oldMap in oldMaps:
+            try:
+                oldMap.close()
+            except BufferError:
+                # views handed out still use it, it goes with the last of them
+                pass
+
+    def appendBar(self, time, open_, high, low, close, volume, wap, barCount) -> bool:
+        """Adds a bar after the last one, or replaces the last one if it has
+        the same time. Older bars are ignored and False is returned."""
+        with self.lock:
+            rows = self.rowsView[0]
+            row = rows
+            if rows:
+                last = self.views["time"][rows - 1]
+                if time < last:
+                    return False
+                if time == last:
+                    row = rows - 1
+            if row == self.capacity:
+                self.grow()
+            views = self.views
+            views["time"][row] = time
+            views["open"][row] = open_
+            views["high"][row] = high
+            views["low"][row] = low
+            views["close"][row] = close
+            views["volume"][row] = volume
+            views["wap"][row] = wap
+            views["barCount"][row] = barCount
+            if row == rows:
+                # the count is written last, a crash leaves a complete series
+                self.rowsView[0] = rows + 1
+        return True
+
+    def append(self, bar) -> bool:
+        """Same as appendBar() for a BarData, eg: from historicalData()."""
+        return self.appendBar(
+            barDateToEpoch(bar.date),
+            bar.open,
+            bar.high,
+            bar.low,
+            bar.close,
+            math.nan if bar.volume == UNSET_DECIMAL else float(bar.volume),
+            math.nan if bar.wap == UNSET_DECIMAL else float(bar.wap),
+            bar.barCount,
+        )
+
+    def rangeIndex(self, start: int, end: int) -> tuple:
+        """Returns (lo, hi), the rows of the bars with start <= time < end."""
+        with self.lock:
+            return self.bisectRange(start, end)
+
+    def columns(self, lo: int = 0, hi: int = None) -> dict:
+        """Returns name -> memoryview of rows lo to hi, without copying. The
+        views stay valid when the series grows, on the mapping they were
+        taken from."""
+        with self.lock:
+            return self.sliceColumns(lo, hi)
+
+    def range(self, start: int, end: int) -> dict:
+        """The columns of the bars with start <= time < end."""
+        with self.lock:
+            return self.sliceColumns(*self.bisectRange(start, end))
+
+    # the following are called with self.lock held, grow() remaps the views
+
+    def bisectRange(self, start, end) -> tuple:
+        times = self.views["time"][: self.rowsView[0]]
+        return bisect.bisect_left(times, start), bisect.bisect_left(times, end)
+
+    def sliceColumns(self, lo, hi) -> dict:
+        rows = self.rowsView[0]
+        hi = rows if hi is None else min(hi, rows)
+        return {name: self.views[name][lo:hi] for name, _ in COLUMNS}
+
+    def flush(self) -> None:
+        for m in self.maps.values():
+            m.flush()
+        self.rowsMap.flush()
+
+    def close(self) -> None:
+        self.flush()
+        for view in self.views.values():
+            view.release()
+        self.rowsView.release()
+        for m in [*self.maps.values(), self.rowsMap]:
+            try:
+                m.close()
+            except BufferError:
+                pass
+        for f in [*self.files.values(), self.rowsFile]:
+            f.close()
+
+
+class BarStore:
+    def __init__(self, root: str) -> None:
+        """root:str - The directory holding all the series."""
+        self.root = root
+        self.lock = threading.Lock()
+        self.series_ = {}
+
+    def seriesPath(self, contract, barSize: str) -> str:
+        if contract.conId:
+            name = str(contract.conId)
+        else:
+            name = "-".join(
+                str(part)
+                for part in (
+                    contract.symbol,
+                    contract.secType,
+                    contract.lastTradeDateOrContractMonth,
+                    contract.strike,
+                    contract.right,
+                    contract.exchange,
+                    contract.currency,
+                )
+                if part
+            )
+        return os.path.join(self.root, name, barSize.replace(" ", ""))
+
+    def series(self, contract, barSize: str) -> BarSeries:
+        """Returns the series of the contract and bar size, opening it the
+        first time."""
+        path = self.seriesPath(contract, barSize)
+        with self.lock:
+            series = self.series_.get(path)
+            if series is None:
+                series = BarSeries(path)
+                self.series_[path] = series
+            return series
+
+    def close(self) -> None:
+        with self.lock:
+            for series in self.series_.values():
+                series.close()
+            self.series_.clear()
@@ -12,6 +12,7 @@ The user just needs to override EWrapper methods to receive the answers.
 import logging
 import queue
 import sys
+from decimal import Decimal
 
 from ibapi import comm, decoder, reader
 from ibapi.comm import make_field, make_field_handle_empty
@@ -19,6 +20,17 @@ from ibapi.common import *  # @UnusedWildImport
 from ibapi.connection import Connection
 from ibapi.const import MAX_MSG_LEN, NO_VALID_ID, UNSET_DOUBLE, UNSET_INTEGER
 from ibapi.contract import Contract
+from ibapi.contract_encoder import (
+    CONTRACT_DATA,
+    HISTORICAL_DATA,
+    HISTORICAL_TICKS,
+    MKT_DATA,
+    MKT_DEPTH,
+    PLACE_ORDER,
+    REAL_TIME_BARS,
+    TICK_BY_TICK,
+    encodeContract,
+)
 from ibapi.errors import (
     BAD_LENGTH,
     BAD_MESSAGE,
@@ -29,95 +41,18 @@ from ibapi.errors import (
     UPDATE_TWS,
 )
 from ibapi.execution import ExecutionFilter
+from ibapi.market_data_table import MarketDataTable
 from ibapi.message import OUT
 from ibapi.order import COMPETE_AGAINST_BEST_OFFSET_UP_TO_MID, Order
 from ibapi.order_cancel import OrderCancel
+from ibapi.order_template import OrderTemplate
+from ibapi.rate_governor import RateGovernor
+from ibapi.router import Router
 from ibapi.scanner import ScannerSubscription
 from ibapi.server_versions import (
     MAX_CLIENT_VER,
     MIN_CLIENT_VER,
-    MIN_SERVER_VER_ADVANCED_ORDER_REJECT,
-    MIN_SERVER_VER_ALGO_ID,
-    MIN_SERVER_VER_ALGO_ORDERS,
-    MIN_SERVER_VER_AUTO_CANCEL_PARENT,
-    MIN_SERVER_VER_AUTO_PRICE_FOR_HEDGE,
-    MIN_SERVER_VER_BOND_ISSUERID,
-    MIN_SERVER_VER_CANCEL_HEADTIMESTAMP,
-    MIN_SERVER_VER_CASH_QTY,
-    MIN_SERVER_VER_CONTRACT_DATA_CHAIN,
-    MIN_SERVER_VER_CUSTOMER_ACCOUNT,
-    MIN_SERVER_VER_D_PEG_ORDERS,
-    MIN_SERVER_VER_DECISION_MAKER,
-    MIN_SERVER_VER_DELTA_NEUTRAL,
-    MIN_SERVER_VER_DELTA_NEUTRAL_CONID,
-    MIN_SERVER_VER_DELTA_NEUTRAL_OPEN_CLOSE,
-    MIN_SERVER_VER_DURATION,
-    MIN_SERVER_VER_EXECUTION_DATA_CHAIN,
-    MIN_SERVER_VER_EXT_OPERATOR,
-    MIN_SERVER_VER_FA_PROFILE_DESUPPORT,
-    MIN_SERVER_VER_FRACTIONAL_POSITIONS,
-    MIN_SERVER_VER_FUNDAMENTAL_DATA,
-    MIN_SERVER_VER_HEDGE_ORDERS,
-    MIN_SERVER_VER_HISTORICAL_SCHEDULE,
-    MIN_SERVER_VER_HISTORICAL_TICKS,
-    MIN_SERVER_VER_LINKING,
-    MIN_SERVER_VER_MANUAL_ORDER_TIME,
-    MIN_SERVER_VER_MANUAL_ORDER_TIME_EXERCISE_OPTIONS,
-    MIN_SERVER_VER_MARKET_RULES,
-    MIN_SERVER_VER_MIFID_EXECUTION,
-    MIN_SERVER_VER_MKT_DEPTH_PRIM_EXCHANGE,
-    MIN_SERVER_VER_MODELS_SUPPORT,
-    MIN_SERVER_VER_NEWS_QUERY_ORIGINS,
-    MIN_SERVER_VER_NOT_HELD,
-    MIN_SERVER_VER_OPT_OUT_SMART_ROUTING,
-    MIN_SERVER_VER_OPTIONAL_CAPABILITIES,
-    MIN_SERVER_VER_ORDER_COMBO_LEGS_PRICE,
-    MIN_SERVER_VER_ORDER_CONTAINER,
-    MIN_SERVER_VER_ORDER_SOLICITED,
-    MIN_SERVER_VER_PEGBEST_PEGMID_OFFSETS,
-    MIN_SERVER_VER_PEGGED_TO_BENCHMARK,
-    MIN_SERVER_VER_PLACE_ORDER_CONID,
-    MIN_SERVER_VER_PNL,
-    MIN_SERVER_VER_POSITIONS,
-    MIN_SERVER_VER_POST_TO_ATS,
-    MIN_SERVER_VER_PRICE_MGMT_ALGO,
-    MIN_SERVER_VER_PRIMARYEXCH,
-    MIN_SERVER_VER_PROFESSIONAL_CUSTOMER,
-    MIN_SERVER_VER_PTA_ORDERS,
-    MIN_SERVER_VER_RANDOMIZE_SIZE_AND_PRICE,
-    MIN_SERVER_VER_REPLACE_FA_END,
-    MIN_SERVER_VER_REQ_CALC_IMPLIED_VOLAT,
-    MIN_SERVER_VER_REQ_FAMILY_CODES,
-    MIN_SERVER_VER_REQ_HEAD_TIMESTAMP,
-    MIN_SERVER_VER_REQ_HISTOGRAM,
-    MIN_SERVER_VER_REQ_HISTORICAL_NEWS,
-    MIN_SERVER_VER_REQ_MARKET_DATA_TYPE,
-    MIN_SERVER_VER_REQ_MATCHING_SYMBOLS,
-    MIN_SERVER_VER_REQ_MKT_DATA_CONID,
-    MIN_SERVER_VER_REQ_MKT_DEPTH_EXCHANGES,
-    MIN_SERVER_VER_REQ_NEWS_ARTICLE,
-    MIN_SERVER_VER_REQ_NEWS_PROVIDERS,
-    MIN_SERVER_VER_REQ_SMART_COMPONENTS,
-    MIN_SERVER_VER_RFQ_FIELDS,
-    MIN_SERVER_VER_SCALE_ORDERS2,
-    MIN_SERVER_VER_SCALE_ORDERS3,
-    MIN_SERVER_VER_SCALE_TABLE,
-    MIN_SERVER_VER_SCANNER_GENERIC_OPTS,
-    MIN_SERVER_VER_SEC_DEF_OPT_PARAMS_REQ,
-    MIN_SERVER_VER_SEC_ID_TYPE,
-    MIN_SERVER_VER_SMART_COMBO_ROUTING_PARAMS,
-    MIN_SERVER_VER_SMART_DEPTH,
-    MIN_SERVER_VER_SOFT_DOLLAR_TIER,
-    MIN_SERVER_VER_SSHORTX,
-    MIN_SERVER_VER_SSHORTX_OLD,
-    MIN_SERVER_VER_SYNT_REALTIME_BARS,
-    MIN_SERVER_VER_TICK_BY_TICK,
-    MIN_SERVER_VER_TICK_BY_TICK_IGNORE_SIZE,
-    MIN_SERVER_VER_TRADING_CLASS,
-    MIN_SERVER_VER_TRAILING_PERCENT,
-    MIN_SERVER_VER_USER_INFO,
-    MIN_SERVER_VER_WSH_EVENT_DATA_FILTERS,
-    MIN_SERVER_VER_WSHE_CALENDAR,
+    ServerCapabilities,
 )
 from ibapi.utils import (
     BadMessage,
@@ -129,6 +64,7 @@ from ibapi.utils import (
     isPegMidOrder,
     log_,
 )
+from ibapi.wrapper_chain import WrapperChain
 
 # TODO: use pylint
 
@@ -144,6 +80,11 @@ class EClient:
         self.msg_queue = queue.Queue()
         self.wrapper = wrapper
         self.decoder = None
+        self.governor = None
+        self.barSinks = {}
+        self.marketDataTable = None
+        self.reqIdRouter = None
+        self.orderIdSinks = []  # given the ids of the orders placed
         self.nKeybIntHard = 0
         self.conn = None
         self.host = None
@@ -151,6 +92,7 @@ class EClient:
         self.extraAuth = False
         self.clientId = None
         self.serverVersion_ = None
+        self.serverCaps = ServerCapabilities()
         self.connTime = None
         self.connState = None
         self.optCapab = None
@@ -169,6 +111,7 @@ class EClient:
         self.extraAuth = False
         self.clientId = None
         self.serverVersion_ = None
+        self.serverCaps = ServerCapabilities()
         self.connTime = None
         self.connState = None
         self.optCapab = None
@@ -186,8 +129,121 @@ class EClient:
     def sendMsg(self, msg) -> None:
         full_msg = comm.make_msg(msg)
         logger.info("%s %s %s", "SENDING", current_fn_name(1), full_msg)
+        if self.governor is not None:
+            self.governor.submit(
+                self.conn.sendMsg,
+                full_msg,
+                self.governor.laneOf(msg),
+                orderIds=self.governor.orderIdsOf(
+                    (msg,), self.serverCaps.ORDER_CONTAINER
+                ),
+            )
+            return
         self.conn.sendMsg(full_msg)
 
+    def sendMsgs(self, msgs) -> None:
+        """Frames the messages and hands them to the connection as a single
+        buffer, so they cost one lock acquisition and one send."""
+        if not msgs:
+            return
+        full_msg = b"".join(comm.make_msg(msg) for msg in msgs)
+        logger.info(
+            "%s %s %d msgs %s", "SENDING", current_fn_name(1), len(msgs), full_msg
+        )
+        if self.governor is not None:
+            # TWS counts each message, the batch leaves the bucket in debt
+            self.governor.submit(
+                self.conn.sendMsg,
+                full_msg,
+                self.governor.laneOf(msgs[0]),
+                len(msgs),
+                self.governor.orderIdsOf(msgs, self.serverCaps.ORDER_CONTAINER),
+            )
+            return
+        self.conn.sendMsg(full_msg)
+
+    def setBarSink(self, reqId: TickerId, sink) -> None:
+        """Has the bars of the historical data request reqId handed to
+        sink.appendBar(time, open, high, low, close, volume, wap, barCount)
+        as they are decoded, eg: a BarSeries of the bar store. No BarData is
+        built and historicalData()/historicalDataUpdate() are not called for
+        those bars; historicalDataEnd() still is. Times are in seconds since
+        the epoch, so request the bars with formatDate=2.
+        The same goes for the bars of a reqRealTimeBars() request, which then
+        are not passed to realtimeBar().
+
+        reqId:TickerId - The request, set the sink before sending it.
+        sink - Has an appendBar() method."""
+        self.barSinks[reqId] = sink
+
+    def removeBarSink(self, reqId: TickerId) -> None:
+        self.barSinks.pop(reqId, None)
+
+    def setMarketDataTable(self, table: MarketDataTable) -> None:
+        """Has the Decoder keep the table up to date with the tick prices,
+        sizes, generic and string ticks of its requests, None to stop.
+
+        table:MarketDataTable - Only the reqIds added to it are kept."""
+        self.marketDataTable = table
+        if self.decoder is not None:
+            self.decoder.marketDataTable = table
+
+    def setRoute(self, reqId: TickerId, handler, lastReqId: TickerId = None) -> None:
+        """Has the messages of reqId, or of reqId to lastReqId included,
+        decoded into handler rather than into the wrapper. Order messages
+        are routed by their order id. See Router. Routing needs server
+        version MIN_SERVER_VER_SIZE_RULES or later: once connected to an
+        older one this raises ValueError, and the routes set before
+        connecting are not used.
+
+        reqId:TickerId - The request, set the route before sending it.
+        handler - An object with some of the EWrapper methods, or a dict of
+            callback name -> function; the other callbacks go to the wrapper.
+        lastReqId:TickerId - The last reqId of a range, None for one reqId."""
+        if self.isConnected() and not self.serverCaps.SIZE_RULES:
+            raise ValueError(
+                "server version %d does not allow routing" % self.serverVersion()
+            )
+        self.router().add(reqId, handler, lastReqId)
+
+    def removeRoute(self, reqId: TickerId) -> None:
+        """Removes the route of reqId, or of the range starting at reqId."""
+        if self.reqIdRouter is not None:
+            self.reqIdRouter.remove(reqId)
+
+    def router(self) -> Router:
+        """Returns the Router of the Decoder, creating it the first time."""
+        if self.reqIdRouter is None:
+            self.reqIdRouter = Router(lambda: self.wrapper)
+            if self.decoder is not None:
+                self.decoder.router = self.reqIdRouter
+        return self.reqIdRouter
+
+    def addOrderIdSink(self, sink) -> None:
+        """Has the order id of every order placed from now on, through
+        placeOrder(), placeOrders() or placeTemplateOrder(), added to sink
+        before the order is sent, eg: by a DecodePool to tell the errors of
+        the orders from those of the requests.
+
+        sink - Has an add() method, eg: a set."""
+        if not any(s is sink for s in self.orderIdSinks):
+            self.orderIdSinks.append(sink)
+
+    def removeOrderIdSink(self, sink) -> None:
+        self.orderIdSinks = [s for s in self.orderIdSinks if s is not sink]
+
+    def placing(self, orderId: OrderId) -> None:
+        for sink in self.orderIdSinks:
+            sink.add(orderId)
+
+    def setRateGovernor(self, governor: RateGovernor) -> None:
+        """Has all the messages sent from now on go through the rate
+        governor, None sends them right away again.
+
+        governor:RateGovernor - The token bucket and its lanes. It is kept
+            across reconnections."""
+        self.governor = governor
+
     def logRequest(self, fnName, fnParams) -> None:
         log_(fnName, fnParams, "REQUEST")
 
@@ -236,7 +292,7 @@ class EClient:
 
             msg = f"{make_field(OUT.START_API)}{make_field(VERSION)}{make_field(self.clientId)}"
 
-            if self.serverVersion() >= MIN_SERVER_VER_OPTIONAL_CAPABILITIES:
+            if self.serverCaps.OPTIONAL_CAPABILITIES:
                 msg += make_field(self.optCapab if self.optCapab is not None else "")
 
         except ClientException as ex:
@@ -294,7 +350,12 @@ class EClient:
             logger.debug("REQUEST %s", msg2)
             self.conn.sendMsg(msg2)
 
-            self.decoder = decoder.Decoder(self.wrapper, self.serverVersion())
+            self.decoder = decoder.Decoder(
+                self.wrapper, self.serverVersion(), self.serverCaps
+            )
+            self.decoder.barSinks = self.barSinks
+            self.decoder.marketDataTable = self.marketDataTable
+            self.decoder.router = self.reqIdRouter
             fields = []
 
             # sometimes I get news before the server version, thus the loop
@@ -321,7 +382,9 @@ class EClient:
             logger.debug("ANSWER Version:%d time:%s", server_version, conn_time)
             self.connTime = conn_time
             self.serverVersion_ = server_version
+            self.serverCaps = ServerCapabilities(server_version)
             self.decoder.serverVersion = self.serverVersion()
+            self.decoder.serverCaps = self.serverCaps
 
             self.setConnState(EClient.CONNECTED)
 
@@ -345,6 +408,8 @@ class EClient:
         if self.conn is not None:
             logger.info("disconnecting")
             self.conn.disconnect()
+            if self.governor is not None:
+                self.governor.clear()
             self.wrapper.connectionClosed()
             self.reset()
 
@@ -432,6 +497,32 @@ class EClient:
         """Returns the version of the TWS instance to which the API application is connected."""
         return self.serverVersion_
 
+    def addWrapperListener(self, listener) -> None:
+        """Has the EWrapper callbacks overridden by listener called as well,
+        ahead of the application's wrapper. See WrapperChain.
+
+        listener:EWrapper - Any EWrapper subclass."""
+        self.wrapperChain().addListener(listener)
+
+    def wrapperChain(self) -> WrapperChain:
+        """Returns the WrapperChain the callbacks are decoded into, putting
+        it in front of the application's wrapper the first time."""
+        if not isinstance(self.wrapper, WrapperChain):
+            self.wrapper = WrapperChain(self.wrapper)
+            if self.decoder is not None:
+                self.decoder.wrapper = self.wrapper
+        return self.wrapper
+
+    def removeWrapperListener(self, listener) -> None:
+        if isinstance(self.wrapper, WrapperChain):
+            self.wrapper.removeListener(listener)
+
+    def serverCapabilities(self) -> ServerCapabilities:
+        """Returns the features supported by the TWS instance to which the API
+        application is connected, eg: serverCapabilities().TRADING_CLASS. The
+        object is built once per connection, after the handshake."""
+        return self.serverCaps
+
     def setServerLogLevel(self, logLevel: int) -> None:
         """The default detail level is ERROR. For more details, see API
         Logging.
@@ -492,7 +583,7 @@ class EClient:
             self.wrapper.error(reqId, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_DELTA_NEUTRAL:
+        if not self.serverCaps.DELTA_NEUTRAL:
             if contract.deltaNeutralContract:
                 self.wrapper.error(
                     reqId,
@@ -501,7 +592,7 @@ class EClient:
                 )
                 return
 
-        if self.serverVersion() < MIN_SERVER_VER_REQ_MKT_DATA_CONID:
+        if not self.serverCaps.REQ_MKT_DATA_CONID:
             if contract.conId > 0:
                 self.wrapper.error(
                     reqId,
@@ -510,7 +601,7 @@ class EClient:
                 )
                 return
 
-        if self.serverVersion() < MIN_SERVER_VER_TRADING_CLASS:
+        if not self.serverCaps.TRADING_CLASS:
             if contract.tradingClass:
                 self.wrapper.error(
                     reqId,
@@ -532,24 +623,7 @@ class EClient:
             ]
 
             # send contract fields
-            if self.serverVersion() >= MIN_SERVER_VER_REQ_MKT_DATA_CONID:
-                flds += [make_field(contract.conId)]
-
-            flds += [
-                make_field(contract.symbol),
-                make_field(contract.secType),
-                make_field(contract.lastTradeDateOrContractMonth),
-                make_field(contract.strike),
-                make_field(contract.right),
-                make_field(contract.multiplier),  # srv v15 and above
-                make_field(contract.exchange),
-                make_field(contract.primaryExchange),  # srv v14 and above
-                make_field(contract.currency),
-                make_field(contract.localSymbol),
-            ]  # srv v2 and above
-
-            if self.serverVersion() >= MIN_SERVER_VER_TRADING_CLASS:
-                flds += [make_field(contract.tradingClass)]
+            flds += [encodeContract(contract, MKT_DATA, self.serverCaps)]
 
             # Send combo legs for BAG requests (srv v8 and above)
             if contract.secType == "BAG":
@@ -563,7 +637,7 @@ class EClient:
                         make_field(comboLeg.exchange),
                     ]
 
-            if self.serverVersion() >= MIN_SERVER_VER_DELTA_NEUTRAL:
+            if self.serverCaps.DELTA_NEUTRAL:
                 if contract.deltaNeutralContract:
                     flds += [
                         make_field(True),
@@ -579,11 +653,11 @@ class EClient:
                 make_field(snapshot),
             ]  # srv v35 and above
 
-            if self.serverVersion() >= MIN_SERVER_VER_REQ_SMART_COMPONENTS:
+            if self.serverCaps.REQ_SMART_COMPONENTS:
                 flds += [make_field(regulatorySnapshot)]
 
             # send mktDataOptions parameter
-            if self.serverVersion() >= MIN_SERVER_VER_LINKING:
+            if self.serverCaps.LINKING:
                 # current doc says this part if for "internal use only" -> won't support it
                 if mktDataOptions:
                     msg = "not supported"
@@ -643,7 +717,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_REQ_MARKET_DATA_TYPE:
+        if not self.serverCaps.REQ_MARKET_DATA_TYPE:
             self.wrapper.error(
                 NO_VALID_ID,
                 UPDATE_TWS.code(),
@@ -671,7 +745,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_REQ_SMART_COMPONENTS:
+        if not self.serverCaps.REQ_SMART_COMPONENTS:
             self.wrapper.error(
                 NO_VALID_ID,
                 UPDATE_TWS.code(),
@@ -699,7 +773,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_MARKET_RULES:
+        if not self.serverCaps.MARKET_RULES:
             self.wrapper.error(
                 NO_VALID_ID,
                 UPDATE_TWS.code(),
@@ -725,7 +799,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_TICK_BY_TICK:
+        if not self.serverCaps.TICK_BY_TICK:
             self.wrapper.error(
                 NO_VALID_ID,
                 UPDATE_TWS.code(),
@@ -733,7 +807,7 @@ class EClient:
             )
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_TICK_BY_TICK_IGNORE_SIZE:
+        if not self.serverCaps.TICK_BY_TICK_IGNORE_SIZE:
             self.wrapper.error(
                 NO_VALID_ID,
                 UPDATE_TWS.code(),
@@ -746,22 +820,11 @@ class EClient:
             msg = (
                 make_field(OUT.REQ_TICK_BY_TICK_DATA)
                 + make_field(reqId)
-                + make_field(contract.conId)
-                + make_field(contract.symbol)
-                + make_field(contract.secType)
-                + make_field(contract.lastTradeDateOrContractMonth)
-                + make_field(contract.strike)
-                + make_field(contract.right)
-                + make_field(contract.multiplier)
-                + make_field(contract.exchange)
-                + make_field(contract.primaryExchange)
-                + make_field(contract.currency)
-                + make_field(contract.localSymbol)
-                + make_field(contract.tradingClass)
+                + encodeContract(contract, TICK_BY_TICK, self.serverCaps)
                 + make_field(tickType)
             )
 
-            if self.serverVersion() >= MIN_SERVER_VER_TICK_BY_TICK_IGNORE_SIZE:
+            if self.serverCaps.TICK_BY_TICK_IGNORE_SIZE:
                 msg += make_field(numberOfTicks) + make_field(ignoreSize)
 
         except ClientException as ex:
@@ -777,7 +840,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_TICK_BY_TICK:
+        if not self.serverCaps.TICK_BY_TICK:
             self.wrapper.error(
                 NO_VALID_ID,
                 UPDATE_TWS.code(),
@@ -816,7 +879,7 @@ class EClient:
             self.wrapper.error(reqId, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_REQ_CALC_IMPLIED_VOLAT:
+        if not self.serverCaps.REQ_CALC_IMPLIED_VOLAT:
             self.wrapper.error(
                 reqId,
                 UPDATE_TWS.code(),
@@ -825,7 +888,7 @@ class EClient:
             )
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_TRADING_CLASS:
+        if not self.serverCaps.TRADING_CLASS:
             if contract.tradingClass:
                 self.wrapper.error(
                     reqId,
@@ -857,11 +920,11 @@ class EClient:
                 make_field(contract.currency),
                 make_field(contract.localSymbol),
             ]
-            if self.serverVersion() >= MIN_SERVER_VER_TRADING_CLASS:
+            if self.serverCaps.TRADING_CLASS:
                 flds += [make_field(contract.tradingClass)]
             flds += [make_field(optionPrice), make_field(underPrice)]
 
-            if self.serverVersion() >= MIN_SERVER_VER_LINKING:
+            if self.serverCaps.LINKING:
                 implVolOptStr = ""
                 tagValuesCount = len(implVolOptions) if implVolOptions else 0
                 if implVolOptions:
@@ -889,7 +952,7 @@ class EClient:
             self.wrapper.error(reqId, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_REQ_CALC_IMPLIED_VOLAT:
+        if not self.serverCaps.REQ_CALC_IMPLIED_VOLAT:
             self.wrapper.error(
                 reqId,
                 UPDATE_TWS.code(),
@@ -930,7 +993,7 @@ class EClient:
             self.wrapper.error(reqId, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_REQ_CALC_IMPLIED_VOLAT:
+        if not self.serverCaps.REQ_CALC_IMPLIED_VOLAT:
             self.wrapper.error(
                 reqId,
                 UPDATE_TWS.code(),
@@ -939,7 +1002,7 @@ class EClient:
             )
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_TRADING_CLASS:
+        if not self.serverCaps.TRADING_CLASS:
             if contract.tradingClass:
                 self.wrapper.error(
                     reqId,
@@ -971,11 +1034,11 @@ class EClient:
                 make_field(contract.currency),
                 make_field(contract.localSymbol),
             ]
-            if self.serverVersion() >= MIN_SERVER_VER_TRADING_CLASS:
+            if self.serverCaps.TRADING_CLASS:
                 flds += [make_field(contract.tradingClass)]
             flds += [make_field(volatility), make_field(underPrice)]
 
-            if self.serverVersion() >= MIN_SERVER_VER_LINKING:
+            if self.serverCaps.LINKING:
                 optPrcOptStr = ""
                 tagValuesCount = len(optPrcOptions) if optPrcOptions else 0
                 if optPrcOptions:
@@ -1003,7 +1066,7 @@ class EClient:
             self.wrapper.error(reqId, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_REQ_CALC_IMPLIED_VOLAT:
+        if not self.serverCaps.REQ_CALC_IMPLIED_VOLAT:
             self.wrapper.error(
                 reqId,
                 UPDATE_TWS.code(),
@@ -1058,7 +1121,7 @@ class EClient:
             self.wrapper.error(reqId, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_TRADING_CLASS:
+        if not self.serverCaps.TRADING_CLASS:
             if contract.tradingClass or contract.conId > 0:
                 self.wrapper.error(
                     reqId,
@@ -1068,10 +1131,7 @@ class EClient:
                 )
                 return
 
-        if (
-            self.serverVersion() < MIN_SERVER_VER_MANUAL_ORDER_TIME_EXERCISE_OPTIONS
-            and manualOrderTime
-        ):
+        if not self.serverCaps.MANUAL_ORDER_TIME_EXERCISE_OPTIONS and manualOrderTime:
             self.wrapper.error(
                 reqId,
                 UPDATE_TWS.code(),
@@ -1080,7 +1140,7 @@ class EClient:
             )
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_CUSTOMER_ACCOUNT and customerAccount:
+        if not self.serverCaps.CUSTOMER_ACCOUNT and customerAccount:
             self.wrapper.error(
                 reqId,
                 UPDATE_TWS.code(),
@@ -1089,10 +1149,7 @@ class EClient:
             )
             return
 
-        if (
-            self.serverVersion() < MIN_SERVER_VER_PROFESSIONAL_CUSTOMER
-            and professionalCustomer
-        ):
+        if not self.serverCaps.PROFESSIONAL_CUSTOMER and professionalCustomer:
             self.wrapper.error(
                 reqId,
                 UPDATE_TWS.code(),
@@ -1112,7 +1169,7 @@ class EClient:
                 make_field(reqId),
             ]
             # send contract fields
-            if self.serverVersion() >= MIN_SERVER_VER_TRADING_CLASS:
+            if self.serverCaps.TRADING_CLASS:
                 fields += [make_field(contract.conId)]
             fields += [
                 make_field(contract.symbol),
@@ -1125,7 +1182,7 @@ class EClient:
                 make_field(contract.currency),
                 make_field(contract.localSymbol),
             ]
-            if self.serverVersion() >= MIN_SERVER_VER_TRADING_CLASS:
+            if self.serverCaps.TRADING_CLASS:
                 fields += [make_field(contract.tradingClass)]
             fields += [
                 make_field(exerciseAction),
@@ -1133,14 +1190,11 @@ class EClient:
                 make_field(account),
                 make_field(override),
             ]
-            if (
-                self.serverVersion()
-                >= MIN_SERVER_VER_MANUAL_ORDER_TIME_EXERCISE_OPTIONS
-            ):
+            if self.serverCaps.MANUAL_ORDER_TIME_EXERCISE_OPTIONS:
                 fields += [make_field(manualOrderTime)]
-            if self.serverVersion() >= MIN_SERVER_VER_CUSTOMER_ACCOUNT:
+            if self.serverCaps.CUSTOMER_ACCOUNT:
                 fields += [make_field(customerAccount)]
-            if self.serverVersion() >= MIN_SERVER_VER_PROFESSIONAL_CUSTOMER:
+            if self.serverCaps.PROFESSIONAL_CUSTOMER:
                 fields += [make_field(professionalCustomer)]
 
             msg = "".join(fields)
@@ -1173,16 +1227,36 @@ class EClient:
             self.wrapper.error(orderId, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_DELTA_NEUTRAL:
+        if not self.validatePlaceOrder(orderId, contract, order):
+            return
+
+        try:
+            msg = "".join(self.encodePlaceOrder(orderId, contract, order))
+
+        except ClientException as ex:
+            self.wrapper.error(orderId, ex.code, ex.msg + ex.text)
+            return
+
+        self.placing(orderId)
+        self.sendMsg(msg)
+
+    def validatePlaceOrder(
+        self, orderId: OrderId, contract: Contract, order: Order
+    ) -> bool:
+        """Checks that the connected TWS supports all the order attributes
+        in use. Problems are reported through EWrapper.error() and False is
+        returned, in which case the order must not be sent.
+        """
+        if not self.serverCaps.DELTA_NEUTRAL:
             if contract.deltaNeutralContract:
                 self.wrapper.error(
                     orderId,
                     UPDATE_TWS.code(),
                     UPDATE_TWS.msg() + "  It does not support delta-neutral orders.",
                 )
-                return
+                return False
 
-        if self.serverVersion() < MIN_SERVER_VER_SCALE_ORDERS2:
+        if not self.serverCaps.SCALE_ORDERS2:
             if order.scaleSubsLevelSize != UNSET_INTEGER:
                 self.wrapper.error(
                     orderId,
@@ -1190,26 +1264,26 @@ class EClient:
                     UPDATE_TWS.msg()
                     + "  It does not support Subsequent Level Size for Scale orders.",
                 )
-                return
+                return False
 
-        if self.serverVersion() < MIN_SERVER_VER_ALGO_ORDERS:
+        if not self.serverCaps.ALGO_ORDERS:
             if order.algoStrategy:
                 self.wrapper.error(
                     orderId,
                     UPDATE_TWS.code(),
                     UPDATE_TWS.msg() + "  It does not support algo orders.",
                 )
-                return
+                return False
 
-        if self.serverVersion() < MIN_SERVER_VER_NOT_HELD and order.notHeld:
+        if not self.serverCaps.NOT_HELD and order.notHeld:
             self.wrapper.error(
                 orderId,
                 UPDATE_TWS.code(),
                 UPDATE_TWS.msg() + "  It does not support notHeld parameter.",
             )
-            return
+            return False
 
-        if self.serverVersion() < MIN_SERVER_VER_SEC_ID_TYPE:
+        if not self.serverCaps.SEC_ID_TYPE:
             if contract.secIdType or contract.secId:
                 self.wrapper.error(
                     orderId,
@@ -1217,27 +1291,27 @@ class EClient:
                     UPDATE_TWS.msg()
                     + "  It does not support secIdType and secId parameters.",
                 )
-                return
+                return False
 
-        if self.serverVersion() < MIN_SERVER_VER_PLACE_ORDER_CONID:
+        if not self.serverCaps.PLACE_ORDER_CONID:
             if contract.conId and contract.conId > 0:
                 self.wrapper.error(
                     orderId,
                     UPDATE_TWS.code(),
                     UPDATE_TWS.msg() + "  It does not support conId parameter.",
                 )
-                return
+                return False
 
-        if self.serverVersion() < MIN_SERVER_VER_SSHORTX:
+        if not self.serverCaps.SSHORTX:
             if order.exemptCode != -1:
                 self.wrapper.error(
                     orderId,
                     UPDATE_TWS.code(),
                     UPDATE_TWS.msg() + "  It does not support exemptCode parameter.",
                 )
-                return
+                return False
 
-        if self.serverVersion() < MIN_SERVER_VER_SSHORTX and contract.comboLegs:
+        if not self.serverCaps.SSHORTX and contract.comboLegs:
             for comboLeg in contract.comboLegs:
                 if comboLeg.exemptCode != -1:
                     self.wrapper.error(
@@ -1246,18 +1320,18 @@ class EClient:
                         UPDATE_TWS.msg()
                         + "  It does not support exemptCode parameter.",
                     )
-                    return
+                    return False
 
-        if self.serverVersion() < MIN_SERVER_VER_HEDGE_ORDERS:
+        if not self.serverCaps.HEDGE_ORDERS:
             if order.hedgeType:
                 self.wrapper.error(
                     orderId,
                     UPDATE_TWS.code(),
                     UPDATE_TWS.msg() + "  It does not support hedge orders.",
                 )
-                return
+                return False
 
-        if self.serverVersion() < MIN_SERVER_VER_OPT_OUT_SMART_ROUTING:
+        if not self.serverCaps.OPT_OUT_SMART_ROUTING:
             if order.optOutSmartRouting:
                 self.wrapper.error(
                     orderId,
@@ -1265,9 +1339,9 @@ class EClient:
                     UPDATE_TWS.msg()
                     + "  It does not support optOutSmartRouting parameter.",
                 )
-                return
+                return False
 
-        if self.serverVersion() < MIN_SERVER_VER_DELTA_NEUTRAL_CONID and (
+        if not self.serverCaps.DELTA_NEUTRAL_CONID and (
             order.deltaNeutralConId > 0
             or order.deltaNeutralSettlingFirm
             or order.deltaNeutralClearingAccount
@@ -1280,9 +1354,9 @@ class EClient:
                 + "  It does not support deltaNeutral parameters: "
                 + "ConId, SettlingFirm, ClearingAccount, ClearingIntent.",
             )
-            return
+            return False
 
-        if self.serverVersion() < MIN_SERVER_VER_DELTA_NEUTRAL_OPEN_CLOSE and (
+        if not self.serverCaps.DELTA_NEUTRAL_OPEN_CLOSE and (
             order.deltaNeutralOpenClose
             or order.deltaNeutralShortSale
             or order.deltaNeutralShortSaleSlot > 0
@@ -1294,9 +1368,9 @@ class EClient:
                 UPDATE_TWS.msg()
                 + "  It does not support deltaNeutral parameters: OpenClose, ShortSale, ShortSaleSlot, DesignatedLocation.",
             )
-            return
+            return False
 
-        if self.serverVersion() < MIN_SERVER_VER_SCALE_ORDERS3:
+        if not self.serverCaps.SCALE_ORDERS3:
             if (
                 order.scalePriceIncrement > 0
                 and order.scalePriceIncrement != UNSET_DOUBLE
@@ -1317,11 +1391,10 @@ class EClient:
                         + "  It does not support Scale order parameters: PriceAdjustValue, PriceAdjustInterval, "
                         + "ProfitOffset, AutoReset, InitPosition, InitFillQty and RandomPercent",
                     )
-                    return
+                    return False
 
         if (
-            self.serverVersion() < MIN_SERVER_VER_ORDER_COMBO_LEGS_PRICE
-            and contract.secType == "BAG"
+            not self.serverCaps.ORDER_COMBO_LEGS_PRICE and contract.secType == "BAG"
         ) and order.orderComboLegs:
             for orderComboLeg in order.orderComboLegs:
                 if orderComboLeg.price != UNSET_DOUBLE:
@@ -1331,9 +1404,9 @@ class EClient:
                         UPDATE_TWS.msg()
                         + "  It does not support per-leg prices for order combo legs.",
                     )
-                    return
+                    return False
 
-        if self.serverVersion() < MIN_SERVER_VER_TRAILING_PERCENT:
+        if not self.serverCaps.TRAILING_PERCENT:
             if order.trailingPercent != UNSET_DOUBLE:
                 self.wrapper.error(
                     orderId,
@@ -1341,9 +1414,9 @@ class EClient:
                     UPDATE_TWS.msg()
                     + "  It does not support trailing percent parameter",
                 )
-                return
+                return False
 
-        if self.serverVersion() < MIN_SERVER_VER_TRADING_CLASS:
+        if not self.serverCaps.TRADING_CLASS:
             if contract.tradingClass:
                 self.wrapper.error(
                     orderId,
@@ -1351,9 +1424,9 @@ class EClient:
                     UPDATE_TWS.msg()
                     + "  It does not support tradingClass parameter in placeOrder.",
                 )
-                return
+                return False
 
-        if self.serverVersion() < MIN_SERVER_VER_SCALE_TABLE:
+        if not self.serverCaps.SCALE_TABLE:
             if order.scaleTable or order.activeStartTime or order.activeStopTime:
                 self.wrapper.error(
                     orderId,
@@ -1361,17 +1434,17 @@ class EClient:
                     UPDATE_TWS.msg()
                     + "  It does not support scaleTable, activeStartTime and activeStopTime parameters",
                 )
-                return
+                return False
 
-        if self.serverVersion() < MIN_SERVER_VER_ALGO_ID and order.algoId:
+        if not self.serverCaps.ALGO_ID and order.algoId:
             self.wrapper.error(
                 orderId,
                 UPDATE_TWS.code(),
                 UPDATE_TWS.msg() + "  It does not support algoId parameter",
             )
-            return
+            return False
 
-        if self.serverVersion() < MIN_SERVER_VER_ORDER_SOLICITED:
+        if not self.serverCaps.ORDER_SOLICITED:
             if order.solicited:
                 self.wrapper.error(
                     orderId,
@@ -1379,44 +1452,44 @@ class EClient:
                     UPDATE_TWS.msg()
                     + "  It does not support order solicited parameter.",
                 )
-                return
+                return False
 
-        if self.serverVersion() < MIN_SERVER_VER_MODELS_SUPPORT:
+        if not self.serverCaps.MODELS_SUPPORT:
             if order.modelCode:
                 self.wrapper.error(
                     orderId,
                     UPDATE_TWS.code(),
                     UPDATE_TWS.msg() + "  It does not support model code parameter.",
                 )
-                return
+                return False
 
-        if self.serverVersion() < MIN_SERVER_VER_EXT_OPERATOR:
+        if not self.serverCaps.EXT_OPERATOR:
             if order.extOperator:
                 self.wrapper.error(
                     orderId,
                     UPDATE_TWS.code(),
                     UPDATE_TWS.msg() + "  It does not support ext operator parameter",
                 )
-                return
+                return False
 
-        if self.serverVersion() < MIN_SERVER_VER_SOFT_DOLLAR_TIER:
+        if not self.serverCaps.SOFT_DOLLAR_TIER:
             if order.softDollarTier.name or order.softDollarTier.val:
                 self.wrapper.error(
                     orderId,
                     UPDATE_TWS.code(),
                     UPDATE_TWS.msg() + " It does not support soft dollar tier",
                 )
-                return
+                return False
 
-        if self.serverVersion() < MIN_SERVER_VER_CASH_QTY and order.cashQty:
+        if not self.serverCaps.CASH_QTY and order.cashQty:
             self.wrapper.error(
                 orderId,
                 UPDATE_TWS.code(),
                 UPDATE_TWS.msg() + " It does not support cash quantity parameter",
             )
-            return
+            return False
 
-        if self.serverVersion() < MIN_SERVER_VER_DECISION_MAKER and (
+        if not self.serverCaps.DECISION_MAKER and (
             order.mifid2DecisionMaker != "" or order.mifid2DecisionAlgo != ""
         ):
             self.wrapper.error(
@@ -1425,9 +1498,9 @@ class EClient:
                 UPDATE_TWS.msg()
                 + " It does not support MIFID II decision maker parameters",
             )
-            return
+            return False
 
-        if self.serverVersion() < MIN_SERVER_VER_MIFID_EXECUTION and (
+        if not self.serverCaps.MIFID_EXECUTION and (
             order.mifid2ExecutionTrader != "" or order.mifid2ExecutionAlgo != ""
         ):
             self.wrapper.error(
@@ -1435,100 +1508,76 @@ class EClient:
                 UPDATE_TWS.code(),
                 UPDATE_TWS.msg() + " It does not support MIFID II execution parameters",
             )
-            return
+            return False
 
-        if (
-            self.serverVersion() < MIN_SERVER_VER_AUTO_PRICE_FOR_HEDGE
-            and order.dontUseAutoPriceForHedge
-        ):
+        if not self.serverCaps.AUTO_PRICE_FOR_HEDGE and order.dontUseAutoPriceForHedge:
             self.wrapper.error(
                 orderId,
                 UPDATE_TWS.code(),
                 UPDATE_TWS.msg()
                 + " It does not support dontUseAutoPriceForHedge parameter",
             )
-            return
+            return False
 
-        if (
-            self.serverVersion() < MIN_SERVER_VER_ORDER_CONTAINER
-            and order.isOmsContainer
-        ):
+        if not self.serverCaps.ORDER_CONTAINER and order.isOmsContainer:
             self.wrapper.error(
                 orderId,
                 UPDATE_TWS.code(),
                 UPDATE_TWS.msg() + " It does not support oms container parameter",
             )
-            return
+            return False
 
-        if (
-            self.serverVersion() < MIN_SERVER_VER_PRICE_MGMT_ALGO
-            and order.usePriceMgmtAlgo
-        ):
+        if not self.serverCaps.PRICE_MGMT_ALGO and order.usePriceMgmtAlgo:
             self.wrapper.error(
                 orderId,
                 UPDATE_TWS.code(),
                 UPDATE_TWS.msg()
                 + " It does not support Use price management algo requests",
             )
-            return
+            return False
 
-        if (
-            self.serverVersion() < MIN_SERVER_VER_DURATION
-            and order.duration != UNSET_INTEGER
-        ):
+        if not self.serverCaps.DURATION and order.duration != UNSET_INTEGER:
             self.wrapper.error(
                 orderId,
                 UPDATE_TWS.code(),
                 UPDATE_TWS.msg() + " It does not support duration attribute",
             )
-            return
+            return False
 
-        if (
-            self.serverVersion() < MIN_SERVER_VER_POST_TO_ATS
-            and order.postToAts != UNSET_INTEGER
-        ):
+        if not self.serverCaps.POST_TO_ATS and order.postToAts != UNSET_INTEGER:
             self.wrapper.error(
                 orderId,
                 UPDATE_TWS.code(),
                 UPDATE_TWS.msg() + " It does not support postToAts attribute",
             )
-            return
+            return False
 
-        if (
-            self.serverVersion() < MIN_SERVER_VER_AUTO_CANCEL_PARENT
-            and order.autoCancelParent
-        ):
+        if not self.serverCaps.AUTO_CANCEL_PARENT and order.autoCancelParent:
             self.wrapper.error(
                 orderId,
                 UPDATE_TWS.code(),
                 UPDATE_TWS.msg() + " It does not support autoCancelParent attribute",
             )
-            return
+            return False
 
-        if (
-            self.serverVersion() < MIN_SERVER_VER_ADVANCED_ORDER_REJECT
-            and order.advancedErrorOverride
-        ):
+        if not self.serverCaps.ADVANCED_ORDER_REJECT and order.advancedErrorOverride:
             self.wrapper.error(
                 orderId,
                 UPDATE_TWS.code(),
                 UPDATE_TWS.msg()
                 + "  It does not support advanced error override attribute",
             )
-            return
+            return False
 
-        if (
-            self.serverVersion() < MIN_SERVER_VER_MANUAL_ORDER_TIME
-            and order.manualOrderTime
-        ):
+        if not self.serverCaps.MANUAL_ORDER_TIME and order.manualOrderTime:
             self.wrapper.error(
                 orderId,
                 UPDATE_TWS.code(),
                 UPDATE_TWS.msg() + "  It does not support manual order time attribute",
             )
-            return
+            return False
 
-        if self.serverVersion() < MIN_SERVER_VER_PEGBEST_PEGMID_OFFSETS:
+        if not self.serverCaps.PEGBEST_PEGMID_OFFSETS:
             if (
                 order.minTradeQty != UNSET_INTEGER
                 or order.minCompeteSize != UNSET_INTEGER
@@ -1543,32 +1592,26 @@ class EClient:
                     + "  It does not support PEG BEST / PEG MID order parameters: minTradeQty, minCompeteSize, "
                     + "competeAgainstBestOffset, midOffsetAtWhole and midOffsetAtHalf",
                 )
-                return
+                return False
 
-        if (
-            self.serverVersion() < MIN_SERVER_VER_CUSTOMER_ACCOUNT
-            and order.customerAccount
-        ):
+        if not self.serverCaps.CUSTOMER_ACCOUNT and order.customerAccount:
             self.wrapper.error(
                 orderId,
                 UPDATE_TWS.code(),
                 UPDATE_TWS.msg() + "  It does not support customer account parameter",
             )
-            return
+            return False
 
-        if (
-            self.serverVersion() < MIN_SERVER_VER_PROFESSIONAL_CUSTOMER
-            and order.professionalCustomer
-        ):
+        if not self.serverCaps.PROFESSIONAL_CUSTOMER and order.professionalCustomer:
             self.wrapper.error(
                 orderId,
                 UPDATE_TWS.code(),
                 UPDATE_TWS.msg()
                 + "  It does not support professional customer parameter",
             )
-            return
+            return False
 
-        if self.serverVersion() < MIN_SERVER_VER_RFQ_FIELDS and (
+        if not self.serverCaps.RFQ_FIELDS and (
             order.externalUserId or order.manualOrderIndicator != UNSET_INTEGER
         ):
             self.wrapper.error(
@@ -1577,449 +1620,501 @@ class EClient:
                 UPDATE_TWS.msg()
                 + "  It does not support external user id and manual order indicator parameters",
             )
-            return
+            return False
 
-        try:
-            VERSION = 27 if (self.serverVersion() < MIN_SERVER_VER_NOT_HELD) else 45
+        return True
 
-            # send place order msg
-            flds = []
-            flds += [make_field(OUT.PLACE_ORDER)]
+    def encodeTotalQuantity(self, totalQuantity) -> str:
+        if self.serverCaps.FRACTIONAL_POSITIONS:
+            return make_field(totalQuantity)
+        return make_field(int(totalQuantity))
 
-            if self.serverVersion() < MIN_SERVER_VER_ORDER_CONTAINER:
-                flds += [make_field(VERSION)]
+    def encodeLmtPrice(self, lmtPrice: float) -> str:
+        if not self.serverCaps.ORDER_COMBO_LEGS_PRICE:
+            return make_field(lmtPrice if lmtPrice != UNSET_DOUBLE else 0)
+        return make_field_handle_empty(lmtPrice)
 
-            flds += [make_field(orderId)]
+    def encodePlaceOrder(
+        self, orderId: OrderId, contract: Contract, order: Order, slots=None
+    ) -> list:
+        """Returns the fields of the place order message, the order is
+        expected to have passed validatePlaceOrder(). May raise
+        ClientException.
 
-            # send contract fields
-            if self.serverVersion() >= MIN_SERVER_VER_PLACE_ORDER_CONID:
-                flds.append(make_field(contract.conId))
-            flds += [
-                make_field(contract.symbol),
-                make_field(contract.secType),
-                make_field(contract.lastTradeDateOrContractMonth),
-                make_field(contract.strike),
-                make_field(contract.right),
-                make_field(contract.multiplier),  # srv v15 and above
-                make_field(contract.exchange),
-                make_field(contract.primaryExchange),  # srv v14 and above
-                make_field(contract.currency),
-                make_field(contract.localSymbol),
-            ]  # srv v2 and above
-            if self.serverVersion() >= MIN_SERVER_VER_TRADING_CLASS:
-                flds.append(make_field(contract.tradingClass))
+        slots:dict - If given, it receives the index of the orderId,
+            totalQuantity and lmtPrice fields. See OrderTemplate.
+        """
+        VERSION = 27 if (not self.serverCaps.NOT_HELD) else 45
 
-            if self.serverVersion() >= MIN_SERVER_VER_SEC_ID_TYPE:
-                flds += [make_field(contract.secIdType), make_field(contract.secId)]
+        # send place order msg
+        flds = []
+        flds += [make_field(OUT.PLACE_ORDER)]
 
-            # send main order fields
-            flds.append(make_field(order.action))
+        if not self.serverCaps.ORDER_CONTAINER:
+            flds += [make_field(VERSION)]
 
-            if self.serverVersion() >= MIN_SERVER_VER_FRACTIONAL_POSITIONS:
-                flds.append(make_field(order.totalQuantity))
-            else:
-                flds.append(make_field(int(order.totalQuantity)))
+        flds += [make_field(orderId)]
+        if slots is not None:
+            slots["orderId"] = len(flds) - 1
 
-            flds.append(make_field(order.orderType))
-            if self.serverVersion() < MIN_SERVER_VER_ORDER_COMBO_LEGS_PRICE:
-                flds.append(
-                    make_field(order.lmtPrice if order.lmtPrice != UNSET_DOUBLE else 0)
-                )
-            else:
-                flds.append(make_field_handle_empty(order.lmtPrice))
-            if self.serverVersion() < MIN_SERVER_VER_TRAILING_PERCENT:
-                flds.append(
-                    make_field(order.auxPrice if order.auxPrice != UNSET_DOUBLE else 0)
-                )
-            else:
-                flds.append(make_field_handle_empty(order.auxPrice))
+        # send contract fields
+        flds.append(encodeContract(contract, PLACE_ORDER, self.serverCaps))
 
-                # send extended order fields
-                flds += [
-                    make_field(order.tif),
-                    make_field(order.ocaGroup),
-                    make_field(order.account),
-                    make_field(order.openClose),
-                    make_field(order.origin),
-                    make_field(order.orderRef),
-                    make_field(order.transmit),
-                    make_field(order.parentId),  # srv v4 and above
-                    make_field(order.blockOrder),  # srv v5 and above
-                    make_field(order.sweepToFill),  # srv v5 and above
-                    make_field(order.displaySize),  # srv v5 and above
-                    make_field(order.triggerMethod),  # srv v5 and above
-                    make_field(order.outsideRth),  # srv v5 and above
-                    make_field(order.hidden),
-                ]  # srv v7 and above
+        # send main order fields
+        flds.append(make_field(order.action))
 
-            # Send combo legs for BAG requests (srv v8 and above)
-            if contract.secType == "BAG":
-                comboLegsCount = len(contract.comboLegs) if contract.comboLegs else 0
-                flds.append(make_field(comboLegsCount))
-                if comboLegsCount > 0:
-                    for comboLeg in contract.comboLegs:
-                        assert comboLeg
-                        flds += [
-                            make_field(comboLeg.conId),
-                            make_field(comboLeg.ratio),
-                            make_field(comboLeg.action),
-                            make_field(comboLeg.exchange),
-                            make_field(comboLeg.openClose),
-                            make_field(comboLeg.shortSaleSlot),  # srv v35 and above
-                            make_field(comboLeg.designatedLocation),
-                        ]  # srv v35 and above
-                        if self.serverVersion() >= MIN_SERVER_VER_SSHORTX_OLD:
-                            flds.append(make_field(comboLeg.exemptCode))
-
-            # Send order combo legs for BAG requests
-            if (
-                self.serverVersion() >= MIN_SERVER_VER_ORDER_COMBO_LEGS_PRICE
-                and contract.secType == "BAG"
-            ):
-                orderComboLegsCount = (
-                    len(order.orderComboLegs) if order.orderComboLegs else 0
-                )
-                flds.append(make_field(orderComboLegsCount))
-                if orderComboLegsCount:
-                    for orderComboLeg in order.orderComboLegs:
-                        assert orderComboLeg
-                        flds.append(make_field_handle_empty(orderComboLeg.price))
+        flds.append(self.encodeTotalQuantity(order.totalQuantity))
+        if slots is not None:
+            slots["totalQuantity"] = len(flds) - 1
 
-            if (
-                self.serverVersion() >= MIN_SERVER_VER_SMART_COMBO_ROUTING_PARAMS
-                and contract.secType == "BAG"
-            ):
-                smartComboRoutingParamsCount = (
-                    len(order.smartComboRoutingParams)
-                    if order.smartComboRoutingParams
-                    else 0
-                )
-                flds.append(make_field(smartComboRoutingParamsCount))
-                if smartComboRoutingParamsCount > 0:
-                    for tagValue in order.smartComboRoutingParams:
-                        flds += [make_field(tagValue.tag), make_field(tagValue.value)]
-
-            ######################################################################
-            # Send the shares allocation.
-            #
-            # This specifies the number of order shares allocated to each Financial
-            # Advisor managed account. The format of the allocation string is as
-            # follows:
-            #                      <account_code1>/<number_shares1>,<account_code2>/<number_shares2>,...N
-            # E.g.
-            #              To allocate 20 shares of a 100 share order to account 'U101' and the
-            #      residual 80 to account 'U203' enter the following share allocation string:
-            #          U101/20,U203/80
-            #####################################################################
-            # send deprecated sharesAllocation field
+        flds.append(make_field(order.orderType))
+        flds.append(self.encodeLmtPrice(order.lmtPrice))
+        if slots is not None:
+            slots["lmtPrice"] = len(flds) - 1
+        if not self.serverCaps.TRAILING_PERCENT:
+            flds.append(
+                make_field(order.auxPrice if order.auxPrice != UNSET_DOUBLE else 0)
+            )
+        else:
+            flds.append(make_field_handle_empty(order.auxPrice))
+
+            # send extended order fields
             flds += [
-                make_field(""),  # srv v9 and above
-                make_field(order.discretionaryAmt),  # srv v10 and above
-                make_field(order.goodAfterTime),  # srv v11 and above
-                make_field(order.goodTillDate),  # srv v12 and above
-                make_field(order.faGroup),  # srv v13 and above
-                make_field(order.faMethod),  # srv v13 and above
-                make_field(order.faPercentage),
-            ]  # srv v13 and above
-            if self.serverVersion() < MIN_SERVER_VER_FA_PROFILE_DESUPPORT:
-                flds.append(make_field(""))  # send deprecated faProfile field
-
-            if self.serverVersion() >= MIN_SERVER_VER_MODELS_SUPPORT:
-                flds.append(make_field(order.modelCode))
-
-            # institutional short saleslot data (srv v18 and above)
+                make_field(order.tif),
+                make_field(order.ocaGroup),
+                make_field(order.account),
+                make_field(order.openClose),
+                make_field(order.origin),
+                make_field(order.orderRef),
+                make_field(order.transmit),
+                make_field(order.parentId),  # srv v4 and above
+                make_field(order.blockOrder),  # srv v5 and above
+                make_field(order.sweepToFill),  # srv v5 and above
+                make_field(order.displaySize),  # srv v5 and above
+                make_field(order.triggerMethod),  # srv v5 and above
+                make_field(order.outsideRth),  # srv v5 and above
+                make_field(order.hidden),
+            ]  # srv v7 and above
+
+        # Send combo legs for BAG requests (srv v8 and above)
+        if contract.secType == "BAG":
+            comboLegsCount = len(contract.comboLegs) if contract.comboLegs else 0
+            flds.append(make_field(comboLegsCount))
+            if comboLegsCount > 0:
+                for comboLeg in contract.comboLegs:
+                    assert comboLeg
+                    flds += [
+                        make_field(comboLeg.conId),
+                        make_field(comboLeg.ratio),
+                        make_field(comboLeg.action),
+                        make_field(comboLeg.exchange),
+                        make_field(comboLeg.openClose),
+                        make_field(comboLeg.shortSaleSlot),  # srv v35 and above
+                        make_field(comboLeg.designatedLocation),
+                    ]  # srv v35 and above
+                    if self.serverCaps.SSHORTX_OLD:
+                        flds.append(make_field(comboLeg.exemptCode))
+
+        # Send order combo legs for BAG requests
+        if self.serverCaps.ORDER_COMBO_LEGS_PRICE and contract.secType == "BAG":
+            orderComboLegsCount = (
+                len(order.orderComboLegs) if order.orderComboLegs else 0
+            )
+            flds.append(make_field(orderComboLegsCount))
+            if orderComboLegsCount:
+                for orderComboLeg in order.orderComboLegs:
+                    assert orderComboLeg
+                    flds.append(make_field_handle_empty(orderComboLeg.price))
+
+        if self.serverCaps.SMART_COMBO_ROUTING_PARAMS and contract.secType == "BAG":
+            smartComboRoutingParamsCount = (
+                len(order.smartComboRoutingParams)
+                if order.smartComboRoutingParams
+                else 0
+            )
+            flds.append(make_field(smartComboRoutingParamsCount))
+            if smartComboRoutingParamsCount > 0:
+                for tagValue in order.smartComboRoutingParams:
+                    flds += [make_field(tagValue.tag), make_field(tagValue.value)]
+
+        ######################################################################
+        # Send the shares allocation.
+        #
+        # This specifies the number of order shares allocated to each Financial
+        # Advisor managed account. The format of the allocation string is as
+        # follows:
+        #                      <account_code1>/<number_shares1>,<account_code2>/<number_shares2>,...N
+        # E.g.
+        #              To allocate 20 shares of a 100 share order to account 'U101' and the
+        #      residual 80 to account 'U203' enter the following share allocation string:
+        #          U101/20,U203/80
+        #####################################################################
+        # send deprecated sharesAllocation field
+        flds += [
+            make_field(""),  # srv v9 and above
+            make_field(order.discretionaryAmt),  # srv v10 and above
+            make_field(order.goodAfterTime),  # srv v11 and above
+            make_field(order.goodTillDate),  # srv v12 and above
+            make_field(order.faGroup),  # srv v13 and above
+            make_field(order.faMethod),  # srv v13 and above
+            make_field(order.faPercentage),
+        ]  # srv v13 and above
+        if not self.serverCaps.FA_PROFILE_DESUPPORT:
+            flds.append(make_field(""))  # send deprecated faProfile field
+
+        if self.serverCaps.MODELS_SUPPORT:
+            flds.append(make_field(order.modelCode))
+
+        # institutional short saleslot data (srv v18 and above)
+        flds += [
+            make_field(order.shortSaleSlot),  # 0 for retail, 1 or 2 for institutions
+            make_field(order.designatedLocation),
+        ]  # populate only when shortSaleSlot = 2.
+        if self.serverCaps.SSHORTX_OLD:
+            flds.append(make_field(order.exemptCode))
+
+        # srv v19 and above fields
+        flds.append(make_field(order.ocaType))
+        # if( self.serverVersion() < 38) {
+        # will never happen
+        #      send( /* order.rthOnly */ false)
+        # }
+        flds += [
+            make_field(order.rule80A),
+            make_field(order.settlingFirm),
+            make_field(order.allOrNone),
+            make_field_handle_empty(order.minQty),
+            make_field_handle_empty(order.percentOffset),
+            make_field(False),
+            make_field(False),
+            make_field_handle_empty(UNSET_DOUBLE),
+            make_field(
+                order.auctionStrategy
+            ),  # AUCTION_MATCH, AUCTION_IMPROVEMENT, AUCTION_TRANSPARENT
+            make_field_handle_empty(order.startingPrice),
+            make_field_handle_empty(order.stockRefPrice),
+            make_field_handle_empty(order.delta),
+            make_field_handle_empty(order.stockRangeLower),
+            make_field_handle_empty(order.stockRangeUpper),
+            make_field(order.overridePercentageConstraints),  # srv v22 and above
+            # Volatility orders (srv v26 and above)
+            make_field_handle_empty(order.volatility),
+            make_field_handle_empty(order.volatilityType),
+            make_field(order.deltaNeutralOrderType),  # srv v28 and above
+            make_field_handle_empty(order.deltaNeutralAuxPrice),
+        ]  # srv v28 and above
+
+        if self.serverCaps.DELTA_NEUTRAL_CONID and order.deltaNeutralOrderType:
             flds += [
-                make_field(
-                    order.shortSaleSlot
-                ),  # 0 for retail, 1 or 2 for institutions
-                make_field(order.designatedLocation),
-            ]  # populate only when shortSaleSlot = 2.
-            if self.serverVersion() >= MIN_SERVER_VER_SSHORTX_OLD:
-                flds.append(make_field(order.exemptCode))
-
-            # srv v19 and above fields
-            flds.append(make_field(order.ocaType))
-            # if( self.serverVersion() < 38) {
-            # will never happen
-            #      send( /* order.rthOnly */ false)
-            # }
+                make_field(order.deltaNeutralConId),
+                make_field(order.deltaNeutralSettlingFirm),
+                make_field(order.deltaNeutralClearingAccount),
+                make_field(order.deltaNeutralClearingIntent),
+            ]
+
+        if self.serverCaps.DELTA_NEUTRAL_OPEN_CLOSE and order.deltaNeutralOrderType:
             flds += [
-                make_field(order.rule80A),
-                make_field(order.settlingFirm),
-                make_field(order.allOrNone),
-                make_field_handle_empty(order.minQty),
-                make_field_handle_empty(order.percentOffset),
-                make_field(False),
-                make_field(False),
-                make_field_handle_empty(UNSET_DOUBLE),
-                make_field(
-                    order.auctionStrategy
-                ),  # AUCTION_MATCH, AUCTION_IMPROVEMENT, AUCTION_TRANSPARENT
-                make_field_handle_empty(order.startingPrice),
-                make_field_handle_empty(order.stockRefPrice),
-                make_field_handle_empty(order.delta),
-                make_field_handle_empty(order.stockRangeLower),
-                make_field_handle_empty(order.stockRangeUpper),
-                make_field(order.overridePercentageConstraints),  # srv v22 and above
-                # Volatility orders (srv v26 and above)
-                make_field_handle_empty(order.volatility),
-                make_field_handle_empty(order.volatilityType),
-                make_field(order.deltaNeutralOrderType),  # srv v28 and above
-                make_field_handle_empty(order.deltaNeutralAuxPrice),
-            ]  # srv v28 and above
+                make_field(order.deltaNeutralOpenClose),
+                make_field(order.deltaNeutralShortSale),
+                make_field(order.deltaNeutralShortSaleSlot),
+                make_field(order.deltaNeutralDesignatedLocation),
+            ]
 
-            if (
-                self.serverVersion() >= MIN_SERVER_VER_DELTA_NEUTRAL_CONID
-                and order.deltaNeutralOrderType
-            ):
-                flds += [
-                    make_field(order.deltaNeutralConId),
-                    make_field(order.deltaNeutralSettlingFirm),
-                    make_field(order.deltaNeutralClearingAccount),
-                    make_field(order.deltaNeutralClearingIntent),
-                ]
+        flds += [
+            make_field(order.continuousUpdate),
+            make_field_handle_empty(order.referencePriceType),
+            make_field_handle_empty(order.trailStopPrice),
+        ]  # srv v30 and above
 
-            if (
-                self.serverVersion() >= MIN_SERVER_VER_DELTA_NEUTRAL_OPEN_CLOSE
-                and order.deltaNeutralOrderType
-            ):
-                flds += [
-                    make_field(order.deltaNeutralOpenClose),
-                    make_field(order.deltaNeutralShortSale),
-                    make_field(order.deltaNeutralShortSaleSlot),
-                    make_field(order.deltaNeutralDesignatedLocation),
-                ]
+        if self.serverCaps.TRAILING_PERCENT:
+            flds.append(make_field_handle_empty(order.trailingPercent))
 
+        # SCALE orders
+        if self.serverCaps.SCALE_ORDERS2:
+            flds += [
+                make_field_handle_empty(order.scaleInitLevelSize),
+                make_field_handle_empty(order.scaleSubsLevelSize),
+            ]
+        else:
+            # srv v35 and above)
             flds += [
-                make_field(order.continuousUpdate),
-                make_field_handle_empty(order.referencePriceType),
-                make_field_handle_empty(order.trailStopPrice),
-            ]  # srv v30 and above
+                make_field(""),  # for not supported scaleNumComponents
+                make_field_handle_empty(order.scaleInitLevelSize),
+            ]  # for scaleComponentSize
 
-            if self.serverVersion() >= MIN_SERVER_VER_TRAILING_PERCENT:
-                flds.append(make_field_handle_empty(order.trailingPercent))
+        flds.append(make_field_handle_empty(order.scalePriceIncrement))
 
-            # SCALE orders
-            if self.serverVersion() >= MIN_SERVER_VER_SCALE_ORDERS2:
-                flds += [
-                    make_field_handle_empty(order.scaleInitLevelSize),
-                    make_field_handle_empty(order.scaleSubsLevelSize),
-                ]
-            else:
-                # srv v35 and above)
-                flds += [
-                    make_field(""),  # for not supported scaleNumComponents
-                    make_field_handle_empty(order.scaleInitLevelSize),
-                ]  # for scaleComponentSize
+        if (
+            self.serverCaps.SCALE_ORDERS3
+            and order.scalePriceIncrement != UNSET_DOUBLE
+            and order.scalePriceIncrement > 0.0
+        ):
+            flds += [
+                make_field_handle_empty(order.scalePriceAdjustValue),
+                make_field_handle_empty(order.scalePriceAdjustInterval),
+                make_field_handle_empty(order.scaleProfitOffset),
+                make_field(order.scaleAutoReset),
+                make_field_handle_empty(order.scaleInitPosition),
+                make_field_handle_empty(order.scaleInitFillQty),
+                make_field(order.scaleRandomPercent),
+            ]
 
-            flds.append(make_field_handle_empty(order.scalePriceIncrement))
+        if self.serverCaps.SCALE_TABLE:
+            flds += [
+                make_field(order.scaleTable),
+                make_field(order.activeStartTime),
+                make_field(order.activeStopTime),
+            ]
 
-            if (
-                self.serverVersion() >= MIN_SERVER_VER_SCALE_ORDERS3
-                and order.scalePriceIncrement != UNSET_DOUBLE
-                and order.scalePriceIncrement > 0.0
-            ):
-                flds += [
-                    make_field_handle_empty(order.scalePriceAdjustValue),
-                    make_field_handle_empty(order.scalePriceAdjustInterval),
-                    make_field_handle_empty(order.scaleProfitOffset),
-                    make_field(order.scaleAutoReset),
-                    make_field_handle_empty(order.scaleInitPosition),
-                    make_field_handle_empty(order.scaleInitFillQty),
-                    make_field(order.scaleRandomPercent),
-                ]
+        # HEDGE orders
+        if self.serverCaps.HEDGE_ORDERS:
+            flds.append(make_field(order.hedgeType))
+            if order.hedgeType:
+                flds.append(make_field(order.hedgeParam))
 
-            if self.serverVersion() >= MIN_SERVER_VER_SCALE_TABLE:
-                flds += [
-                    make_field(order.scaleTable),
-                    make_field(order.activeStartTime),
-                    make_field(order.activeStopTime),
-                ]
+        if self.serverCaps.OPT_OUT_SMART_ROUTING:
+            flds.append(make_field(order.optOutSmartRouting))
 
-            # HEDGE orders
-            if self.serverVersion() >= MIN_SERVER_VER_HEDGE_ORDERS:
-                flds.append(make_field(order.hedgeType))
-                if order.hedgeType:
-                    flds.append(make_field(order.hedgeParam))
+        if self.serverCaps.PTA_ORDERS:
+            flds += [
+                make_field(order.clearingAccount),
+                make_field(order.clearingIntent),
+            ]
 
-            if self.serverVersion() >= MIN_SERVER_VER_OPT_OUT_SMART_ROUTING:
-                flds.append(make_field(order.optOutSmartRouting))
+        if self.serverCaps.NOT_HELD:
+            flds.append(make_field(order.notHeld))
 
-            if self.serverVersion() >= MIN_SERVER_VER_PTA_ORDERS:
+        if self.serverCaps.DELTA_NEUTRAL:
+            if contract.deltaNeutralContract:
                 flds += [
-                    make_field(order.clearingAccount),
-                    make_field(order.clearingIntent),
+                    make_field(True),
+                    make_field(contract.deltaNeutralContract.conId),
+                    make_field(contract.deltaNeutralContract.delta),
+                    make_field(contract.deltaNeutralContract.price),
                 ]
+            else:
+                flds.append(make_field(False))
 
-            if self.serverVersion() >= MIN_SERVER_VER_NOT_HELD:
-                flds.append(make_field(order.notHeld))
+        if self.serverCaps.ALGO_ORDERS:
+            flds.append(make_field(order.algoStrategy))
+            if order.algoStrategy:
+                algoParamsCount = len(order.algoParams) if order.algoParams else 0
+                flds.append(make_field(algoParamsCount))
+                if algoParamsCount > 0:
+                    for algoParam in order.algoParams:
+                        flds += [
+                            make_field(algoParam.tag),
+                            make_field(algoParam.value),
+                        ]
 
-            if self.serverVersion() >= MIN_SERVER_VER_DELTA_NEUTRAL:
-                if contract.deltaNeutralContract:
-                    flds += [
-                        make_field(True),
-                        make_field(contract.deltaNeutralContract.conId),
-                        make_field(contract.deltaNeutralContract.delta),
-                        make_field(contract.deltaNeutralContract.price),
-                    ]
-                else:
-                    flds.append(make_field(False))
-
-            if self.serverVersion() >= MIN_SERVER_VER_ALGO_ORDERS:
-                flds.append(make_field(order.algoStrategy))
-                if order.algoStrategy:
-                    algoParamsCount = len(order.algoParams) if order.algoParams else 0
-                    flds.append(make_field(algoParamsCount))
-                    if algoParamsCount > 0:
-                        for algoParam in order.algoParams:
-                            flds += [
-                                make_field(algoParam.tag),
-                                make_field(algoParam.value),
-                            ]
-
-            if self.serverVersion() >= MIN_SERVER_VER_ALGO_ID:
-                flds.append(make_field(order.algoId))
-
-            flds.append(make_field(order.whatIf))  # srv v36 and above
-
-            # send miscOptions parameter
-            if self.serverVersion() >= MIN_SERVER_VER_LINKING:
-                miscOptionsStr = ""
-                if order.orderMiscOptions:
-                    for tagValue in order.orderMiscOptions:
-                        miscOptionsStr += str(tagValue)
-                flds.append(make_field(miscOptionsStr))
-
-            if self.serverVersion() >= MIN_SERVER_VER_ORDER_SOLICITED:
-                flds.append(make_field(order.solicited))
-
-            if self.serverVersion() >= MIN_SERVER_VER_RANDOMIZE_SIZE_AND_PRICE:
-                flds += [
-                    make_field(order.randomizeSize),
-                    make_field(order.randomizePrice),
-                ]
+        if self.serverCaps.ALGO_ID:
+            flds.append(make_field(order.algoId))
 
-            if self.serverVersion() >= MIN_SERVER_VER_PEGGED_TO_BENCHMARK:
-                if isPegBenchOrder(order.orderType):
-                    flds += [
-                        make_field(order.referenceContractId),
-                        make_field(order.isPeggedChangeAmountDecrease),
-                        make_field(order.peggedChangeAmount),
-                        make_field(order.referenceChangeAmount),
-                        make_field(order.referenceExchangeId),
-                    ]
+        flds.append(make_field(order.whatIf))  # srv v36 and above
 
-                flds.append(make_field(len(order.conditions)))
+        # send miscOptions parameter
+        if self.serverCaps.LINKING:
+            miscOptionsStr = ""
+            if order.orderMiscOptions:
+                for tagValue in order.orderMiscOptions:
+                    miscOptionsStr += str(tagValue)
+            flds.append(make_field(miscOptionsStr))
 
-                if len(order.conditions) > 0:
-                    for cond in order.conditions:
-                        flds.append(make_field(cond.type()))
-                        flds += cond.make_fields()
+        if self.serverCaps.ORDER_SOLICITED:
+            flds.append(make_field(order.solicited))
 
-                    flds += [
-                        make_field(order.conditionsIgnoreRth),
-                        make_field(order.conditionsCancelOrder),
-                    ]
+        if self.serverCaps.RANDOMIZE_SIZE_AND_PRICE:
+            flds += [
+                make_field(order.randomizeSize),
+                make_field(order.randomizePrice),
+            ]
 
+        if self.serverCaps.PEGGED_TO_BENCHMARK:
+            if isPegBenchOrder(order.orderType):
                 flds += [
-                    make_field(order.adjustedOrderType),
-                    make_field(order.triggerPrice),
-                    make_field(order.lmtPriceOffset),
-                    make_field(order.adjustedStopPrice),
-                    make_field(order.adjustedStopLimitPrice),
-                    make_field(order.adjustedTrailingAmount),
-                    make_field(order.adjustableTrailingUnit),
+                    make_field(order.referenceContractId),
+                    make_field(order.isPeggedChangeAmountDecrease),
+                    make_field(order.peggedChangeAmount),
+                    make_field(order.referenceChangeAmount),
+                    make_field(order.referenceExchangeId),
                 ]
 
-            if self.serverVersion() >= MIN_SERVER_VER_EXT_OPERATOR:
-                flds.append(make_field(order.extOperator))
+            flds.append(make_field(len(order.conditions)))
+
+            if len(order.conditions) > 0:
+                for cond in order.conditions:
+                    flds.append(make_field(cond.type()))
+                    flds += cond.make_fields()
 
-            if self.serverVersion() >= MIN_SERVER_VER_SOFT_DOLLAR_TIER:
                 flds += [
-                    make_field(order.softDollarTier.name),
-                    make_field(order.softDollarTier.val),
+                    make_field(order.conditionsIgnoreRth),
+                    make_field(order.conditionsCancelOrder),
                 ]
 
-            if self.serverVersion() >= MIN_SERVER_VER_CASH_QTY:
-                flds.append(make_field(order.cashQty))
+            flds += [
+                make_field(order.adjustedOrderType),
+                make_field(order.triggerPrice),
+                make_field(order.lmtPriceOffset),
+                make_field(order.adjustedStopPrice),
+                make_field(order.adjustedStopLimitPrice),
+                make_field(order.adjustedTrailingAmount),
+                make_field(order.adjustableTrailingUnit),
+            ]
+
+        if self.serverCaps.EXT_OPERATOR:
+            flds.append(make_field(order.extOperator))
+
+        if self.serverCaps.SOFT_DOLLAR_TIER:
+            flds += [
+                make_field(order.softDollarTier.name),
+                make_field(order.softDollarTier.val),
+            ]
 
-            if self.serverVersion() >= MIN_SERVER_VER_DECISION_MAKER:
-                flds.append(make_field(order.mifid2DecisionMaker))
-                flds.append(make_field(order.mifid2DecisionAlgo))
+        if self.serverCaps.CASH_QTY:
+            flds.append(make_field(order.cashQty))
 
-            if self.serverVersion() >= MIN_SERVER_VER_MIFID_EXECUTION:
-                flds.append(make_field(order.mifid2ExecutionTrader))
-                flds.append(make_field(order.mifid2ExecutionAlgo))
+        if self.serverCaps.DECISION_MAKER:
+            flds.append(make_field(order.mifid2DecisionMaker))
+            flds.append(make_field(order.mifid2DecisionAlgo))
 
-            if self.serverVersion() >= MIN_SERVER_VER_AUTO_PRICE_FOR_HEDGE:
-                flds.append(make_field(order.dontUseAutoPriceForHedge))
+        if self.serverCaps.MIFID_EXECUTION:
+            flds.append(make_field(order.mifid2ExecutionTrader))
+            flds.append(make_field(order.mifid2ExecutionAlgo))
 
-            if self.serverVersion() >= MIN_SERVER_VER_ORDER_CONTAINER:
-                flds.append(make_field(order.isOmsContainer))
+        if self.serverCaps.AUTO_PRICE_FOR_HEDGE:
+            flds.append(make_field(order.dontUseAutoPriceForHedge))
 
-            if self.serverVersion() >= MIN_SERVER_VER_D_PEG_ORDERS:
-                flds.append(make_field(order.discretionaryUpToLimitPrice))
+        if self.serverCaps.ORDER_CONTAINER:
+            flds.append(make_field(order.isOmsContainer))
 
-            if self.serverVersion() >= MIN_SERVER_VER_PRICE_MGMT_ALGO:
-                flds.append(
-                    make_field_handle_empty(
-                        UNSET_INTEGER
-                        if order.usePriceMgmtAlgo is None
-                        else 1
-                        if order.usePriceMgmtAlgo
-                        else 0
-                    )
+        if self.serverCaps.D_PEG_ORDERS:
+            flds.append(make_field(order.discretionaryUpToLimitPrice))
+
+        if self.serverCaps.PRICE_MGMT_ALGO:
+            flds.append(
+                make_field_handle_empty(
+                    UNSET_INTEGER
+                    if order.usePriceMgmtAlgo is None
+                    else 1
+                    if order.usePriceMgmtAlgo
+                    else 0
                 )
+            )
+
+        if self.serverCaps.DURATION:
+            flds.append(make_field(order.duration))
+
+        if self.serverCaps.POST_TO_ATS:
+            flds.append(make_field(order.postToAts))
 
-            if self.serverVersion() >= MIN_SERVER_VER_DURATION:
-                flds.append(make_field(order.duration))
-
-            if self.serverVersion() >= MIN_SERVER_VER_POST_TO_ATS:
-                flds.append(make_field(order.postToAts))
-
-            if self.serverVersion() >= MIN_SERVER_VER_AUTO_CANCEL_PARENT:
-                flds.append(make_field(order.autoCancelParent))
-
-            if self.serverVersion() >= MIN_SERVER_VER_ADVANCED_ORDER_REJECT:
-                flds.append(make_field(order.advancedErrorOverride))
-
-            if self.serverVersion() >= MIN_SERVER_VER_MANUAL_ORDER_TIME:
-                flds.append(make_field(order.manualOrderTime))
-
-            if self.serverVersion() >= MIN_SERVER_VER_PEGBEST_PEGMID_OFFSETS:
-                sendMidOffsets = False
-                if contract.exchange == "IBKRATS":
-                    flds.append(make_field_handle_empty(order.minTradeQty))
-                if isPegBestOrder(order.orderType):
-                    flds.append(make_field_handle_empty(order.minCompeteSize))
-                    flds.append(make_field_handle_empty(order.competeAgainstBestOffset))
-                    if (
-                        order.competeAgainstBestOffset
-                        == COMPETE_AGAINST_BEST_OFFSET_UP_TO_MID
-                    ):
-                        sendMidOffsets = True
-                elif isPegMidOrder(order.orderType):
+        if self.serverCaps.AUTO_CANCEL_PARENT:
+            flds.append(make_field(order.autoCancelParent))
+
+        if self.serverCaps.ADVANCED_ORDER_REJECT:
+            flds.append(make_field(order.advancedErrorOverride))
+
+        if self.serverCaps.MANUAL_ORDER_TIME:
+            flds.append(make_field(order.manualOrderTime))
+
+        if self.serverCaps.PEGBEST_PEGMID_OFFSETS:
+            sendMidOffsets = False
+            if contract.exchange == "IBKRATS":
+                flds.append(make_field_handle_empty(order.minTradeQty))
+            if isPegBestOrder(order.orderType):
+                flds.append(make_field_handle_empty(order.minCompeteSize))
+                flds.append(make_field_handle_empty(order.competeAgainstBestOffset))
+                if (
+                    order.competeAgainstBestOffset
+                    == COMPETE_AGAINST_BEST_OFFSET_UP_TO_MID
+                ):
                     sendMidOffsets = True
-                if sendMidOffsets:
-                    flds.append(make_field_handle_empty(order.midOffsetAtWhole))
-                    flds.append(make_field_handle_empty(order.midOffsetAtHalf))
+            elif isPegMidOrder(order.orderType):
+                sendMidOffsets = True
+            if sendMidOffsets:
+                flds.append(make_field_handle_empty(order.midOffsetAtWhole))
+                flds.append(make_field_handle_empty(order.midOffsetAtHalf))
 
-            if self.serverVersion() >= MIN_SERVER_VER_CUSTOMER_ACCOUNT:
-                flds.append(make_field(order.customerAccount))
+        if self.serverCaps.CUSTOMER_ACCOUNT:
+            flds.append(make_field(order.customerAccount))
 
-            if self.serverVersion() >= MIN_SERVER_VER_PROFESSIONAL_CUSTOMER:
-                flds.append(make_field(order.professionalCustomer))
+        if self.serverCaps.PROFESSIONAL_CUSTOMER:
+            flds.append(make_field(order.professionalCustomer))
 
-            if self.serverVersion() >= MIN_SERVER_VER_RFQ_FIELDS:
-                flds.append(make_field(order.externalUserId))
-                flds.append(make_field(order.manualOrderIndicator))
+        if self.serverCaps.RFQ_FIELDS:
+            flds.append(make_field(order.externalUserId))
+            flds.append(make_field(order.manualOrderIndicator))
 
-            msg = "".join(flds)
+        return flds
+
+    def makeOrderTemplate(self, contract: Contract, order: Order):
+        """Validates and pre-encodes a (Contract, Order) for repeated sending
+        with placeTemplateOrder(). Returns None if the order can't be sent,
+        the reason is reported through EWrapper.error().
+
+        contract:Contract - The contract being traded.
+        order:Order - The order whose attributes, apart from lmtPrice and
+            totalQuantity, are fixed for all the orders sent from the
+            template. Both objects are copied.
+        """
+        self.logRequest(current_fn_name(), vars())
+
+        if not self.isConnected():
+            self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
+            return None
+
+        template = OrderTemplate(contract, order)
+        if not self.buildOrderTemplate(NO_VALID_ID, template):
+            return None
+        return template
+
+    def buildOrderTemplate(self, orderId: OrderId, template: OrderTemplate) -> bool:
+        if not self.validatePlaceOrder(orderId, template.contract, template.order):
+            return False
+
+        try:
+            template.build(self)
 
         except ClientException as ex:
             self.wrapper.error(orderId, ex.code, ex.msg + ex.text)
+            return False
+
+        return True
+
+    def placeTemplateOrder(
+        self,
+        orderId: OrderId,
+        template: OrderTemplate,
+        lmtPrice: float = None,
+        totalQuantity: Decimal = None,
+    ) -> None:
+        """Places (or modifies) an order built from a template. Only the
+        orderId, lmtPrice and totalQuantity fields are encoded, the rest of
+        the message was prepared by makeOrderTemplate().
+
+        orderId:OrderId - The order id, as for placeOrder().
+        template:OrderTemplate - As returned by makeOrderTemplate().
+        lmtPrice:float - The limit price, None keeps the template's.
+        totalQuantity:Decimal - The order size, None keeps the template's.
+        """
+        self.logRequest(current_fn_name(), vars())
+
+        if not self.isConnected():
+            self.wrapper.error(orderId, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
+        # the template was encoded for another TWS, eg: before a reconnect
+        if template.serverVersion != self.serverVersion():
+            if not self.buildOrderTemplate(orderId, template):
+                return
+
+        msg = template.encode(
+            self,
+            orderId,
+            template.order.lmtPrice if lmtPrice is None else lmtPrice,
+            template.order.totalQuantity if totalQuantity is None else totalQuantity,
+        )
+
+        self.placing(orderId)
         self.sendMsg(msg)
 
     def cancelOrder(self, orderId: OrderId, orderCancel: OrderCancel) -> None:
@@ -2034,19 +2129,33 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if (
-            self.serverVersion() < MIN_SERVER_VER_MANUAL_ORDER_TIME
-            and orderCancel.manualOrderCancelTime
-        ):
+        if not self.validateCancelOrder(orderId, orderCancel):
+            return
+
+        try:
+            msg = "".join(self.encodeCancelOrder(orderId, orderCancel))
+
+        except ClientException as ex:
+            self.wrapper.error(orderId, ex.code, ex.msg + ex.text)
+            return
+
+        self.sendMsg(msg)
+
+    def validateCancelOrder(self, orderId: OrderId, orderCancel: OrderCancel) -> bool:
+        """Checks that the connected TWS supports all the cancel attributes
+        in use. Problems are reported through EWrapper.error() and False is
+        returned, in which case the cancel must not be sent.
+        """
+        if not self.serverCaps.MANUAL_ORDER_TIME and orderCancel.manualOrderCancelTime:
             self.wrapper.error(
                 orderId,
                 UPDATE_TWS.code(),
                 UPDATE_TWS.msg()
                 + "  It does not support manual order cancel time attribute",
             )
-            return
+            return False
 
-        if self.serverVersion() < MIN_SERVER_VER_RFQ_FIELDS and (
+        if not self.serverCaps.RFQ_FIELDS and (
             orderCancel.extOperator
             or orderCancel.externalUserId
             or orderCancel.manualOrderIndicator != UNSET_INTEGER
@@ -2057,31 +2166,92 @@ class EClient:
                 UPDATE_TWS.msg()
                 + "  It does not support ext operator, external user id and manual order indicator parameters",
             )
+            return False
+
+        return True
+
+    def encodeCancelOrder(self, orderId: OrderId, orderCancel: OrderCancel) -> list:
+        """Returns the fields of the cancel order message. May raise
+        ClientException.
+        """
+        VERSION = 1
+
+        flds = []
+        flds += [make_field(OUT.CANCEL_ORDER)]
+        flds += [make_field(VERSION)]
+        flds += [make_field(orderId)]
+
+        if self.serverCaps.MANUAL_ORDER_TIME:
+            flds += [make_field(orderCancel.manualOrderCancelTime)]
+
+        if self.serverCaps.RFQ_FIELDS:
+            flds += [make_field(orderCancel.extOperator)]
+            flds += [make_field(orderCancel.externalUserId)]
+            flds += [make_field(orderCancel.manualOrderIndicator)]
+
+        return flds
+
+    def placeOrders(self, orders: list) -> None:
+        """Call this function to place (or modify) many orders at once, eg: a
+        basket. All the orders are validated and encoded first, the ones that
+        pass are then written to the socket in a single send. Problems with
+        an order are reported through EWrapper.error() with its orderId and
+        only that order is left out.
+
+        orders:list - The (orderId, contract, order) tuples, each as for
+            placeOrder(). They are sent in the given order.
+        """
+        self.logRequest(current_fn_name(), vars())
+
+        if not self.isConnected():
+            for orderId, _, _ in orders:
+                self.wrapper.error(orderId, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        try:
-            VERSION = 1
+        msgs = []
+        for orderId, contract, order in orders:
+            if not self.validatePlaceOrder(orderId, contract, order):
+                continue
 
-            flds = []
-            flds += [make_field(OUT.CANCEL_ORDER)]
-            flds += [make_field(VERSION)]
-            flds += [make_field(orderId)]
+            try:
+                msgs.append("".join(self.encodePlaceOrder(orderId, contract, order)))
 
-            if self.serverVersion() >= MIN_SERVER_VER_MANUAL_ORDER_TIME:
-                flds += [make_field(orderCancel.manualOrderCancelTime)]
+            except ClientException as ex:
+                self.wrapper.error(orderId, ex.code, ex.msg + ex.text)
+                continue
 
-            if self.serverVersion() >= MIN_SERVER_VER_RFQ_FIELDS:
-                flds += [make_field(orderCancel.extOperator)]
-                flds += [make_field(orderCancel.externalUserId)]
-                flds += [make_field(orderCancel.manualOrderIndicator)]
+            self.placing(orderId)
 
-            msg = "".join(flds)
+        self.sendMsgs(msgs)
 
-        except ClientException as ex:
-            self.wrapper.error(orderId, ex.code, ex.msg + ex.text)
+    def cancelOrders(self, cancels: list) -> None:
+        """Call this function to cancel many orders at once, eg: all the
+        orders of one strategy. As with placeOrders() everything is validated
+        and encoded first and then sent in one go; problems are reported
+        through EWrapper.error() per order.
+
+        cancels:list - The (orderId, orderCancel) tuples, each as for
+            cancelOrder().
+        """
+        self.logRequest(current_fn_name(), vars())
+
+        if not self.isConnected():
+            for orderId, _ in cancels:
+                self.wrapper.error(orderId, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        self.sendMsg(msg)
+        msgs = []
+        for orderId, orderCancel in cancels:
+            if not self.validateCancelOrder(orderId, orderCancel):
+                continue
+
+            try:
+                msgs.append("".join(self.encodeCancelOrder(orderId, orderCancel)))
+
+            except ClientException as ex:
+                self.wrapper.error(orderId, ex.code, ex.msg + ex.text)
+
+        self.sendMsgs(msgs)
 
     def reqOpenOrders(self) -> None:
         """Call this function to request the open orders that were
@@ -2340,7 +2510,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_POSITIONS:
+        if not self.serverCaps.POSITIONS:
             self.wrapper.error(
                 NO_VALID_ID,
                 UPDATE_TWS.code(),
@@ -2362,7 +2532,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_POSITIONS:
+        if not self.serverCaps.POSITIONS:
             self.wrapper.error(
                 NO_VALID_ID,
                 UPDATE_TWS.code(),
@@ -2387,7 +2557,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_MODELS_SUPPORT:
+        if not self.serverCaps.MODELS_SUPPORT:
             self.wrapper.error(
                 NO_VALID_ID,
                 UPDATE_TWS.code(),
@@ -2419,7 +2589,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_MODELS_SUPPORT:
+        if not self.serverCaps.MODELS_SUPPORT:
             self.wrapper.error(
                 NO_VALID_ID,
                 UPDATE_TWS.code(),
@@ -2447,7 +2617,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_MODELS_SUPPORT:
+        if not self.serverCaps.MODELS_SUPPORT:
             self.wrapper.error(
                 NO_VALID_ID,
                 UPDATE_TWS.code(),
@@ -2481,7 +2651,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_MODELS_SUPPORT:
+        if not self.serverCaps.MODELS_SUPPORT:
             self.wrapper.error(
                 NO_VALID_ID,
                 UPDATE_TWS.code(),
@@ -2510,7 +2680,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_PNL:
+        if not self.serverCaps.PNL:
             self.wrapper.error(
                 NO_VALID_ID,
                 UPDATE_TWS.code(),
@@ -2539,7 +2709,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_PNL:
+        if not self.serverCaps.PNL:
             self.wrapper.error(
                 NO_VALID_ID,
                 UPDATE_TWS.code(),
@@ -2560,7 +2730,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_PNL:
+        if not self.serverCaps.PNL:
             self.wrapper.error(
                 NO_VALID_ID,
                 UPDATE_TWS.code(),
@@ -2590,7 +2760,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_PNL:
+        if not self.serverCaps.PNL:
             self.wrapper.error(
                 NO_VALID_ID,
                 UPDATE_TWS.code(),
@@ -2634,7 +2804,7 @@ class EClient:
             flds = []
             flds += [make_field(OUT.REQ_EXECUTIONS), make_field(VERSION)]
 
-            if self.serverVersion() >= MIN_SERVER_VER_EXECUTION_DATA_CHAIN:
+            if self.serverCaps.EXECUTION_DATA_CHAIN:
                 flds += [make_field(reqId)]
 
             # Send the execution rpt filter data (srv v9 and above)
@@ -2676,7 +2846,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_SEC_ID_TYPE:
+        if not self.serverCaps.SEC_ID_TYPE:
             if contract.secIdType or contract.secId:
                 self.wrapper.error(
                     reqId,
@@ -2686,7 +2856,7 @@ class EClient:
                 )
                 return
 
-        if self.serverVersion() < MIN_SERVER_VER_TRADING_CLASS:
+        if not self.serverCaps.TRADING_CLASS:
             if contract.tradingClass:
                 self.wrapper.error(
                     reqId,
@@ -2696,7 +2866,7 @@ class EClient:
                 )
                 return
 
-        if self.serverVersion() < MIN_SERVER_VER_LINKING:
+        if not self.serverCaps.LINKING:
             if contract.primaryExchange:
                 self.wrapper.error(
                     reqId,
@@ -2706,7 +2876,7 @@ class EClient:
                 )
                 return
 
-        if self.serverVersion() < MIN_SERVER_VER_BOND_ISSUERID:
+        if not self.serverCaps.BOND_ISSUERID:
             if contract.issuerId:
                 self.wrapper.error(
                     reqId,
@@ -2723,45 +2893,11 @@ class EClient:
             flds = []
             flds += [make_field(OUT.REQ_CONTRACT_DATA), make_field(VERSION)]
 
-            if self.serverVersion() >= MIN_SERVER_VER_CONTRACT_DATA_CHAIN:
+            if self.serverCaps.CONTRACT_DATA_CHAIN:
                 flds += [make_field(reqId)]
 
             # send contract fields
-            flds += [
-                make_field(contract.conId),  # srv v37 and above
-                make_field(contract.symbol),
-                make_field(contract.secType),
-                make_field(contract.lastTradeDateOrContractMonth),
-                make_field(contract.strike),
-                make_field(contract.right),
-                make_field(contract.multiplier),
-            ]  # srv v15 and above
-
-            if self.serverVersion() >= MIN_SERVER_VER_PRIMARYEXCH:
-                flds += [
-                    make_field(contract.exchange),
-                    make_field(contract.primaryExchange),
-                ]
-            elif self.serverVersion() >= MIN_SERVER_VER_LINKING:
-                if contract.primaryExchange and (
-                    contract.exchange in {"BEST", "SMART"}
-                ):
-                    flds += [
-                        make_field(contract.exchange + ":" + contract.primaryExchange)
-                    ]
-                else:
-                    flds += [make_field(contract.exchange)]
-
-            flds += [make_field(contract.currency), make_field(contract.localSymbol)]
-            if self.serverVersion() >= MIN_SERVER_VER_TRADING_CLASS:
-                flds += [make_field(contract.tradingClass)]
-            flds += [make_field(contract.includeExpired)]  # srv v31 and above
-
-            if self.serverVersion() >= MIN_SERVER_VER_SEC_ID_TYPE:
-                flds += [make_field(contract.secIdType), make_field(contract.secId)]
-
-            if self.serverVersion() >= MIN_SERVER_VER_BOND_ISSUERID:
-                flds += [make_field(contract.issuerId)]
+            flds += [encodeContract(contract, CONTRACT_DATA, self.serverCaps)]
 
             msg = "".join(flds)
 
@@ -2782,7 +2918,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_REQ_MKT_DEPTH_EXCHANGES:
+        if not self.serverCaps.REQ_MKT_DEPTH_EXCHANGES:
             self.wrapper.error(
                 NO_VALID_ID,
                 UPDATE_TWS.code(),
@@ -2828,7 +2964,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_TRADING_CLASS:
+        if not self.serverCaps.TRADING_CLASS:
             if contract.tradingClass or contract.conId > 0:
                 self.wrapper.error(
                     reqId,
@@ -2838,7 +2974,7 @@ class EClient:
                 )
                 return
 
-        if self.serverVersion() < MIN_SERVER_VER_SMART_DEPTH and isSmartDepth:
+        if not self.serverCaps.SMART_DEPTH and isSmartDepth:
             self.wrapper.error(
                 reqId,
                 UPDATE_TWS.code(),
@@ -2846,10 +2982,7 @@ class EClient:
             )
             return
 
-        if (
-            self.serverVersion() < MIN_SERVER_VER_MKT_DEPTH_PRIM_EXCHANGE
-            and contract.primaryExchange
-        ):
+        if not self.serverCaps.MKT_DEPTH_PRIM_EXCHANGE and contract.primaryExchange:
             self.wrapper.error(
                 reqId,
                 UPDATE_TWS.code(),
@@ -2870,30 +3003,15 @@ class EClient:
             ]
 
             # send contract fields
-            if self.serverVersion() >= MIN_SERVER_VER_TRADING_CLASS:
-                flds += [make_field(contract.conId)]
-            flds += [
-                make_field(contract.symbol),
-                make_field(contract.secType),
-                make_field(contract.lastTradeDateOrContractMonth),
-                make_field(contract.strike),
-                make_field(contract.right),
-                make_field(contract.multiplier),  # srv v15 and above
-                make_field(contract.exchange),
-            ]
-            if self.serverVersion() >= MIN_SERVER_VER_MKT_DEPTH_PRIM_EXCHANGE:
-                flds += [make_field(contract.primaryExchange)]
-            flds += [make_field(contract.currency), make_field(contract.localSymbol)]
-            if self.serverVersion() >= MIN_SERVER_VER_TRADING_CLASS:
-                flds += [make_field(contract.tradingClass)]
+            flds += [encodeContract(contract, MKT_DEPTH, self.serverCaps)]
 
             flds += [make_field(numRows)]  # srv v19 and above
 
-            if self.serverVersion() >= MIN_SERVER_VER_SMART_DEPTH:
+            if self.serverCaps.SMART_DEPTH:
                 flds += [make_field(isSmartDepth)]
 
             # send mktDepthOptions parameter
-            if self.serverVersion() >= MIN_SERVER_VER_LINKING:
+            if self.serverCaps.LINKING:
                 # current doc says this part if for "internal use only" -> won't support it
                 if mktDepthOptions:
                     msg = "not supported"
@@ -2923,7 +3041,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_SMART_DEPTH and isSmartDepth:
+        if not self.serverCaps.SMART_DEPTH and isSmartDepth:
             self.wrapper.error(
                 reqId,
                 UPDATE_TWS.code(),
@@ -2941,7 +3059,7 @@ class EClient:
             make_field(reqId),
         ]
 
-        if self.serverVersion() >= MIN_SERVER_VER_SMART_DEPTH:
+        if self.serverCaps.SMART_DEPTH:
             flds += [make_field(isSmartDepth)]
 
         msg = "".join(flds)
@@ -3027,7 +3145,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return None
 
-        if self.serverVersion() >= MIN_SERVER_VER_FA_PROFILE_DESUPPORT and faData == 2:
+        if self.serverCaps.FA_PROFILE_DESUPPORT and faData == 2:
             self.wrapper.error(
                 NO_VALID_ID,
                 FA_PROFILE_NOT_SUPPORTED.code(),
@@ -3059,7 +3177,7 @@ class EClient:
             self.wrapper.error(reqId, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return None
 
-        if self.serverVersion() >= MIN_SERVER_VER_FA_PROFILE_DESUPPORT and faData == 2:
+        if self.serverCaps.FA_PROFILE_DESUPPORT and faData == 2:
             self.wrapper.error(
                 reqId, FA_PROFILE_NOT_SUPPORTED.code(), FA_PROFILE_NOT_SUPPORTED.msg()
             )
@@ -3075,7 +3193,7 @@ class EClient:
                 + make_field(cxml)
             )
 
-            if self.serverVersion() >= MIN_SERVER_VER_REPLACE_FA_END:
+            if self.serverCaps.REPLACE_FA_END:
                 msg += make_field(reqId)
 
         except ClientException as ex:
@@ -3162,7 +3280,7 @@ class EClient:
             self.wrapper.error(reqId, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_TRADING_CLASS:
+        if not self.serverCaps.TRADING_CLASS:
             if contract.tradingClass or contract.conId > 0:
                 self.wrapper.error(
                     reqId,
@@ -3172,7 +3290,7 @@ class EClient:
                 )
                 return
 
-        if self.serverVersion() < MIN_SERVER_VER_HISTORICAL_SCHEDULE:
+        if not self.serverCaps.HISTORICAL_SCHEDULE:
             if whatToShow == "SCHEDULE":
                 self.wrapper.error(
                     reqId,
@@ -3189,30 +3307,14 @@ class EClient:
             flds = []
             flds += [make_field(OUT.REQ_HISTORICAL_DATA)]
 
-            if self.serverVersion() < MIN_SERVER_VER_SYNT_REALTIME_BARS:
+            if not self.serverCaps.SYNT_REALTIME_BARS:
                 flds += [make_field(VERSION)]
 
             flds += [make_field(reqId)]
 
             # send contract fields
-            if self.serverVersion() >= MIN_SERVER_VER_TRADING_CLASS:
-                flds += [make_field(contract.conId)]
-            flds += [
-                make_field(contract.symbol),
-                make_field(contract.secType),
-                make_field(contract.lastTradeDateOrContractMonth),
-                make_field(contract.strike),
-                make_field(contract.right),
-                make_field(contract.multiplier),
-                make_field(contract.exchange),
-                make_field(contract.primaryExchange),
-                make_field(contract.currency),
-                make_field(contract.localSymbol),
-            ]
-            if self.serverVersion() >= MIN_SERVER_VER_TRADING_CLASS:
-                flds += [make_field(contract.tradingClass)]
+            flds += [encodeContract(contract, HISTORICAL_DATA, self.serverCaps)]
             flds += [
-                make_field(contract.includeExpired),  # srv v31 and above
                 make_field(endDateTime),  # srv v20 and above
                 make_field(barSizeSetting),  # srv v20 and above
                 make_field(durationStr),
@@ -3232,11 +3334,11 @@ class EClient:
                         make_field(comboLeg.exchange),
                     ]
 
-            if self.serverVersion() >= MIN_SERVER_VER_SYNT_REALTIME_BARS:
+            if self.serverCaps.SYNT_REALTIME_BARS:
                 flds += [make_field(keepUpToDate)]
 
             # send chartOptions parameter
-            if self.serverVersion() >= MIN_SERVER_VER_LINKING:
+            if self.serverCaps.LINKING:
                 chartOptionsStr = ""
                 if chartOptions:
                     for tagValue in chartOptions:
@@ -3291,7 +3393,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_REQ_HEAD_TIMESTAMP:
+        if not self.serverCaps.REQ_HEAD_TIMESTAMP:
             self.wrapper.error(
                 reqId,
                 UPDATE_TWS.code(),
@@ -3304,19 +3406,7 @@ class EClient:
             flds += [
                 make_field(OUT.REQ_HEAD_TIMESTAMP),
                 make_field(reqId),
-                make_field(contract.conId),
-                make_field(contract.symbol),
-                make_field(contract.secType),
-                make_field(contract.lastTradeDateOrContractMonth),
-                make_field(contract.strike),
-                make_field(contract.right),
-                make_field(contract.multiplier),
-                make_field(contract.exchange),
-                make_field(contract.primaryExchange),
-                make_field(contract.currency),
-                make_field(contract.localSymbol),
-                make_field(contract.tradingClass),
-                make_field(contract.includeExpired),
+                encodeContract(contract, HISTORICAL_TICKS, self.serverCaps),
                 make_field(useRTH),
                 make_field(whatToShow),
                 make_field(formatDate),
@@ -3337,7 +3427,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_CANCEL_HEADTIMESTAMP:
+        if not self.serverCaps.CANCEL_HEADTIMESTAMP:
             self.wrapper.error(
                 reqId,
                 UPDATE_TWS.code(),
@@ -3360,7 +3450,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_REQ_HISTOGRAM:
+        if not self.serverCaps.REQ_HISTOGRAM:
             self.wrapper.error(
                 NO_VALID_ID,
                 UPDATE_TWS.code(),
@@ -3373,19 +3463,7 @@ class EClient:
             flds += [
                 make_field(OUT.REQ_HISTOGRAM_DATA),
                 make_field(tickerId),
-                make_field(contract.conId),
-                make_field(contract.symbol),
-                make_field(contract.secType),
-                make_field(contract.lastTradeDateOrContractMonth),
-                make_field(contract.strike),
-                make_field(contract.right),
-                make_field(contract.multiplier),
-                make_field(contract.exchange),
-                make_field(contract.primaryExchange),
-                make_field(contract.currency),
-                make_field(contract.localSymbol),
-                make_field(contract.tradingClass),
-                make_field(contract.includeExpired),
+                encodeContract(contract, HISTORICAL_TICKS, self.serverCaps),
                 make_field(useRTH),
                 make_field(timePeriod),
             ]
@@ -3405,7 +3483,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_REQ_HISTOGRAM:
+        if not self.serverCaps.REQ_HISTOGRAM:
             self.wrapper.error(
                 NO_VALID_ID,
                 UPDATE_TWS.code(),
@@ -3435,7 +3513,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_HISTORICAL_TICKS:
+        if not self.serverCaps.HISTORICAL_TICKS:
             self.wrapper.error(
                 NO_VALID_ID,
                 UPDATE_TWS.code(),
@@ -3448,19 +3526,7 @@ class EClient:
             flds += [
                 make_field(OUT.REQ_HISTORICAL_TICKS),
                 make_field(reqId),
-                make_field(contract.conId),
-                make_field(contract.symbol),
-                make_field(contract.secType),
-                make_field(contract.lastTradeDateOrContractMonth),
-                make_field(contract.strike),
-                make_field(contract.right),
-                make_field(contract.multiplier),
-                make_field(contract.exchange),
-                make_field(contract.primaryExchange),
-                make_field(contract.currency),
-                make_field(contract.localSymbol),
-                make_field(contract.tradingClass),
-                make_field(contract.includeExpired),
+                encodeContract(contract, HISTORICAL_TICKS, self.serverCaps),
                 make_field(startDateTime),
                 make_field(endDateTime),
                 make_field(numberOfTicks),
@@ -3521,7 +3587,7 @@ class EClient:
             return
 
         if (
-            self.serverVersion() < MIN_SERVER_VER_SCANNER_GENERIC_OPTS
+            not self.serverCaps.SCANNER_GENERIC_OPTS
             and scannerSubscriptionFilterOptions is not None
         ):
             self.wrapper.error(
@@ -3538,7 +3604,7 @@ class EClient:
             flds = []
             flds += [make_field(OUT.REQ_SCANNER_SUBSCRIPTION)]
 
-            if self.serverVersion() < MIN_SERVER_VER_SCANNER_GENERIC_OPTS:
+            if not self.serverCaps.SCANNER_GENERIC_OPTS:
                 flds += [make_field(VERSION)]
 
             flds += [
@@ -3569,7 +3635,7 @@ class EClient:
             ]  # srv v27 and above
 
             # send scannerSubscriptionFilterOptions parameter
-            if self.serverVersion() >= MIN_SERVER_VER_SCANNER_GENERIC_OPTS:
+            if self.serverCaps.SCANNER_GENERIC_OPTS:
                 scannerSubscriptionFilterOptionsStr = ""
                 if scannerSubscriptionFilterOptions:
                     for tagValueOpt in scannerSubscriptionFilterOptions:
@@ -3577,7 +3643,7 @@ class EClient:
                 flds += [make_field(scannerSubscriptionFilterOptionsStr)]
 
             # send scannerSubscriptionOptions parameter
-            if self.serverVersion() >= MIN_SERVER_VER_LINKING:
+            if self.serverCaps.LINKING:
                 scannerSubscriptionOptionsStr = ""
                 if scannerSubscriptionOptions:
                     for tagValueOpt in scannerSubscriptionOptions:
@@ -3654,7 +3720,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_TRADING_CLASS:
+        if not self.serverCaps.TRADING_CLASS:
             if contract.tradingClass:
                 self.wrapper.error(
                     reqId,
@@ -3675,26 +3741,11 @@ class EClient:
             ]
 
             # send contract fields
-            if self.serverVersion() >= MIN_SERVER_VER_TRADING_CLASS:
-                flds += [make_field(contract.conId)]
-            flds += [
-                make_field(contract.symbol),
-                make_field(contract.secType),
-                make_field(contract.lastTradeDateOrContractMonth),
-                make_field(contract.strike),
-                make_field(contract.right),
-                make_field(contract.multiplier),
-                make_field(contract.exchange),
-                make_field(contract.primaryExchange),
-                make_field(contract.currency),
-                make_field(contract.localSymbol),
-            ]
-            if self.serverVersion() >= MIN_SERVER_VER_TRADING_CLASS:
-                flds += [make_field(contract.tradingClass)]
+            flds += [encodeContract(contract, REAL_TIME_BARS, self.serverCaps)]
             flds += [make_field(barSize), make_field(whatToShow), make_field(useRTH)]
 
             # send realTimeBarsOptions parameter
-            if self.serverVersion() >= MIN_SERVER_VER_LINKING:
+            if self.serverCaps.LINKING:
                 realTimeBarsOptionsStr = ""
                 if realTimeBarsOptions:
                     for tagValueOpt in realTimeBarsOptions:
@@ -3774,7 +3825,7 @@ class EClient:
         try:
             VERSION = 2
 
-            if self.serverVersion() < MIN_SERVER_VER_FUNDAMENTAL_DATA:
+            if not self.serverCaps.FUNDAMENTAL_DATA:
                 self.wrapper.error(
                     NO_VALID_ID,
                     UPDATE_TWS.code(),
@@ -3783,7 +3834,7 @@ class EClient:
                 )
                 return
 
-            if self.serverVersion() < MIN_SERVER_VER_TRADING_CLASS:
+            if not self.serverCaps.TRADING_CLASS:
                 self.wrapper.error(
                     NO_VALID_ID,
                     UPDATE_TWS.code(),
@@ -3800,7 +3851,7 @@ class EClient:
             ]
 
             # send contract fields
-            if self.serverVersion() >= MIN_SERVER_VER_TRADING_CLASS:
+            if self.serverCaps.TRADING_CLASS:
                 flds += [make_field(contract.conId)]
             flds += [
                 make_field(contract.symbol),
@@ -3812,7 +3863,7 @@ class EClient:
                 make_field(reportType),
             ]
 
-            if self.serverVersion() >= MIN_SERVER_VER_LINKING:
+            if self.serverCaps.LINKING:
                 fundDataOptStr = ""
                 tagValuesCount = (
                     len(fundamentalDataOptions) if fundamentalDataOptions else 0
@@ -3841,7 +3892,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_FUNDAMENTAL_DATA:
+        if not self.serverCaps.FUNDAMENTAL_DATA:
             self.wrapper.error(
                 NO_VALID_ID,
                 UPDATE_TWS.code(),
@@ -3870,7 +3921,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_REQ_NEWS_PROVIDERS:
+        if not self.serverCaps.REQ_NEWS_PROVIDERS:
             self.wrapper.error(
                 NO_VALID_ID,
                 UPDATE_TWS.code(),
@@ -3895,7 +3946,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_REQ_NEWS_ARTICLE:
+        if not self.serverCaps.REQ_NEWS_ARTICLE:
             self.wrapper.error(
                 NO_VALID_ID,
                 UPDATE_TWS.code(),
@@ -3914,7 +3965,7 @@ class EClient:
             ]
 
             # send newsArticleOptions parameter
-            if self.serverVersion() >= MIN_SERVER_VER_NEWS_QUERY_ORIGINS:
+            if self.serverCaps.NEWS_QUERY_ORIGINS:
                 newsArticleOptionsStr = ""
                 if newsArticleOptions:
                     for tagValue in newsArticleOptions:
@@ -3945,7 +3996,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_REQ_HISTORICAL_NEWS:
+        if not self.serverCaps.REQ_HISTORICAL_NEWS:
             self.wrapper.error(
                 NO_VALID_ID,
                 UPDATE_TWS.code(),
@@ -3967,7 +4018,7 @@ class EClient:
             ]
 
             # send historicalNewsOptions parameter
-            if self.serverVersion() >= MIN_SERVER_VER_NEWS_QUERY_ORIGINS:
+            if self.serverCaps.NEWS_QUERY_ORIGINS:
                 historicalNewsOptionsStr = ""
                 if historicalNewsOptions:
                     for tagValue in historicalNewsOptionsStr:
@@ -4000,7 +4051,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_LINKING:
+        if not self.serverCaps.LINKING:
             self.wrapper.error(
                 NO_VALID_ID,
                 UPDATE_TWS.code(),
@@ -4029,7 +4080,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_LINKING:
+        if not self.serverCaps.LINKING:
             self.wrapper.error(
                 NO_VALID_ID,
                 UPDATE_TWS.code(),
@@ -4065,7 +4116,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_LINKING:
+        if not self.serverCaps.LINKING:
             self.wrapper.error(
                 NO_VALID_ID,
                 UPDATE_TWS.code(),
@@ -4097,7 +4148,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_LINKING:
+        if not self.serverCaps.LINKING:
             self.wrapper.error(
                 NO_VALID_ID,
                 UPDATE_TWS.code(),
@@ -4126,7 +4177,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_LINKING:
+        if not self.serverCaps.LINKING:
             self.wrapper.error(
                 NO_VALID_ID,
                 UPDATE_TWS.code(),
@@ -4169,7 +4220,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_LINKING:
+        if not self.serverCaps.LINKING:
             self.wrapper.error(
                 NO_VALID_ID,
                 UPDATE_TWS.code(),
@@ -4204,7 +4255,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_LINKING:
+        if not self.serverCaps.LINKING:
             self.wrapper.error(
                 NO_VALID_ID,
                 UPDATE_TWS.code(),
@@ -4248,7 +4299,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_LINKING:
+        if not self.serverCaps.LINKING:
             self.wrapper.error(
                 NO_VALID_ID,
                 UPDATE_TWS.code(),
@@ -4294,7 +4345,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_SEC_DEF_OPT_PARAMS_REQ:
+        if not self.serverCaps.SEC_DEF_OPT_PARAMS_REQ:
             self.wrapper.error(
                 NO_VALID_ID,
                 UPDATE_TWS.code(),
@@ -4344,7 +4395,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_REQ_FAMILY_CODES:
+        if not self.serverCaps.REQ_FAMILY_CODES:
             self.wrapper.error(
                 NO_VALID_ID,
                 UPDATE_TWS.code(),
@@ -4363,7 +4414,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_REQ_MATCHING_SYMBOLS:
+        if not self.serverCaps.REQ_MATCHING_SYMBOLS:
             self.wrapper.error(
                 NO_VALID_ID,
                 UPDATE_TWS.code(),
@@ -4407,7 +4458,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_WSHE_CALENDAR:
+        if not self.serverCaps.WSHE_CALENDAR:
             self.wrapper.error(
                 NO_VALID_ID,
                 UPDATE_TWS.code(),
@@ -4431,7 +4482,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_WSHE_CALENDAR:
+        if not self.serverCaps.WSHE_CALENDAR:
             self.wrapper.error(
                 NO_VALID_ID,
                 UPDATE_TWS.code(),
@@ -4455,7 +4506,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_WSHE_CALENDAR:
+        if not self.serverCaps.WSHE_CALENDAR:
             self.wrapper.error(
                 NO_VALID_ID,
                 UPDATE_TWS.code(),
@@ -4463,7 +4514,7 @@ class EClient:
             )
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_WSH_EVENT_DATA_FILTERS and (
+        if not self.serverCaps.WSH_EVENT_DATA_FILTERS and (
             wshEventData.filter != ""
             or wshEventData.fillWatchlist
             or wshEventData.fillPortfolio
@@ -4497,7 +4548,7 @@ class EClient:
                 make_field(wshEventData.conId),
             ]
 
-            if self.serverVersion() >= MIN_SERVER_VER_WSH_EVENT_DATA_FILTERS:
+            if self.serverCaps.WSH_EVENT_DATA_FILTERS:
                 flds.append(make_field(wshEventData.filter))
                 flds.append(make_field(wshEventData.fillWatchlist))
                 flds.append(make_field(wshEventData.fillPortfolio))
@@ -4523,7 +4574,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_WSHE_CALENDAR:
+        if not self.serverCaps.WSHE_CALENDAR:
             self.wrapper.error(
                 NO_VALID_ID,
                 UPDATE_TWS.code(),
@@ -4542,7 +4593,7 @@ class EClient:
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
             return
 
-        if self.serverVersion() < MIN_SERVER_VER_USER_INFO:
+        if not self.serverCaps.USER_INFO:
             self.wrapper.error(
                 NO_VALID_ID,
                 UPDATE_TWS.code(),
@@ -72,7 +72,10 @@ class Connection:
             self.lock.release()
             return 0
         try:
-            nSent = self.socket.send(msg)
+            # a batch of messages (see EClient.sendMsgs) easily exceeds what a
+            # single send() accepts, never leave a message half written
+            self.socket.sendall(msg)
+            nSent = len(msg)
         except OSError:
             logger.debug("exception from sendMsg %s", sys.exc_info())
             raise
@@ -83,6 +83,12 @@ class Contract(Object):
         self.comboLegs = []  # type: list[ComboLeg]
         self.deltaNeutralContract = None
 
+    def __setattr__(self, name, value) -> None:
+        super().__setattr__(name, value)
+        # any mutation invalidates the cached request encodings (see contract_encoder),
+        # dropping rather than clearing them keeps shallow copies independent
+        self.__dict__.pop("encodedFields", None)
+
     def __str__(self) -> str:
         s = ",".join((
             str(self.conId),
@@ -0,0 +1,219 @@
+"""Copyright (C) 2024 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+"""
+Encoding of the contract block shared by the requests.
+
+Most requests send the same run of contract fields; only the server version
+decides which ones are included. The encoded block is cached on the Contract
+itself, keyed by request family and server version, and dropped as soon as the
+Contract is mutated (see Contract.__setattr__).
+"""
+
+from ibapi.comm import make_field
+from ibapi.contract import Contract
+
+"""
+MKT_DATA         = reqMktData
+MKT_DEPTH        = reqMktDepth
+HISTORICAL_DATA  = reqHistoricalData
+REAL_TIME_BARS   = reqRealTimeBars
+CONTRACT_DATA    = reqContractDetails
+PLACE_ORDER      = placeOrder
+HISTORICAL_TICKS = reqHistoricalTicks, reqHeadTimeStamp, reqHistogramData
+TICK_BY_TICK     = reqTickByTickData
+"""
+(
+    MKT_DATA,
+    MKT_DEPTH,
+    HISTORICAL_DATA,
+    REAL_TIME_BARS,
+    CONTRACT_DATA,
+    PLACE_ORDER,
+    HISTORICAL_TICKS,
+    TICK_BY_TICK,
+) = range(8)
+
+
+def encodeMktDataFields(contract, serverCaps) -> list:
+    flds = []
+    if serverCaps.REQ_MKT_DATA_CONID:
+        flds += [make_field(contract.conId)]
+    flds += [
+        make_field(contract.symbol),
+        make_field(contract.secType),
+        make_field(contract.lastTradeDateOrContractMonth),
+        make_field(contract.strike),
+        make_field(contract.right),
+        make_field(contract.multiplier),  # srv v15 and above
+        make_field(contract.exchange),
+        make_field(contract.primaryExchange),  # srv v14 and above
+        make_field(contract.currency),
+        make_field(contract.localSymbol),
+    ]  # srv v2 and above
+    if serverCaps.TRADING_CLASS:
+        flds += [make_field(contract.tradingClass)]
+    return flds
+
+
+def encodeMktDepthFields(contract, serverCaps) -> list:
+    flds = []
+    if serverCaps.TRADING_CLASS:
+        flds += [make_field(contract.conId)]
+    flds += [
+        make_field(contract.symbol),
+        make_field(contract.secType),
+        make_field(contract.lastTradeDateOrContractMonth),
+        make_field(contract.strike),
+        make_field(contract.right),
+        make_field(contract.multiplier),  # srv v15 and above
+        make_field(contract.exchange),
+    ]
+    if serverCaps.MKT_DEPTH_PRIM_EXCHANGE:
+        flds += [make_field(contract.primaryExchange)]
+    flds += [make_field(contract.currency), make_field(contract.localSymbol)]
+    if serverCaps.TRADING_CLASS:
+        flds += [make_field(contract.tradingClass)]
+    return flds
+
+
+def encodeRealTimeBarsFields(contract, serverCaps) -> list:
+    flds = []
+    if serverCaps.TRADING_CLASS:
+        flds += [make_field(contract.conId)]
+    flds += [
+        make_field(contract.symbol),
+        make_field(contract.secType),
+        make_field(contract.lastTradeDateOrContractMonth),
+        make_field(contract.strike),
+        make_field(contract.right),
+        make_field(contract.multiplier),
+        make_field(contract.exchange),
+        make_field(contract.primaryExchange),
+        make_field(contract.currency),
+        make_field(contract.localSymbol),
+    ]
+    if serverCaps.TRADING_CLASS:
+        flds += [make_field(contract.tradingClass)]
+    return flds
+
+
+def encodeHistoricalDataFields(contract, serverCaps) -> list:
+    flds = encodeRealTimeBarsFields(contract, serverCaps)
+    flds += [make_field(contract.includeExpired)]  # srv v31 and above
+    return flds
+
+
+def encodeContractDataFields(contract, serverCaps) -> list:
+    flds = [
+        make_field(contract.conId),  # srv v37 and above
+        make_field(contract.symbol),
+        make_field(contract.secType),
+        make_field(contract.lastTradeDateOrContractMonth),
+        make_field(contract.strike),
+        make_field(contract.right),
+        make_field(contract.multiplier),
+    ]  # srv v15 and above
+
+    if serverCaps.PRIMARYEXCH:
+        flds += [
+            make_field(contract.exchange),
+            make_field(contract.primaryExchange),
+        ]
+    elif serverCaps.LINKING:
+        if contract.primaryExchange and (contract.exchange in {"BEST", "SMART"}):
+            flds += [make_field(contract.exchange + ":" + contract.primaryExchange)]
+        else:
+            flds += [make_field(contract.exchange)]
+
+    flds += [make_field(contract.currency), make_field(contract.localSymbol)]
+    if serverCaps.TRADING_CLASS:
+        flds += [make_field(contract.tradingClass)]
+    flds += [make_field(contract.includeExpired)]  # srv v31 and above
+
+    if serverCaps.SEC_ID_TYPE:
+        flds += [make_field(contract.secIdType), make_field(contract.secId)]
+
+    if serverCaps.BOND_ISSUERID:
+        flds += [make_field(contract.issuerId)]
+    return flds
+
+
+def encodePlaceOrderFields(contract, serverCaps) -> list:
+    flds = []
+    if serverCaps.PLACE_ORDER_CONID:
+        flds.append(make_field(contract.conId))
+    flds += [
+        make_field(contract.symbol),
+        make_field(contract.secType),
+        make_field(contract.lastTradeDateOrContractMonth),
+        make_field(contract.strike),
+        make_field(contract.right),
+        make_field(contract.multiplier),  # srv v15 and above
+        make_field(contract.exchange),
+        make_field(contract.primaryExchange),  # srv v14 and above
+        make_field(contract.currency),
+        make_field(contract.localSymbol),
+    ]  # srv v2 and above
+    if serverCaps.TRADING_CLASS:
+        flds.append(make_field(contract.tradingClass))
+
+    if serverCaps.SEC_ID_TYPE:
+        flds += [make_field(contract.secIdType), make_field(contract.secId)]
+    return flds
+
+
+def encodeTickByTickFields(contract, serverCaps) -> list:
+    return [
+        make_field(contract.conId),
+        make_field(contract.symbol),
+        make_field(contract.secType),
+        make_field(contract.lastTradeDateOrContractMonth),
+        make_field(contract.strike),
+        make_field(contract.right),
+        make_field(contract.multiplier),
+        make_field(contract.exchange),
+        make_field(contract.primaryExchange),
+        make_field(contract.currency),
+        make_field(contract.localSymbol),
+        make_field(contract.tradingClass),
+    ]
+
+
+def encodeHistoricalTicksFields(contract, serverCaps) -> list:
+    flds = encodeTickByTickFields(contract, serverCaps)
+    flds += [make_field(contract.includeExpired)]
+    return flds
+
+
+family2encoder = {
+    MKT_DATA: encodeMktDataFields,
+    MKT_DEPTH: encodeMktDepthFields,
+    HISTORICAL_DATA: encodeHistoricalDataFields,
+    REAL_TIME_BARS: encodeRealTimeBarsFields,
+    CONTRACT_DATA: encodeContractDataFields,
+    PLACE_ORDER: encodePlaceOrderFields,
+    HISTORICAL_TICKS: encodeHistoricalTicksFields,
+    TICK_BY_TICK: encodeTickByTickFields,
+}
+
+
+def encodeContract(contract, family, serverCaps) -> str:
+    """Returns the encoded contract block of the given request family.
+
+    The block is only cached for real Contract instances since those are the
+    ones that know how to invalidate it; anything else is encoded every time.
+    Combo legs and the delta neutral contract are not part of the block, they
+    are sent separately by each request.
+    """
+    if not isinstance(contract, Contract):
+        return "".join(family2encoder[family](contract, serverCaps))
+
+    encodedFields = contract.__dict__.setdefault("encodedFields", {})
+    key = (family, serverCaps.serverVersion)
+    block = encodedFields.get(key)
+    if block is None:
+        block = "".join(family2encoder[family](contract, serverCaps))
+        encodedFields[key] = block
+    return block
@@ -0,0 +1,222 @@
+"""Copyright (C) 2024 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+"""
+Decoding on several processes.
+
+One Python thread decodes a few tens of thousands of messages a second. A
+DecodePool takes the place of EClient.run(): the messages framed by the
+EReader are not decoded but dispatched, as they are, to N worker processes,
+each with its own Decoder and wrapper (made by the wrapperFactory in the
+worker). Only the message id and the reqId field are read to dispatch:
+
+- the messages of a reqId always go to the same worker, reqId % N, so
+  they are decoded in order;
+- the order and account messages (order status, executions, positions,
+  account values, nextValidId...) and those without a reqId go to the
+  pinned worker, as do the errors of the order ids it has seen or that
+  were placed through the client, so a rejection before any order status
+  is decoded after the order's earlier messages.
+
+The messages are sent in batches, flushed whenever the EReader has nothing
+more queued. The requests are still sent through the client in this
+process; the wrappers hand their results back by their own means (eg: a
+multiprocessing.Queue, or the market data bus).
+"""
+
+import logging
+import multiprocessing
+import queue
+
+from ibapi import comm
+from ibapi.decoder import Decoder
+from ibapi.message import IN
+from ibapi.router import routingId
+from ibapi.utils import BadMessage
+
+logger = logging.getLogger(__name__)
+
+# the messages decoded by the pinned worker, whatever their id
+PINNED_MSG_IDS = frozenset((
+    IN.ORDER_STATUS,
+    IN.OPEN_ORDER,
+    IN.OPEN_ORDER_END,
+    IN.EXECUTION_DATA,
+    IN.EXECUTION_DATA_END,
+    IN.COMMISSION_REPORT,
+    IN.COMPLETED_ORDER,
+    IN.COMPLETED_ORDERS_END,
+    IN.ORDER_BOUND,
+    IN.NEXT_VALID_ID,
+    IN.MANAGED_ACCTS,
+    IN.ACCT_VALUE,
+    IN.PORTFOLIO_VALUE,
+    IN.ACCT_UPDATE_TIME,
+    IN.ACCT_DOWNLOAD_END,
+    IN.POSITION_DATA,
+    IN.POSITION_END,
+    IN.ACCOUNT_SUMMARY,
+    IN.ACCOUNT_SUMMARY_END,
+    IN.POSITION_MULTI,
+    IN.POSITION_MULTI_END,
+    IN.ACCOUNT_UPDATE_MULTI,
+    IN.ACCOUNT_UPDATE_MULTI_END,
+    IN.PNL,
+    IN.PNL_SINGLE,
+))
+
+# the messages whose id field is an order id
+ORDER_MSG_IDS = (IN.ORDER_STATUS, IN.OPEN_ORDER)
+
+
+def work(worker, inbox, wrapperFactory, args, serverVersion) -> None:
+    """The loop of a worker process."""
+    wrapper = wrapperFactory(worker, *args)
+    decoder = Decoder(wrapper, serverVersion)
+    while True:
+        batch = inbox.get()
+        if batch is None:
+            break
+        for msg in batch:
+            try:
+                decoder.interpret(comm.read_fields(msg))
+            except BadMessage:
+                logger.info("BadMessage")
+    wrapper.connectionClosed()
+
+
+class DecodePool:
+    def __init__(
+        self,
+        wrapperFactory,
+        nWorkers: int = 4,
+        args: tuple = (),
+        pinnedWorker: int = 0,
+        batchSize: int = 64,
+        context: str = None,
+    ) -> None:
+        """wrapperFactory - Called as wrapperFactory(worker, *args) in each
+            worker process, returns its EWrapper. It has to be picklable,
+            eg: a module level function, unless the processes are forked.
+        nWorkers:int - The worker processes.
+        args:tuple - More arguments of wrapperFactory, eg: a queue for the
+            results.
+        pinnedWorker:int - The worker of the order and account messages.
+        batchSize:int - Messages sent to a worker at once at most.
+        context:str - The multiprocessing start method, the default one if
+            None.
+        """
+        self.wrapperFactory = wrapperFactory
+        self.nWorkers = nWorkers
+        self.args = args
+        self.pinnedWorker = pinnedWorker
+        self.batchSize = batchSize
+        self.context = multiprocessing.get_context(context)
+        self.inboxes = []
+        self.processes = []
+        self.batches = [[] for _ in range(nWorkers)]
+        self.orderIds = set()
+
+        self.nDispatched = [0] * nWorkers
+        self.nBatches = [0] * nWorkers
+
+    def __str__(self) -> str:
+        return (
+            f"DecodePool. Workers: {self.nWorkers}, Dispatched: {self.nDispatched}, "
+            f"Batches: {self.nBatches}"
+        )
+
+    def start(self, serverVersion: int) -> None:
+        """Starts the workers, once connected: they decode for serverVersion."""
+        for worker in range(self.nWorkers):
+            inbox = self.context.Queue()
+            process = self.context.Process(
+                target=work,
+                args=(worker, inbox, self.wrapperFactory, self.args, serverVersion),
+                name="DecodeWorker-%d" % worker,
+                daemon=True,
+            )
+            process.start()
+            self.inboxes.append(inbox)
+            self.processes.append(process)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Has the workers decode what was dispatched, and waits for them."""
+        self.flush()
+        for inbox in self.inboxes:
+            inbox.put(None)
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                logger.warning("%s did not stop, terminating it", process.name)
+                process.terminate()
+        self.inboxes = []
+        self.processes = []
+
+    def run(self, client) -> None:
+        """The message loop, instead of client.run(): dispatches the
+        messages of client until it is disconnected, then stops the
+        workers."""
+        if not self.processes:
+            self.start(client.serverVersion())
+        self.watchOrders(client)
+        try:
+            while client.isConnected() or not client.msg_queue.empty():
+                try:
+                    msg = client.msg_queue.get(block=True, timeout=0.2)
+                except queue.Empty:
+                    self.flush()
+                    continue
+                self.dispatch(msg)
+                if client.msg_queue.empty():
+                    self.flush()
+        finally:
+            self.unwatchOrders(client)
+            client.disconnect()
+            self.stop()
+
+    def watchOrders(self, client) -> None:
+        """Has the order ids placed through client recorded from now on, so
+        that their errors go to the pinned worker."""
+        client.addOrderIdSink(self.orderIds)
+
+    def unwatchOrders(self, client) -> None:
+        client.removeOrderIdSink(self.orderIds)
+
+    def workerOf(self, msg) -> int:
+        fields = msg.split(b"\0", 4)
+        msgId = int(fields[0])
+        reqId = routingId(msgId, fields)
+        if msgId in PINNED_MSG_IDS:
+            if msgId == IN.EXECUTION_DATA:
+                # the order id follows the reqId, of reqExecutions() or -1
+                self.orderIds.add(int(fields[2]))
+            elif msgId in ORDER_MSG_IDS:
+                self.orderIds.add(reqId)
+            return self.pinnedWorker
+        if reqId is None or reqId == -1:
+            return self.pinnedWorker
+        if msgId == IN.ERR_MSG and reqId in self.orderIds:
+            return self.pinnedWorker
+        return reqId % self.nWorkers
+
+    def dispatch(self, msg) -> None:
+        """Queues the raw payload msg, without its size prefix, for the
+        worker of its reqId."""
+        worker = self.workerOf(msg)
+        batch = self.batches[worker]
+        batch.append(msg)
+        self.nDispatched[worker] += 1
+        if len(batch) >= self.batchSize:
+            self.send(worker)
+
+    def flush(self) -> None:
+        for worker in range(self.nWorkers):
+            if self.batches[worker]:
+                self.send(worker)
+
+    def send(self, worker) -> None:
+        self.inboxes[worker].put(self.batches[worker])
+        self.batches[worker] = []
+        self.nBatches[worker] += 1
@@ -2,7 +2,10 @@
 and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
 """
 
-from ibapi.const import NO_VALID_ID
+import math
+import weakref
+
+from ibapi.const import NO_VALID_ID, UNSET_DECIMAL
 from ibapi.contract import getEnumTypeFromString
 
 """
@@ -49,9 +52,14 @@ class HandleInfo(Object):
 
 
 class Decoder(Object):
-    def __init__(self, wrapper, serverVersion) -> None:
+    def __init__(self, wrapper, serverVersion, serverCaps=None) -> None:
         self.wrapper = wrapper
         self.serverVersion = serverVersion
+        self.serverCaps = serverCaps or ServerCapabilities(serverVersion)
+        self.barSinks = {}  # reqId -> sink, see EClient.setBarSink()
+        self.marketDataTable = None  # see EClient.setMarketDataTable()
+        self.router = None  # see EClient.setRoute()
+        self.routedDecoders = weakref.WeakKeyDictionary()  # Handler -> decoder
         self.discoverParams()
 
     def processTickPriceMsg(self, fields) -> None:
@@ -68,10 +76,10 @@ class Decoder(Object):
 
         attrib.canAutoExecute = attrMask == 1
 
-        if self.serverVersion >= MIN_SERVER_VER_PAST_LIMIT:
+        if self.serverCaps.PAST_LIMIT:
             attrib.canAutoExecute = attrMask & 1 != 0
             attrib.pastLimit = attrMask & 2 != 0
-            if self.serverVersion >= MIN_SERVER_VER_PRE_OPEN_BID_ASK:
+            if self.serverCaps.PRE_OPEN_BID_ASK:
                 attrib.preOpen = attrMask & 4 != 0
 
         self.wrapper.tickPrice(reqId, tickType, price, attrib)
@@ -94,6 +102,16 @@ class Decoder(Object):
         if sizeTickType != TickTypeEnum.NOT_SET:
             self.wrapper.tickSize(reqId, sizeTickType, size)
 
+        table = self.marketDataTable
+        if table is not None:
+            table.update(reqId, tickType, price)
+            if sizeTickType != TickTypeEnum.NOT_SET:
+                table.update(
+                    reqId,
+                    sizeTickType,
+                    math.nan if size == UNSET_DECIMAL else float(size),
+                )
+
     def processTickSizeMsg(self, fields) -> None:
         next(fields)
         decode(int, fields)
@@ -104,10 +122,49 @@ class Decoder(Object):
 
         if sizeTickType != TickTypeEnum.NOT_SET:
             self.wrapper.tickSize(reqId, sizeTickType, size)
+            table = self.marketDataTable
+            if table is not None:
+                table.update(
+                    reqId,
+                    sizeTickType,
+                    math.nan if size == UNSET_DECIMAL else float(size),
+                )
+
+    def processTickGenericMsg(self, fields) -> None:
+        next(fields)
+        decode(int, fields)
+
+        reqId = decode(int, fields)
+        tickType = decode(int, fields)
+        value = decode(float, fields)
+
+        self.wrapper.tickGeneric(reqId, tickType, value)
+
+        table = self.marketDataTable
+        if table is not None:
+            table.update(reqId, tickType, value)
+
+    def processTickStringMsg(self, fields) -> None:
+        next(fields)
+        decode(int, fields)
+
+        reqId = decode(int, fields)
+        tickType = decode(int, fields)
+        value = decode(str, fields, use_unicode=self.serverCaps.ENCODE_MSG_ASCII7)
+
+        self.wrapper.tickString(reqId, tickType, value)
+
+        table = self.marketDataTable
+        if table is not None and value:
+            try:
+                table.update(reqId, tickType, float(value))
+            except ValueError:
+                # only the numeric string ticks are kept, eg: LAST_TIMESTAMP
+                pass
 
     def processOrderStatusMsg(self, fields) -> None:
         next(fields)
-        if self.serverVersion < MIN_SERVER_VER_MARKET_CAP_PRICE:
+        if not self.serverCaps.MARKET_CAP_PRICE:
             decode(int, fields)
         orderId = decode(int, fields)
         status = decode(str, fields)
@@ -121,7 +178,7 @@ class Decoder(Object):
         clientId = decode(int, fields)  # ver 5 field
         whyHeld = decode(str, fields)  # ver 6 field
 
-        if self.serverVersion >= MIN_SERVER_VER_MARKET_CAP_PRICE:
+        if self.serverCaps.MARKET_CAP_PRICE:
             mktCapPrice = decode(float, fields)
         else:
             mktCapPrice = None
@@ -147,13 +204,13 @@ class Decoder(Object):
         contract = Contract()
         orderState = OrderState()
 
-        if self.serverVersion < MIN_SERVER_VER_ORDER_CONTAINER:
+        if not self.serverCaps.ORDER_CONTAINER:
             version = decode(int, fields)
         else:
             version = self.serverVersion
 
         OrderDecoder.__init__(
-            self, contract, order, orderState, version, self.serverVersion
+            self, contract, order, orderState, version, self.serverCaps
         )
 
         # read orderId
@@ -287,7 +344,7 @@ class Decoder(Object):
     def processContractDataMsg(self, fields) -> None:
         next(fields)
         version = 8
-        if self.serverVersion < MIN_SERVER_VER_SIZE_RULES:
+        if not self.serverCaps.SIZE_RULES:
             version = decode(int, fields)
 
         reqId = -1
@@ -298,7 +355,7 @@ class Decoder(Object):
         contract.contract.symbol = decode(str, fields)
         contract.contract.secType = decode(str, fields)
         self.readLastTradeDate(fields, contract, False)
-        if self.serverVersion >= MIN_SERVER_VER_LAST_TRADE_DATE:
+        if self.serverCaps.LAST_TRADE_DATE:
             contract.contract.lastTradeDate = decode(str, fields)
         contract.contract.strike = decode(float, fields)
         contract.contract.right = decode(str, fields)
@@ -309,10 +366,7 @@ class Decoder(Object):
         contract.contract.tradingClass = decode(str, fields)
         contract.contract.conId = decode(int, fields)
         contract.minTick = decode(float, fields)
-        if (
-            self.serverVersion >= MIN_SERVER_VER_MD_SIZE_MULTIPLIER
-            and self.serverVersion < MIN_SERVER_VER_SIZE_RULES
-        ):
+        if self.serverCaps.MD_SIZE_MULTIPLIER and not self.serverCaps.SIZE_RULES:
             decode(int, fields)  # mdSizeMultiplier - not used anymore
         contract.contract.multiplier = decode(str, fields)
         contract.orderTypes = decode(str, fields)
@@ -323,7 +377,7 @@ class Decoder(Object):
         if version >= 5:
             contract.longName = (
                 decode(str, fields).encode().decode("unicode-escape")
-                if self.serverVersion >= MIN_SERVER_VER_ENCODE_MSG_ASCII7
+                if self.serverCaps.ENCODE_MSG_ASCII7
                 else decode(str, fields)
             )
             contract.contract.primaryExchange = decode(str, fields)
@@ -348,37 +402,31 @@ class Decoder(Object):
                     tagValue.value = decode(str, fields)
                     contract.secIdList.append(tagValue)
 
-        if self.serverVersion >= MIN_SERVER_VER_AGG_GROUP:
+        if self.serverCaps.AGG_GROUP:
             contract.aggGroup = decode(int, fields)
 
-        if self.serverVersion >= MIN_SERVER_VER_UNDERLYING_INFO:
+        if self.serverCaps.UNDERLYING_INFO:
             contract.underSymbol = decode(str, fields)
             contract.underSecType = decode(str, fields)
 
-        if self.serverVersion >= MIN_SERVER_VER_MARKET_RULES:
+        if self.serverCaps.MARKET_RULES:
             contract.marketRuleIds = decode(str, fields)
 
-        if self.serverVersion >= MIN_SERVER_VER_REAL_EXPIRATION_DATE:
+        if self.serverCaps.REAL_EXPIRATION_DATE:
             contract.realExpirationDate = decode(str, fields)
 
-        if self.serverVersion >= MIN_SERVER_VER_STOCK_TYPE:
+        if self.serverCaps.STOCK_TYPE:
             contract.stockType = decode(str, fields)
 
-        if (
-            self.serverVersion >= MIN_SERVER_VER_FRACTIONAL_SIZE_SUPPORT
-            and self.serverVersion < MIN_SERVER_VER_SIZE_RULES
-        ):
+        if self.serverCaps.FRACTIONAL_SIZE_SUPPORT and not self.serverCaps.SIZE_RULES:
             decode(Decimal, fields)  # sizeMinTick - not used anymore
 
-        if self.serverVersion >= MIN_SERVER_VER_SIZE_RULES:
+        if self.serverCaps.SIZE_RULES:
             contract.minSize = decode(Decimal, fields)
             contract.sizeIncrement = decode(Decimal, fields)
             contract.suggestedSizeIncrement = decode(Decimal, fields)
 
-        if (
-            self.serverVersion >= MIN_SERVER_VER_FUND_DATA_FIELDS
-            and contract.contract.secType == "FUND"
-        ):
+        if self.serverCaps.FUND_DATA_FIELDS and contract.contract.secType == "FUND":
             contract.fundName = decode(str, fields)
             contract.fundFamily = decode(str, fields)
             contract.fundType = decode(str, fields)
@@ -401,7 +449,7 @@ class Decoder(Object):
                 FundAssetType, decode(str, fields)
             )
 
-        if self.serverVersion >= MIN_SERVER_VER_INELIGIBILITY_REASONS:
+        if self.serverCaps.INELIGIBILITY_REASONS:
             ineligibilityReasonListCount = decode(int, fields)
             if ineligibilityReasonListCount > 0:
                 contract.ineligibilityReasonList = []
@@ -416,7 +464,7 @@ class Decoder(Object):
     def processBondContractDataMsg(self, fields) -> None:
         next(fields)
         version = 6
-        if self.serverVersion < MIN_SERVER_VER_SIZE_RULES:
+        if not self.serverCaps.SIZE_RULES:
             version = decode(int, fields)
 
         reqId = -1
@@ -443,10 +491,7 @@ class Decoder(Object):
         contract.contract.tradingClass = decode(str, fields)
         contract.contract.conId = decode(int, fields)
         contract.minTick = decode(float, fields)
-        if (
-            self.serverVersion >= MIN_SERVER_VER_MD_SIZE_MULTIPLIER
-            and self.serverVersion < MIN_SERVER_VER_SIZE_RULES
-        ):
+        if self.serverCaps.MD_SIZE_MULTIPLIER and not self.serverCaps.SIZE_RULES:
             decode(int, fields)  # mdSizeMultiplier - not used anymore
         contract.orderTypes = decode(str, fields)
         contract.validExchanges = decode(str, fields)
@@ -469,13 +514,13 @@ class Decoder(Object):
                     tagValue.value = decode(str, fields)
                     contract.secIdList.append(tagValue)
 
-        if self.serverVersion >= MIN_SERVER_VER_AGG_GROUP:
+        if self.serverCaps.AGG_GROUP:
             contract.aggGroup = decode(int, fields)
 
-        if self.serverVersion >= MIN_SERVER_VER_MARKET_RULES:
+        if self.serverCaps.MARKET_RULES:
             contract.marketRuleIds = decode(str, fields)
 
-        if self.serverVersion >= MIN_SERVER_VER_SIZE_RULES:
+        if self.serverCaps.SIZE_RULES:
             contract.minSize = decode(Decimal, fields)
             contract.sizeIncrement = decode(Decimal, fields)
             contract.suggestedSizeIncrement = decode(Decimal, fields)
@@ -525,7 +570,7 @@ class Decoder(Object):
         next(fields)
         version = self.serverVersion
 
-        if self.serverVersion < MIN_SERVER_VER_LAST_LIQUIDITY:
+        if not self.serverCaps.LAST_LIQUIDITY:
             version = decode(int, fields)
 
         reqId = -1
@@ -574,11 +619,11 @@ class Decoder(Object):
         if version >= 9:
             execution.evRule = decode(str, fields)
             execution.evMultiplier = decode(float, fields)
-        if self.serverVersion >= MIN_SERVER_VER_MODELS_SUPPORT:
+        if self.serverCaps.MODELS_SUPPORT:
             execution.modelCode = decode(str, fields)
-        if self.serverVersion >= MIN_SERVER_VER_LAST_LIQUIDITY:
+        if self.serverCaps.LAST_LIQUIDITY:
             execution.lastLiquidity = decode(int, fields)
-        if self.serverVersion >= MIN_SERVER_VER_PENDING_PRICE_REVISION:
+        if self.serverCaps.PENDING_PRICE_REVISION:
             execution.pendingPriceRevision = decode(bool, fields)
 
         self.wrapper.execDetails(reqId, contract, execution)
@@ -586,7 +631,7 @@ class Decoder(Object):
     def processHistoricalDataMsg(self, fields) -> None:
         next(fields)
 
-        if self.serverVersion < MIN_SERVER_VER_SYNT_REALTIME_BARS:
+        if not self.serverCaps.SYNT_REALTIME_BARS:
             decode(int, fields)
 
         reqId = decode(int, fields)
@@ -595,6 +640,12 @@ class Decoder(Object):
 
         itemCount = decode(int, fields)
 
+        sink = self.barSinks.get(reqId)
+        if sink is not None:
+            self.decodeBarsInto(sink, fields, itemCount)
+            self.wrapper.historicalDataEnd(reqId, startDateStr, endDateStr)
+            return
+
         for _ in range(itemCount):
             bar = BarData()
             bar.date = decode(str, fields)
@@ -605,7 +656,7 @@ class Decoder(Object):
             bar.volume = decode(Decimal, fields)
             bar.wap = decode(Decimal, fields)
 
-            if self.serverVersion < MIN_SERVER_VER_SYNT_REALTIME_BARS:
+            if not self.serverCaps.SYNT_REALTIME_BARS:
                 decode(str, fields)
 
             bar.barCount = decode(int, fields)  # ver 3 field
@@ -615,9 +666,40 @@ class Decoder(Object):
         # send end of dataset marker
         self.wrapper.historicalDataEnd(reqId, startDateStr, endDateStr)
 
+    def decodeBarsInto(self, sink, fields, itemCount) -> None:
+        """Hands the bars of a historical data message straight to the sink,
+        see EClient.setBarSink()."""
+        syntRealTimeBars = self.serverCaps.SYNT_REALTIME_BARS
+        for _ in range(itemCount):
+            time = barDateToEpoch(next(fields).decode())
+            open_ = float(next(fields))
+            high = float(next(fields))
+            low = float(next(fields))
+            close = float(next(fields))
+            volume = decodeFloatOrNan(fields)
+            wap = decodeFloatOrNan(fields)
+            if not syntRealTimeBars:
+                next(fields)
+            barCount = int(next(fields) or 0)
+            sink.appendBar(time, open_, high, low, close, volume, wap, barCount)
+
     def processHistoricalDataUpdateMsg(self, fields) -> None:
         next(fields)
         reqId = decode(int, fields)
+
+        sink = self.barSinks.get(reqId)
+        if sink is not None:
+            barCount = int(next(fields) or 0)
+            time = barDateToEpoch(next(fields).decode())
+            open_ = float(next(fields))
+            close = float(next(fields))
+            high = float(next(fields))
+            low = float(next(fields))
+            wap = decodeFloatOrNan(fields)
+            volume = decodeFloatOrNan(fields)
+            sink.appendBar(time, open_, high, low, close, volume, wap, barCount)
+            return
+
         bar = BarData()
         bar.barCount = decode(int, fields)
         bar.date = decode(str, fields)
@@ -634,6 +716,19 @@ class Decoder(Object):
         decode(int, fields)
         reqId = decode(int, fields)
 
+        sink = self.barSinks.get(reqId)
+        if sink is not None:
+            time = int(next(fields))
+            open_ = float(next(fields))
+            high = float(next(fields))
+            low = float(next(fields))
+            close = float(next(fields))
+            volume = decodeFloatOrNan(fields)
+            wap = decodeFloatOrNan(fields)
+            count = int(next(fields) or 0)
+            sink.appendBar(time, open_, high, low, close, volume, wap, count)
+            return
+
         bar = RealTimeBar()
         bar.time = decode(int, fields)
         bar.open = decode(float, fields)
@@ -667,13 +762,13 @@ class Decoder(Object):
         undPrice = None
 
         next(fields)
-        if self.serverVersion < MIN_SERVER_VER_PRICE_BASED_VOLATILITY:
+        if not self.serverCaps.PRICE_BASED_VOLATILITY:
             version = decode(int, fields)
 
         reqId = decode(int, fields)
         tickTypeInt = decode(int, fields)
 
-        if self.serverVersion >= MIN_SERVER_VER_PRICE_BASED_VOLATILITY:
+        if self.serverCaps.PRICE_BASED_VOLATILITY:
             tickAttrib = decode(int, fields)
 
         impliedVol = decode(float, fields)
@@ -903,7 +998,7 @@ class Decoder(Object):
                 conDesc.derivativeSecTypes.append(derivSecType)
             contractDescriptions.append(conDesc)
 
-            if self.serverVersion >= MIN_SERVER_VER_BOND_ISSUERID:
+            if self.serverCaps.BOND_ISSUERID:
                 conDesc.contract.description = decode(str, fields)
                 conDesc.contract.issuerId = decode(str, fields)
 
@@ -942,7 +1037,7 @@ class Decoder(Object):
                 desc = DepthMktDataDescription()
                 desc.exchange = decode(str, fields)
                 desc.secType = decode(str, fields)
-                if self.serverVersion >= MIN_SERVER_VER_SERVICE_DATA_TYPE:
+                if self.serverCaps.SERVICE_DATA_TYPE:
                     desc.listingExch = decode(str, fields)
                     desc.serviceDataType = decode(str, fields)
                     desc.aggGroup = decode(int, fields)
@@ -1058,10 +1153,10 @@ class Decoder(Object):
         unrealizedPnL = None
         realizedPnL = None
 
-        if self.serverVersion >= MIN_SERVER_VER_UNREALIZED_PNL:
+        if self.serverCaps.UNREALIZED_PNL:
             unrealizedPnL = decode(float, fields)
 
-        if self.serverVersion >= MIN_SERVER_VER_REALIZED_PNL:
+        if self.serverCaps.REALIZED_PNL:
             realizedPnL = decode(float, fields)
 
         self.wrapper.pnl(reqId, dailyPnL, unrealizedPnL, realizedPnL)
@@ -1074,10 +1169,10 @@ class Decoder(Object):
         unrealizedPnL = None
         realizedPnL = None
 
-        if self.serverVersion >= MIN_SERVER_VER_UNREALIZED_PNL:
+        if self.serverCaps.UNREALIZED_PNL:
             unrealizedPnL = decode(float, fields)
 
-        if self.serverVersion >= MIN_SERVER_VER_REALIZED_PNL:
+        if self.serverCaps.REALIZED_PNL:
             realizedPnL = decode(float, fields)
 
         value = decode(float, fields)
@@ -1238,7 +1333,7 @@ class Decoder(Object):
         size = decode(Decimal, fields)
         isSmartDepth = False
 
-        if self.serverVersion >= MIN_SERVER_VER_SMART_DEPTH:
+        if self.serverCaps.SMART_DEPTH:
             isSmartDepth = decode(bool, fields)
 
         self.wrapper.updateMktDepthL2(
@@ -1253,7 +1348,7 @@ class Decoder(Object):
         orderState = OrderState()
 
         OrderDecoder.__init__(
-            self, contract, order, orderState, UNSET_INTEGER, self.serverVersion
+            self, contract, order, orderState, UNSET_INTEGER, self.serverCaps
         )
 
         # read contract fields
@@ -1385,11 +1480,9 @@ class Decoder(Object):
         decode(int, fields)
         reqId = decode(TickerId, fields)
         errorCode = decode(int, fields)
-        errorString = decode(
-            str, fields, False, self.serverVersion >= MIN_SERVER_VER_ENCODE_MSG_ASCII7
-        )
+        errorString = decode(str, fields, False, self.serverCaps.ENCODE_MSG_ASCII7)
         advancedOrderRejectJson = ""
-        if self.serverVersion >= MIN_SERVER_VER_ADVANCED_ORDER_REJECT:
+        if self.serverCaps.ADVANCED_ORDER_REJECT:
             advancedOrderRejectJson = decode(str, fields, False, True)
 
         self.wrapper.error(reqId, errorCode, errorString, advancedOrderRejectJson)
@@ -1470,7 +1563,7 @@ class Decoder(Object):
                 try:
                     arg = fields[fieldIdx].decode(
                         "unicode-escape"
-                        if self.serverVersion >= MIN_SERVER_VER_ENCODE_MSG_ASCII7
+                        if self.serverCaps.ENCODE_MSG_ASCII7
                         else "UTF-8"
                     )
                 except UnicodeDecodeError:
@@ -1507,15 +1600,28 @@ class Decoder(Object):
             logger.debug("%s: no handleInfo", fields)
             return
 
+        # a routed message is decoded by the RoutedDecoder of its handler:
+        # self.wrapper, which EClient.wrapperChain() may replace from another
+        # thread, is left alone
+        decoder = self
+        if self.router is not None and self.serverCaps.SIZE_RULES:
+            handler = self.router.handlerOf(nMsgId, fields)
+            if handler is not None:
+                decoder = self.routedDecoders.get(handler)
+                if decoder is None:
+                    decoder = self.routedDecoders[handler] = RoutedDecoder(
+                        self, handler
+                    )
+
         try:
             if handleInfo.wrapperMeth is not None:
                 logger.debug("In interpret(), handleInfo: %s", handleInfo)
-                self.interpretWithSignature(fields, handleInfo)
+                decoder.interpretWithSignature(fields, handleInfo)
             elif handleInfo.processMeth is not None:
-                handleInfo.processMeth(self, iter(fields))
+                handleInfo.processMeth(decoder, iter(fields))
         except BadMessage:
             theBadMsg = ",".join(fields)
-            self.wrapper.error(
+            decoder.wrapper.error(
                 NO_VALID_ID, BAD_MESSAGE.code(), BAD_MESSAGE.msg() + theBadMsg
             )
             raise
@@ -1543,8 +1649,8 @@ class Decoder(Object):
         IN.SCANNER_PARAMETERS: HandleInfo(wrap=EWrapper.scannerParameters),
         IN.SCANNER_DATA: HandleInfo(proc=processScannerDataMsg),
         IN.TICK_OPTION_COMPUTATION: HandleInfo(proc=processTickOptionComputationMsg),
-        IN.TICK_GENERIC: HandleInfo(wrap=EWrapper.tickGeneric),
-        IN.TICK_STRING: HandleInfo(wrap=EWrapper.tickString),
+        IN.TICK_GENERIC: HandleInfo(proc=processTickGenericMsg),
+        IN.TICK_STRING: HandleInfo(proc=processTickStringMsg),
         IN.TICK_EFP: HandleInfo(wrap=EWrapper.tickEFP),
         IN.CURRENT_TIME: HandleInfo(wrap=EWrapper.currentTime),
         IN.REAL_TIME_BARS: HandleInfo(proc=processRealTimeBarMsg),
@@ -1610,3 +1716,16 @@ class Decoder(Object):
         IN.HISTORICAL_SCHEDULE: HandleInfo(proc=processHistoricalSchedule),
         IN.USER_INFO: HandleInfo(proc=processUserInfo),
     }
+
+
+class RoutedDecoder(Decoder):
+    """Decodes into the handler of a route, reading everything else, eg: the
+    server version or the bar sinks, from the decoder. Made once per
+    handler, and gone with it."""
+
+    def __init__(self, decoder, handler) -> None:
+        self.decoder = decoder
+        self.wrapper = weakref.proxy(handler)
+
+    def __getattr__(self, name):
+        return getattr(self.decoder, name)
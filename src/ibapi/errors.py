@@ -40,3 +40,16 @@ INVALID_SYMBOL = CodeMsgPair(579, "Invalid symbol in string - ")
 FA_PROFILE_NOT_SUPPORTED = CodeMsgPair(
     585, "FA Profile is not supported anymore, use FA Group instead - "
 )
+
+# error codes that inform, or come with the data: the request goes on
+WARNING_CODES = frozenset(
+    (
+        *range(2100, 2200),  # connectivity and farm notices
+        10090,  # part of the requested market data is not subscribed
+        10167,  # displaying delayed market data
+    )
+)
+
+
+def isWarning(errorCode) -> bool:
+    return errorCode in WARNING_CODES
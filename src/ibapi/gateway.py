@@ -0,0 +1,702 @@
+"""Copyright (C) 2024 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+"""
+Local multiplexing gateway: many API applications over one TWS session.
+
+The Gateway keeps one upstream EClient connected to TWS and listens for
+local API clients, which connect to it as they would to TWS (same wire
+protocol and handshake) and each get their own session. Messages are not
+decoded but routed on their raw fields:
+
+- every request and order id of a session is given an id of the upstream
+  session, from a single counter, so the answers (and the errors) of TWS are
+  routed back to the session with its own id put back;
+- identical reqMktData() (not snapshots) and reqMktDepth() requests share
+  one upstream subscription: a session joining one gets the last ticks, or
+  the current book, replayed, and the subscription is cancelled upstream
+  when its last session cancels or leaves;
+- answers without an id (account updates, positions, news bulletins,
+  commission reports...) go to every session.
+
+The route of a request is dropped on its last answer or on an error, and the
+subscriptions of a session are cancelled upstream when it leaves. The
+parentId of an order is translated as its order id, an order whose parent
+the session did not place is refused.
+
+The positions of the id fields are those of server version
+MIN_SERVER_VER_SIZE_RULES and later, older TWS versions are refused, and
+the sessions use the version of the upstream session.
+"""
+
+import logging
+import queue
+import socket
+import struct
+import threading
+import time
+
+from ibapi import comm
+from ibapi.client import EClient
+from ibapi.connection import Connection
+from ibapi.decoder import Decoder
+from ibapi.errors import isWarning
+from ibapi.message import IN, OUT, inIdIndex
+from ibapi.order_book import ASK, BID, INSERT, OrderBook
+from ibapi.reader import EReader
+from ibapi.server_versions import MIN_SERVER_VER_SIZE_RULES
+from ibapi.wrapper import EWrapper
+
+logger = logging.getLogger(__name__)
+
+# outgoing msg id -> index of its request or order id field
+outIdIndex = {
+    OUT.REQ_MKT_DATA: 2,
+    OUT.CANCEL_MKT_DATA: 2,
+    OUT.PLACE_ORDER: 1,
+    OUT.CANCEL_ORDER: 2,
+    OUT.REQ_EXECUTIONS: 2,
+    OUT.REQ_CONTRACT_DATA: 2,
+    OUT.REQ_MKT_DEPTH: 2,
+    OUT.CANCEL_MKT_DEPTH: 2,
+    OUT.REQ_HISTORICAL_DATA: 1,
+    OUT.EXERCISE_OPTIONS: 2,
+    OUT.REQ_SCANNER_SUBSCRIPTION: 1,
+    OUT.CANCEL_SCANNER_SUBSCRIPTION: 2,
+    OUT.CANCEL_HISTORICAL_DATA: 2,
+    OUT.REQ_REAL_TIME_BARS: 2,
+    OUT.CANCEL_REAL_TIME_BARS: 2,
+    OUT.REQ_FUNDAMENTAL_DATA: 2,
+    OUT.CANCEL_FUNDAMENTAL_DATA: 2,
+    OUT.REQ_CALC_IMPLIED_VOLAT: 2,
+    OUT.REQ_CALC_OPTION_PRICE: 2,
+    OUT.CANCEL_CALC_IMPLIED_VOLAT: 2,
+    OUT.CANCEL_CALC_OPTION_PRICE: 2,
+    OUT.REQ_ACCOUNT_SUMMARY: 2,
+    OUT.CANCEL_ACCOUNT_SUMMARY: 2,
+    OUT.QUERY_DISPLAY_GROUPS: 2,
+    OUT.SUBSCRIBE_TO_GROUP_EVENTS: 2,
+    OUT.UPDATE_DISPLAY_GROUP: 2,
+    OUT.UNSUBSCRIBE_FROM_GROUP_EVENTS: 2,
+    OUT.REQ_POSITIONS_MULTI: 2,
+    OUT.CANCEL_POSITIONS_MULTI: 2,
+    OUT.REQ_ACCOUNT_UPDATES_MULTI: 2,
+    OUT.CANCEL_ACCOUNT_UPDATES_MULTI: 2,
+    OUT.REQ_SEC_DEF_OPT_PARAMS: 1,
+    OUT.REQ_SOFT_DOLLAR_TIERS: 1,
+    OUT.REQ_MATCHING_SYMBOLS: 1,
+    OUT.REQ_SMART_COMPONENTS: 1,
+    OUT.REQ_NEWS_ARTICLE: 1,
+    OUT.REQ_HISTORICAL_NEWS: 1,
+    OUT.REQ_HEAD_TIMESTAMP: 1,
+    OUT.REQ_HISTOGRAM_DATA: 1,
+    OUT.CANCEL_HISTOGRAM_DATA: 1,
+    OUT.CANCEL_HEAD_TIMESTAMP: 1,
+    OUT.REQ_PNL: 1,
+    OUT.CANCEL_PNL: 1,
+    OUT.REQ_PNL_SINGLE: 1,
+    OUT.CANCEL_PNL_SINGLE: 1,
+    OUT.REQ_HISTORICAL_TICKS: 1,
+    OUT.REQ_TICK_BY_TICK_DATA: 1,
+    OUT.CANCEL_TICK_BY_TICK_DATA: 1,
+    OUT.REQ_WSH_META_DATA: 1,
+    OUT.CANCEL_WSH_META_DATA: 1,
+    OUT.REQ_WSH_EVENT_DATA: 1,
+    OUT.CANCEL_WSH_EVENT_DATA: 1,
+    OUT.REQ_USER_INFO: 1,
+}
+
+# the requests whose id is not used anymore once they are sent
+cancelMsgIds = {
+    OUT.CANCEL_SCANNER_SUBSCRIPTION,
+    OUT.CANCEL_HISTORICAL_DATA,
+    OUT.CANCEL_REAL_TIME_BARS,
+    OUT.CANCEL_FUNDAMENTAL_DATA,
+    OUT.CANCEL_CALC_IMPLIED_VOLAT,
+    OUT.CANCEL_CALC_OPTION_PRICE,
+    OUT.CANCEL_ACCOUNT_SUMMARY,
+    OUT.UNSUBSCRIBE_FROM_GROUP_EVENTS,
+    OUT.CANCEL_POSITIONS_MULTI,
+    OUT.CANCEL_ACCOUNT_UPDATES_MULTI,
+    OUT.CANCEL_HISTOGRAM_DATA,
+    OUT.CANCEL_HEAD_TIMESTAMP,
+    OUT.CANCEL_PNL,
+    OUT.CANCEL_PNL_SINGLE,
+    OUT.CANCEL_TICK_BY_TICK_DATA,
+    OUT.CANCEL_WSH_META_DATA,
+    OUT.CANCEL_WSH_EVENT_DATA,
+}
+
+# request msg id -> the message cancelling it
+cancelOf = {
+    OUT.REQ_MKT_DATA: OUT.CANCEL_MKT_DATA,
+    OUT.REQ_MKT_DEPTH: OUT.CANCEL_MKT_DEPTH,
+    OUT.REQ_SCANNER_SUBSCRIPTION: OUT.CANCEL_SCANNER_SUBSCRIPTION,
+    OUT.REQ_HISTORICAL_DATA: OUT.CANCEL_HISTORICAL_DATA,
+    OUT.REQ_REAL_TIME_BARS: OUT.CANCEL_REAL_TIME_BARS,
+    OUT.REQ_FUNDAMENTAL_DATA: OUT.CANCEL_FUNDAMENTAL_DATA,
+    OUT.REQ_CALC_IMPLIED_VOLAT: OUT.CANCEL_CALC_IMPLIED_VOLAT,
+    OUT.REQ_CALC_OPTION_PRICE: OUT.CANCEL_CALC_OPTION_PRICE,
+    OUT.REQ_ACCOUNT_SUMMARY: OUT.CANCEL_ACCOUNT_SUMMARY,
+    OUT.SUBSCRIBE_TO_GROUP_EVENTS: OUT.UNSUBSCRIBE_FROM_GROUP_EVENTS,
+    OUT.REQ_POSITIONS_MULTI: OUT.CANCEL_POSITIONS_MULTI,
+    OUT.REQ_ACCOUNT_UPDATES_MULTI: OUT.CANCEL_ACCOUNT_UPDATES_MULTI,
+    OUT.REQ_HISTOGRAM_DATA: OUT.CANCEL_HISTOGRAM_DATA,
+    OUT.REQ_HEAD_TIMESTAMP: OUT.CANCEL_HEAD_TIMESTAMP,
+    OUT.REQ_PNL: OUT.CANCEL_PNL,
+    OUT.REQ_PNL_SINGLE: OUT.CANCEL_PNL_SINGLE,
+    OUT.REQ_TICK_BY_TICK_DATA: OUT.CANCEL_TICK_BY_TICK_DATA,
+    OUT.REQ_WSH_META_DATA: OUT.CANCEL_WSH_META_DATA,
+    OUT.REQ_WSH_EVENT_DATA: OUT.CANCEL_WSH_EVENT_DATA,
+}
+
+# the answers after which the id of their request is not used anymore
+endMsgIds = {
+    IN.CONTRACT_DATA_END,
+    IN.EXECUTION_DATA_END,
+    IN.TICK_SNAPSHOT_END,
+    IN.HISTORICAL_DATA,  # unless keepUpToDate, the bars and their end
+    IN.HISTORICAL_SCHEDULE,
+    IN.FUNDAMENTAL_DATA,
+    IN.DISPLAY_GROUP_LIST,
+    IN.SECURITY_DEFINITION_OPTION_PARAMETER_END,
+    IN.SOFT_DOLLAR_TIERS,
+    IN.SYMBOL_SAMPLES,
+    IN.SMART_COMPONENTS,
+    IN.NEWS_ARTICLE,
+    IN.HISTORICAL_NEWS_END,
+    IN.HEAD_TIMESTAMP,
+    IN.HISTOGRAM_DATA,
+    IN.USER_INFO,
+    IN.WSH_META_DATA,
+    IN.WSH_EVENT_DATA,
+}
+
+# the historical ticks, ended by the one with the done flag, their last field
+historicalTicksMsgIds = {
+    IN.HISTORICAL_TICKS,
+    IN.HISTORICAL_TICKS_BID_ASK,
+    IN.HISTORICAL_TICKS_LAST,
+}
+
+# index of the parentId field of a placeOrder(), see MIN_SERVER_VER_SIZE_RULES
+PARENT_ID_INDEX = 28
+
+# the market data messages replayed to a session joining a subscription,
+# the last one per (msg id, tick type)
+cachedMsgIds = {
+    IN.TICK_PRICE,
+    IN.TICK_SIZE,
+    IN.TICK_GENERIC,
+    IN.TICK_STRING,
+    IN.TICK_EFP,
+    IN.TICK_OPTION_COMPUTATION,
+    IN.MARKET_DATA_TYPE,
+    IN.TICK_REQ_PARAMS,
+}
+
+
+def frame(fields) -> bytes:
+    """The length prefixed message of raw fields, as comm.make_msg()."""
+    text = b"\0".join(fields) + b"\0"
+    return struct.pack("!I", len(text)) + text
+
+
+class Route:
+    def __init__(self, upstreamId, msgId, session, localId, key=None) -> None:
+        self.upstreamId = upstreamId
+        self.msgId = msgId  # of the request
+        self.subscribers = [(session, localId)]
+        self.key = key  # of a shared subscription
+        self.keepUpToDate = False  # of a historical data request
+        self.cache = {}  # (msg id, tick type) -> fields
+        self.book = None  # OrderBook of a depth subscription
+        self.isL2 = False
+
+
+class Inbox:
+    """Stands for the msg_queue of an EReader, queues (session, msg) in the
+    gateway's inbox; session is None for the upstream EReader."""
+
+    def __init__(self, gateway, session) -> None:
+        self.gateway = gateway
+        self.session = session
+
+    def put(self, msg) -> None:
+        self.gateway.inbox.put((self.session, msg))
+
+
+class Session:
+    def __init__(self, sock, address) -> None:
+        self.address = address
+        self.conn = Connection(*address[:2])
+        self.conn.socket = sock
+        sock.settimeout(1)
+        self.clientId = None
+        self.nextOrderId = 1
+        self.reqIds = {}  # local request id -> upstream id
+        self.orderIds = {}  # local order id -> upstream id
+        self.reader = None
+
+    def __repr__(self) -> str:
+        return f"Session(clientId={self.clientId}, address={self.address})"
+
+    def send(self, fields) -> None:
+        try:
+            self.conn.sendMsg(frame(fields))
+        except OSError:
+            logger.debug("%s: send failed", self)
+            self.conn.disconnect()
+
+
+class Gateway(EWrapper):
+    def __init__(
+        self,
+        upstreamHost: str,
+        upstreamPort: int,
+        clientId: int,
+        host: str = "127.0.0.1",
+        port: int = 4010,
+    ) -> None:
+        """upstreamHost:str, upstreamPort:int, clientId:int - The TWS (or IB
+            Gateway) to connect to, and the clientId of the upstream session.
+        host:str, port:int - Where the local API clients connect, port 0
+            picks a free one (see self.port once started).
+        """
+        EWrapper.__init__(self)
+        self.upstreamHost = upstreamHost
+        self.upstreamPort = upstreamPort
+        self.clientId = clientId
+        self.host = host
+        self.port = port
+        self.inbox = queue.Queue()  # (session, msg), session None for upstream
+        self.upstream = EClient(self)
+        self.upstream.msg_queue = Inbox(self, None)
+        self.decoder = None
+        self.sessions = []
+        self.routes = {}  # upstream id -> Route
+        self.subscriptions = {}  # key -> Route of a shared subscription
+        self.nextId = None
+        self.accounts = ""
+        self.ready = threading.Event()
+        self.server = None
+        self.threads = []
+        self.done = False
+
+    def start(self, timeout: float = 10) -> None:
+        """Connects upstream, then accepts local clients; returns once ready."""
+        self.upstream.connect(self.upstreamHost, self.upstreamPort, self.clientId)
+        if not self.upstream.isConnected():
+            raise ConnectionError("could not connect to TWS")
+        serverVersion = self.upstream.serverVersion()
+        if serverVersion < MIN_SERVER_VER_SIZE_RULES:
+            self.upstream.disconnect()
+            raise ConnectionError("server version %d is too old" % serverVersion)
+        self.decoder = Decoder(self, serverVersion, self.upstream.serverCaps)
+
+        dispatcher = threading.Thread(target=self.run, name="gateway", daemon=True)
+        dispatcher.start()
+        self.threads.append(dispatcher)
+        if not self.ready.wait(timeout):
+            self.stop()
+            raise ConnectionError("no next valid id from TWS")
+
+        self.server = socket.create_server((self.host, self.port))
+        self.server.settimeout(0.5)
+        self.port = self.server.getsockname()[1]
+        acceptor = threading.Thread(
+            target=self.accept, name="gateway-accept", daemon=True
+        )
+        acceptor.start()
+        self.threads.append(acceptor)
+        logger.info("gateway listening on %s:%d", self.host, self.port)
+
+    def stop(self) -> None:
+        self.done = True
+        if self.server is not None:
+            self.server.close()
+        for session in list(self.sessions):
+            session.conn.disconnect()
+        self.upstream.disconnect()
+        for thread in self.threads:
+            if thread is not threading.current_thread():
+                thread.join()
+
+    ##########################################################################
+    # local clients
+
+    def accept(self) -> None:
+        while not self.done:
+            try:
+                sock, address = self.server.accept()
+            except TimeoutError:
+                continue
+            except OSError:
+                return
+            try:
+                self.handshake(sock, address)
+            except Exception:
+                logger.warning("handshake with %s failed", address, exc_info=True)
+                sock.close()
+
+    def recvExactly(self, sock, n) -> bytes:
+        buf = b""
+        while len(buf) < n:
+            data = sock.recv(n - len(buf))
+            if not data:
+                raise ConnectionError("closed during the handshake")
+            buf += data
+        return buf
+
+    def handshake(self, sock, address) -> None:
+        sock.settimeout(5)
+        if self.recvExactly(sock, 4) != b"API\0":
+            raise ValueError("not an API client")
+        size = struct.unpack("!I", self.recvExactly(sock, 4))[0]
+        versions = self.recvExactly(sock, size).decode().split()[0]
+        minVersion, maxVersion = (int(v) for v in versions[1:].split(".."))
+        serverVersion = self.upstream.serverVersion()
+        if not minVersion <= serverVersion <= maxVersion:
+            raise ValueError(
+                "client versions %s do not include %d" % (versions, serverVersion)
+            )
+        # the connection time as TWS sent it
+        sock.sendall(frame([str(serverVersion).encode(), self.upstream.connTime]))
+
+        session = Session(sock, address)
+        session.reader = EReader(session.conn, Inbox(self, session))
+        self.inbox.put((session, None))  # registered by the dispatcher
+        session.reader.start()
+
+    ##########################################################################
+    # routing, all done by the dispatcher thread
+
+    def run(self) -> None:
+        lastCheck = time.monotonic()
+        while not self.done:
+            if time.monotonic() - lastCheck > 0.2:
+                lastCheck = time.monotonic()
+                self.dropClosedSessions()
+                if not self.upstream.isConnected():
+                    self.done = True
+            try:
+                session, msg = self.inbox.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            try:
+                if session is None:
+                    self.fromUpstream(comm.read_fields(msg))
+                elif msg is None:
+                    self.sessions.append(session)
+                else:
+                    self.fromSession(session, list(comm.read_fields(msg)))
+            except Exception:
+                logger.exception("could not route %s", msg)
+        for session in self.sessions:
+            session.conn.disconnect()
+
+    def newId(self) -> int:
+        upstreamId = self.nextId
+        self.nextId += 1
+        return upstreamId
+
+    def forward(self, fields) -> None:
+        # through EClient.sendMsg() for the rate governor, if any
+        self.upstream.sendMsg(b"\0".join(fields).decode() + "\0")
+
+    def fromSession(self, session, fields) -> None:
+        msgId = int(fields[0])
+        if msgId == OUT.START_API:
+            session.clientId = int(fields[2])
+            session.send([
+                str(IN.NEXT_VALID_ID).encode(),
+                b"1",
+                str(session.nextOrderId).encode(),
+            ])
+            session.send([str(IN.MANAGED_ACCTS).encode(), b"1", self.accounts.encode()])
+            return
+        if msgId == OUT.REQ_IDS:
+            session.send([
+                str(IN.NEXT_VALID_ID).encode(),
+                b"1",
+                str(session.nextOrderId).encode(),
+            ])
+            return
+
+        idx = outIdIndex.get(msgId)
+        if idx is None:
+            self.forward(fields)
+            return
+        localId = int(fields[idx])
+
+        if msgId in (OUT.PLACE_ORDER, OUT.CANCEL_ORDER):
+            if msgId == OUT.PLACE_ORDER and not self.translateParentId(
+                session, localId, fields
+            ):
+                return
+            upstreamId = session.orderIds.get(localId)
+            if upstreamId is None:
+                if msgId == OUT.CANCEL_ORDER:
+                    logger.warning("%s: cancel of unknown order %d", session, localId)
+                    return
+                upstreamId = self.newId()
+                session.orderIds[localId] = upstreamId
+                session.nextOrderId = max(session.nextOrderId, localId + 1)
+                self.routes[upstreamId] = Route(upstreamId, msgId, session, localId)
+        elif msgId in (OUT.REQ_MKT_DATA, OUT.REQ_MKT_DEPTH):
+            # snapshots are not shared, the flag is the third field from the end
+            key = None
+            if msgId == OUT.REQ_MKT_DEPTH or fields[-3] != b"1":
+                key = (msgId, *fields[1:idx], *fields[idx + 1 :])
+            route = self.subscriptions.get(key)
+            if route is not None:
+                route.subscribers.append((session, localId))
+                session.reqIds[localId] = route.upstreamId
+                self.replay(route, session, localId)
+                return
+            upstreamId = self.newId()
+            session.reqIds[localId] = upstreamId
+            route = Route(upstreamId, msgId, session, localId, key)
+            if msgId == OUT.REQ_MKT_DEPTH:
+                route.book = OrderBook(int(fields[-3]))
+            self.routes[upstreamId] = route
+            if key is not None:
+                self.subscriptions[key] = route
+        elif msgId in (OUT.CANCEL_MKT_DATA, OUT.CANCEL_MKT_DEPTH):
+            upstreamId = session.reqIds.pop(localId, None)
+            route = self.routes.get(upstreamId)
+            if route is None:
+                return
+            route.subscribers.remove((session, localId))
+            if route.subscribers:
+                return
+            self.dropRoute(route)
+        elif msgId in cancelMsgIds:
+            upstreamId = session.reqIds.get(localId)
+            if upstreamId is None:
+                logger.debug("%s: cancel of ended request %d", session, localId)
+                return
+            route = self.routes.get(upstreamId)
+            if route is not None:
+                self.dropRoute(route)
+        else:
+            upstreamId = session.reqIds.get(localId)
+            if upstreamId is None:
+                upstreamId = self.newId()
+                session.reqIds[localId] = upstreamId
+                route = Route(upstreamId, msgId, session, localId)
+                if msgId == OUT.REQ_HISTORICAL_DATA:
+                    # the flag is followed by the chart options
+                    route.keepUpToDate = fields[-2] == b"1"
+                self.routes[upstreamId] = route
+
+        fields[idx] = str(upstreamId).encode()
+        self.forward(fields)
+
+    def translateParentId(self, session, localId, fields) -> bool:
+        """Puts the upstream id of the parent order in the placeOrder()
+        fields, False if the session has no such order."""
+        parentId = int(fields[PARENT_ID_INDEX] or 0)
+        if not parentId:
+            return True
+        upstreamId = session.orderIds.get(parentId)
+        if upstreamId is None:
+            logger.warning(
+                "%s: order %d has unknown parent %d", session, localId, parentId
+            )
+            self.sendError(
+                session, localId, 135, "Can't find parent order id = %d" % parentId
+            )
+            return False
+        fields[PARENT_ID_INDEX] = str(upstreamId).encode()
+        return True
+
+    def sendError(self, session, localId, errorCode, errorString) -> None:
+        fields = [
+            str(IN.ERR_MSG).encode(),
+            b"2",
+            str(localId).encode(),
+            str(errorCode).encode(),
+            errorString.encode(),
+        ]
+        if self.upstream.serverCaps.ADVANCED_ORDER_REJECT:
+            fields.append(b"")
+        session.send(fields)
+
+    def dropRoute(self, route) -> None:
+        self.routes.pop(route.upstreamId, None)
+        if route.key is not None and self.subscriptions.get(route.key) is route:
+            del self.subscriptions[route.key]
+        for session, localId in route.subscribers:
+            if session.reqIds.get(localId) == route.upstreamId:
+                del session.reqIds[localId]
+
+    def isLast(self, route, msgId, fields, idx) -> bool:
+        """Whether the answer fields ends the request of route."""
+        if route.msgId == OUT.PLACE_ORDER:
+            return False  # the orders live on
+        if msgId == IN.ERR_MSG:
+            return not isWarning(int(fields[idx + 1]))
+        if msgId == IN.HISTORICAL_DATA:
+            return not route.keepUpToDate
+        if msgId in historicalTicksMsgIds:
+            return fields[-1] == b"1"
+        return msgId in endMsgIds
+
+    def cancelFields(self, route):
+        """The fields cancelling the request of route upstream, None if it
+        cannot be."""
+        cancel = cancelOf.get(route.msgId)
+        if cancel is None:
+            return None
+        fields = [str(cancel).encode()]
+        if outIdIndex[cancel] == 2:
+            fields.append(b"2" if cancel == OUT.CANCEL_MKT_DATA else b"1")
+        fields.append(str(route.upstreamId).encode())
+        if cancel == OUT.CANCEL_MKT_DEPTH:
+            isSmartDepth = route.book is not None and route.book.isSmartDepth
+            fields.append(b"1" if isSmartDepth else b"0")
+        return fields
+
+    def dropClosedSessions(self) -> None:
+        for session in [s for s in self.sessions if not s.conn.isConnected()]:
+            logger.info("%s closed", session)
+            self.sessions.remove(session)
+            for route in list(self.routes.values()):
+                subscribers = [s for s in route.subscribers if s[0] is not session]
+                if len(subscribers) == len(route.subscribers):
+                    continue
+                if subscribers:
+                    route.subscribers = subscribers
+                    continue
+                self.dropRoute(route)
+                route.subscribers = subscribers
+                fields = self.cancelFields(route)
+                if fields is not None:
+                    self.forward(fields)
+
+    def replay(self, route, session, localId) -> None:
+        localIdField = str(localId).encode()
+        for fields in route.cache.values():
+            fields = list(fields)
+            fields[inIdIndex[int(fields[0])]] = localIdField
+            session.send(fields)
+        book = route.book
+        if book is None:
+            return
+        for side in (ASK, BID):
+            bookSide = book.sides[side]
+            for position in range(bookSide.rows):
+                price = repr(bookSide.prices[position]).encode()
+                size = repr(bookSide.sizes[position]).encode()
+                if route.isL2:
+                    fields = [
+                        str(IN.MARKET_DEPTH_L2).encode(),
+                        b"1",
+                        localIdField,
+                        str(position).encode(),
+                        bookSide.marketMakers[position].encode(),
+                        str(INSERT).encode(),
+                        str(side).encode(),
+                        price,
+                        size,
+                        b"1" if book.isSmartDepth else b"0",
+                    ]
+                else:
+                    fields = [
+                        str(IN.MARKET_DEPTH).encode(),
+                        b"1",
+                        localIdField,
+                        str(position).encode(),
+                        str(INSERT).encode(),
+                        str(side).encode(),
+                        price,
+                        size,
+                    ]
+                session.send(fields)
+
+    def fromUpstream(self, fields) -> None:
+        if not fields:
+            return
+        msgId = int(fields[0])
+        if msgId in (IN.NEXT_VALID_ID, IN.MANAGED_ACCTS):
+            self.decoder.interpret(fields)
+            if msgId == IN.NEXT_VALID_ID:
+                return
+
+        idx = inIdIndex.get(msgId)
+        if idx is None:
+            self.broadcast(fields)
+            return
+
+        upstreamId = int(fields[idx])
+        if msgId == IN.EXECUTION_DATA and upstreamId == -1:
+            # the execution of an order, not an answer to reqExecutions()
+            idx += 1
+            upstreamId = int(fields[idx])
+        route = self.routes.get(upstreamId)
+        if route is None:
+            if msgId == IN.ERR_MSG and upstreamId == -1:
+                self.broadcast(fields)
+            else:
+                logger.debug("no route for %s", fields)
+            return
+
+        if msgId in cachedMsgIds:
+            route.cache[(msgId, fields[idx + 1])] = fields
+        elif msgId in (IN.MARKET_DEPTH, IN.MARKET_DEPTH_L2) and route.book is not None:
+            self.updateBook(route, msgId, fields)
+
+        fields = list(fields)
+        for session, localId in route.subscribers:
+            fields[idx] = str(localId).encode()
+            if msgId == IN.EXECUTION_DATA and idx == 1:
+                # answer to reqExecutions(), show only the session's order ids
+                orderId = int(fields[2])
+                fields[2] = b"0"
+                for local, upstream in session.orderIds.items():
+                    if upstream == orderId:
+                        fields[2] = str(local).encode()
+            session.send(fields)
+        if self.isLast(route, msgId, fields, idx):
+            self.dropRoute(route)
+
+    def updateBook(self, route, msgId, fields) -> None:
+        if msgId == IN.MARKET_DEPTH_L2:
+            route.isL2 = True
+            position, marketMaker, operation, side, price, size = fields[3:9]
+            route.book.isSmartDepth = len(fields) > 9 and fields[9] == b"1"
+        else:
+            position, operation, side, price, size = fields[3:8]
+            marketMaker = b""
+        route.book.update(
+            int(position),
+            int(operation),
+            int(side),
+            float(price),
+            float(size or 0),
+            marketMaker.decode(),
+        )
+
+    def broadcast(self, fields) -> None:
+        for session in self.sessions:
+            session.send(fields)
+
+    ##########################################################################
+    # upstream session
+
+    def nextValidId(self, orderId: int) -> None:
+        if self.nextId is None or orderId > self.nextId:
+            self.nextId = orderId
+        self.ready.set()
+
+    def managedAccounts(self, accountsList: str) -> None:
+        self.accounts = accountsList
+
+    def error(self, reqId, errorCode, errorString, advancedOrderRejectJson="") -> None:
+        # only the upstream EClient's own errors, eg: not connected
+        logger.warning("upstream error %s %d %s", reqId, errorCode, errorString)
+
+    def connectionClosed(self) -> None:
+        logger.warning("upstream connection closed")
@@ -0,0 +1,301 @@
+"""Copyright (C) 2024 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+"""
+Chunked download of long historical bar ranges over several connections.
+
+A job (contract, time range, bar size, whatToShow) is split into the longest
+chunks IB accepts for the bar size. The chunks are spread over a pool of
+connected EClients (each with its own clientId, and so its own pacing
+allowance) through one HistoricalPacer per client, and the bars are handed
+back in time order through the historicalData() and historicalDataEnd()
+of the job's wrapper. Progress can be checkpointed to a JSON file so a job
+restarted after a crash resumes after the last chunk delivered.
+"""
+
+import json
+import logging
+import os
+import threading
+
+from ibapi.errors import isWarning
+from ibapi.historical_pacer import HistoricalPacer
+from ibapi.utils import barDateToEpoch, epochToDateTime
+from ibapi.wrapper import EWrapper
+
+logger = logging.getLogger(__name__)
+
+DAY = 24 * 60 * 60
+
+# bar size -> longest duration, in seconds, that can be asked for at once
+maxChunkSeconds = {
+    "1 secs": 1800,
+    "5 secs": 3600,
+    "10 secs": 4 * 3600,
+    "15 secs": 4 * 3600,
+    "30 secs": 8 * 3600,
+    "1 min": DAY,
+    "2 mins": 2 * DAY,
+    "3 mins": 7 * DAY,
+    "5 mins": 7 * DAY,
+    "10 mins": 7 * DAY,
+    "15 mins": 7 * DAY,
+    "20 mins": 7 * DAY,
+    "30 mins": 30 * DAY,
+    "1 hour": 30 * DAY,
+    "2 hours": 30 * DAY,
+    "3 hours": 30 * DAY,
+    "4 hours": 30 * DAY,
+    "8 hours": 30 * DAY,
+    "1 day": 365 * DAY,
+    "1 week": 365 * DAY,
+    "1 month": 365 * DAY,
+}
+
+
+def durationStr(seconds) -> str:
+    """The durationStr of a request covering seconds; IB takes up to 365 D,
+    years beyond that."""
+    if seconds < DAY:
+        return "%d S" % seconds
+    days = -(-seconds // DAY)
+    if days <= 365:
+        return "%d D" % days
+    return "%d Y" % -(-days // 365)
+
+
+class Chunk:
+    def __init__(self, index, start, end) -> None:
+        self.index = index
+        self.start = start  # epoch seconds, included
+        self.end = end  # epoch seconds, excluded
+        self.client = None
+        self.bars = []
+
+
+class DownloadJob:
+    def __init__(
+        self, jobId, contract, barSize, whatToShow, useRTH, wrapper, chunks, spec
+    ) -> None:
+        self.jobId = jobId
+        self.contract = contract
+        self.barSize = barSize
+        self.whatToShow = whatToShow
+        self.useRTH = useRTH
+        self.wrapper = wrapper
+        self.chunks = chunks
+        self.spec = spec  # identifies the job in the checkpoint
+        self.checkpointPath = None
+        self.todo = []  # chunks not requested yet
+        self.next = 0  # index of the next chunk to deliver
+        self.done = {}  # index -> Chunk, finished but not delivered yet
+        self.reqId2chunk = {}  # chunks requested and not finished
+
+
+class HistoricalDownloader(EWrapper):
+    def __init__(self, clients, perClient: int = 3, reqIdBase: int = 1 << 24) -> None:
+        """clients:list - Connected EClients, each with a different clientId.
+        perClient:int - Chunks queued on a client at once; the pacer of the
+            client decides when they are actually sent.
+        reqIdBase:int - The reqIds of the chunk requests start from there,
+            keep them apart from the application's.
+        """
+        EWrapper.__init__(self)
+        self.clients = list(clients)
+        self.perClient = perClient
+        self.nextReqId = reqIdBase
+        self.lock = threading.Lock()
+        self.pacers = {}
+        for client in self.clients:
+            self.pacers[client] = HistoricalPacer(client)
+            client.addWrapperListener(self)
+        self.job = None
+        # the calls of the job's wrapper, made in order once self.lock is
+        # released, so that they may start the next job
+        self.calls = []
+        self.calling = False
+
+    def close(self) -> None:
+        for client, pacer in self.pacers.items():
+            client.removeWrapperListener(self)
+            pacer.close()
+
+    def download(
+        self,
+        jobId,
+        contract,
+        start: int,
+        end: int,
+        barSize: str,
+        whatToShow: str,
+        useRTH: int,
+        wrapper,
+        checkpointPath: str = None,
+    ) -> None:
+        """Starts downloading; returns right away. One job at a time,
+        RuntimeError if one is running already.
+
+        jobId:int - The reqId the bars are delivered with.
+        contract:Contract - The contract, must not change during the job.
+        start:int, end:int - The range, in seconds since the epoch.
+        barSize:str - One of maxChunkSeconds.
+        wrapper:EWrapper - Gets historicalData(jobId, bar) in time order,
+            then historicalDataEnd(jobId, start, end). Chunks that failed are
+            reported through error(jobId, ...) and skipped.
+        checkpointPath:str - Where progress is kept, None for nowhere.
+        """
+        chunkSeconds = maxChunkSeconds[barSize]
+        chunks = [
+            Chunk(index, t, min(t + chunkSeconds, end))
+            for index, t in enumerate(range(start, end, chunkSeconds))
+        ]
+        spec = [contract.conId, str(contract), start, end, barSize, whatToShow, useRTH]
+        nextIndex = 0
+        if checkpointPath and os.path.exists(checkpointPath):
+            with open(checkpointPath) as f:
+                checkpoint = json.load(f)
+            if checkpoint["job"] == spec:
+                nextIndex = checkpoint["next"]
+                logger.info("resuming download at chunk %d", nextIndex)
+
+        with self.lock:
+            if self.job is not None:
+                raise RuntimeError("a download is running already")
+            self.job = DownloadJob(
+                jobId, contract, barSize, whatToShow, useRTH, wrapper, chunks, spec
+            )
+            self.job.checkpointPath = checkpointPath
+            self.job.todo = list(chunks[nextIndex:])
+            self.job.next = nextIndex
+        self.assign()
+
+    def assign(self) -> None:
+        toSend = []
+        with self.lock:
+            job = self.job
+            if job is not None:
+                for client in self.clients:
+                    while job.todo and self.queued(client) < self.perClient:
+                        chunk = job.todo.pop(0)
+                        chunk.client = client
+                        reqId = self.nextReqId
+                        self.nextReqId += 1
+                        job.reqId2chunk[reqId] = chunk
+                        toSend.append((reqId, chunk))
+                if not job.todo and not job.reqId2chunk and not job.done:
+                    self.finish()
+
+        for reqId, chunk in toSend:
+            self.pacers[chunk.client].reqHistoricalData(
+                reqId,
+                job.contract,
+                epochToDateTime(chunk.end),
+                durationStr(chunk.end - chunk.start),
+                job.barSize,
+                job.whatToShow,
+                job.useRTH,
+                2,
+                False,
+                [],
+            )
+        self.makeCalls()
+
+    def makeCalls(self) -> None:
+        """Makes the wrapper calls queued, in order and by one thread at a
+        time, without self.lock held."""
+        while True:
+            with self.lock:
+                if self.calling or not self.calls:
+                    return
+                self.calling = True
+                calls, self.calls = self.calls, []
+            try:
+                for func, args in calls:
+                    func(*args)
+            finally:
+                with self.lock:
+                    self.calling = False
+
+    def queued(self, client) -> int:
+        return sum(
+            1 for chunk in self.job.reqId2chunk.values() if chunk.client is client
+        )
+
+    def chunkDone(self, reqId) -> None:
+        with self.lock:
+            job = self.job
+            chunk = job.reqId2chunk.pop(reqId, None) if job else None
+            if chunk is None:
+                return
+            job.done[chunk.index] = chunk
+            self.deliver()
+        self.assign()
+
+    def deliver(self) -> None:
+        # called with self.lock held, as finish()
+        job = self.job
+        historicalData = job.wrapper.historicalData
+        delivered = False
+        while job.next in job.done:
+            chunk = job.done.pop(job.next)
+            for bar in chunk.bars:
+                self.calls.append((historicalData, (job.jobId, bar)))
+            job.next += 1
+            delivered = True
+        if delivered and job.checkpointPath:
+            # once the bars are delivered
+            self.calls.append((
+                self.saveCheckpoint,
+                (job.checkpointPath, job.spec, job.next),
+            ))
+
+    def saveCheckpoint(self, path, spec, nextIndex) -> None:
+        with open(path + ".tmp", "w") as f:
+            json.dump({"job": spec, "next": nextIndex}, f)
+        os.replace(path + ".tmp", path)
+
+    def finish(self) -> None:
+        job = self.job
+        self.job = None
+        chunks = job.chunks
+        self.calls.append((
+            job.wrapper.historicalDataEnd,
+            (
+                job.jobId,
+                epochToDateTime(chunks[0].start) if chunks else "",
+                epochToDateTime(chunks[-1].end) if chunks else "",
+            ),
+        ))
+
+    ##########################################################################
+    # answers from the clients
+
+    def historicalData(self, reqId, bar) -> None:
+        with self.lock:
+            chunk = self.job.reqId2chunk.get(reqId) if self.job else None
+            # chunks are asked for whole days past a day, drop the overlap
+            if (
+                chunk is not None
+                and chunk.start <= barDateToEpoch(bar.date) < chunk.end
+            ):
+                chunk.bars.append(bar)
+
+    def historicalDataEnd(self, reqId, start, end) -> None:
+        self.chunkDone(reqId)
+
+    def error(self, reqId, errorCode, errorString, advancedOrderRejectJson="") -> None:
+        if isWarning(errorCode):
+            return
+        with self.lock:
+            job = self.job
+            chunk = job.reqId2chunk.get(reqId) if job else None
+            if chunk is None or self.pacers[chunk.client].isQueued(reqId):
+                return
+            chunk.bars = []
+            if "no data" not in errorString.lower():
+                self.calls.append((
+                    job.wrapper.error,
+                    (job.jobId, errorCode, errorString),
+                ))
+        self.chunkDone(reqId)
@@ -0,0 +1,343 @@
+"""Copyright (C) 2024 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+"""
+Scheduling of historical data requests within IB's pacing rules.
+
+Breaking the rules gets error 162 ("pacing violation") and the request is
+lost. The pacer queues the reqHistoricalData, reqHistoricalTicks and
+reqHeadTimeStamp requests and sends each one as soon as doing so keeps
+within all the limits:
+ - no identical request within 15 seconds
+ - no more than 5 requests for the same contract, exchange and tick type
+   within 2 seconds
+ - no more than 60 requests within 10 minutes
+ - no more than maxInFlight requests waiting for their answer
+Requests failing with a pacing violation anyway are sent again, and the
+application's wrapper does not see the error of those: the pacer puts a
+filter in front of it.
+"""
+
+import collections
+import logging
+import threading
+import time
+
+from ibapi.errors import isWarning
+from ibapi.pacing import PumpTimer, SendWindow
+from ibapi.wrapper import EWrapper
+from ibapi.wrapper_chain import CALLBACKS
+
+logger = logging.getLogger(__name__)
+
+PACING_VIOLATION = 162
+
+PendingRequest = collections.namedtuple(
+    "PendingRequest", "reqId meth args sameKey contractKey notBefore retries"
+)
+
+
+class RetriedErrorFilter(EWrapper):
+    """In front of the application's wrapper, drops the pacing violations of
+    the requests the pacer queued again; passes everything on once pacer is
+    None."""
+
+    def __init__(self, pacer, wrapper) -> None:
+        EWrapper.__init__(self)
+        self.pacer = pacer
+        self.wrapper = wrapper
+        for name in CALLBACKS:
+            if name != "error":
+                setattr(self, name, getattr(wrapper, name))
+
+    def error(self, reqId, errorCode, errorString, advancedOrderRejectJson="") -> None:
+        # the pacer, a listener, saw the error first
+        pacer = self.pacer
+        if (
+            pacer is not None
+            and errorCode == PACING_VIOLATION
+            and pacer.isQueued(reqId)
+        ):
+            logger.debug("hiding the pacing violation of %d, retried", reqId)
+            return
+        self.wrapper.error(reqId, errorCode, errorString, advancedOrderRejectJson)
+
+
+class HistoricalPacer(EWrapper):
+    def __init__(
+        self,
+        client,
+        maxInFlight: int = 50,
+        identicalInterval: float = 15.0,
+        contractLimit: tuple = (5, 2.0),
+        globalLimit: tuple = (60, 600.0),
+        retryDelay: float = 15.0,
+        maxRetries: int = 3,
+        clock=time.monotonic,
+    ) -> None:
+        """client:EClient - The client the requests are sent with. The pacer
+            registers itself as one of its wrapper listeners, and puts a
+            RetriedErrorFilter in front of its application wrapper.
+        maxInFlight:int - Requests sent and not answered yet.
+        identicalInterval:float - Seconds between two identical requests.
+        contractLimit:tuple - (count, seconds) for one contract, exchange and
+            tick type.
+        globalLimit:tuple - (count, seconds) for all the requests.
+        retryDelay:float - Seconds to wait before sending a request again
+            after a pacing violation.
+        maxRetries:int - After which the error is left to the application.
+        clock - Returns the current time in seconds, for testing.
+        """
+        EWrapper.__init__(self)
+        self.client = client
+        self.maxInFlight = maxInFlight
+        self.identicalInterval = identicalInterval
+        self.contractLimit = contractLimit
+        self.globalLimit = globalLimit
+        self.retryDelay = retryDelay
+        self.maxRetries = maxRetries
+        self.clock = clock
+
+        self.lock = threading.Lock()
+        self.pending = []  # PendingRequest, in order of submission
+        self.inFlight = {}  # reqId -> PendingRequest
+        self.lastSent = {}  # sameKey -> time
+        self.contractSends = collections.defaultdict(
+            lambda: SendWindow(*self.contractLimit)
+        )
+        self.globalSends = SendWindow(*self.globalLimit)
+        self.timer = PumpTimer(self.lock, self.pump)
+
+        self.nSent = 0
+        self.nRetried = 0
+        client.addWrapperListener(self)
+        chain = client.wrapperChain()
+        self.errorFilter = RetriedErrorFilter(self, chain.wrapper)
+        chain.setWrapper(self.errorFilter)
+
+    def __str__(self) -> str:
+        return (
+            f"HistoricalPacer. Pending: {len(self.pending)}, "
+            f"InFlight: {len(self.inFlight)}, Sent: {self.nSent}, "
+            f"Retried: {self.nRetried}"
+        )
+
+    def close(self) -> None:
+        """Stops sending, forgets the queued requests and puts the
+        application's wrapper back."""
+        with self.lock:
+            self.pending.clear()
+            self.timer.cancel()
+        self.client.removeWrapperListener(self)
+        if not self.client.wrapperChain().restoreWrapper(
+            self.errorFilter, self.errorFilter.wrapper
+        ):
+            self.errorFilter.pacer = None
+
+    ##########################################################################
+    # requests, same parameters as the EClient ones
+
+    def reqHistoricalData(
+        self,
+        reqId,
+        contract,
+        endDateTime,
+        durationStr,
+        barSizeSetting,
+        whatToShow,
+        useRTH,
+        formatDate,
+        keepUpToDate,
+        chartOptions,
+    ) -> None:
+        self.submit(
+            reqId,
+            self.client.reqHistoricalData,
+            (
+                contract,
+                endDateTime,
+                durationStr,
+                barSizeSetting,
+                whatToShow,
+                useRTH,
+                formatDate,
+                keepUpToDate,
+                chartOptions,
+            ),
+            whatToShow,
+        )
+
+    def reqHistoricalTicks(
+        self,
+        reqId,
+        contract,
+        startDateTime,
+        endDateTime,
+        numberOfTicks,
+        whatToShow,
+        useRth,
+        ignoreSize,
+        miscOptions,
+    ) -> None:
+        self.submit(
+            reqId,
+            self.client.reqHistoricalTicks,
+            (
+                contract,
+                startDateTime,
+                endDateTime,
+                numberOfTicks,
+                whatToShow,
+                useRth,
+                ignoreSize,
+                miscOptions,
+            ),
+            whatToShow,
+        )
+
+    def reqHeadTimeStamp(self, reqId, contract, whatToShow, useRTH, formatDate) -> None:
+        self.submit(
+            reqId,
+            self.client.reqHeadTimeStamp,
+            (contract, whatToShow, useRTH, formatDate),
+            whatToShow,
+        )
+
+    def cancelHistoricalData(self, reqId) -> None:
+        if self.dequeue(reqId):
+            self.client.cancelHistoricalData(reqId)
+
+    def cancelHeadTimeStamp(self, reqId) -> None:
+        if self.dequeue(reqId):
+            self.client.cancelHeadTimeStamp(reqId)
+
+    ##########################################################################
+    # scheduling
+
+    def submit(self, reqId, meth, args, whatToShow) -> None:
+        contract = args[0]
+        contractKey = (
+            contract.conId,
+            contract.symbol,
+            contract.secType,
+            contract.lastTradeDateOrContractMonth,
+            contract.strike,
+            contract.right,
+            contract.exchange,
+            contract.currency,
+            whatToShow,
+        )
+        sameKey = (meth.__name__, str(contract), repr(args[1:]))
+        with self.lock:
+            self.pending.append(
+                PendingRequest(reqId, meth, args, sameKey, contractKey, 0.0, 0)
+            )
+        self.pump()
+
+    def isQueued(self, reqId) -> bool:
+        """True while the request waits to be sent, eg: for a retry."""
+        with self.lock:
+            return any(req.reqId == reqId for req in self.pending)
+
+    def dequeue(self, reqId) -> bool:
+        """Forgets the request, returns True if it was sent already."""
+        with self.lock:
+            self.pending = [req for req in self.pending if req.reqId != reqId]
+            sent = self.inFlight.pop(reqId, None) is not None
+        if sent:
+            self.pump()
+        return sent
+
+    def admissibleAt(self, req, now) -> float:
+        """The earliest time the request can be sent at, given what was sent
+        so far."""
+        at = req.notBefore
+        last = self.lastSent.get(req.sameKey)
+        if last is not None:
+            at = max(at, last + self.identicalInterval)
+        for sends in (self.contractSends[req.contractKey], self.globalSends):
+            at = max(at, sends.admissibleAt(now))
+        return at
+
+    def pump(self) -> None:
+        """Sends whatever the rules allow now, and arranges to be called
+        again when the next queued request becomes admissible."""
+        toSend = []
+        with self.lock:
+            now = self.clock()
+            nextDue = None
+            for req in list(self.pending):
+                if len(self.inFlight) >= self.maxInFlight:
+                    # an answer will pump again
+                    nextDue = None
+                    break
+                at = self.admissibleAt(req, now)
+                if at > now:
+                    nextDue = at if nextDue is None else min(nextDue, at)
+                    continue
+                self.pending.remove(req)
+                self.inFlight[req.reqId] = req
+                self.lastSent[req.sameKey] = now
+                self.contractSends[req.contractKey].append(now)
+                self.globalSends.append(now)
+                self.nSent += 1
+                toSend.append(req)
+            self.timer.schedule(nextDue, now)
+
+        for req in toSend:
+            req.meth(req.reqId, *req.args)
+
+    def done(self, reqId) -> None:
+        with self.lock:
+            req = self.inFlight.pop(reqId, None)
+        if req is not None:
+            self.pump()
+
+    ##########################################################################
+    # answers
+
+    def historicalDataEnd(self, reqId, start, end) -> None:
+        self.done(reqId)
+
+    def historicalSchedule(self, reqId, *args) -> None:
+        self.done(reqId)
+
+    def headTimestamp(self, reqId, headTimestamp) -> None:
+        self.done(reqId)
+
+    def historicalTicks(self, reqId, ticks, done) -> None:
+        if done:
+            self.done(reqId)
+
+    def historicalTicksBidAsk(self, reqId, ticks, done) -> None:
+        if done:
+            self.done(reqId)
+
+    def historicalTicksLast(self, reqId, ticks, done) -> None:
+        if done:
+            self.done(reqId)
+
+    def error(self, reqId, errorCode, errorString, advancedOrderRejectJson="") -> None:
+        if isWarning(errorCode):
+            # eg: 2174, the request goes on
+            return
+        with self.lock:
+            req = self.inFlight.pop(reqId, None)
+            if req is None:
+                return
+            if (
+                errorCode == PACING_VIOLATION
+                and "pacing violation" in errorString.lower()
+                and req.retries < self.maxRetries
+            ):
+                logger.info("pacing violation for %d, will retry", reqId)
+                self.nRetried += 1
+                self.pending.insert(
+                    0,
+                    req._replace(
+                        notBefore=self.clock() + self.retryDelay,
+                        retries=req.retries + 1,
+                    ),
+                )
+        self.pump()
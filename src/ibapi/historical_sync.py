@@ -0,0 +1,242 @@
+"""Copyright (C) 2024 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+"""
+Incremental sync of a bar store series.
+
+Only what the series does not hold yet is requested: the sync starts after
+the last stored bar (or at the head timestamp for an empty series), asks for
+the trading schedule of the remaining range (whatToShow=SCHEDULE) and then
+requests the trading sessions only, so nights, weekends and holidays cost
+nothing. The bars go straight into the series through EClient.setBarSink().
+
+A session answered with "no data" stops the sync, as the series cannot take
+its bars once later ones are in: the next sync() asks for it again, and only
+moves past it if it has no data a second time.
+"""
+
+import logging
+import threading
+
+from ibapi.errors import isWarning
+from ibapi.historical_downloader import durationStr, maxChunkSeconds
+from ibapi.historical_pacer import HistoricalPacer
+from ibapi.utils import barDateToEpoch, epochToDateTime, scheduleTimeToEpoch
+from ibapi.wrapper import EWrapper
+
+logger = logging.getLogger(__name__)
+
+unit2seconds = {
+    "sec": 1,
+    "secs": 1,
+    "min": 60,
+    "mins": 60,
+    "hour": 3600,
+    "hours": 3600,
+    "day": 86400,
+    "week": 7 * 86400,
+    "month": 31 * 86400,
+}
+
+
+def barSizeSeconds(barSize: str) -> int:
+    """eg: "5 mins" -> 300"""
+    count, unit = barSize.split()
+    return int(count) * unit2seconds[unit]
+
+
+"""
+HEAD_TIMESTAMP = waiting for the earliest available data
+SCHEDULE       = waiting for the trading sessions
+BARS           = waiting for the bars of a segment
+DONE           = finished or failed
+"""
+(HEAD_TIMESTAMP, SCHEDULE, BARS, DONE) = range(4)
+
+
+class HistoricalSync(EWrapper):
+    def __init__(
+        self,
+        client,
+        series,
+        contract,
+        barSize: str,
+        whatToShow: str,
+        useRTH: int,
+        pacer: HistoricalPacer = None,
+        reqIdBase: int = 1 << 25,
+    ) -> None:
+        """client:EClient - The client the requests are sent with.
+        series:BarSeries - The series to bring up to date.
+        contract:Contract, barSize:str, whatToShow:str, useRTH:int - As for
+            reqHistoricalData(), the series must hold bars of these.
+        pacer:HistoricalPacer - Used to send the requests, one is created
+            for the client if None.
+        reqIdBase:int - The reqIds used start from there.
+        """
+        EWrapper.__init__(self)
+        self.client = client
+        self.series = series
+        self.contract = contract
+        self.barSize = barSize
+        self.whatToShow = whatToShow
+        self.useRTH = useRTH
+        self.ownPacer = pacer is None
+        self.pacer = HistoricalPacer(client) if pacer is None else pacer
+        self.nextReqId = reqIdBase
+        self.lock = threading.Lock()
+        self.state = DONE
+        self.reqId = None
+        self.segments = []  # (start, end) still to request
+        self.segment = None  # (start, end) requested
+        self.gaps = {}  # start -> end, of the segments answered "no data" once
+        self.nRequested = 0
+        client.addWrapperListener(self)
+
+    def close(self) -> None:
+        self.client.removeWrapperListener(self)
+        if self.ownPacer:
+            self.pacer.close()
+
+    def sync(self, jobId, start: int, end: int, wrapper) -> None:
+        """Requests whatever part of [start, end) the series is missing;
+        returns right away.
+
+        jobId:int - The reqId the outcome is reported with.
+        start:int, end:int - The range, in seconds since the epoch.
+        wrapper:EWrapper - Gets historicalDataEnd(jobId, start, end) once the
+            series is up to date, or error(jobId, ...) if a request failed.
+        """
+        self.jobId = jobId
+        self.start = start
+        self.end = end
+        self.wrapper = wrapper
+        self.segments = []
+
+        times = self.series.columns()["time"]
+        if len(times) == 0:
+            self.state = HEAD_TIMESTAMP
+            self.pacer.reqHeadTimeStamp(
+                self.newReqId(), self.contract, self.whatToShow, self.useRTH, 2
+            )
+            return
+
+        if start < times[0]:
+            logger.warning(
+                "the series only grows forward, nothing before %d is requested",
+                times[0],
+            )
+        self.requestSchedule(max(start, times[-1] + barSizeSeconds(self.barSize)))
+
+    def newReqId(self) -> int:
+        with self.lock:
+            self.reqId = self.nextReqId
+            self.nextReqId += 1
+            return self.reqId
+
+    def requestSchedule(self, start) -> None:
+        self.start = start
+        if start >= self.end:
+            self.finish()
+            return
+        self.state = SCHEDULE
+        self.pacer.reqHistoricalData(
+            self.newReqId(),
+            self.contract,
+            epochToDateTime(self.end),
+            durationStr(self.end - start),
+            "1 day",
+            "SCHEDULE",
+            self.useRTH,
+            2,
+            False,
+            [],
+        )
+
+    def planSegments(self, timeZone, sessions) -> None:
+        """Turns the sessions falling in the range into requests, merging
+        consecutive sessions as long as they fit in one request."""
+        maxSpan = maxChunkSeconds[self.barSize]
+        for session in sessions:
+            start = max(
+                self.start, scheduleTimeToEpoch(session.startDateTime, timeZone)
+            )
+            end = min(self.end, scheduleTimeToEpoch(session.endDateTime, timeZone))
+            if start >= end:
+                continue
+            if self.segments and end - self.segments[-1][0] <= maxSpan:
+                self.segments[-1] = (self.segments[-1][0], end)
+            else:
+                self.segments.append((start, end))
+
+    def requestNextSegment(self) -> None:
+        if not self.segments:
+            self.finish()
+            return
+        self.state = BARS
+        start, end = self.segment = self.segments.pop(0)
+        reqId = self.newReqId()
+        self.client.setBarSink(reqId, self.series)
+        self.nRequested += 1
+        self.pacer.reqHistoricalData(
+            reqId,
+            self.contract,
+            epochToDateTime(end),
+            durationStr(end - start),
+            self.barSize,
+            self.whatToShow,
+            self.useRTH,
+            2,
+            False,
+            [],
+        )
+
+    def finish(self) -> None:
+        self.state = DONE
+        self.wrapper.historicalDataEnd(
+            self.jobId, epochToDateTime(self.start), epochToDateTime(self.end)
+        )
+
+    ##########################################################################
+    # answers
+
+    def headTimestamp(self, reqId, headTimestamp) -> None:
+        if reqId != self.reqId or self.state != HEAD_TIMESTAMP:
+            return
+        self.requestSchedule(max(self.start, barDateToEpoch(headTimestamp)))
+
+    def historicalSchedule(
+        self, reqId, startDateTime, endDateTime, timeZone, sessions
+    ) -> None:
+        if reqId != self.reqId or self.state != SCHEDULE:
+            return
+        self.planSegments(timeZone, sessions)
+        self.requestNextSegment()
+
+    def historicalDataEnd(self, reqId, start, end) -> None:
+        if reqId != self.reqId or self.state != BARS:
+            return
+        self.client.removeBarSink(reqId)
+        self.requestNextSegment()
+
+    def error(self, reqId, errorCode, errorString, advancedOrderRejectJson="") -> None:
+        if (
+            reqId != self.reqId
+            or self.state == DONE
+            or isWarning(errorCode)
+            or self.pacer.isQueued(reqId)
+        ):
+            return
+        self.client.removeBarSink(reqId)
+        if self.state == BARS and "no data" in errorString.lower():
+            start, end = self.segment
+            if self.gaps.pop(start, None) is not None:
+                # no data the second time either, nothing to wait for
+                self.requestNextSegment()
+                return
+            self.gaps[start] = end
+            logger.info("no data from %d to %d, stopping there", start, end)
+        # later bars could not be appended before the missing ones, stop
+        self.state = DONE
+        self.wrapper.error(self.jobId, errorCode, errorString)
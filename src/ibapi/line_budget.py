@@ -0,0 +1,328 @@
+"""Copyright (C) 2024 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+"""
+Rotation of a watchlist larger than the account's market data lines.
+
+An account can only stream as many reqMktData subscriptions at once as it
+has market data lines (100 by default). A LineBudget keeps the priority
+symbols subscribed all the time and rotates the others through the lines
+left: each rotating subscription stays up for the dwell time, then makes
+room for the symbol that went the longest without one. With n rotating
+symbols over L lines the whole watchlist is seen once every
+ceil(n / L) * dwell seconds, see cycleTime(), unless the message rate set
+aside for the rotation is the tighter limit.
+
+Each symbol has its own reqId for as long as it is watched, the ticks come
+to the application's wrapper as usual; symbolOf() maps them back.
+"""
+
+import collections
+import logging
+import math
+import threading
+import time
+
+from ibapi.pacing import PumpTimer, SendWindow
+from ibapi.wrapper import EWrapper
+
+logger = logging.getLogger(__name__)
+
+MAX_TICKERS_REACHED = 101
+
+
+class Watched:
+    def __init__(self, symbol, reqId, contract, genericTickList, priority) -> None:
+        self.symbol = symbol
+        self.reqId = reqId
+        self.contract = contract
+        self.genericTickList = genericTickList
+        self.priority = priority
+        self.subscribedAt = None  # None while it has no line
+        self.lastServed = None  # when its last subscription started
+        self.lastUpdate = None  # when its last tick came
+
+
+class LineBudget(EWrapper):
+    def __init__(
+        self,
+        client,
+        maxLines: int = 100,
+        dwell: float = 10.0,
+        msgRate: float = 10.0,
+        reqIdBase: int = 1 << 27,
+        clock=time.monotonic,
+    ) -> None:
+        """client:EClient - The client the requests are sent with. The
+            manager registers itself as one of its wrapper listeners.
+        maxLines:int - The market data lines the manager may use.
+        dwell:float - Seconds a rotating symbol keeps its line.
+        msgRate:float - Messages per second the rotation may send, a swap
+            is two (cancelMktData and reqMktData); keep it well under the
+            client's RateGovernor rate to leave room for the rest. At least
+            2, ValueError otherwise.
+        reqIdBase:int - The reqIds of the symbols start from there, keep
+            them apart from the application's.
+        clock - Returns the current time in seconds, for testing.
+        """
+        if msgRate < 2:
+            raise ValueError("msgRate %s does not allow a swap" % msgRate)
+        EWrapper.__init__(self)
+        self.client = client
+        self.maxLines = maxLines
+        self.dwell = dwell
+        self.msgRate = msgRate
+        self.nextReqId = reqIdBase
+        self.clock = clock
+
+        self.lock = threading.Lock()
+        self.symbols = {}  # symbol -> Watched
+        self.reqId2symbol = {}
+        self.active = {}  # symbol -> Watched, the ones with a line
+        # rotating symbols waiting for a line, least recently served first
+        self.waiting = collections.OrderedDict()
+        self.sends = SendWindow(int(msgRate))
+        self.timer = PumpTimer(self.lock, self.pump)
+
+        self.nSwaps = 0
+        client.addWrapperListener(self)
+
+    def __str__(self) -> str:
+        return (
+            f"LineBudget. Symbols: {len(self.symbols)}, Active: {len(self.active)}, "
+            f"Waiting: {len(self.waiting)}, Swaps: {self.nSwaps}, "
+            f"CycleTime: {self.cycleTime():.1f}"
+        )
+
+    def close(self) -> None:
+        """Cancels all the subscriptions and stops rotating."""
+        with self.lock:
+            self.timer.cancel()
+            active = list(self.active.values())
+            self.active.clear()
+            self.waiting.clear()
+            for watched in active:
+                watched.subscribedAt = None
+        for watched in active:
+            self.client.cancelMktData(watched.reqId)
+        self.client.removeWrapperListener(self)
+
+    ##########################################################################
+    # watchlist
+
+    def watch(
+        self, symbol, contract, priority: bool = False, genericTickList: str = ""
+    ) -> int:
+        """Adds symbol to the watchlist, priority ones are never rotated out.
+        Returns the reqId its ticks come with."""
+        with self.lock:
+            if symbol in self.symbols:
+                raise ValueError("%s is already watched" % symbol)
+            nPriority = sum(1 for watched in self.symbols.values() if watched.priority)
+            if priority and nPriority >= self.maxLines:
+                raise ValueError("more priority symbols than lines")
+            watched = Watched(
+                symbol, self.nextReqId, contract, genericTickList, priority
+            )
+            self.nextReqId += 1
+            self.symbols[symbol] = watched
+            self.reqId2symbol[watched.reqId] = symbol
+            if not priority:
+                self.waiting[symbol] = watched
+        self.pump()
+        return watched.reqId
+
+    def unwatch(self, symbol) -> None:
+        with self.lock:
+            watched = self.symbols.pop(symbol, None)
+            if watched is None:
+                return
+            del self.reqId2symbol[watched.reqId]
+            self.waiting.pop(symbol, None)
+            wasActive = self.active.pop(symbol, None) is not None
+        if wasActive:
+            self.client.cancelMktData(watched.reqId)
+            self.pump()
+
+    def symbolOf(self, reqId):
+        return self.reqId2symbol.get(reqId)
+
+    def isActive(self, symbol) -> bool:
+        return symbol in self.active
+
+    def age(self, symbol):
+        """Seconds since the last tick of symbol, None if none came yet."""
+        watched = self.symbols[symbol]
+        if watched.lastUpdate is None:
+            return None
+        return self.clock() - watched.lastUpdate
+
+    def stale(self, maxAge: float) -> list:
+        """The symbols without a tick for more than maxAge seconds, stalest
+        first, the ones never updated at the front."""
+        now = self.clock()
+        watched = sorted(
+            self.symbols.values(),
+            key=lambda watched: (
+                -math.inf if watched.lastUpdate is None else watched.lastUpdate
+            ),
+        )
+        return [
+            w.symbol
+            for w in watched
+            if w.lastUpdate is None or now - w.lastUpdate > maxAge
+        ]
+
+    def cycleTime(self) -> float:
+        """Seconds for every rotating symbol to get a line once, 0 when
+        they all fit."""
+        nPriority = sum(1 for watched in self.symbols.values() if watched.priority)
+        nRotating = len(self.symbols) - nPriority
+        lines = self.maxLines - nPriority
+        if nRotating <= lines:
+            return 0.0
+        if lines <= 0:
+            return math.inf
+        return max(
+            math.ceil(nRotating / lines) * self.dwell, 2 * nRotating / self.msgRate
+        )
+
+    ##########################################################################
+    # rotation
+
+    def pump(self) -> None:
+        """Subscribes and swaps whatever is due and the message rate allows
+        now, and arranges to be called again for the next swap."""
+        cancels = []
+        subscribes = []
+        with self.lock:
+            now = self.clock()
+            budget = self.sends.budget(now)
+
+            # priority symbols first, making room if need be
+            blocked = 0  # the messages waited for
+            for watched in self.symbols.values():
+                if not watched.priority or watched.symbol in self.active:
+                    continue
+                needed = 1 if len(self.active) < self.maxLines else 2
+                rotating = self.oldestRotating()
+                if needed == 2 and rotating is None:
+                    break
+                if budget < needed:
+                    blocked = needed
+                    break
+                if needed == 2:
+                    cancels.append(self.release(rotating, now))
+                subscribes.append(self.take(watched, now))
+                budget -= needed
+
+            # free lines
+            while self.waiting and len(self.active) < self.maxLines:
+                if budget < 1:
+                    blocked = 1
+                    break
+                subscribes.append(self.take(next(iter(self.waiting.values())), now))
+                budget -= 1
+
+            # expired lines, only if some symbol waits for them
+            due = None
+            for watched in sorted(
+                (w for w in self.active.values() if not w.priority),
+                key=lambda w: w.subscribedAt,
+            ):
+                if not self.waiting:
+                    break
+                expiry = watched.subscribedAt + self.dwell
+                if expiry > now:
+                    due = expiry
+                    break
+                if budget < 2:
+                    blocked = 2
+                    break
+                cancels.append(self.release(watched, now))
+                subscribes.append(self.take(next(iter(self.waiting.values())), now))
+                budget -= 2
+                self.nSwaps += 1
+            if blocked:
+                due = self.sends.admissibleAt(now, blocked)
+            self.timer.schedule(due, now)
+
+        for watched in cancels:
+            self.client.cancelMktData(watched.reqId)
+        for watched in subscribes:
+            self.client.reqMktData(
+                watched.reqId,
+                watched.contract,
+                watched.genericTickList,
+                False,
+                False,
+                [],
+            )
+
+    # the following are called with self.lock held
+
+    def oldestRotating(self):
+        return min(
+            (w for w in self.active.values() if not w.priority),
+            key=lambda w: w.subscribedAt,
+            default=None,
+        )
+
+    def take(self, watched, now):
+        self.waiting.pop(watched.symbol, None)
+        self.active[watched.symbol] = watched
+        watched.subscribedAt = now
+        watched.lastServed = now
+        self.sends.append(now)
+        return watched
+
+    def release(self, watched, now):
+        del self.active[watched.symbol]
+        watched.subscribedAt = None
+        if not watched.priority:
+            # to the back of the queue, it was just served
+            self.waiting[watched.symbol] = watched
+        self.sends.append(now)
+        return watched
+
+    ##########################################################################
+    # answers
+
+    def updated(self, reqId) -> None:
+        symbol = self.reqId2symbol.get(reqId)
+        if symbol is not None:
+            self.symbols[symbol].lastUpdate = self.clock()
+
+    def tickPrice(self, reqId, tickType, price, attrib) -> None:
+        self.updated(reqId)
+
+    def tickSize(self, reqId, tickType, size) -> None:
+        self.updated(reqId)
+
+    def tickGeneric(self, reqId, tickType, value) -> None:
+        self.updated(reqId)
+
+    def tickString(self, reqId, tickType, value) -> None:
+        self.updated(reqId)
+
+    def error(self, reqId, errorCode, errorString, advancedOrderRejectJson="") -> None:
+        if errorCode != MAX_TICKERS_REACHED:
+            return
+        with self.lock:
+            symbol = self.reqId2symbol.get(reqId)
+            watched = self.active.pop(symbol, None)
+            if watched is None:
+                return
+            # the account has fewer lines than we thought
+            logger.warning(
+                "max number of tickers reached, lines: %d -> %d",
+                self.maxLines,
+                len(self.active),
+            )
+            self.maxLines = max(1, len(self.active))
+            watched.subscribedAt = None
+            if not watched.priority:
+                self.waiting[symbol] = watched
+                self.waiting.move_to_end(symbol, last=False)
+        self.pump()
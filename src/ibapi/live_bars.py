@@ -0,0 +1,113 @@
+"""Copyright (C) 2024 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+"""
+In memory bar series kept up to date by keepUpToDate requests.
+
+reqHistoricalData(..., keepUpToDate=True) sends the forming bar again on each
+update. A LiveBarSeries set as the bar sink of the request (see
+EClient.setBarSink()) gets the initial bars and then every update; an update
+of the last bar overwrites its row in place and a bar with a later time is
+appended, so listeners are told which of the two happened and consumers can
+read the columns without copying them.
+"""
+
+import array
+import logging
+import math
+import threading
+
+from ibapi.bar_store import COLUMNS
+from ibapi.const import UNSET_DECIMAL
+from ibapi.utils import barDateToEpoch
+
+logger = logging.getLogger(__name__)
+
+
+class LiveBarSeries:
+    def __init__(self, capacity: int = 1024) -> None:
+        """capacity:int - Rows preallocated, doubled whenever full."""
+        self.capacity = capacity
+        self.rows = 0
+        self.lock = threading.Lock()
+        self.listeners = []
+        self.arrays = {
+            name: array.array(typecode, bytes(capacity * 8))
+            for name, typecode in COLUMNS
+        }
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def addListener(self, listener) -> None:
+        """listener(series, row, isNew) is called after each change, isNew
+        tells an appended bar from an update of the last one."""
+        self.listeners.append(listener)
+
+    def removeListener(self, listener) -> None:
+        self.listeners.remove(listener)
+
+    def grow(self) -> None:
+        # new arrays rather than resizing: views handed out keep the old ones
+        self.capacity *= 2
+        for name, typecode in COLUMNS:
+            old = self.arrays[name]
+            new = array.array(typecode, bytes(self.capacity * 8))
+            memoryview(new)[: self.rows] = memoryview(old)[: self.rows]
+            self.arrays[name] = new
+
+    def appendBar(self, time, open_, high, low, close, volume, wap, barCount) -> bool:
+        """Appends a bar, or updates the last one in place if it has the same
+        time. A bar older than the last one is ignored and False returned."""
+        with self.lock:
+            rows = self.rows
+            row = rows
+            if rows:
+                last = self.arrays["time"][rows - 1]
+                if time < last:
+                    return False
+                if time == last:
+                    row = rows - 1
+            if row == self.capacity:
+                self.grow()
+            arrays = self.arrays
+            arrays["time"][row] = time
+            arrays["open"][row] = open_
+            arrays["high"][row] = high
+            arrays["low"][row] = low
+            arrays["close"][row] = close
+            arrays["volume"][row] = volume
+            arrays["wap"][row] = wap
+            arrays["barCount"][row] = barCount
+            isNew = row == rows
+            if isNew:
+                self.rows = rows + 1
+
+        for listener in self.listeners:
+            listener(self, row, isNew)
+        return True
+
+    def append(self, bar) -> bool:
+        """Same as appendBar() for a BarData, eg: from historicalDataUpdate()."""
+        return self.appendBar(
+            barDateToEpoch(bar.date),
+            bar.open,
+            bar.high,
+            bar.low,
+            bar.close,
+            math.nan if bar.volume == UNSET_DECIMAL else float(bar.volume),
+            math.nan if bar.wap == UNSET_DECIMAL else float(bar.wap),
+            bar.barCount,
+        )
+
+    def columns(self, lo: int = 0, hi: int = None) -> dict:
+        """Returns name -> memoryview of rows lo to hi, without copying. The
+        views see later updates of those rows, until the series grows."""
+        hi = self.rows if hi is None else min(hi, self.rows)
+        return {name: memoryview(self.arrays[name])[lo:hi] for name, _ in COLUMNS}
+
+    def last(self) -> dict:
+        """Returns name -> value of the last (possibly forming) bar."""
+        row = self.rows - 1
+        return {name: self.arrays[name][row] for name, _ in COLUMNS} if row >= 0 else {}
@@ -0,0 +1,231 @@
+"""Copyright (C) 2024 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+"""
+Market data bus over shared memory, for strategies running in other processes.
+
+A MarketDataPublisher listens to the tick, quote and depth callbacks of one
+client and writes each update once, as a fixed size record, into a ring
+buffer in a multiprocessing.shared_memory block. Any number of
+MarketDataReaders, in any process, attach to the block by its name and read
+the records at their own pace; nothing is serialized per reader.
+
+There is one writer (the thread of the client's EReader) and no lock. Each
+record starts with a sequence number the writer sets to an odd value before
+writing the record and to the next even value after, so a reader that sees
+the number change while reading, or sees a later one than expected, knows
+the writer lapped it: the records are lost and counted as an overrun.
+"""
+
+import logging
+import math
+import struct
+import sys
+from multiprocessing import resource_tracker, shared_memory
+
+from ibapi.const import UNSET_DECIMAL
+from ibapi.wrapper import EWrapper
+
+logger = logging.getLogger(__name__)
+
+"""
+TICK_PRICE = tickPrice: field = tick type, price
+TICK_SIZE  = tickSize: field = tick type, size
+TRADE      = tickByTickAllLast: time, price, size
+QUOTE      = tickByTickBidAsk: time, price = bid, size = bid size,
+             price2 = ask, size2 = ask size
+DEPTH      = updateMktDepth(L2): field = side, position, operation, price, size
+"""
+(TICK_PRICE, TICK_SIZE, TRADE, QUOTE, DEPTH) = range(5)
+
+# a record is the sequence number then the payload:
+# kind, reqId, field, position, operation, time, price, size, price2, size2
+SEQ = struct.Struct("<Q")
+PAYLOAD = struct.Struct("<iiiiiqdddd")
+RECORD_SIZE = 80  # SEQ.size + PAYLOAD.size, rounded up to a multiple of 16
+# capacity, number of records written
+HEADER = struct.Struct("<QQ")
+HEADER_SIZE = 64
+
+
+def attach(name: str) -> shared_memory.SharedMemory:
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name, track=False)
+    shm = shared_memory.SharedMemory(name)
+    # only the publisher owns the block, do not have it unlinked at our exit
+    resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+def toFloat(size) -> float:
+    return math.nan if size == UNSET_DECIMAL else float(size)
+
+
+class MarketDataPublisher(EWrapper):
+    def __init__(self, client, name: str = None, capacity: int = 1 << 16) -> None:
+        """client:EClient - The client the updates come from.
+        name:str - The name of the shared memory block, a unique one is
+            generated if None; readers attach with self.name.
+        capacity:int - Records in the ring, readers lagging more than that
+            behind lose records.
+        """
+        EWrapper.__init__(self)
+        self.client = client
+        self.capacity = capacity
+        self.shm = shared_memory.SharedMemory(
+            name, create=True, size=HEADER_SIZE + capacity * RECORD_SIZE
+        )
+        self.name = self.shm.name
+        self.buf = self.shm.buf
+        self.nWritten = 0
+        HEADER.pack_into(self.buf, 0, capacity, 0)
+        client.addWrapperListener(self)
+
+    def close(self) -> None:
+        """Stops publishing and removes the block, readers should be closed
+        first."""
+        self.client.removeWrapperListener(self)
+        self.buf = None
+        self.shm.close()
+        self.shm.unlink()
+
+    def publish(
+        self,
+        kind,
+        reqId,
+        field=0,
+        position=0,
+        operation=0,
+        time=0,
+        price=0.0,
+        size=0.0,
+        price2=0.0,
+        size2=0.0,
+    ) -> None:
+        buf = self.buf
+        if buf is None:
+            return
+        n = self.nWritten
+        offset = HEADER_SIZE + (n % self.capacity) * RECORD_SIZE
+        # odd while writing, readers do not use the record
+        SEQ.pack_into(buf, offset, 2 * n + 1)
+        PAYLOAD.pack_into(
+            buf,
+            offset + SEQ.size,
+            kind,
+            reqId,
+            field,
+            position,
+            operation,
+            time,
+            price,
+            size,
+            price2,
+            size2,
+        )
+        SEQ.pack_into(buf, offset, 2 * n + 2)
+        self.nWritten = n + 1
+        SEQ.pack_into(buf, 8, n + 1)
+
+    ##########################################################################
+    # updates
+
+    def tickPrice(self, reqId, tickType, price, attrib) -> None:
+        self.publish(TICK_PRICE, reqId, tickType, price=price)
+
+    def tickSize(self, reqId, tickType, size) -> None:
+        self.publish(TICK_SIZE, reqId, tickType, size=toFloat(size))
+
+    def tickByTickAllLast(
+        self,
+        reqId,
+        tickType,
+        time,
+        price,
+        size,
+        tickAttribLast,
+        exchange,
+        specialConditions,
+    ) -> None:
+        self.publish(TRADE, reqId, tickType, time=time, price=price, size=toFloat(size))
+
+    def tickByTickBidAsk(
+        self, reqId, time, bidPrice, askPrice, bidSize, askSize, tickAttribBidAsk
+    ) -> None:
+        self.publish(
+            QUOTE,
+            reqId,
+            time=time,
+            price=bidPrice,
+            size=toFloat(bidSize),
+            price2=askPrice,
+            size2=toFloat(askSize),
+        )
+
+    def updateMktDepth(self, reqId, position, operation, side, price, size) -> None:
+        self.publish(
+            DEPTH, reqId, side, position, operation, price=price, size=toFloat(size)
+        )
+
+    def updateMktDepthL2(
+        self,
+        reqId,
+        position,
+        marketMaker,
+        operation,
+        side,
+        price,
+        size,
+        isSmartDepth,
+    ) -> None:
+        self.publish(
+            DEPTH, reqId, side, position, operation, price=price, size=toFloat(size)
+        )
+
+
+class MarketDataReader:
+    def __init__(self, name: str, fromStart: bool = False) -> None:
+        """name:str - The name of the publisher's block.
+        fromStart:bool - Read the records still in the ring, not only the
+            ones written from now on.
+        """
+        self.shm = attach(name)
+        self.buf = self.shm.buf
+        self.capacity, nWritten = HEADER.unpack_from(self.buf, 0)
+        self.next = max(0, nWritten - self.capacity) if fromStart else nWritten
+        self.nLost = 0  # records overwritten before they were read
+        self.nOverruns = 0
+
+    def close(self) -> None:
+        self.buf = None
+        self.shm.close()
+
+    def poll(self, maxRecords: int = 1024) -> list:
+        """Returns the records written since the last call, oldest first, as
+        (kind, reqId, field, position, operation, time, price, size, price2,
+        size2) tuples; at most maxRecords of them."""
+        buf = self.buf
+        nWritten = SEQ.unpack_from(buf, 8)[0]
+        if nWritten - self.next > self.capacity:
+            self.overrun(nWritten - self.capacity)
+        records = []
+        while self.next < nWritten and len(records) < maxRecords:
+            n = self.next
+            offset = HEADER_SIZE + (n % self.capacity) * RECORD_SIZE
+            seq = SEQ.unpack_from(buf, offset)[0]
+            record = PAYLOAD.unpack_from(buf, offset + SEQ.size)
+            if seq != 2 * n + 2 or SEQ.unpack_from(buf, offset)[0] != seq:
+                # lapped, go on from the oldest record the writer left
+                nWritten = SEQ.unpack_from(buf, 8)[0]
+                self.overrun(max(n + 1, nWritten - self.capacity + 1))
+                continue
+            records.append(record)
+            self.next = n + 1
+        return records
+
+    def overrun(self, to) -> None:
+        logger.warning("market data reader lost %d records", to - self.next)
+        self.nLost += to - self.next
+        self.nOverruns += 1
+        self.next = to
@@ -0,0 +1,151 @@
+"""Copyright (C) 2024 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+"""
+Top of book table of all the market data subscriptions.
+
+A MarketDataTable set on the client (see EClient.setMarketDataTable()) is
+filled by the Decoder as tick prices, sizes, generic and string ticks come
+in, on top of the usual EWrapper calls. It has one row per reqId and one
+column per tick type of COLUMNS, in a single row-major array of doubles, so
+the whole universe is read at once: view() is a (rows, columns) memoryview
+over it (numpy.frombuffer(table.values).reshape(-1, len(COLUMNS)) gives the
+same as an array). Each row also carries the sequence number of its last
+update, to pick what changed since a previous read.
+"""
+
+import array
+import logging
+import math
+import threading
+
+from ibapi.ticktype import TickTypeEnum
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = (
+    TickTypeEnum.BID,
+    TickTypeEnum.ASK,
+    TickTypeEnum.LAST,
+    TickTypeEnum.BID_SIZE,
+    TickTypeEnum.ASK_SIZE,
+    TickTypeEnum.LAST_SIZE,
+    TickTypeEnum.VOLUME,
+    TickTypeEnum.HIGH,
+    TickTypeEnum.LOW,
+    TickTypeEnum.CLOSE,
+    TickTypeEnum.OPEN,
+    TickTypeEnum.LAST_TIMESTAMP,  # seconds since the epoch
+    TickTypeEnum.HALTED,
+    TickTypeEnum.SHORTABLE,
+    TickTypeEnum.DELAYED_BID,
+    TickTypeEnum.DELAYED_ASK,
+    TickTypeEnum.DELAYED_LAST,
+    TickTypeEnum.DELAYED_BID_SIZE,
+    TickTypeEnum.DELAYED_ASK_SIZE,
+    TickTypeEnum.DELAYED_LAST_SIZE,
+    TickTypeEnum.DELAYED_VOLUME,
+    TickTypeEnum.DELAYED_HIGH,
+    TickTypeEnum.DELAYED_LOW,
+    TickTypeEnum.DELAYED_CLOSE,
+    TickTypeEnum.DELAYED_OPEN,
+    TickTypeEnum.DELAYED_LAST_TIMESTAMP,
+    TickTypeEnum.DELAYED_HALTED,
+)
+
+# tick type -> column, -1 for the tick types not kept
+tickType2column = [-1] * (TickTypeEnum.NOT_SET + 1)
+for column, tickType in enumerate(COLUMNS):
+    tickType2column[tickType] = column
+
+
+class MarketDataTable:
+    def __init__(self, capacity: int = 1024) -> None:
+        """capacity:int - Rows preallocated, doubled whenever full."""
+        self.capacity = capacity
+        self.nColumns = len(COLUMNS)
+        self.lock = threading.Lock()
+        self.reqId2row = {}
+        self.row2reqId = []
+        self.freeRows = []
+        self.seq = 0
+        self.values = array.array("d", [math.nan]) * (capacity * self.nColumns)
+        self.seqs = array.array("q", bytes(capacity * 8))
+
+    def __len__(self) -> int:
+        return len(self.row2reqId)
+
+    def addRequest(self, reqId) -> int:
+        """Gives reqId a row, all NaN until its ticks come; returns the row."""
+        with self.lock:
+            row = self.reqId2row.get(reqId)
+            if row is not None:
+                return row
+            if self.freeRows:
+                row = self.freeRows.pop()
+                self.row2reqId[row] = reqId
+            else:
+                row = len(self.row2reqId)
+                if row == self.capacity:
+                    # new arrays rather than resizing: views handed out keep the old ones
+                    self.values = self.values + array.array("d", [math.nan]) * (
+                        self.capacity * self.nColumns
+                    )
+                    self.seqs = self.seqs + array.array("q", bytes(self.capacity * 8))
+                    self.capacity *= 2
+                self.row2reqId.append(reqId)
+            self.reqId2row[reqId] = row
+            return row
+
+    def removeRequest(self, reqId) -> None:
+        """Frees the row of reqId, eg: after cancelMktData()."""
+        with self.lock:
+            row = self.reqId2row.pop(reqId, None)
+            if row is None:
+                return
+            self.row2reqId[row] = None
+            base = row * self.nColumns
+            for i in range(base, base + self.nColumns):
+                self.values[i] = math.nan
+            self.seqs[row] = 0
+            self.freeRows.append(row)
+
+    def update(self, reqId, tickType, value: float) -> None:
+        """Called by the Decoder, ignores the reqIds not added and the tick
+        types not in COLUMNS."""
+        row = self.reqId2row.get(reqId)
+        if row is None or tickType >= len(tickType2column):
+            return
+        column = tickType2column[tickType]
+        if column < 0:
+            return
+        with self.lock:
+            self.seq += 1
+            self.values[row * self.nColumns + column] = value
+            self.seqs[row] = self.seq
+
+    def view(self):
+        """Returns a (rows, len(COLUMNS)) memoryview over the values, rows
+        as given by row2reqId (None for free rows)."""
+        rows = len(self.row2reqId)
+        return (
+            memoryview(self.values)[: rows * self.nColumns]
+            .cast("B")
+            .cast("d", (rows, self.nColumns))
+        )
+
+    def get(self, reqId, tickType) -> float:
+        """One value, NaN if not received yet."""
+        return self.values[
+            self.reqId2row[reqId] * self.nColumns + tickType2column[tickType]
+        ]
+
+    def changedSince(self, seq: int) -> list:
+        """Returns the reqIds updated after the sequence number seq, eg: the
+        seq attribute at the time of a previous read."""
+        return [
+            self.row2reqId[row]
+            for row in range(len(self.row2reqId))
+            if self.seqs[row] > seq
+        ]
@@ -182,3 +182,66 @@ class OUT:
     REQ_WSH_EVENT_DATA = 102
     CANCEL_WSH_EVENT_DATA = 103
     REQ_USER_INFO = 104
+
+
+# incoming msg id -> index of its request or order id field, from server
+# version MIN_SERVER_VER_SIZE_RULES on; the other messages have no id
+inIdIndex = {
+    IN.TICK_PRICE: 2,
+    IN.TICK_SIZE: 2,
+    IN.ORDER_STATUS: 1,
+    IN.ERR_MSG: 2,
+    IN.OPEN_ORDER: 1,
+    IN.CONTRACT_DATA: 1,
+    IN.EXECUTION_DATA: 1,  # the order id follows
+    IN.MARKET_DEPTH: 2,
+    IN.MARKET_DEPTH_L2: 2,
+    IN.HISTORICAL_DATA: 1,
+    IN.BOND_CONTRACT_DATA: 1,
+    IN.SCANNER_DATA: 2,
+    IN.TICK_OPTION_COMPUTATION: 1,
+    IN.TICK_GENERIC: 2,
+    IN.TICK_STRING: 2,
+    IN.TICK_EFP: 2,
+    IN.REAL_TIME_BARS: 2,
+    IN.FUNDAMENTAL_DATA: 2,
+    IN.CONTRACT_DATA_END: 2,
+    IN.EXECUTION_DATA_END: 2,
+    IN.DELTA_NEUTRAL_VALIDATION: 2,
+    IN.TICK_SNAPSHOT_END: 2,
+    IN.MARKET_DATA_TYPE: 2,
+    IN.ACCOUNT_SUMMARY: 2,
+    IN.ACCOUNT_SUMMARY_END: 2,
+    IN.DISPLAY_GROUP_LIST: 2,
+    IN.DISPLAY_GROUP_UPDATED: 2,
+    IN.POSITION_MULTI: 2,
+    IN.POSITION_MULTI_END: 2,
+    IN.ACCOUNT_UPDATE_MULTI: 2,
+    IN.ACCOUNT_UPDATE_MULTI_END: 2,
+    IN.SECURITY_DEFINITION_OPTION_PARAMETER: 1,
+    IN.SECURITY_DEFINITION_OPTION_PARAMETER_END: 1,
+    IN.SOFT_DOLLAR_TIERS: 1,
+    IN.SYMBOL_SAMPLES: 1,
+    IN.TICK_REQ_PARAMS: 1,
+    IN.SMART_COMPONENTS: 1,
+    IN.NEWS_ARTICLE: 1,
+    IN.TICK_NEWS: 1,
+    IN.HISTORICAL_NEWS: 1,
+    IN.HISTORICAL_NEWS_END: 1,
+    IN.HEAD_TIMESTAMP: 1,
+    IN.HISTOGRAM_DATA: 1,
+    IN.HISTORICAL_DATA_UPDATE: 1,
+    IN.REROUTE_MKT_DATA_REQ: 1,
+    IN.REROUTE_MKT_DEPTH_REQ: 1,
+    IN.PNL: 1,
+    IN.PNL_SINGLE: 1,
+    IN.HISTORICAL_TICKS: 1,
+    IN.HISTORICAL_TICKS_BID_ASK: 1,
+    IN.HISTORICAL_TICKS_LAST: 1,
+    IN.TICK_BY_TICK: 1,
+    IN.REPLACE_FA_END: 1,
+    IN.WSH_META_DATA: 1,
+    IN.WSH_EVENT_DATA: 1,
+    IN.HISTORICAL_SCHEDULE: 1,
+    IN.USER_INFO: 1,
+}
@@ -0,0 +1,206 @@
+"""Copyright (C) 2024 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+"""
+Order books kept from the market depth updates.
+
+updateMktDepth() and updateMktDepthL2() insert, update or delete the row at a
+position of one side of the book. An OrderBook holds each side as fixed size
+price and size arrays, so an insert or a delete is one move of the rows below
+it, done by the array slice assignment, and a snapshot is a copy of the
+filled rows. The OrderBooks listener keeps one book per reqMktDepth() request.
+
+After error 317 (market depth data reset) TWS sends the book again from
+scratch, so the book of that reqId is cleared.
+
+With smart depth (isSmartDepth=True) the rows come from several exchanges and
+the same price can appear on several rows; aggregated() merges those by price.
+"""
+
+import array
+import logging
+import threading
+
+from ibapi.wrapper import EWrapper
+
+logger = logging.getLogger(__name__)
+
+MARKET_DEPTH_RESET = 317
+
+"""
+INSERT = add a row at the position, the rows below move down
+UPDATE = replace the row at the position
+DELETE = remove the row at the position, the rows below move up
+"""
+(INSERT, UPDATE, DELETE) = range(3)
+
+"""
+ASK = the side the depth messages send as 0
+BID = the side the depth messages send as 1
+"""
+(ASK, BID) = range(2)
+
+
+class BookSide:
+    def __init__(self, depth: int) -> None:
+        self.depth = depth
+        self.rows = 0
+        self.prices = array.array("d", bytes(depth * 8))
+        self.sizes = array.array("d", bytes(depth * 8))
+        self.marketMakers = [""] * depth
+
+    def apply(self, position, operation, price, size, marketMaker="") -> bool:
+        """Returns False if the operation does not fit the rows held."""
+        rows = self.rows
+        depth = self.depth
+        if operation == INSERT:
+            if position > rows or position >= depth:
+                return False
+            last = min(rows, depth - 1)
+            self.prices[position + 1 : last + 1] = self.prices[position:last]
+            self.sizes[position + 1 : last + 1] = self.sizes[position:last]
+            self.marketMakers[position + 1 : last + 1] = self.marketMakers[
+                position:last
+            ]
+            self.rows = last + 1
+        elif operation == UPDATE:
+            if position >= rows:
+                return False
+        elif operation == DELETE:
+            if position >= rows:
+                return False
+            self.prices[position : rows - 1] = self.prices[position + 1 : rows]
+            self.sizes[position : rows - 1] = self.sizes[position + 1 : rows]
+            self.marketMakers[position : rows - 1] = self.marketMakers[
+                position + 1 : rows
+            ]
+            self.rows = rows - 1
+            return True
+        else:
+            return False
+        self.prices[position] = price
+        self.sizes[position] = size
+        self.marketMakers[position] = marketMaker
+        return True
+
+    def snapshot(self) -> tuple:
+        """Returns (prices, sizes), copies of the filled rows."""
+        return self.prices[: self.rows], self.sizes[: self.rows]
+
+    def aggregated(self) -> tuple:
+        """Returns (prices, sizes) with the sizes of equal prices summed,
+        the prices in the order of the book."""
+        prices = array.array("d")
+        sizes = array.array("d")
+        index = {}
+        for row in range(self.rows):
+            price = self.prices[row]
+            i = index.get(price)
+            if i is None:
+                index[price] = len(prices)
+                prices.append(price)
+                sizes.append(self.sizes[row])
+            else:
+                sizes[i] += self.sizes[row]
+        return prices, sizes
+
+
+class OrderBook:
+    def __init__(self, depth: int) -> None:
+        self.sides = (BookSide(depth), BookSide(depth))
+        self.isSmartDepth = False
+        self.nUpdates = 0
+        self.nRejected = 0  # operations on positions the book does not have
+
+    def update(self, position, operation, side, price, size, marketMaker="") -> None:
+        if self.sides[side].apply(position, operation, price, size, marketMaker):
+            self.nUpdates += 1
+        else:
+            self.nRejected += 1
+
+    def snapshot(self, aggregate: bool = None) -> tuple:
+        """Returns (bidPrices, bidSizes, askPrices, askSizes).
+
+        aggregate:bool - Merge the rows of equal prices, by default only for
+            smart depth books."""
+        if aggregate is None:
+            aggregate = self.isSmartDepth
+        bid, ask = self.sides[BID], self.sides[ASK]
+        if aggregate:
+            return (*bid.aggregated(), *ask.aggregated())
+        return (*bid.snapshot(), *ask.snapshot())
+
+    def clear(self) -> None:
+        for side in self.sides:
+            side.rows = 0
+
+
+class OrderBooks(EWrapper):
+    def __init__(self, client, depth: int = 10) -> None:
+        """client:EClient - The client receiving the depth updates.
+        depth:int - The rows kept per side, the numRows of the requests.
+        """
+        EWrapper.__init__(self)
+        self.client = client
+        self.depth = depth
+        self.lock = threading.Lock()
+        self.books = {}
+        client.addWrapperListener(self)
+
+    def close(self) -> None:
+        self.client.removeWrapperListener(self)
+
+    def book(self, reqId) -> OrderBook:
+        with self.lock:
+            book = self.books.get(reqId)
+            if book is None:
+                book = OrderBook(self.depth)
+                self.books[reqId] = book
+            return book
+
+    def snapshot(self, reqId, aggregate: bool = None) -> tuple:
+        """See OrderBook.snapshot(), empty arrays for unknown reqIds."""
+        book = self.books.get(reqId)
+        if book is None:
+            return tuple(array.array("d") for _ in range(4))
+        with self.lock:
+            return book.snapshot(aggregate)
+
+    def remove(self, reqId) -> None:
+        """Forgets the book, eg: after cancelMktDepth()."""
+        with self.lock:
+            self.books.pop(reqId, None)
+
+    ##########################################################################
+    # depth updates
+
+    def updateMktDepth(self, reqId, position, operation, side, price, size) -> None:
+        book = self.book(reqId)
+        with self.lock:
+            book.update(position, operation, side, price, float(size))
+
+    def updateMktDepthL2(
+        self,
+        reqId,
+        position,
+        marketMaker,
+        operation,
+        side,
+        price,
+        size,
+        isSmartDepth,
+    ) -> None:
+        book = self.book(reqId)
+        with self.lock:
+            book.isSmartDepth = isSmartDepth
+            book.update(position, operation, side, price, float(size), marketMaker)
+
+    def error(self, reqId, errorCode, errorString, advancedOrderRejectJson="") -> None:
+        if errorCode != MARKET_DEPTH_RESET:
+            return
+        book = self.books.get(reqId)
+        if book is not None:
+            logger.info("market depth of %d reset, clearing its book", reqId)
+            with self.lock:
+                book.clear()
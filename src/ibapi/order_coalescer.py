@@ -0,0 +1,121 @@
+"""Copyright (C) 2024 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+"""
+Coalescing of order amendments.
+
+Repricing an order faster than TWS acknowledges the modifications puts every
+intermediate version on the wire, and each one counts against the message
+rate limit. The coalescer sends an orderId again only once the previous
+place/modify was acknowledged (orderStatus, openOrder or error for that
+orderId); meanwhile only the latest amendment is kept and the ones it
+replaces are never sent.
+"""
+
+import logging
+import threading
+import time
+
+from ibapi.common import OrderId
+from ibapi.contract import Contract
+from ibapi.errors import isWarning
+from ibapi.order import Order
+from ibapi.order_cancel import OrderCancel
+from ibapi.wrapper import EWrapper
+
+logger = logging.getLogger(__name__)
+
+
+class OrderCoalescer(EWrapper):
+    def __init__(self, client, ackTimeout: float = None) -> None:
+        """client:EClient - The client the orders are sent with. The
+            coalescer registers itself as one of its wrapper listeners.
+        ackTimeout:float - Seconds after which an unacknowledged order no
+            longer holds back a new amendment, None waits for the ack.
+        """
+        EWrapper.__init__(self)
+        self.client = client
+        self.ackTimeout = ackTimeout
+        self.lock = threading.Lock()
+        self.inFlight = {}  # orderId -> time sent
+        self.pending = {}  # orderId -> (contract, order), latest amendment
+        self.nSent = 0
+        self.nSaved = 0
+        self.nAcks = 0
+        self.totalAckLatency = 0.0
+        self.maxAckLatency = 0.0
+        client.addWrapperListener(self)
+
+    def __str__(self) -> str:
+        return (
+            f"OrderCoalescer. Sent: {self.nSent}, Saved: {self.nSaved}, "
+            f"Acks: {self.nAcks}, AvgAckLatency: {self.avgAckLatency()}, "
+            f"MaxAckLatency: {self.maxAckLatency}"
+        )
+
+    def avgAckLatency(self) -> float:
+        return self.totalAckLatency / self.nAcks if self.nAcks else 0.0
+
+    def placeOrder(self, orderId: OrderId, contract: Contract, order: Order) -> None:
+        """As EClient.placeOrder() but held back, and possibly replaced by a
+        later call, while a previous version of the order is unacknowledged.
+        """
+        now = time.monotonic()
+        with self.lock:
+            sentTime = self.inFlight.get(orderId)
+            if sentTime is not None and (
+                self.ackTimeout is None or now - sentTime < self.ackTimeout
+            ):
+                if orderId in self.pending:
+                    self.nSaved += 1
+                self.pending[orderId] = (contract, order)
+                return
+            # past ackTimeout: an amendment still held back is older than this one
+            if self.pending.pop(orderId, None) is not None:
+                self.nSaved += 1
+            self.inFlight[orderId] = now
+            self.nSent += 1
+
+        self.client.placeOrder(orderId, contract, order)
+
+    def cancelOrder(self, orderId: OrderId, orderCancel: OrderCancel) -> None:
+        """Cancels the order right away; a held back amendment is dropped."""
+        with self.lock:
+            if self.pending.pop(orderId, None) is not None:
+                self.nSaved += 1
+
+        self.client.cancelOrder(orderId, orderCancel)
+
+    def acknowledged(self, orderId: OrderId) -> None:
+        now = time.monotonic()
+        with self.lock:
+            sentTime = self.inFlight.pop(orderId, None)
+            if sentTime is None:
+                return
+            latency = now - sentTime
+            self.nAcks += 1
+            self.totalAckLatency += latency
+            self.maxAckLatency = max(self.maxAckLatency, latency)
+
+            amendment = self.pending.pop(orderId, None)
+            if amendment is None:
+                return
+            self.inFlight[orderId] = now
+            self.nSent += 1
+
+        logger.debug("sending coalesced amendment of order %d", orderId)
+        self.client.placeOrder(orderId, *amendment)
+
+    def orderStatus(self, orderId: OrderId, *args) -> None:
+        self.acknowledged(orderId)
+
+    def openOrder(self, orderId: OrderId, *args) -> None:
+        self.acknowledged(orderId)
+
+    def error(self, reqId, errorCode, *args) -> None:
+        # rejections, and client side problems such as not being connected;
+        # warnings, or errors of other requests, do not answer an order
+        if isWarning(errorCode) or reqId not in self.inFlight:
+            return
+        self.acknowledged(reqId)
@@ -0,0 +1,60 @@
+"""Copyright (C) 2024 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+"""
+A pre-encoded place order message.
+
+EClient.placeOrder() validates and encodes every single field of the order on
+each call. When the same (Contract, Order) is sent over and over with only the
+price and/or quantity changing, the template does that work once and each send
+only encodes the orderId, totalQuantity and lmtPrice fields.
+"""
+
+import copy
+
+from ibapi.comm import make_field
+from ibapi.object_implem import Object
+
+
+class OrderTemplate(Object):
+    def __init__(self, contract, order) -> None:
+        # private deep copies, the lists (comboLegs, algoParams, conditions...)
+        # included, so later changes to the caller's objects don't leak into a
+        # re-encoding after a reconnect
+        self.contract = copy.deepcopy(contract)
+        self.order = copy.deepcopy(order)
+        self.serverVersion = None
+        self.segments = None  # encoded text around orderId, totalQuantity and lmtPrice
+
+    def __str__(self) -> str:
+        return f"OrderTemplate. ServerVersion: {self.serverVersion}, Contract: {self.contract}, Order: {self.order}"
+
+    def build(self, client) -> None:
+        """Encodes the static part of the message for the client's server
+        version. May raise ClientException.
+        """
+        slots = {}
+        flds = client.encodePlaceOrder(0, self.contract, self.order, slots)
+        idIdx = slots["orderId"]
+        qtyIdx = slots["totalQuantity"]
+        priceIdx = slots["lmtPrice"]
+        self.segments = (
+            "".join(flds[:idIdx]),
+            "".join(flds[idIdx + 1 : qtyIdx]),
+            "".join(flds[qtyIdx + 1 : priceIdx]),
+            "".join(flds[priceIdx + 1 :]),
+        )
+        self.serverVersion = client.serverVersion()
+
+    def encode(self, client, orderId, lmtPrice, totalQuantity) -> str:
+        head, beforeQty, beforePrice, tail = self.segments
+        return (
+            head
+            + make_field(orderId)
+            + beforeQty
+            + client.encodeTotalQuantity(totalQuantity)
+            + beforePrice
+            + client.encodeLmtPrice(lmtPrice)
+            + tail
+        )
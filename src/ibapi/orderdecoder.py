@@ -12,23 +12,7 @@ from ibapi.object_implem import Object
 from ibapi.order import OrderComboLeg
 from ibapi.server_versions import (
     MIN_CLIENT_VER,
-    MIN_SERVER_VER_AUTO_PRICE_FOR_HEDGE,
-    MIN_SERVER_VER_BOND_ACCRUED_INTEREST,
-    MIN_SERVER_VER_CASH_QTY,
-    MIN_SERVER_VER_CUSTOMER_ACCOUNT,
-    MIN_SERVER_VER_D_PEG_ORDERS,
-    MIN_SERVER_VER_DURATION,
-    MIN_SERVER_VER_FA_PROFILE_DESUPPORT,
-    MIN_SERVER_VER_MODELS_SUPPORT,
-    MIN_SERVER_VER_ORDER_CONTAINER,
-    MIN_SERVER_VER_PEGBEST_PEGMID_OFFSETS,
-    MIN_SERVER_VER_PEGGED_TO_BENCHMARK,
-    MIN_SERVER_VER_POST_TO_ATS,
-    MIN_SERVER_VER_PRICE_MGMT_ALGO,
-    MIN_SERVER_VER_PROFESSIONAL_CUSTOMER,
-    MIN_SERVER_VER_SOFT_DOLLAR_TIER,
     MIN_SERVER_VER_SSHORTX_OLD,
-    MIN_SERVER_VER_WHAT_IF_EXT_FIELDS,
 )
 from ibapi.softdollartier import SoftDollarTier
 from ibapi.tag_value import TagValue
@@ -39,12 +23,13 @@ logger = logging.getLogger(__name__)
 
 
 class OrderDecoder(Object):
-    def __init__(self, contract, order, orderState, version, serverVersion) -> None:
+    def __init__(self, contract, order, orderState, version, serverCaps) -> None:
         self.contract = contract
         self.order = order
         self.orderState = orderState
         self.version = version
-        self.serverVersion = serverVersion
+        self.serverVersion = serverCaps.serverVersion
+        self.serverCaps = serverCaps
 
     def decodeOrderId(self, fields) -> None:
         self.order.orderId = decode(int, fields)
@@ -128,11 +113,11 @@ class OrderDecoder(Object):
         self.order.faGroup = decode(str, fields)
         self.order.faMethod = decode(str, fields)
         self.order.faPercentage = decode(str, fields)
-        if self.serverVersion < MIN_SERVER_VER_FA_PROFILE_DESUPPORT:
+        if not self.serverCaps.FA_PROFILE_DESUPPORT:
             _faProfile = decode(str, fields)  # skip deprecated faProfile field
 
     def decodeModelCode(self, fields) -> None:
-        if self.serverVersion >= MIN_SERVER_VER_MODELS_SUPPORT:
+        if self.serverCaps.MODELS_SUPPORT:
             self.order.modelCode = decode(str, fields)
 
     def decodeGoodTillDate(self, fields) -> None:
@@ -344,7 +329,7 @@ class OrderDecoder(Object):
     def decodeWhatIfInfoAndCommission(self, fields) -> None:
         self.order.whatIf = decode(bool, fields)
         OrderDecoder.decodeOrderStatus(self, fields)
-        if self.serverVersion >= MIN_SERVER_VER_WHAT_IF_EXT_FIELDS:
+        if self.serverCaps.WHAT_IF_EXT_FIELDS:
             self.orderState.initMarginBefore = decode(str, fields)
             self.orderState.maintMarginBefore = decode(str, fields)
             self.orderState.equityWithLoanBefore = decode(str, fields)
@@ -368,7 +353,7 @@ class OrderDecoder(Object):
             self.order.randomizePrice = decode(bool, fields)
 
     def decodePegToBenchParams(self, fields) -> None:
-        if self.serverVersion >= MIN_SERVER_VER_PEGGED_TO_BENCHMARK:
+        if self.serverCaps.PEGGED_TO_BENCHMARK:
             if isPegBenchOrder(self.order.orderType):
                 self.order.referenceContractId = decode(int, fields)
                 self.order.isPeggedChangeAmountDecrease = decode(bool, fields)
@@ -377,7 +362,7 @@ class OrderDecoder(Object):
                 self.order.referenceExchangeId = decode(str, fields)
 
     def decodeConditions(self, fields) -> None:
-        if self.serverVersion >= MIN_SERVER_VER_PEGGED_TO_BENCHMARK:
+        if self.serverCaps.PEGGED_TO_BENCHMARK:
             conditionsSize = decode(int, fields)
             if conditionsSize > 0:
                 self.order.conditions = []
@@ -391,7 +376,7 @@ class OrderDecoder(Object):
                 self.order.conditionsCancelOrder = decode(bool, fields)
 
     def decodeAdjustedOrderParams(self, fields) -> None:
-        if self.serverVersion >= MIN_SERVER_VER_PEGGED_TO_BENCHMARK:
+        if self.serverCaps.PEGGED_TO_BENCHMARK:
             self.order.adjustedOrderType = decode(str, fields)
             self.order.triggerPrice = decode(float, fields)
             OrderDecoder.decodeStopPriceAndLmtPriceOffset(self, fields)
@@ -405,26 +390,26 @@ class OrderDecoder(Object):
         self.order.lmtPriceOffset = decode(float, fields)
 
     def decodeSoftDollarTier(self, fields) -> None:
-        if self.serverVersion >= MIN_SERVER_VER_SOFT_DOLLAR_TIER:
+        if self.serverCaps.SOFT_DOLLAR_TIER:
             name = decode(str, fields)
             value = decode(str, fields)
             displayName = decode(str, fields)
             self.order.softDollarTier = SoftDollarTier(name, value, displayName)
 
     def decodeCashQty(self, fields) -> None:
-        if self.serverVersion >= MIN_SERVER_VER_CASH_QTY:
+        if self.serverCaps.CASH_QTY:
             self.order.cashQty = decode(float, fields)
 
     def decodeDontUseAutoPriceForHedge(self, fields) -> None:
-        if self.serverVersion >= MIN_SERVER_VER_AUTO_PRICE_FOR_HEDGE:
+        if self.serverCaps.AUTO_PRICE_FOR_HEDGE:
             self.order.dontUseAutoPriceForHedge = decode(bool, fields)
 
     def decodeIsOmsContainers(self, fields) -> None:
-        if self.serverVersion >= MIN_SERVER_VER_ORDER_CONTAINER:
+        if self.serverCaps.ORDER_CONTAINER:
             self.order.isOmsContainer = decode(bool, fields)
 
     def decodeDiscretionaryUpToLimitPrice(self, fields) -> None:
-        if self.serverVersion >= MIN_SERVER_VER_D_PEG_ORDERS:
+        if self.serverCaps.D_PEG_ORDERS:
             self.order.discretionaryUpToLimitPrice = decode(bool, fields)
 
     def decodeAutoCancelDate(self, fields) -> None:
@@ -461,19 +446,19 @@ class OrderDecoder(Object):
         self.orderState.completedStatus = decode(str, fields)
 
     def decodeUsePriceMgmtAlgo(self, fields) -> None:
-        if self.serverVersion >= MIN_SERVER_VER_PRICE_MGMT_ALGO:
+        if self.serverCaps.PRICE_MGMT_ALGO:
             self.order.usePriceMgmtAlgo = decode(bool, fields)
 
     def decodeDuration(self, fields) -> None:
-        if self.serverVersion >= MIN_SERVER_VER_DURATION:
+        if self.serverCaps.DURATION:
             self.order.duration = decode(int, fields, SHOW_UNSET)
 
     def decodePostToAts(self, fields) -> None:
-        if self.serverVersion >= MIN_SERVER_VER_POST_TO_ATS:
+        if self.serverCaps.POST_TO_ATS:
             self.order.postToAts = decode(int, fields, SHOW_UNSET)
 
     def decodePegBestPegMidOrderAttributes(self, fields) -> None:
-        if self.serverVersion >= MIN_SERVER_VER_PEGBEST_PEGMID_OFFSETS:
+        if self.serverCaps.PEGBEST_PEGMID_OFFSETS:
             self.order.minTradeQty = decode(int, fields, SHOW_UNSET)
             self.order.minCompeteSize = decode(int, fields, SHOW_UNSET)
             self.order.competeAgainstBestOffset = decode(float, fields, SHOW_UNSET)
@@ -481,13 +466,13 @@ class OrderDecoder(Object):
             self.order.midOffsetAtHalf = decode(float, fields, SHOW_UNSET)
 
     def decodeCustomerAccount(self, fields) -> None:
-        if self.serverVersion >= MIN_SERVER_VER_CUSTOMER_ACCOUNT:
+        if self.serverCaps.CUSTOMER_ACCOUNT:
             self.order.customerAccount = decode(str, fields)
 
     def decodeProfessionalCustomer(self, fields) -> None:
-        if self.serverVersion >= MIN_SERVER_VER_PROFESSIONAL_CUSTOMER:
+        if self.serverCaps.PROFESSIONAL_CUSTOMER:
             self.order.professionalCustomer = decode(bool, fields)
 
     def decodeBondAccruedInterest(self, fields) -> None:
-        if self.serverVersion >= MIN_SERVER_VER_BOND_ACCRUED_INTEREST:
+        if self.serverCaps.BOND_ACCRUED_INTEREST:
             self.order.bondAccruedInterest = decode(str, fields)
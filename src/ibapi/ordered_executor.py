@@ -0,0 +1,185 @@
+"""Copyright (C) 2024 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+"""
+Callbacks run on a thread pool, in order per reqId.
+
+The Decoder calls the wrapper on the thread of EClient.run(), so a callback
+doing heavy work (eg: quoting again, risk checks) holds back the messages of
+every other request. An OrderedExecutor put in front of the application's
+wrapper hands the callbacks to a thread pool instead. They are partitioned
+by their reqId: the callbacks of a partition run one after the other and in
+the order they were decoded, those of different partitions run in parallel.
+The order and account callbacks
+(order status, executions, positions, account values, nextValidId...),
+the errors of the orders placed through the client, even before any status,
+and the callbacks without an id form one pinned partition, so the callbacks
+of an order keep their order whatever id they come with.
+
+The WrapperChain listeners still run on the decoding thread.
+"""
+
+import collections
+import inspect
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from ibapi.wrapper import EWrapper
+from ibapi.wrapper_chain import CALLBACKS
+
+logger = logging.getLogger(__name__)
+
+# the pinned partition, of the order and account callbacks and of those
+# without an id
+NO_ID = None
+
+# the callbacks run in the pinned partition, whatever their id
+PINNED_CALLBACKS = frozenset((
+    "orderStatus",
+    "openOrder",
+    "openOrderEnd",
+    "execDetails",
+    "execDetailsEnd",
+    "commissionReport",
+    "completedOrder",
+    "completedOrdersEnd",
+    "orderBound",
+    "nextValidId",
+    "managedAccounts",
+    "updateAccountValue",
+    "updatePortfolio",
+    "updateAccountTime",
+    "accountDownloadEnd",
+    "position",
+    "positionEnd",
+    "accountSummary",
+    "accountSummaryEnd",
+    "positionMulti",
+    "positionMultiEnd",
+    "accountUpdateMulti",
+    "accountUpdateMultiEnd",
+    "pnl",
+    "pnlSingle",
+))
+
+
+def partitionOf(name, orderIds):
+    """Returns the function giving the partition of a callback from its
+    arguments. orderIds:set - The ids of the orders placed through the
+    client, their errors go to the pinned partition."""
+    if name in PINNED_CALLBACKS:
+        return lambda args: NO_ID
+    if name == "error":
+        return lambda args: NO_ID if args[0] == -1 or args[0] in orderIds else args[0]
+    params = list(inspect.signature(getattr(EWrapper, name)).parameters)[1:]
+    if not params or params[0] not in ("reqId", "requestId", "tickerId", "orderId"):
+        return lambda args: NO_ID
+    return lambda args: args[0]
+
+
+class OrderedExecutor(EWrapper):
+    def __init__(self, client, maxWorkers: int = 8, batchSize: int = 16) -> None:
+        """client:EClient - The client whose application wrapper is called
+            on the pool; the executor puts itself in front of it.
+        maxWorkers:int - The threads of the pool.
+        batchSize:int - Callbacks of one partition run before the thread
+            moves on to another partition, so that a busy partition does
+            not hold a thread for good.
+        """
+        EWrapper.__init__(self)
+        self.client = client
+        self.batchSize = batchSize
+        self.pool = ThreadPoolExecutor(maxWorkers, thread_name_prefix="OrderedExecutor")
+        self.lock = threading.Lock()
+        self.queues = {}  # partition -> deque of (target, args), while not empty
+        self.orderIds = set()  # placed through the client, see addOrderIdSink()
+        self.closed = False
+        self.nSubmitted = 0
+        self.maxQueueDepth = 0
+
+        chain = client.wrapperChain()
+        self.wrapper = chain.wrapper
+        for name in CALLBACKS:
+            setattr(
+                self,
+                name,
+                self.makeSubmit(
+                    getattr(self.wrapper, name), partitionOf(name, self.orderIds)
+                ),
+            )
+        chain.setWrapper(self)
+        client.addOrderIdSink(self.orderIds)
+
+    def __str__(self) -> str:
+        return (
+            f"OrderedExecutor. Partitions: {len(self.queues)}, "
+            f"Queued: {sum(self.queueDepths().values())}, "
+            f"Submitted: {self.nSubmitted}, MaxQueueDepth: {self.maxQueueDepth}"
+        )
+
+    def close(self, wait: bool = True) -> None:
+        """Puts the application's wrapper back, and waits for the callbacks
+        queued to run if wait. If another proxy was put in front of the
+        executor since, the callbacks keep coming and are run right away."""
+        self.closed = True
+        self.client.removeOrderIdSink(self.orderIds)
+        self.client.wrapperChain().restoreWrapper(self, self.wrapper)
+        self.pool.shutdown(wait)
+
+    def makeSubmit(self, target, partition):
+        def submit(*args) -> None:
+            self.submit(partition(args), target, args)
+
+        return submit
+
+    def submit(self, key, target, args) -> None:
+        if self.closed:
+            target(*args)
+            return
+        with self.lock:
+            self.nSubmitted += 1
+            queue = self.queues.get(key)
+            idle = queue is None
+            if idle:
+                queue = self.queues[key] = collections.deque()
+            queue.append((target, args))
+            self.maxQueueDepth = max(self.maxQueueDepth, len(queue))
+        if idle:
+            self.pool.submit(self.drain, key, queue)
+
+    def drain(self, key, queue) -> None:
+        while True:
+            for _ in range(self.batchSize):
+                with self.lock:
+                    if not queue:
+                        del self.queues[key]
+                        return
+                    target, args = queue[0]
+                try:
+                    target(*args)
+                except Exception:
+                    logger.exception(
+                        "callback %s failed", getattr(target, "__name__", target)
+                    )
+                with self.lock:
+                    # popped only now, the partition stays busy while it runs
+                    queue.popleft()
+            try:
+                # to the back of the pool's queue, behind the other partitions
+                self.pool.submit(self.drain, key, queue)
+                return
+            except RuntimeError:
+                # shutting down, finish the partition here
+                pass
+
+    def queueDepth(self, key) -> int:
+        """The callbacks of the partition key queued or running."""
+        queue = self.queues.get(key)
+        return len(queue) if queue is not None else 0
+
+    def queueDepths(self) -> dict:
+        """Partition -> callbacks queued or running, for the busy ones."""
+        with self.lock:
+            return {key: len(queue) for key, queue in self.queues.items()}
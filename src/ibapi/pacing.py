@@ -0,0 +1,84 @@
+"""Copyright (C) 2024 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+"""
+The pacing helpers of the request schedulers.
+
+A scheduler (HistoricalPacer, LineBudget, SnapshotSweep) has a pump() that
+sends whatever its rules allow now. It keeps a SendWindow per limit of the
+form "no more than count messages in interval seconds", and a PumpTimer
+that calls pump() again once the next message becomes admissible.
+"""
+
+import collections
+import threading
+
+
+class SendWindow:
+    def __init__(self, count: int, interval: float = 1.0) -> None:
+        """count:int - Messages allowed within interval.
+        interval:float - The length of the window, in seconds.
+        """
+        self.count = count
+        self.interval = interval
+        self.sends = collections.deque()  # times of the messages sent
+
+    def __len__(self) -> int:
+        return len(self.sends)
+
+    def trim(self, now) -> None:
+        """Forgets the messages sent more than interval seconds ago."""
+        while self.sends and self.sends[0] <= now - self.interval:
+            self.sends.popleft()
+
+    def budget(self, now) -> int:
+        """Messages that can be sent now."""
+        self.trim(now)
+        return max(0, self.count - len(self.sends))
+
+    def admissibleAt(self, now, n: int = 1) -> float:
+        """The earliest time n more messages can be sent at, n at most
+        count."""
+        self.trim(now)
+        over = len(self.sends) + n - self.count
+        if over <= 0:
+            return now
+        return self.sends[over - 1] + self.interval
+
+    def append(self, now) -> None:
+        self.sends.append(now)
+
+
+class PumpTimer:
+    def __init__(self, lock, pump) -> None:
+        """lock:threading.Lock - The lock of the scheduler, schedule() and
+            cancel() are called with it held.
+        pump - Called, without the lock, when the timer is due.
+        """
+        self.lock = lock
+        self.pump = pump
+        self.timer = None
+        self.due = None
+
+    def schedule(self, due, now) -> None:
+        """Calls pump at due, unless it is called before already. due:float
+        - None for not at all."""
+        if due is None or (self.timer is not None and self.due <= due):
+            return
+        if self.timer is not None:
+            self.timer.cancel()
+        self.due = due
+        self.timer = threading.Timer(max(0.0, due - now), self.onTimer)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def cancel(self) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+    def onTimer(self) -> None:
+        with self.lock:
+            self.timer = None
+        self.pump()
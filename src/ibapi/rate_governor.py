@@ -0,0 +1,261 @@
+"""Copyright (C) 2024 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+"""
+Outbound message rate limiting.
+
+TWS disconnects a client sending more than about 50 messages a second. Once
+installed with EClient.setRateGovernor(), every message goes through a token
+bucket. When the bucket is empty the messages wait in one queue per lane and
+are sent by priority: cancels first, then orders, then everything else,
+except that a cancel waits for a place of the same order id still queued,
+and a global cancel for all the places queued before it.
+"""
+
+import collections
+import logging
+import threading
+import time
+from concurrent.futures import CancelledError, Future
+
+from ibapi.message import OUT
+
+logger = logging.getLogger(__name__)
+
+"""
+CANCEL_LANE = cancels, the risk reducing messages
+ORDER_LANE  = orders
+DATA_LANE   = everything else, mostly data requests
+"""
+(CANCEL_LANE, ORDER_LANE, DATA_LANE) = range(3)
+
+"""
+BLOCK  = sendMsg() returns once the message was sent
+QUEUE  = sendMsg() returns right away, the message is sent later
+FUTURE = as QUEUE but a Future of each send is kept, see lastFuture()
+"""
+(BLOCK, QUEUE, FUTURE) = range(3)
+
+# in the orderIds of a global cancel, for those of all the queued orders
+ALL_ORDERS = "*"
+
+msgId2lane = {
+    OUT.CANCEL_ORDER: CANCEL_LANE,
+    OUT.REQ_GLOBAL_CANCEL: CANCEL_LANE,
+    OUT.PLACE_ORDER: ORDER_LANE,
+    OUT.EXERCISE_OPTIONS: ORDER_LANE,
+}
+
+
+class RateGovernor:
+    def __init__(
+        self,
+        rate: float = 45.0,
+        burst: float = None,
+        mode: int = BLOCK,
+        laneOverrides: dict = None,
+    ) -> None:
+        """rate:float - The sustained number of messages per second.
+        burst:float - The number of messages that can be sent at once after
+            being idle, defaults to one second worth.
+        mode:int - BLOCK, QUEUE or FUTURE.
+        laneOverrides:dict - OUT message id -> lane, on top of msgId2lane.
+            Anything not listed is in the DATA_LANE.
+        """
+        self.rate = rate
+        self.burst = rate if burst is None else burst
+        self.mode = mode
+        self.msgId2lane = dict(msgId2lane)
+        if laneOverrides:
+            self.msgId2lane.update(laneOverrides)
+
+        self.tokens = self.burst
+        self.lastRefill = time.monotonic()
+        self.lanes = [collections.deque() for _ in range(DATA_LANE + 1)]
+        # order id -> its messages queued outside of the CANCEL_LANE
+        self.queuedOrderIds = collections.Counter()
+        self.cond = threading.Condition()
+        self.dispatcher = None
+        self.futures = threading.local()
+
+        # metrics
+        self.nSent = [0] * (DATA_LANE + 1)
+        self.nQueued = [0] * (DATA_LANE + 1)
+        self.maxQueueDepth = 0
+        self.totalWait = 0.0
+        self.recentSends = collections.deque()  # (time, count) over the last second
+
+    def __str__(self) -> str:
+        return (
+            f"RateGovernor. Rate: {self.rate}, Burst: {self.burst}, "
+            f"Sent: {self.nSent}, Queued: {self.nQueued}, "
+            f"Depth: {self.queueDepth()}, Utilization: {self.utilization():.2f}"
+        )
+
+    def laneOf(self, msg: str) -> int:
+        try:
+            msgId = int(msg[: msg.index("\0")])
+        except ValueError:
+            return DATA_LANE
+        return self.msgId2lane.get(msgId, DATA_LANE)
+
+    def orderIdsOf(self, msgs, orderContainer: bool) -> tuple:
+        """The order ids of the place and cancel messages among msgs, and
+        ALL_ORDERS for a global cancel.
+        orderContainer:bool - Whether the server has ServerCapabilities
+            ORDER_CONTAINER, the place orders then have no version field."""
+        orderIds = []
+        for msg in msgs:
+            fields = msg.split("\0", 3)
+            try:
+                msgId = int(fields[0])
+                if msgId == OUT.PLACE_ORDER:
+                    orderIds.append(int(fields[1 if orderContainer else 2]))
+                elif msgId == OUT.CANCEL_ORDER:
+                    orderIds.append(int(fields[2]))
+                elif msgId == OUT.REQ_GLOBAL_CANCEL:
+                    orderIds.append(ALL_ORDERS)
+            except (ValueError, IndexError):
+                continue
+        return tuple(orderIds)
+
+    def submit(self, send, data: bytes, lane: int, count: int = 1, orderIds=()):
+        """Sends data through send(data) now if a token is available and
+        nothing is waiting, otherwise queues it. A batch of count messages
+        needs only one token but the bucket then goes into debt for the rest.
+        orderIds are those of the orders data places or cancels, see
+        orderIdsOf(): a cancel is not sent before a queued place of its order,
+        nor a global cancel (ALL_ORDERS) before any place queued already.
+        Returns the Future of the send in FUTURE mode, None otherwise.
+        """
+        future = Future() if self.mode != QUEUE else None
+        with self.cond:
+            self.refill()
+            if self.tokens >= 1 and not any(self.lanes):
+                self.transmit(send, data, lane, count, 0.0, future)
+            else:
+                if ALL_ORDERS in orderIds:
+                    orderIds = tuple(self.queuedOrderIds) + tuple(
+                        orderId for orderId in orderIds if orderId != ALL_ORDERS
+                    )
+                self.lanes[lane].append((
+                    send,
+                    data,
+                    count,
+                    time.monotonic(),
+                    future,
+                    orderIds,
+                ))
+                if lane != CANCEL_LANE:
+                    for orderId in orderIds:
+                        self.queuedOrderIds[orderId] += 1
+                self.nQueued[lane] += count
+                self.maxQueueDepth = max(self.maxQueueDepth, self.queueDepth())
+                self.startDispatcher()
+                self.cond.notify()
+
+        if self.mode == BLOCK:
+            try:
+                future.result()
+            except CancelledError:
+                logger.info("governed message dropped by clear()")
+            return None
+        if self.mode == FUTURE:
+            self.futures.last = future
+        return future
+
+    def lastFuture(self):
+        """The Future of the last message submitted by the calling thread in
+        FUTURE mode, eg: right after client.placeOrder()."""
+        return getattr(self.futures, "last", None)
+
+    def queueDepth(self) -> int:
+        return sum(len(lane) for lane in self.lanes)
+
+    def utilization(self) -> float:
+        """The fraction of the rate used over the last second."""
+        with self.cond:
+            self.forgetOldSends(time.monotonic())
+            return sum(count for _, count in self.recentSends) / self.rate
+
+    def clear(self) -> None:
+        """Drops the queued messages, eg: after a disconnect."""
+        with self.cond:
+            for lane in self.lanes:
+                while lane:
+                    future = lane.popleft()[4]
+                    if future is not None:
+                        future.cancel()
+            self.queuedOrderIds.clear()
+
+    # the following are called with self.cond held
+
+    def refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.lastRefill) * self.rate)
+        self.lastRefill = now
+
+    def forgetOldSends(self, now) -> None:
+        while self.recentSends and now - self.recentSends[0][0] > 1.0:
+            self.recentSends.popleft()
+
+    def transmit(self, send, data, lane, count, wait, future) -> None:
+        # sending with the lock held keeps the messages in order on the wire
+        self.tokens -= count
+        self.nSent[lane] += count
+        now = time.monotonic()
+        self.recentSends.append((now, count))
+        self.forgetOldSends(now)
+        self.totalWait += wait
+        try:
+            send(data)
+        except Exception as ex:
+            logger.exception("sending a governed message failed")
+            if future is not None:
+                future.set_exception(ex)
+            return
+        if future is not None:
+            future.set_result(True)
+
+    def startDispatcher(self) -> None:
+        if self.dispatcher is None or not self.dispatcher.is_alive():
+            self.dispatcher = threading.Thread(
+                target=self.dispatch, name="RateGovernor", daemon=True
+            )
+            self.dispatcher.start()
+
+    def nextEntry(self):
+        """Pops the next message to send: the first of the highest lane, but
+        for the cancels of orders whose place is still queued."""
+        cancels = self.lanes[CANCEL_LANE]
+        for i, entry in enumerate(cancels):
+            if not any(orderId in self.queuedOrderIds for orderId in entry[5]):
+                del cancels[i]
+                return CANCEL_LANE, entry
+        lane = next(
+            lane for lane in range(ORDER_LANE, len(self.lanes)) if self.lanes[lane]
+        )
+        return lane, self.lanes[lane].popleft()
+
+    def dispatch(self) -> None:
+        with self.cond:
+            while True:
+                if not any(self.lanes):
+                    # idle, leave it to the next submit() to restart us
+                    self.dispatcher = None
+                    return
+                self.refill()
+                if self.tokens < 1:
+                    self.cond.wait((1 - self.tokens) / self.rate)
+                    continue
+                lane, entry = self.nextEntry()
+                send, data, count, queuedTime, future, orderIds = entry
+                if lane != CANCEL_LANE:
+                    for orderId in orderIds:
+                        self.queuedOrderIds[orderId] -= 1
+                        if not self.queuedOrderIds[orderId]:
+                            del self.queuedOrderIds[orderId]
+                self.transmit(
+                    send, data, lane, count, time.monotonic() - queuedTime, future
+                )
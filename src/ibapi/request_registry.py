@@ -0,0 +1,294 @@
+"""Copyright (C) 2024 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+"""
+Futures for the request/response calls.
+
+The answer to a request like reqContractDetails() comes as any number of
+callbacks with the request's reqId, followed by an end callback (here
+contractDetailsEnd()) or an error. A RequestRegistry does the pairing: its
+methods allocate the reqId, send the request and return a
+concurrent.futures.Future, the registry collects the callbacks of that
+reqId, found in a dict, and sets the future's result on the end callback
+or a RequestError as its exception on an error. For asyncio, requestAsync()
+returns an asyncio future instead.
+
+    registry = RequestRegistry(client)
+    details = registry.reqContractDetails(contract).result(timeout=10)
+
+The results are lists of what the callbacks got (ContractDetails, BarData,
+tuples of the arguments for the callbacks with several), or the one value
+for the requests answered by a single callback, see REQUESTS.
+"""
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+
+from ibapi.errors import isWarning
+from ibapi.wrapper import EWrapper
+
+logger = logging.getLogger(__name__)
+
+# request -> the cancel request, if any
+REQUESTS = {
+    "reqContractDetails": None,  # list of ContractDetails
+    "reqHistoricalData": "cancelHistoricalData",  # list of BarData
+    "reqHistoricalTicks": None,  # list of HistoricalTick(BidAsk|Last)
+    "reqHeadTimeStamp": "cancelHeadTimeStamp",  # str
+    "reqHistogramData": "cancelHistogramData",  # list of HistogramData
+    "reqSecDefOptParams": None,  # list of (exchange, underlyingConId,
+    # tradingClass, multiplier, expirations, strikes)
+    "reqMatchingSymbols": None,  # list of ContractDescription
+    "reqFundamentalData": "cancelFundamentalData",  # str
+    "reqNewsArticle": None,  # (articleType, articleText)
+    "reqHistoricalNews": None,  # list of (time, providerCode, articleId, headline)
+    "reqSmartComponents": None,  # SmartComponentMap
+    "reqSoftDollarTiers": None,  # list of SoftDollarTier
+    "reqUserInfo": None,  # whiteBrandingId
+    "reqWshMetaData": "cancelWshMetaData",  # json str
+    "reqWshEventData": "cancelWshEventData",  # json str
+}
+
+
+class RequestError(Exception):
+    def __init__(
+        self, reqId, errorCode, errorString, advancedOrderRejectJson=""
+    ) -> None:
+        super().__init__(f"request {reqId} failed: {errorCode} {errorString}")
+        self.reqId = reqId
+        self.errorCode = errorCode
+        self.errorString = errorString
+        self.advancedOrderRejectJson = advancedOrderRejectJson
+
+
+class Request:
+    __slots__ = ("name", "future", "items")
+
+    def __init__(self, name, future) -> None:
+        self.name = name
+        self.future = future
+        self.items = []
+
+
+class RequestRegistry(EWrapper):
+    def __init__(self, client, reqIdBase: int = 1 << 29) -> None:
+        """client:EClient - The client the requests are sent with. The
+            registry registers itself as one of its wrapper listeners.
+        reqIdBase:int - The reqIds allocated start from there, keep them
+            apart from the application's.
+        """
+        EWrapper.__init__(self)
+        self.client = client
+        self.lock = threading.Lock()
+        self.nextReqId = reqIdBase
+        self.requests = {}  # reqId -> Request
+        client.addWrapperListener(self)
+
+    def __str__(self) -> str:
+        return f"RequestRegistry. InFlight: {len(self.requests)}"
+
+    def close(self) -> None:
+        """Stops routing, the futures not done yet are cancelled."""
+        self.client.removeWrapperListener(self)
+        with self.lock:
+            requests = list(self.requests.values())
+            self.requests.clear()
+        for request in requests:
+            request.future.cancel()
+
+    def request(self, name: str, *args) -> Future:
+        """Sends the request name of REQUESTS with a new reqId and args, the
+        parameters of the EClient method after the reqId. Returns its
+        Future, with the reqId as its reqId attribute. Cancelling the
+        Future cancels the request if it can be."""
+        if name not in REQUESTS:
+            raise ValueError("%s is not a request/response call" % name)
+        future = Future()
+        with self.lock:
+            reqId = self.nextReqId
+            self.nextReqId += 1
+            self.requests[reqId] = Request(name, future)
+        future.reqId = reqId
+        future.add_done_callback(self.onDone)
+        getattr(self.client, name)(reqId, *args)
+        return future
+
+    def requestAsync(self, name: str, *args) -> asyncio.Future:
+        """As request() but returns an asyncio future of the running loop."""
+        return asyncio.wrap_future(self.request(name, *args))
+
+    def onDone(self, future) -> None:
+        if not future.cancelled():
+            return
+        with self.lock:
+            request = self.requests.pop(future.reqId, None)
+        cancel = REQUESTS[request.name] if request is not None else None
+        if cancel is not None:
+            getattr(self.client, cancel)(future.reqId)
+
+    def resolve(self, reqId, result) -> None:
+        with self.lock:
+            request = self.requests.pop(reqId, None)
+        if request is not None and not request.future.done():
+            request.future.set_result(request.items if result is None else result)
+
+    def collect(self, reqId, item) -> None:
+        request = self.requests.get(reqId)
+        if request is not None:
+            request.items.append(item)
+
+    ##########################################################################
+    # requests, same parameters as the EClient ones without the reqId
+
+    def reqContractDetails(self, contract) -> Future:
+        return self.request("reqContractDetails", contract)
+
+    def reqHistoricalData(
+        self,
+        contract,
+        endDateTime,
+        durationStr,
+        barSizeSetting,
+        whatToShow,
+        useRTH,
+        formatDate,
+        chartOptions=None,
+    ) -> Future:
+        """Without keepUpToDate, the result is the bars up to the end."""
+        return self.request(
+            "reqHistoricalData",
+            contract,
+            endDateTime,
+            durationStr,
+            barSizeSetting,
+            whatToShow,
+            useRTH,
+            formatDate,
+            False,
+            chartOptions or [],
+        )
+
+    def reqSecDefOptParams(
+        self, underlyingSymbol, futFopExchange, underlyingSecType, underlyingConId
+    ) -> Future:
+        return self.request(
+            "reqSecDefOptParams",
+            underlyingSymbol,
+            futFopExchange,
+            underlyingSecType,
+            underlyingConId,
+        )
+
+    def reqMatchingSymbols(self, pattern) -> Future:
+        return self.request("reqMatchingSymbols", pattern)
+
+    def reqHeadTimeStamp(self, contract, whatToShow, useRTH, formatDate) -> Future:
+        return self.request(
+            "reqHeadTimeStamp", contract, whatToShow, useRTH, formatDate
+        )
+
+    ##########################################################################
+    # answers
+
+    def contractDetails(self, reqId, contractDetails) -> None:
+        self.collect(reqId, contractDetails)
+
+    def bondContractDetails(self, reqId, contractDetails) -> None:
+        self.collect(reqId, contractDetails)
+
+    def contractDetailsEnd(self, reqId) -> None:
+        self.resolve(reqId, None)
+
+    def historicalData(self, reqId, bar) -> None:
+        self.collect(reqId, bar)
+
+    def historicalDataEnd(self, reqId, start, end) -> None:
+        self.resolve(reqId, None)
+
+    def historicalSchedule(
+        self, reqId, startDateTime, endDateTime, timeZone, sessions
+    ) -> None:
+        self.resolve(reqId, (startDateTime, endDateTime, timeZone, sessions))
+
+    def historicalTicks(self, reqId, ticks, done) -> None:
+        self.historicalTicksLast(reqId, ticks, done)
+
+    def historicalTicksBidAsk(self, reqId, ticks, done) -> None:
+        self.historicalTicksLast(reqId, ticks, done)
+
+    def historicalTicksLast(self, reqId, ticks, done) -> None:
+        request = self.requests.get(reqId)
+        if request is None:
+            return
+        request.items.extend(ticks)
+        if done:
+            self.resolve(reqId, None)
+
+    def headTimestamp(self, reqId, headTimestamp) -> None:
+        self.resolve(reqId, headTimestamp)
+
+    def histogramData(self, reqId, items) -> None:
+        self.resolve(reqId, items)
+
+    def securityDefinitionOptionParameter(
+        self,
+        reqId,
+        exchange,
+        underlyingConId,
+        tradingClass,
+        multiplier,
+        expirations,
+        strikes,
+    ) -> None:
+        self.collect(
+            reqId,
+            (exchange, underlyingConId, tradingClass, multiplier, expirations, strikes),
+        )
+
+    def securityDefinitionOptionParameterEnd(self, reqId) -> None:
+        self.resolve(reqId, None)
+
+    def symbolSamples(self, reqId, contractDescriptions) -> None:
+        self.resolve(reqId, contractDescriptions)
+
+    def fundamentalData(self, reqId, data) -> None:
+        self.resolve(reqId, data)
+
+    def newsArticle(self, requestId, articleType, articleText) -> None:
+        self.resolve(requestId, (articleType, articleText))
+
+    def historicalNews(
+        self, requestId, time, providerCode, articleId, headline
+    ) -> None:
+        self.collect(requestId, (time, providerCode, articleId, headline))
+
+    def historicalNewsEnd(self, requestId, hasMore) -> None:
+        self.resolve(requestId, None)
+
+    def smartComponents(self, reqId, smartComponentMap) -> None:
+        self.resolve(reqId, smartComponentMap)
+
+    def softDollarTiers(self, reqId, tiers) -> None:
+        self.resolve(reqId, tiers)
+
+    def userInfo(self, reqId, whiteBrandingId) -> None:
+        self.resolve(reqId, whiteBrandingId)
+
+    def wshMetaData(self, reqId, dataJson) -> None:
+        self.resolve(reqId, dataJson)
+
+    def wshEventData(self, reqId, dataJson) -> None:
+        self.resolve(reqId, dataJson)
+
+    def error(self, reqId, errorCode, errorString, advancedOrderRejectJson="") -> None:
+        if isWarning(errorCode):
+            return
+        with self.lock:
+            request = self.requests.pop(reqId, None)
+        if request is not None and not request.future.done():
+            request.future.set_exception(
+                RequestError(reqId, errorCode, errorString, advancedOrderRejectJson)
+            )
@@ -0,0 +1,124 @@
+"""Copyright (C) 2024 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+"""
+Routing of the callbacks of a request to a handler of its own.
+
+By default the Decoder calls the one wrapper for every message and the
+application then finds out, by reqId, which of its parts the message is
+for. With a route set through EClient.setRoute(), the Decoder reads the
+reqId (or order id) of each incoming message before decoding it, looks it
+up in a dict, and calls the route's handler instead of the wrapper. Routes
+are set for one reqId or for a range of them, eg: the reqIds a subsystem
+allocates its requests from.
+
+A handler is any object with some of the EWrapper methods, or a dict of
+callback name -> function; the callbacks it does not have go to the
+client's wrapper. The messages of a routed reqId do not go through the
+WrapperChain listeners.
+"""
+
+import bisect
+import logging
+import threading
+
+from ibapi.message import IN, inIdIndex
+from ibapi.wrapper import EWrapper
+from ibapi.wrapper_chain import CALLBACKS, overrides
+
+logger = logging.getLogger(__name__)
+
+
+def routingId(msgId, fields):
+    """The reqId or order id of a message, None for the messages without."""
+    idx = inIdIndex.get(msgId)
+    if idx is None:
+        return None
+    reqId = int(fields[idx])
+    if msgId == IN.EXECUTION_DATA and reqId == -1:
+        # the execution of an order, not an answer to reqExecutions()
+        reqId = int(fields[idx + 1])
+    return reqId
+
+
+class Handler:
+    """The callbacks of the target, then those of the default wrapper."""
+
+    def __init__(self, target, defaultWrapper) -> None:
+        self.target = target
+        self.defaultWrapper = defaultWrapper  # returns the wrapper
+        if isinstance(target, dict):
+            for name, func in target.items():
+                if name not in CALLBACKS:
+                    raise ValueError("%s is not an EWrapper callback" % name)
+                setattr(self, name, func)
+        else:
+            for name in CALLBACKS:
+                if isinstance(target, EWrapper) and not overrides(target, name):
+                    continue
+                meth = getattr(target, name, None)
+                if meth is not None:
+                    setattr(self, name, meth)
+
+    def __getattr__(self, name):
+        return getattr(self.defaultWrapper(), name)
+
+
+class Router:
+    def __init__(self, defaultWrapper) -> None:
+        """defaultWrapper - Returns the wrapper of the callbacks the handlers
+        do not have, eg: lambda: client.wrapper."""
+        self.defaultWrapper = defaultWrapper
+        self.lock = threading.Lock()
+        self.reqIds = {}  # reqId -> Handler
+        # (first reqIds, (first, last, Handler)), sorted, replaced as a whole
+        self.ranges = ((), ())
+
+    def __len__(self) -> int:
+        return len(self.reqIds) + len(self.ranges[1])
+
+    def add(self, reqId, handler, lastReqId=None) -> None:
+        """Routes reqId, or reqId to lastReqId included, to handler."""
+        handler = Handler(handler, self.defaultWrapper)
+        with self.lock:
+            if lastReqId is None:
+                self.reqIds[reqId] = handler
+                return
+            if lastReqId < reqId:
+                raise ValueError("empty range %d..%d" % (reqId, lastReqId))
+            ranges = [
+                route
+                for route in self.ranges[1]
+                if route[1] < reqId or lastReqId < route[0]
+            ]
+            if len(ranges) != len(self.ranges[1]):
+                logger.warning(
+                    "route %d..%d replaces overlapping ones", reqId, lastReqId
+                )
+            ranges.append((reqId, lastReqId, handler))
+            ranges.sort(key=lambda route: route[0])
+            self.ranges = (tuple(route[0] for route in ranges), tuple(ranges))
+
+    def remove(self, reqId) -> None:
+        """Removes the route of reqId, or the range starting at reqId."""
+        with self.lock:
+            if self.reqIds.pop(reqId, None) is not None:
+                return
+            ranges = [route for route in self.ranges[1] if route[0] != reqId]
+            self.ranges = (tuple(route[0] for route in ranges), tuple(ranges))
+
+    def handlerOf(self, msgId, fields):
+        """The Handler of the message, None if it is not routed."""
+        reqId = routingId(msgId, fields)
+        if reqId is None:
+            return None
+        handler = self.reqIds.get(reqId)
+        if handler is not None:
+            return handler
+        starts, ranges = self.ranges
+        if starts:
+            i = bisect.bisect_right(starts, reqId) - 1
+            if i >= 0 and reqId <= ranges[i][1]:
+                return ranges[i][2]
+        return None
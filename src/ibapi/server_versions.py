@@ -6,6 +6,8 @@ and conditions of the IB API Non-Commercial License or the IB API Commercial Lic
 The known server versions.
 """
 
+from ibapi.object_implem import Object
+
 # MIN_SERVER_VER_REAL_TIME_BARS       = 34
 # MIN_SERVER_VER_SCALE_ORDERS         = 35
 # MIN_SERVER_VER_SNAPSHOT_MKT_DATA    = 35
@@ -142,3 +144,33 @@ MIN_SERVER_VER_RFQ_FIELDS = 187
 
 MIN_CLIENT_VER = 100
 MAX_CLIENT_VER = MIN_SERVER_VER_RFQ_FIELDS
+
+
+# feature name -> min server version, eg: "TRADING_CLASS" -> MIN_SERVER_VER_TRADING_CLASS
+MIN_SERVER_VERSIONS = {
+    name[len("MIN_SERVER_VER_") :]: value
+    for name, value in dict(globals()).items()
+    if name.startswith("MIN_SERVER_VER_")
+}
+
+
+class ServerCapabilities(Object):
+    """The features supported by the connected TWS, worked out once from the
+    server version negotiated in EClient.connect(). Each MIN_SERVER_VER_XXX
+    gives a bool attribute XXX, eg: caps.TRADING_CLASS is True when the
+    server version is at least MIN_SERVER_VER_TRADING_CLASS.
+    """
+
+    def __init__(self, serverVersion=None) -> None:
+        self.serverVersion = serverVersion
+        for name, minVersion in MIN_SERVER_VERSIONS.items():
+            setattr(self, name, self.supports(minVersion))
+
+    def __str__(self) -> str:
+        return "ServerCapabilities. ServerVersion: %s, Supported: %s" % (
+            self.serverVersion,
+            ",".join(name for name in MIN_SERVER_VERSIONS if getattr(self, name)),
+        )
+
+    def supports(self, minVersion) -> bool:
+        return self.serverVersion is not None and self.serverVersion >= minVersion
@@ -0,0 +1,288 @@
+"""Copyright (C) 2024 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+"""
+One market data snapshot of many contracts.
+
+A SnapshotSweep sends reqMktData(snapshot=True) for each contract of a list,
+keeping as many requests in flight as there are lines for them and no more
+messages a second than msgRate, and sends the next one as soon as one ends
+(tickSnapshotEnd). The ticks are collected into a MarketDataTable with one
+row per contract, in the order of the list. A request not ended within the
+timeout is cancelled and marked TIMED_OUT, one answered by an error is
+marked FAILED; the sweep ends when every contract has a status.
+"""
+
+import array
+import collections
+import logging
+import math
+import threading
+import time
+
+from ibapi.const import UNSET_DECIMAL
+from ibapi.errors import isWarning
+from ibapi.market_data_table import COLUMNS, MarketDataTable, tickType2column
+from ibapi.pacing import PumpTimer, SendWindow
+from ibapi.wrapper import EWrapper
+
+logger = logging.getLogger(__name__)
+
+"""
+PENDING   = not sent or not answered yet
+DONE      = ended by tickSnapshotEnd
+TIMED_OUT = cancelled after the timeout, the ticks received are kept
+FAILED    = answered by an error
+"""
+(PENDING, DONE, TIMED_OUT, FAILED) = range(4)
+
+
+class SweepResult:
+    def __init__(self, contracts, table, status, elapsed) -> None:
+        self.contracts = contracts
+        self.table = table
+        self.status = status  # array of PENDING, DONE, TIMED_OUT or FAILED
+        self.elapsed = elapsed  # seconds
+
+    def __str__(self) -> str:
+        return (
+            f"SweepResult. Contracts: {len(self.contracts)}, "
+            f"Done: {self.status.count(DONE)}, "
+            f"TimedOut: {self.status.count(TIMED_OUT)}, "
+            f"Failed: {self.status.count(FAILED)}, Elapsed: {self.elapsed:.1f}"
+        )
+
+    def values(self):
+        """A (contracts, len(COLUMNS)) memoryview, rows in the order of the
+        contracts, NaN for the ticks not received."""
+        return self.table.view()
+
+    def column(self, tickType):
+        """The values of one tick type of COLUMNS, in the order of the
+        contracts."""
+        nColumns = len(COLUMNS)
+        end = len(self.contracts) * nColumns
+        return self.table.values[tickType2column[tickType] : end : nColumns]
+
+
+class SnapshotSweep(EWrapper):
+    def __init__(
+        self,
+        client,
+        maxInFlight: int = 90,
+        msgRate: float = 40.0,
+        timeout: float = 12.0,
+        reqIdBase: int = 1 << 28,
+        clock=time.monotonic,
+    ) -> None:
+        """client:EClient - The client the requests are sent with. The sweep
+            registers itself as one of its wrapper listeners.
+        maxInFlight:int - Snapshot requests waiting for their end, each one
+            takes a market data line while it does. At least 1, ValueError
+            otherwise.
+        msgRate:float - Messages per second the sweep may send. At least 1,
+            ValueError otherwise.
+        timeout:float - Seconds after which a request is cancelled, TWS
+            ends a snapshot within 11 seconds.
+        reqIdBase:int - The reqIds of the requests start from there, keep
+            them apart from the application's.
+        clock - Returns the current time in seconds, for testing.
+        """
+        if maxInFlight < 1:
+            raise ValueError("maxInFlight %s does not allow a request" % maxInFlight)
+        if msgRate < 1:
+            raise ValueError("msgRate %s does not allow a request" % msgRate)
+        EWrapper.__init__(self)
+        self.client = client
+        self.maxInFlight = maxInFlight
+        self.msgRate = msgRate
+        self.timeout = timeout
+        self.reqIdBase = reqIdBase
+        self.clock = clock
+
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+        self.finished.set()
+        self.contracts = []
+        self.genericTickList = ""
+        self.regulatorySnapshot = False
+        self.table = None
+        self.status = None
+        self.pending = collections.deque()  # indices of the contracts to send
+        self.inFlight = {}  # reqId -> time sent
+        self.sends = SendWindow(int(msgRate))
+        self.startTime = None
+        self.endTime = None
+        self.timer = PumpTimer(self.lock, self.pump)
+
+    def __str__(self) -> str:
+        return (
+            f"SnapshotSweep. Pending: {len(self.pending)}, "
+            f"InFlight: {len(self.inFlight)}"
+        )
+
+    def close(self) -> None:
+        """Cancels what is in flight and stops the sweep."""
+        with self.lock:
+            cancels = list(self.inFlight)
+            self.stop()
+        for reqId in cancels:
+            self.client.cancelMktData(reqId)
+
+    def sweep(
+        self,
+        contracts,
+        genericTickList: str = "",
+        regulatorySnapshot: bool = False,
+        timeout: float = None,
+    ):
+        """Snapshots contracts and returns the SweepResult, or None if the
+        sweep did not end within timeout seconds (it goes on though, see
+        wait())."""
+        self.start(contracts, genericTickList, regulatorySnapshot)
+        return self.wait(timeout)
+
+    def start(
+        self, contracts, genericTickList: str = "", regulatorySnapshot: bool = False
+    ) -> None:
+        """Starts the sweep and returns right away."""
+        with self.lock:
+            if not self.finished.is_set():
+                raise RuntimeError("a sweep is running already")
+            self.finished.clear()
+            self.contracts = list(contracts)
+            self.genericTickList = genericTickList
+            self.regulatorySnapshot = regulatorySnapshot
+            self.table = MarketDataTable(max(1, len(self.contracts)))
+            for i in range(len(self.contracts)):
+                self.table.addRequest(self.reqIdBase + i)
+            self.status = array.array("b", bytes(len(self.contracts)))
+            self.pending = collections.deque(range(len(self.contracts)))
+            self.inFlight.clear()
+            self.startTime = self.clock()
+            self.endTime = None
+            self.client.addWrapperListener(self)
+        self.pump()
+
+    def wait(self, timeout: float = None):
+        """Returns the SweepResult once the sweep ended, None on timeout."""
+        if not self.finished.wait(timeout):
+            return None
+        return self.result()
+
+    def result(self):
+        """The SweepResult so far, the contracts not answered yet PENDING."""
+        end = self.clock() if self.endTime is None else self.endTime
+        return SweepResult(
+            self.contracts, self.table, self.status, end - self.startTime
+        )
+
+    ##########################################################################
+    # scheduling
+
+    def pump(self) -> None:
+        """Cancels the requests timed out, sends what the lines and the
+        message rate allow, and arranges to be called again when needed."""
+        cancels = []
+        toSend = []
+        with self.lock:
+            if self.finished.is_set():
+                return
+            now = self.clock()
+            budget = self.sends.budget(now)
+
+            for reqId, sentAt in list(self.inFlight.items()):
+                if sentAt + self.timeout > now:
+                    break  # in order of sending
+                if budget < 1:
+                    break
+                del self.inFlight[reqId]
+                self.status[reqId - self.reqIdBase] = TIMED_OUT
+                self.sends.append(now)
+                budget -= 1
+                cancels.append(reqId)
+
+            while self.pending and len(self.inFlight) < self.maxInFlight and budget > 0:
+                reqId = self.reqIdBase + self.pending.popleft()
+                self.inFlight[reqId] = now
+                self.sends.append(now)
+                budget -= 1
+                toSend.append(reqId)
+
+            if not self.pending and not self.inFlight:
+                self.stop()
+            else:
+                due = None
+                if self.inFlight:
+                    due = next(iter(self.inFlight.values())) + self.timeout
+                if budget < 1:
+                    sendable = self.sends.admissibleAt(now)
+                    due = sendable if due is None else min(due, sendable)
+                self.timer.schedule(due, now)
+
+        if cancels:
+            logger.info("%d snapshot requests timed out", len(cancels))
+        for reqId in cancels:
+            self.client.cancelMktData(reqId)
+        for reqId in toSend:
+            self.client.reqMktData(
+                reqId,
+                self.contracts[reqId - self.reqIdBase],
+                self.genericTickList,
+                True,
+                self.regulatorySnapshot,
+                [],
+            )
+
+    # the following are called with self.lock held
+
+    def stop(self) -> None:
+        self.pending.clear()
+        self.inFlight.clear()
+        self.timer.cancel()
+        if not self.finished.is_set():
+            self.endTime = self.clock()
+            self.client.removeWrapperListener(self)
+            self.finished.set()
+
+    def done(self, reqId, status) -> None:
+        with self.lock:
+            if self.inFlight.pop(reqId, None) is None:
+                return
+            self.status[reqId - self.reqIdBase] = status
+        self.pump()
+
+    ##########################################################################
+    # answers
+
+    def tickPrice(self, reqId, tickType, price, attrib) -> None:
+        if reqId in self.inFlight:
+            self.table.update(reqId, tickType, price)
+
+    def tickSize(self, reqId, tickType, size) -> None:
+        if reqId in self.inFlight:
+            self.table.update(
+                reqId, tickType, math.nan if size == UNSET_DECIMAL else float(size)
+            )
+
+    def tickGeneric(self, reqId, tickType, value) -> None:
+        if reqId in self.inFlight:
+            self.table.update(reqId, tickType, value)
+
+    def tickString(self, reqId, tickType, value) -> None:
+        if reqId in self.inFlight and value:
+            try:
+                self.table.update(reqId, tickType, float(value))
+            except ValueError:
+                pass
+
+    def tickSnapshotEnd(self, reqId) -> None:
+        self.done(reqId, DONE)
+
+    def error(self, reqId, errorCode, errorString, advancedOrderRejectJson="") -> None:
+        if isWarning(errorCode):
+            return
+        if reqId in self.inFlight:
+            logger.info("snapshot %d failed: %d %s", reqId, errorCode, errorString)
+            self.done(reqId, FAILED)
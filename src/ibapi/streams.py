@@ -0,0 +1,456 @@
+"""Copyright (C) 2024 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+"""
+Streaming subscriptions as asyncio iterators.
+
+    streams = Streams(client)
+    async with streams.streamTickByTick(contract, "Last") as stream:
+        async for update in stream:
+            ...
+
+Each update is a tuple of the name of the callback then its arguments after
+the reqId, eg: ("tickByTickAllLast", tickType, time, price, size,
+tickAttribLast, exchange, specialConditions). The callbacks come on the
+thread of the client's EReader and are buffered per stream; the buffer is
+bounded and what happens when the consumer falls behind is up to the
+stream's policy:
+ - DROP_OLDEST: the oldest updates make room, nDropped counts them
+ - CONFLATE: only the last update of each key is kept, eg: per tick type
+   for market data, so the consumer sees the latest state at its own pace
+ - FAIL: the stream ends with a StreamOverflow
+Leaving the async with block, close(), or cancelling the task waiting on
+the stream sends the cancel request of the subscription. An error for the
+subscription ends the stream with a RequestError.
+"""
+
+import asyncio
+import collections
+import logging
+import threading
+
+from ibapi.errors import isWarning
+from ibapi.request_registry import RequestError
+from ibapi.wrapper import EWrapper
+
+logger = logging.getLogger(__name__)
+
+"""
+DROP_OLDEST = a full buffer drops its oldest update
+CONFLATE    = the buffer keeps the last update per key
+FAIL        = a full buffer ends the stream with a StreamOverflow
+"""
+(DROP_OLDEST, CONFLATE, FAIL) = range(3)
+
+
+class StreamOverflow(Exception):
+    pass
+
+
+# callback -> key of its updates for CONFLATE
+conflationKeys = {
+    "tickPrice": lambda update: update[:2],  # per tick type
+    "tickSize": lambda update: update[:2],
+    "tickString": lambda update: update[:2],
+    "tickGeneric": lambda update: update[:2],
+    "tickEFP": lambda update: update[:2],
+    "tickOptionComputation": lambda update: update[:2],
+    "updateMktDepth": lambda update: (update[0], update[3], update[1]),  # side, row
+    "updateMktDepthL2": lambda update: (update[0], update[4], update[1]),
+    "accountUpdateMulti": lambda update: update[:4] + update[5:],  # tag, currency
+}
+
+
+class Stream:
+    def __init__(self, streams, reqId, cancel, maxSize, policy) -> None:
+        self.streams = streams
+        self.reqId = reqId
+        self.cancel = cancel  # sends the cancel request
+        self.maxSize = maxSize
+        self.policy = policy
+        self.lock = threading.Lock()
+        if policy == CONFLATE:
+            self.buffer = collections.OrderedDict()  # key -> update
+        else:
+            self.buffer = collections.deque()
+        self.loop = None
+        self.ready = None
+        self.closed = False
+        self.exception = None
+        self.nReceived = 0
+        self.nDropped = 0  # dropped or conflated
+
+    def __str__(self) -> str:
+        return (
+            f"Stream {self.reqId}. Buffered: {len(self.buffer)}, "
+            f"Received: {self.nReceived}, Dropped: {self.nDropped}"
+        )
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.loop is None:
+            self.loop = asyncio.get_running_loop()
+            self.ready = asyncio.Event()
+        while True:
+            with self.lock:
+                if self.buffer:
+                    if self.policy == CONFLATE:
+                        return self.buffer.popitem(last=False)[1]
+                    return self.buffer.popleft()
+                if self.closed:
+                    if self.exception is not None:
+                        raise self.exception
+                    raise StopAsyncIteration
+                self.ready.clear()
+            try:
+                await self.ready.wait()
+            except asyncio.CancelledError:
+                self.close()
+                raise
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Cancels the subscription, the updates buffered can still be read."""
+        if self.end(None):
+            self.cancel()
+
+    def put(self, update) -> None:
+        """Called on the thread of the client's EReader."""
+        overflow = False
+        with self.lock:
+            if self.closed:
+                return
+            self.nReceived += 1
+            wasEmpty = not self.buffer
+            if self.policy == CONFLATE:
+                keyOf = conflationKeys.get(update[0])
+                key = keyOf(update) if keyOf is not None else update[0]
+                if key in self.buffer:
+                    self.nDropped += 1
+                    del self.buffer[key]  # to the back, in the order of arrival
+                elif len(self.buffer) >= self.maxSize:
+                    self.nDropped += 1
+                    self.buffer.popitem(last=False)
+                self.buffer[key] = update
+            elif len(self.buffer) < self.maxSize:
+                self.buffer.append(update)
+            elif self.policy == DROP_OLDEST:
+                self.nDropped += 1
+                self.buffer.popleft()
+                self.buffer.append(update)
+            else:
+                overflow = True
+            loop = self.loop
+        if overflow:
+            logger.warning("stream %d overflowed, cancelling it", self.reqId)
+            if self.end(StreamOverflow("stream %d overflowed" % self.reqId)):
+                self.cancel()
+            return
+        if loop is not None and (loop.is_closed() or wasEmpty and not self.wake(loop)):
+            # the loop reading the stream is gone, eg: left without close()
+            logger.info("stream %d has no event loop left, closing it", self.reqId)
+            self.close()
+
+    def wake(self, loop) -> bool:
+        """Wakes up the reader, returns False if its loop is closed."""
+        if loop.is_closed():
+            return False
+        try:
+            loop.call_soon_threadsafe(self.ready.set)
+        except RuntimeError:
+            # closed meanwhile
+            return False
+        return True
+
+    def end(self, exception) -> bool:
+        """Marks the stream closed, returns False if it was already."""
+        with self.lock:
+            if self.closed:
+                return False
+            self.closed = True
+            self.exception = exception
+            loop = self.loop
+        self.streams.remove(self.reqId)
+        if loop is not None:
+            self.wake(loop)
+        return True
+
+
+class Streams(EWrapper):
+    def __init__(self, client, reqIdBase: int = 1 << 30) -> None:
+        """client:EClient - The client the requests are sent with. Streams
+            registers itself as one of its wrapper listeners.
+        reqIdBase:int - The reqIds of the streams start from there, keep them
+            apart from the application's.
+        """
+        EWrapper.__init__(self)
+        self.client = client
+        self.lock = threading.Lock()
+        self.nextReqId = reqIdBase
+        self.streams = {}  # reqId -> Stream
+        client.addWrapperListener(self)
+
+    def close(self) -> None:
+        """Closes all the streams."""
+        for stream in list(self.streams.values()):
+            stream.close()
+        self.client.removeWrapperListener(self)
+
+    def open(self, send, cancel, maxSize, policy) -> Stream:
+        with self.lock:
+            reqId = self.nextReqId
+            self.nextReqId += 1
+            stream = Stream(self, reqId, lambda: cancel(reqId), maxSize, policy)
+            self.streams[reqId] = stream
+        send(reqId)
+        return stream
+
+    def remove(self, reqId) -> None:
+        with self.lock:
+            self.streams.pop(reqId, None)
+
+    def put(self, reqId, update) -> None:
+        stream = self.streams.get(reqId)
+        if stream is not None:
+            stream.put(update)
+
+    ##########################################################################
+    # streams, same parameters as the EClient requests without the reqId,
+    # then the buffer size and policy
+
+    def streamMktData(
+        self,
+        contract,
+        genericTickList: str = "",
+        mktDataOptions=None,
+        maxSize: int = 1024,
+        policy: int = CONFLATE,
+    ) -> Stream:
+        return self.open(
+            lambda reqId: self.client.reqMktData(
+                reqId, contract, genericTickList, False, False, mktDataOptions or []
+            ),
+            self.client.cancelMktData,
+            maxSize,
+            policy,
+        )
+
+    def streamTickByTick(
+        self,
+        contract,
+        tickType: str,
+        numberOfTicks: int = 0,
+        ignoreSize: bool = False,
+        maxSize: int = 4096,
+        policy: int = DROP_OLDEST,
+    ) -> Stream:
+        return self.open(
+            lambda reqId: self.client.reqTickByTickData(
+                reqId, contract, tickType, numberOfTicks, ignoreSize
+            ),
+            self.client.cancelTickByTickData,
+            maxSize,
+            policy,
+        )
+
+    def streamRealTimeBars(
+        self,
+        contract,
+        whatToShow: str,
+        useRTH: bool,
+        realTimeBarsOptions=None,
+        maxSize: int = 1024,
+        policy: int = DROP_OLDEST,
+    ) -> Stream:
+        return self.open(
+            lambda reqId: self.client.reqRealTimeBars(
+                reqId, contract, 5, whatToShow, useRTH, realTimeBarsOptions or []
+            ),
+            self.client.cancelRealTimeBars,
+            maxSize,
+            policy,
+        )
+
+    def streamMktDepth(
+        self,
+        contract,
+        numRows: int,
+        isSmartDepth: bool,
+        mktDepthOptions=None,
+        maxSize: int = 4096,
+        policy: int = FAIL,
+    ) -> Stream:
+        """Depth updates only make sense all together, a consumer falling
+        behind rather fails by default."""
+        return self.open(
+            lambda reqId: self.client.reqMktDepth(
+                reqId, contract, numRows, isSmartDepth, mktDepthOptions or []
+            ),
+            lambda reqId: self.client.cancelMktDepth(reqId, isSmartDepth),
+            maxSize,
+            policy,
+        )
+
+    def streamPnLSingle(
+        self,
+        account: str,
+        modelCode: str,
+        conid: int,
+        maxSize: int = 1,
+        policy: int = CONFLATE,
+    ) -> Stream:
+        return self.open(
+            lambda reqId: self.client.reqPnLSingle(reqId, account, modelCode, conid),
+            self.client.cancelPnLSingle,
+            maxSize,
+            policy,
+        )
+
+    def streamAccountUpdatesMulti(
+        self,
+        account: str,
+        modelCode: str,
+        ledgerAndNLV: bool = False,
+        maxSize: int = 1024,
+        policy: int = CONFLATE,
+    ) -> Stream:
+        return self.open(
+            lambda reqId: self.client.reqAccountUpdatesMulti(
+                reqId, account, modelCode, ledgerAndNLV
+            ),
+            self.client.cancelAccountUpdatesMulti,
+            maxSize,
+            policy,
+        )
+
+    ##########################################################################
+    # updates
+
+    def tickPrice(self, reqId, tickType, price, attrib) -> None:
+        self.put(reqId, ("tickPrice", tickType, price, attrib))
+
+    def tickSize(self, reqId, tickType, size) -> None:
+        self.put(reqId, ("tickSize", tickType, size))
+
+    def tickString(self, reqId, tickType, value) -> None:
+        self.put(reqId, ("tickString", tickType, value))
+
+    def tickGeneric(self, reqId, tickType, value) -> None:
+        self.put(reqId, ("tickGeneric", tickType, value))
+
+    def tickEFP(self, reqId, tickType, *args) -> None:
+        self.put(reqId, ("tickEFP", tickType, *args))
+
+    def tickOptionComputation(self, reqId, tickType, *args) -> None:
+        self.put(reqId, ("tickOptionComputation", tickType, *args))
+
+    def tickByTickAllLast(
+        self,
+        reqId,
+        tickType,
+        time,
+        price,
+        size,
+        tickAttribLast,
+        exchange,
+        specialConditions,
+    ) -> None:
+        self.put(
+            reqId,
+            (
+                "tickByTickAllLast",
+                tickType,
+                time,
+                price,
+                size,
+                tickAttribLast,
+                exchange,
+                specialConditions,
+            ),
+        )
+
+    def tickByTickBidAsk(
+        self, reqId, time, bidPrice, askPrice, bidSize, askSize, tickAttribBidAsk
+    ) -> None:
+        self.put(
+            reqId,
+            (
+                "tickByTickBidAsk",
+                time,
+                bidPrice,
+                askPrice,
+                bidSize,
+                askSize,
+                tickAttribBidAsk,
+            ),
+        )
+
+    def tickByTickMidPoint(self, reqId, time, midPoint) -> None:
+        self.put(reqId, ("tickByTickMidPoint", time, midPoint))
+
+    def realtimeBar(
+        self, reqId, time, open_, high, low, close, volume, wap, count
+    ) -> None:
+        self.put(
+            reqId, ("realtimeBar", time, open_, high, low, close, volume, wap, count)
+        )
+
+    def updateMktDepth(self, reqId, position, operation, side, price, size) -> None:
+        self.put(reqId, ("updateMktDepth", position, operation, side, price, size))
+
+    def updateMktDepthL2(
+        self,
+        reqId,
+        position,
+        marketMaker,
+        operation,
+        side,
+        price,
+        size,
+        isSmartDepth,
+    ) -> None:
+        self.put(
+            reqId,
+            (
+                "updateMktDepthL2",
+                position,
+                marketMaker,
+                operation,
+                side,
+                price,
+                size,
+                isSmartDepth,
+            ),
+        )
+
+    def pnlSingle(
+        self, reqId, pos, dailyPnL, unrealizedPnL, realizedPnL, value
+    ) -> None:
+        self.put(reqId, ("pnlSingle", pos, dailyPnL, unrealizedPnL, realizedPnL, value))
+
+    def accountUpdateMulti(
+        self, reqId, account, modelCode, key, value, currency
+    ) -> None:
+        self.put(
+            reqId, ("accountUpdateMulti", account, modelCode, key, value, currency)
+        )
+
+    def accountUpdateMultiEnd(self, reqId) -> None:
+        self.put(reqId, ("accountUpdateMultiEnd",))
+
+    def error(self, reqId, errorCode, errorString, advancedOrderRejectJson="") -> None:
+        if isWarning(errorCode):
+            return
+        stream = self.streams.get(reqId)
+        if stream is not None:
+            stream.end(
+                RequestError(reqId, errorCode, errorString, advancedOrderRejectJson)
+            )
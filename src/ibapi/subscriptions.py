@@ -0,0 +1,262 @@
+"""Copyright (C) 2024 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+"""
+Sharing of identical market data subscriptions within one client.
+
+Components of one application asking for the same data (same contract, same
+generic ticks, same tick-by-tick type) each with their own reqId would use
+as many market data lines and decode as many messages. A SubscriptionManager
+sends one request per distinct subscription instead, with a reqId of its
+own, and calls the application's wrapper once per subscriber with the
+subscriber's reqId. The subscription is cancelled when its last subscriber
+cancels, or dropped when it fails with an error. A subscriber joining a
+running market data subscription gets the last value of each tick type
+right away. Contracts are the same if their legs (BAG), delta neutral
+contract and includeExpired are too.
+
+The manager sits between the client's WrapperChain and the application's
+wrapper; the callbacks of other requests go straight through.
+"""
+
+import logging
+import threading
+
+from ibapi.errors import isWarning
+from ibapi.wrapper import EWrapper
+from ibapi.wrapper_chain import CALLBACKS
+
+logger = logging.getLogger(__name__)
+
+# the callbacks of shared requests, all have the reqId first
+SHARED_CALLBACKS = (
+    "tickPrice",
+    "tickSize",
+    "tickGeneric",
+    "tickString",
+    "tickEFP",
+    "tickOptionComputation",
+    "tickReqParams",
+    "tickNews",
+    "marketDataType",
+    "rerouteMktDataReq",
+    "tickByTickAllLast",
+    "tickByTickBidAsk",
+    "tickByTickMidPoint",
+    "error",
+)
+
+# the callbacks whose last value, per tick type, is replayed to a new subscriber
+REPLAYED_CALLBACKS = {
+    "tickPrice": True,  # name -> keyed by tick type
+    "tickSize": True,
+    "tickGeneric": True,
+    "tickString": True,
+    "tickOptionComputation": True,
+    "tickReqParams": False,
+    "marketDataType": False,
+}
+
+
+def contractKey(contract) -> tuple:
+    # the legs of a BAG, the hedge of a delta neutral request
+    extra = (
+        tuple(str(leg) for leg in contract.comboLegs or ()),
+        str(contract.deltaNeutralContract) if contract.deltaNeutralContract else "",
+        contract.includeExpired,
+    )
+    if contract.conId:
+        return (contract.conId, contract.exchange, *extra)
+    return (
+        contract.symbol,
+        contract.secType,
+        contract.lastTradeDateOrContractMonth,
+        contract.strike,
+        contract.right,
+        contract.multiplier,
+        contract.exchange,
+        contract.primaryExchange,
+        contract.currency,
+        contract.localSymbol,
+        contract.tradingClass,
+        *extra,
+    )
+
+
+def genericTicksKey(genericTickList: str) -> tuple:
+    return tuple(
+        sorted({tick.strip() for tick in genericTickList.split(",") if tick.strip()})
+    )
+
+
+class Subscription:
+    def __init__(self, upstreamId, key, cancel) -> None:
+        self.upstreamId = upstreamId
+        self.key = key
+        self.cancel = cancel  # the client method cancelling it
+        self.subscribers = []
+        self.last = {}  # (callback name, tick type) -> args
+        self.failed = False  # ended by an error, no longer shared
+
+
+class SubscriptionManager(EWrapper):
+    def __init__(self, client, reqIdBase: int = 1 << 26) -> None:
+        """client:EClient - The client sending the requests; the manager puts
+            itself in front of its application wrapper.
+        reqIdBase:int - The reqIds of the shared requests start from there,
+            keep them apart from the application's.
+        """
+        EWrapper.__init__(self)
+        self.client = client
+        self.nextReqId = reqIdBase
+        # held while calling the subscribers too, so that a replay and the
+        # updates of its subscription reach the new subscriber in order; a
+        # callback may subscribe or cancel again
+        self.lock = threading.RLock()
+        self.subscriptions = {}  # key -> Subscription
+        self.upstream = {}  # upstream reqId -> Subscription
+        self.reqId2subscription = {}  # subscriber reqId -> Subscription
+
+        chain = client.wrapperChain()
+        self.wrapper = chain.wrapper
+        for name in CALLBACKS:
+            target = getattr(self.wrapper, name)
+            if name in SHARED_CALLBACKS:
+                setattr(self, name, self.makeFanOut(name, target))
+            else:
+                setattr(self, name, target)
+        chain.setWrapper(self)
+
+    def close(self) -> None:
+        """Puts the application's wrapper back, unless another proxy was put
+        in front of the manager since; the subscriptions stay."""
+        self.client.wrapperChain().restoreWrapper(self, self.wrapper)
+
+    def makeFanOut(self, name, target):
+        replayed = name in REPLAYED_CALLBACKS
+        byTickType = REPLAYED_CALLBACKS.get(name, False)
+
+        def fanOut(reqId, *args) -> None:
+            subscription = self.upstream.get(reqId)
+            if subscription is None:
+                target(reqId, *args)
+                return
+            with self.lock:
+                if replayed:
+                    subscription.last[(name, args[0] if byTickType else None)] = args
+                elif name == "error" and not isWarning(args[0]):
+                    # the request is dead: a later subscriber sends it again
+                    # and gets TWS' answer of its own
+                    self.drop(subscription)
+                for subscriberId in tuple(subscription.subscribers):
+                    target(subscriberId, *args)
+
+        return fanOut
+
+    def drop(self, subscription) -> None:
+        # called with self.lock held
+        subscription.failed = True
+        if self.subscriptions.get(subscription.key) is subscription:
+            del self.subscriptions[subscription.key]
+        self.upstream.pop(subscription.upstreamId, None)
+
+    def subscribe(self, reqId, key, send, cancel) -> None:
+        with self.lock:
+            if reqId in self.reqId2subscription:
+                raise ValueError("reqId %d is already subscribed" % reqId)
+            subscription = self.subscriptions.get(key)
+            isNew = subscription is None
+            if isNew:
+                subscription = Subscription(self.nextReqId, key, cancel)
+                self.nextReqId += 1
+                self.subscriptions[key] = subscription
+                self.upstream[subscription.upstreamId] = subscription
+            subscription.subscribers.append(reqId)
+            self.reqId2subscription[reqId] = subscription
+            if not isNew:
+                for (name, _), args in list(subscription.last.items()):
+                    getattr(self.wrapper, name)(reqId, *args)
+
+        if isNew:
+            send(subscription.upstreamId)
+
+    def unsubscribe(self, reqId) -> None:
+        with self.lock:
+            subscription = self.reqId2subscription.pop(reqId, None)
+            if subscription is None:
+                return
+            subscription.subscribers.remove(reqId)
+            if subscription.subscribers or subscription.failed:
+                return
+            del self.subscriptions[subscription.key]
+            del self.upstream[subscription.upstreamId]
+        subscription.cancel(subscription.upstreamId)
+
+    def nSubscribers(self, reqId) -> int:
+        """The subscribers sharing the subscription of reqId."""
+        subscription = self.reqId2subscription.get(reqId)
+        return len(subscription.subscribers) if subscription is not None else 0
+
+    ##########################################################################
+    # requests, same arguments as the EClient methods
+
+    def reqMktData(
+        self,
+        reqId,
+        contract,
+        genericTickList: str,
+        snapshot: bool,
+        regulatorySnapshot: bool,
+        mktDataOptions,
+    ) -> None:
+        """Snapshots are not shared, they are sent with reqId as they are."""
+        if snapshot or regulatorySnapshot:
+            self.client.reqMktData(
+                reqId,
+                contract,
+                genericTickList,
+                snapshot,
+                regulatorySnapshot,
+                mktDataOptions,
+            )
+            return
+        key = (
+            "mktData",
+            contractKey(contract),
+            genericTicksKey(genericTickList),
+            tuple(str(option) for option in mktDataOptions or []),
+        )
+        self.subscribe(
+            reqId,
+            key,
+            lambda upstreamId: self.client.reqMktData(
+                upstreamId, contract, genericTickList, False, False, mktDataOptions
+            ),
+            self.client.cancelMktData,
+        )
+
+    def cancelMktData(self, reqId) -> None:
+        if reqId in self.reqId2subscription:
+            self.unsubscribe(reqId)
+        else:
+            self.client.cancelMktData(reqId)
+
+    def reqTickByTickData(
+        self, reqId, contract, tickType: str, numberOfTicks: int, ignoreSize: bool
+    ) -> None:
+        key = ("tickByTick", contractKey(contract), tickType, numberOfTicks, ignoreSize)
+        self.subscribe(
+            reqId,
+            key,
+            lambda upstreamId: self.client.reqTickByTickData(
+                upstreamId, contract, tickType, numberOfTicks, ignoreSize
+            ),
+            self.client.cancelTickByTickData,
+        )
+
+    def cancelTickByTickData(self, reqId) -> None:
+        if reqId in self.reqId2subscription:
+            self.unsubscribe(reqId)
+        else:
+            self.client.cancelTickByTickData(reqId)
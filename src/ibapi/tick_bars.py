@@ -0,0 +1,248 @@
+"""Copyright (C) 2024 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+"""
+Aggregation of tick-by-tick data into bars.
+
+A TickBarAggregator listens to the tickByTickAllLast, tickByTickBidAsk and
+tickByTickMidPoint callbacks of a client. Each subscription (reqId) has a
+slot in one state table shared by all the instruments, kept as one array per
+field, and each tick updates its slot in constant time. Finished bars are
+collected and handed to the onBars callback in batches.
+
+Trades (AllLast) carry a size; for BidAsk ticks the midpoint is used as the
+price and for both BidAsk and MidPoint ticks the size is 0, so volume and
+dollar bars only make sense with AllLast. A time bar is finished by the
+first tick of a later interval.
+"""
+
+import array
+import logging
+import threading
+
+from ibapi.wrapper import EWrapper
+
+logger = logging.getLogger(__name__)
+
+"""
+TIME_BARS   = a bar every threshold seconds
+TICK_BARS   = a bar every threshold ticks
+VOLUME_BARS = a bar once threshold shares/contracts traded
+DOLLAR_BARS = a bar once threshold of price * size traded
+"""
+(TIME_BARS, TICK_BARS, VOLUME_BARS, DOLLAR_BARS) = range(4)
+
+
+class TickBar:
+    __slots__ = (
+        "reqId",
+        "time",
+        "open",
+        "high",
+        "low",
+        "close",
+        "volume",
+        "vwap",
+        "count",
+    )
+
+    def __init__(self, reqId, time, open_, high, low, close, volume, vwap, count):
+        self.reqId = reqId
+        self.time = time  # of the first tick, or of the bar start for TIME_BARS
+        self.open = open_
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.vwap = vwap  # of the priced trades, the close when there were none
+        self.count = count
+
+    def __str__(self) -> str:
+        return (
+            f"ReqId: {self.reqId}, Time: {self.time}, Open: {self.open}, "
+            f"High: {self.high}, Low: {self.low}, Close: {self.close}, "
+            f"Volume: {self.volume}, VWAP: {self.vwap}, Count: {self.count}"
+        )
+
+
+class TickBarAggregator(EWrapper):
+    def __init__(self, client, onBars, batchSize: int = 64, capacity: int = 64) -> None:
+        """client:EClient - The client whose tick-by-tick data is aggregated.
+            The aggregator registers itself as one of its wrapper listeners.
+        onBars - Called with a list of TickBar once batchSize bars are done,
+            and by flush().
+        batchSize:int - Bars collected before calling onBars.
+        capacity:int - Slots preallocated in the state table.
+        """
+        EWrapper.__init__(self)
+        self.client = client
+        self.onBars = onBars
+        self.batchSize = batchSize
+        self.lock = threading.Lock()
+        self.reqId2slot = {}
+        self.slot2reqId = []  # None for the free slots
+        self.freeSlots = []
+        self.done = []
+
+        # the state table, one entry per slot
+        self.capacity = capacity
+        self.kinds = array.array("b", bytes(capacity))
+        self.thresholds = array.array("d", bytes(capacity * 8))
+        self.starts = array.array("q", bytes(capacity * 8))
+        self.opens = array.array("d", bytes(capacity * 8))
+        self.highs = array.array("d", bytes(capacity * 8))
+        self.lows = array.array("d", bytes(capacity * 8))
+        self.closes = array.array("d", bytes(capacity * 8))
+        self.volumes = array.array("d", bytes(capacity * 8))
+        self.notionals = array.array("d", bytes(capacity * 8))
+        self.counts = array.array("q", bytes(capacity * 8))
+        client.addWrapperListener(self)
+
+    def close(self) -> None:
+        self.flush()
+        self.client.removeWrapperListener(self)
+
+    def addInstrument(self, reqId, kind: int, threshold: float) -> None:
+        """Aggregates the ticks of the reqTickByTickData request reqId.
+
+        kind:int - TIME_BARS, TICK_BARS, VOLUME_BARS or DOLLAR_BARS.
+        threshold:float - Seconds, ticks, volume or dollars per bar.
+        """
+        with self.lock:
+            if self.freeSlots:
+                slot = self.freeSlots.pop()
+                self.slot2reqId[slot] = reqId
+            else:
+                slot = len(self.slot2reqId)
+                if slot == self.capacity:
+                    self.capacity *= 2
+                    for column in self.columns():
+                        column.extend(
+                            array.array(column.typecode, bytes(slot * column.itemsize))
+                        )
+                self.slot2reqId.append(reqId)
+            self.reqId2slot[reqId] = slot
+            self.kinds[slot] = kind
+            self.thresholds[slot] = threshold
+            self.counts[slot] = 0
+
+    def removeInstrument(self, reqId) -> None:
+        """Stops aggregating reqId, eg: after cancelTickByTickData(), the bar
+        being formed is dropped."""
+        with self.lock:
+            slot = self.reqId2slot.pop(reqId, None)
+            if slot is not None:
+                self.slot2reqId[slot] = None
+                self.freeSlots.append(slot)
+
+    def columns(self) -> tuple:
+        return (
+            self.kinds,
+            self.thresholds,
+            self.starts,
+            self.opens,
+            self.highs,
+            self.lows,
+            self.closes,
+            self.volumes,
+            self.notionals,
+            self.counts,
+        )
+
+    def flush(self) -> None:
+        """Hands the finished bars to onBars, whatever their number."""
+        with self.lock:
+            bars = self.done
+            self.done = []
+        if bars:
+            self.onBars(bars)
+
+    def closeBar(self, slot) -> None:
+        # called with self.lock held
+        volume = self.volumes[slot]
+        self.done.append(
+            TickBar(
+                self.slot2reqId[slot],
+                self.starts[slot],
+                self.opens[slot],
+                self.highs[slot],
+                self.lows[slot],
+                self.closes[slot],
+                volume,
+                self.notionals[slot] / volume if volume else self.closes[slot],
+                self.counts[slot],
+            )
+        )
+        self.counts[slot] = 0
+
+    def onTick(self, reqId, time, price, size) -> None:
+        with self.lock:
+            slot = self.reqId2slot.get(reqId)
+            if slot is None:
+                return
+            kind = self.kinds[slot]
+            count = self.counts[slot]
+
+            if kind == TIME_BARS:
+                seconds = int(self.thresholds[slot])
+                barStart = time - time % seconds
+                if count and barStart != self.starts[slot]:
+                    self.closeBar(slot)
+                    count = 0
+            else:
+                barStart = time
+
+            if count == 0:
+                self.starts[slot] = barStart
+                self.opens[slot] = self.highs[slot] = self.lows[slot] = price
+                self.volumes[slot] = 0.0
+                self.notionals[slot] = 0.0
+            elif price > self.highs[slot]:
+                self.highs[slot] = price
+            elif price < self.lows[slot]:
+                self.lows[slot] = price
+            self.closes[slot] = price
+            self.volumes[slot] += size
+            self.notionals[slot] += price * size
+            self.counts[slot] = count + 1
+
+            if (
+                (kind == TICK_BARS and count + 1 >= self.thresholds[slot])
+                or (kind == VOLUME_BARS and self.volumes[slot] >= self.thresholds[slot])
+                or (
+                    kind == DOLLAR_BARS
+                    and self.notionals[slot] >= self.thresholds[slot]
+                )
+            ):
+                self.closeBar(slot)
+
+            if len(self.done) < self.batchSize:
+                return
+            bars = self.done
+            self.done = []
+        self.onBars(bars)
+
+    ##########################################################################
+    # ticks
+
+    def tickByTickAllLast(
+        self,
+        reqId,
+        tickType,
+        time,
+        price,
+        size,
+        tickAttribLast,
+        exchange,
+        specialConditions,
+    ) -> None:
+        self.onTick(reqId, time, price, float(size))
+
+    def tickByTickBidAsk(
+        self, reqId, time, bidPrice, askPrice, bidSize, askSize, tickAttribBidAsk
+    ) -> None:
+        self.onTick(reqId, time, (bidPrice + askPrice) / 2, 0.0)
+
+    def tickByTickMidPoint(self, reqId, time, midPoint) -> None:
+        self.onTick(reqId, time, midPoint, 0.0)
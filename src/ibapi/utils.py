@@ -2,9 +2,14 @@
 and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
 """
 
+import calendar
+import datetime
 import inspect
 import logging
+import math
 import sys
+import time
+import zoneinfo
 from decimal import Decimal
 
 from ibapi.const import (
@@ -141,6 +146,16 @@ def decode(the_type, fields, show_unset=False, use_unicode=False):
     return n
 
 
+UNSET_FIELDS = (b"", b"2147483647", b"9223372036854775807", b"1.7976931348623157E308")
+
+
+def decodeFloatOrNan(fields) -> float:
+    """Same as decode(float, fields), with NaN for unset values. Used on the
+    paths that skip the Decimal and BarData objects."""
+    s = next(fields)
+    return math.nan if s in UNSET_FIELDS else float(s)
+
+
 def ExerciseStaticMethods(klass) -> None:
     import types
 
@@ -188,6 +203,39 @@ def isPegBestOrder(orderType: str):
     return orderType in ("PEG BEST", "PEGBEST")
 
 
+def barDateToEpoch(date: str) -> int:
+    """Returns BarData.date as seconds since the epoch. Intraday bars requested
+    with formatDate=2 are that already; daily bars (yyyymmdd) are taken at
+    00:00 UTC and formatDate=1 dates (yyyymmdd hh:mm:ss [tz]) in their time
+    zone, UTC if there is none. An unknown time zone raises ValueError."""
+    if len(date) == 8:
+        return calendar.timegm(time.strptime(date, "%Y%m%d"))
+    if date.isdigit():
+        return int(date)
+    local = datetime.datetime.strptime(date[:17].replace("-", " "), "%Y%m%d %H:%M:%S")
+    timeZone = date[17:].strip()
+    if not timeZone:
+        return calendar.timegm(local.timetuple())
+    try:
+        tzinfo = zoneinfo.ZoneInfo(timeZone)
+    except (zoneinfo.ZoneInfoNotFoundError, ValueError) as ex:
+        raise ValueError(f"unknown time zone in bar date {date!r}") from ex
+    return int(local.replace(tzinfo=tzinfo).timestamp())
+
+
+def scheduleTimeToEpoch(dateTime: str, timeZone: str) -> int:
+    """Returns a time of historicalSchedule() (yyyymmdd-hh:mm:ss in the
+    timeZone of the schedule) as seconds since the epoch."""
+    local = datetime.datetime.strptime(dateTime, "%Y%m%d-%H:%M:%S")
+    return int(local.replace(tzinfo=zoneinfo.ZoneInfo(timeZone)).timestamp())
+
+
+def epochToDateTime(epoch: int) -> str:
+    """Returns the UTC yyyymmdd-hh:mm:ss form of a time, as accepted by the
+    endDateTime of the historical data requests."""
+    return time.strftime("%Y%m%d-%H:%M:%S", time.gmtime(epoch))
+
+
 def log_(func, params, action) -> None:
     if logger.isEnabledFor(logging.INFO):
         if "self" in params:
@@ -0,0 +1,89 @@
+"""Copyright (C) 2024 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+"""
+Fan out of the EWrapper callbacks.
+
+The Decoder only knows about one wrapper. Helpers that need to see the
+answers too (eg: to learn that an order was acknowledged) register as
+listeners through EClient.addWrapperListener() and the client then decodes
+into a WrapperChain instead of the application's wrapper.
+"""
+
+import inspect
+import logging
+
+from ibapi.wrapper import EWrapper
+
+logger = logging.getLogger(__name__)
+
+CALLBACKS = tuple(
+    name
+    for name, _ in inspect.getmembers(EWrapper, inspect.isfunction)
+    if not name.startswith("_")
+)
+
+
+def overrides(listener, name) -> bool:
+    return getattr(type(listener), name, None) is not getattr(EWrapper, name)
+
+
+class WrapperChain(EWrapper):
+    """Calls the listeners, in the order they were added, and then the
+    application's wrapper. Listeners are EWrapper subclasses and only the
+    methods they override are called. The dispatch is worked out whenever
+    the listeners change, so a callback nobody listens to costs the same as
+    calling the application's wrapper directly.
+    """
+
+    def __init__(self, wrapper) -> None:
+        EWrapper.__init__(self)
+        self.wrapper = wrapper
+        self.listeners = []
+        self.rebuild()
+
+    def addListener(self, listener) -> None:
+        if listener not in self.listeners:
+            self.listeners.append(listener)
+            self.rebuild()
+
+    def removeListener(self, listener) -> None:
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+            self.rebuild()
+
+    def setWrapper(self, wrapper) -> None:
+        """Replaces the application's wrapper, eg: by a proxy in front of it."""
+        self.wrapper = wrapper
+        self.rebuild()
+
+    def restoreWrapper(self, proxy, wrapper) -> bool:
+        """Puts wrapper back in place of proxy, eg: when the proxy is closed,
+        unless another proxy was put in front since; returns False then, and
+        proxy has to keep passing the callbacks on."""
+        if self.wrapper is not proxy:
+            return False
+        self.setWrapper(wrapper)
+        return True
+
+    def rebuild(self) -> None:
+        for name in CALLBACKS:
+            targets = [
+                getattr(listener, name)
+                for listener in self.listeners
+                if overrides(listener, name)
+            ]
+            targets.append(getattr(self.wrapper, name))
+            if len(targets) == 1:
+                setattr(self, name, targets[0])
+            else:
+                setattr(self, name, self.makeFanOut(tuple(targets)))
+
+    @staticmethod
+    def makeFanOut(targets):
+        def fanOut(*args, **kwargs) -> None:
+            for target in targets:
+                target(*args, **kwargs)
+
+        return fanOut
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import pytest
+
+from ibapi.client import EClient
+from ibapi.contract import Contract
+from ibapi.server_versions import MAX_CLIENT_VER, ServerCapabilities
+from ibapi.wrapper import EWrapper
+from ibapi.wrapper_chain import WrapperChain
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+
+class FakeConnection:
+    """Stands for the Connection of an EClient, keeps what is sent."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.sent: list[bytes] = []
+
+    def isConnected(self) -> bool:
+        return True
+
+    def sendMsg(self, msg: bytes) -> int:
+        self.sent.append(msg)
+        return len(msg)
+
+
+class FakeClient:
+    """Stands for an EClient to the helpers registering as its wrapper
+    listeners. The requests and cancels are kept in sent as (method name,
+    reqId, *args); callback() decodes a callback into the WrapperChain."""
+
+    def __init__(self, wrapper: EWrapper | None = None) -> None:
+        super().__init__()
+        self.wrapper = WrapperChain(wrapper if wrapper is not None else EWrapper())
+        self.sent: list[tuple] = []
+        self.sinks: dict = {}
+
+    def __getattr__(self, name: str) -> Callable[..., None]:
+        if not name.startswith(("req", "cancel")):
+            raise AttributeError(name)
+
+        def send(*args) -> None:
+            self.sent.append((name, *args))
+
+        return send
+
+    @property
+    def listeners(self) -> list[EWrapper]:
+        return self.wrapper.listeners
+
+    def addWrapperListener(self, listener: EWrapper) -> None:
+        self.wrapper.addListener(listener)
+
+    def removeWrapperListener(self, listener: EWrapper) -> None:
+        self.wrapper.removeListener(listener)
+
+    def wrapperChain(self) -> WrapperChain:
+        return self.wrapper
+
+    def setBarSink(self, reqId: int, sink) -> None:
+        self.sinks[reqId] = sink
+
+    def removeBarSink(self, reqId: int) -> None:
+        self.sinks.pop(reqId, None)
+
+    def callback(self, name: str, *args) -> None:
+        getattr(self.wrapper, name)(*args)
+
+    def requests(self, name: str) -> list[tuple]:
+        """The arguments of the name requests sent, reqId first."""
+        return [call[1:] for call in self.sent if call[0] == name]
+
+
+class Clock:
+    """A clock moved by hand, see now."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def make_client() -> Callable[..., tuple[EClient, FakeConnection]]:
+    """Returns a factory of EClients connected to a FakeConnection."""
+
+    def make(
+        serverVersion: int = MAX_CLIENT_VER, wrapper: EWrapper | None = None
+    ) -> tuple[EClient, FakeConnection]:
+        client = EClient(wrapper if wrapper is not None else EWrapper())
+        client.conn = conn = FakeConnection()
+        client.serverVersion_ = serverVersion
+        client.serverCaps = ServerCapabilities(serverVersion)
+        client.connState = EClient.CONNECTED
+        return client, conn
+
+    return make
+
+
+@pytest.fixture
+def fake_connection() -> FakeConnection:
+    return FakeConnection()
+
+
+@pytest.fixture
+def make_fake_client() -> Callable[..., FakeClient]:
+    return FakeClient
+
+
+@pytest.fixture
+def fake_client() -> FakeClient:
+    return FakeClient()
+
+
+@pytest.fixture
+def clock() -> Clock:
+    return Clock()
+
+
+@pytest.fixture
+def make_contract() -> Callable[..., Contract]:
+    """Returns a factory of contracts, a US stock by default."""
+
+    def make(symbol: str = "AAPL", **fields) -> Contract:
+        contract = Contract()
+        contract.symbol = symbol
+        contract.secType = "STK"
+        contract.exchange = "SMART"
+        contract.currency = "USD"
+        for name, value in fields.items():
+            setattr(contract, name, value)
+        return contract
+
+    return make
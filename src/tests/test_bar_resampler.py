@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from ibapi.bar_resampler import RealTimeBarResampler
+from ibapi.client import EClient
+from ibapi.decoder import Decoder
+from ibapi.message import IN
+from ibapi.server_versions import MAX_CLIENT_VER
+from ibapi.wrapper import EWrapper
+
+
+class _Wrapper(EWrapper):
+    def realtimeBar(self, *args) -> None:
+        raise AssertionError("bar should have gone to the resampler")
+
+
+def _realTimeBar(decoder: Decoder, reqId: int, time: int, price: float) -> None:
+    fields = [IN.REAL_TIME_BARS, 3, reqId, time, price, price + 1, price - 1, price]
+    fields += [10, price, 2]
+    decoder.interpret(tuple(str(field).encode() for field in fields))
+
+
+class TestRealTimeBarResampler:
+    def test_completed_bars_are_emitted_once(self) -> None:
+        client = EClient(_Wrapper())
+        bars: list[tuple] = []
+        resampler = RealTimeBarResampler(
+            client, [15, 30], lambda *bar: bars.append(bar), maxRequests=2
+        )
+        resampler.addRequest(7)
+        decoder = Decoder(client.wrapper, MAX_CLIENT_VER)
+        decoder.barSinks = client.barSinks
+
+        for time, price in [(0, 1.0), (5, 2.0), (10, 3.0), (15, 4.0), (20, 5.0)]:
+            _realTimeBar(decoder, 7, time, price)
+        assert bars == [(7, 15, 0, 1.0, 4.0, 0.0, 3.0, 30.0, 2.0, 6)]
+        _realTimeBar(decoder, 7, 30, 6.0)  # 25 is missing
+        assert bars[1:] == [
+            (7, 15, 15, 4.0, 6.0, 3.0, 5.0, 20.0, 4.5, 4),
+            (7, 30, 0, 1.0, 6.0, 0.0, 5.0, 50.0, 3.0, 10),
+        ]
+
+        resampler.removeRequest(7)
+        assert 7 not in client.barSinks
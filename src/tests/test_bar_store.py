@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import math
+import threading
+from typing import TYPE_CHECKING
+
+import pytest
+
+from ibapi.bar_store import BarSeries, BarStore
+from ibapi.common import BarData
+from ibapi.contract import Contract
+from ibapi.decoder import Decoder
+from ibapi.message import IN
+from ibapi.server_versions import MAX_CLIENT_VER
+from ibapi.utils import barDateToEpoch
+from ibapi.wrapper import EWrapper
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+class _RecordingWrapper(EWrapper):
+    def __init__(self) -> None:
+        super().__init__()
+        self.bars = 0
+        self.ended: list[int] = []
+
+    def historicalData(self, reqId, bar) -> None:
+        self.bars += 1
+
+    def historicalDataEnd(self, reqId, start, end) -> None:
+        self.ended.append(reqId)
+
+
+class TestBarSeries:
+    def test_append_and_range(self, tmp_path: Path) -> None:
+        series = BarSeries(str(tmp_path), initialCapacity=4)
+        for i in range(10):
+            assert series.appendBar(i * 60, 1.0, 2.0, 0.5, 1.5, 100.0, 1.2, i)
+        assert series.appendBar(9 * 60, 1.0, 3.0, 0.5, 2.5, 150.0, 1.3, 9)
+        assert not series.appendBar(0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1)
+        assert len(series) == 10
+        cols = series.range(120, 300)
+        assert list(cols["time"]) == [120, 180, 240]
+        assert series.columns()["close"][-1] == 2.5
+        series.close()
+        reopened = BarSeries(str(tmp_path))
+        assert list(reopened.columns()["barCount"]) == list(range(10))
+        reopened.close()
+
+    def test_read_while_growing(self, tmp_path: Path) -> None:
+        series = BarSeries(str(tmp_path), initialCapacity=2)
+        errors = []
+
+        def read() -> None:
+            try:
+                while len(series) < 2000:
+                    columns = series.range(0, 2000)
+                    assert len(columns["time"]) == len(columns["close"])
+                    series.columns(0, 10)
+            except Exception as ex:
+                errors.append(ex)
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        for t in range(2000):
+            series.appendBar(t, 1.0, 1.0, 1.0, float(t), 1.0, 1.0, 1)
+        reader.join(timeout=30)
+        assert not errors
+        assert list(series.range(1990, 2000)["close"]) == [
+            float(t) for t in range(1990, 2000)
+        ]
+        series.close()
+
+    def test_from_bar_data(self, tmp_path: Path) -> None:
+        store = BarStore(str(tmp_path))
+        contract = Contract()
+        contract.conId = 265598
+        series = store.series(contract, "1 day")
+        assert store.series(contract, "1 day") is series
+        bar = BarData()
+        bar.date = "20240102"
+        bar.close = 185.6
+        series.append(bar)
+        assert series.columns()["time"][0] == 1704153600
+        assert math.isnan(series.columns()["volume"][0])
+        store.close()
+
+    def test_bar_dates(self) -> None:
+        assert barDateToEpoch("1704205800") == 1704205800
+        assert barDateToEpoch("20240102 14:30:00") == 1704205800
+        assert barDateToEpoch("20240102-14:30:00") == 1704205800
+        assert barDateToEpoch("20240102 09:30:00 US/Eastern") == 1704205800
+        assert barDateToEpoch("20240102 15:30:00 Europe/Berlin") == 1704205800
+        with pytest.raises(ValueError, match="time zone"):
+            barDateToEpoch("20240102 09:30:00 Nowhere/Else")
+
+
+class TestBarSink:
+    def test_decoder_streams_into_sink(self, tmp_path: Path) -> None:
+        wrapper = _RecordingWrapper()
+        decoder = Decoder(wrapper, MAX_CLIENT_VER)
+        series = BarSeries(str(tmp_path))
+        decoder.barSinks[7] = series
+        fields = [str(IN.HISTORICAL_DATA), "7", "start", "end", "2"]
+        for t in (1704153600, 1704153660):
+            fields += [str(t), "1.5", "2", "1", "1.75", "300", "1.6", "12"]
+        decoder.interpret(tuple(field.encode() for field in fields))
+        assert wrapper.bars == 0
+        assert wrapper.ended == [7]
+        assert list(series.columns()["time"]) == [1704153600, 1704153660]
+        assert list(series.columns()["volume"]) == [300.0, 300.0]
+        series.close()
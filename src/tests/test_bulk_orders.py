@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from decimal import Decimal
+
+from ibapi.order import Order
+from ibapi.order_cancel import OrderCancel
+from ibapi.server_versions import MIN_SERVER_VER_INELIGIBILITY_REASONS
+from ibapi.wrapper import EWrapper
+
+
+class _RecordingWrapper(EWrapper):
+    def __init__(self) -> None:
+        super().__init__()
+        self.errors: list[tuple[int, int]] = []
+
+    def error(self, reqId, errorCode, errorString, advancedOrderRejectJson="") -> None:
+        self.errors.append((reqId, errorCode))
+
+
+def _order(price: float) -> Order:
+    order = Order()
+    order.action = "BUY"
+    order.orderType = "LMT"
+    order.totalQuantity = Decimal(100)
+    order.lmtPrice = price
+    return order
+
+
+class TestBulkOrders:
+    def test_place_orders_single_send(self, make_client, make_contract) -> None:
+        client, conn = make_client()
+        orders = [(i, make_contract(), _order(10.0 + i)) for i in range(1, 4)]
+        client.placeOrders(orders)
+        single, singleConn = make_client()
+        for orderId, contract, order in orders:
+            single.placeOrder(orderId, contract, order)
+        assert conn.sent == [b"".join(singleConn.sent)]
+
+    def test_invalid_order_reported_and_skipped(
+        self, make_client, make_contract
+    ) -> None:
+        client, conn = make_client(
+            MIN_SERVER_VER_INELIGIBILITY_REASONS, _RecordingWrapper()
+        )
+        good = (1, make_contract(), _order(10.0))
+        bad = (2, make_contract(), _order(11.0))
+        bad[2].externalUserId = "U1"  # needs MIN_SERVER_VER_RFQ_FIELDS
+        client.placeOrders([good, bad])
+        single, singleConn = make_client(MIN_SERVER_VER_INELIGIBILITY_REASONS)
+        single.placeOrder(*good)
+        assert conn.sent == singleConn.sent
+        assert [reqId for reqId, _ in client.wrapper.errors] == [2]
+
+    def test_cancel_orders_single_send(self, make_client) -> None:
+        client, conn = make_client()
+        client.cancelOrders([(i, OrderCancel()) for i in range(1, 4)])
+        single, singleConn = make_client()
+        for i in range(1, 4):
+            single.cancelOrder(i, OrderCancel())
+        assert conn.sent == [b"".join(singleConn.sent)]
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+from copy import copy
+
+from ibapi.contract import Contract
+from ibapi.contract_encoder import MKT_DATA, PLACE_ORDER, encodeContract
+from ibapi.server_versions import (
+    MAX_CLIENT_VER,
+    MIN_SERVER_VER_TRADING_CLASS,
+    ServerCapabilities,
+)
+
+_CAPS = ServerCapabilities(MAX_CLIENT_VER)
+
+
+def _make_contract() -> Contract:
+    contract = Contract()
+    contract.symbol = "AAPL"
+    contract.secType = "STK"
+    contract.exchange = "SMART"
+    contract.currency = "USD"
+    return contract
+
+
+class TestEncodeContract:
+    def test_cached_per_family_and_server_version(self) -> None:
+        contract = _make_contract()
+        first = encodeContract(contract, MKT_DATA, _CAPS)
+        assert encodeContract(contract, MKT_DATA, _CAPS) is first
+        assert set(contract.encodedFields) == {(MKT_DATA, MAX_CLIENT_VER)}
+        _ = encodeContract(contract, PLACE_ORDER, _CAPS)
+        _ = encodeContract(
+            contract, MKT_DATA, ServerCapabilities(MIN_SERVER_VER_TRADING_CLASS - 1)
+        )
+        assert len(contract.encodedFields) == 3
+
+    def test_mutation_invalidates(self) -> None:
+        contract = _make_contract()
+        before = encodeContract(contract, MKT_DATA, _CAPS)
+        contract.symbol = "MSFT"
+        after = encodeContract(contract, MKT_DATA, _CAPS)
+        assert after != before
+        assert "MSFT\0" in after
+
+    def test_copies_are_independent(self) -> None:
+        contract = _make_contract()
+        _ = encodeContract(contract, MKT_DATA, _CAPS)
+        other = copy(contract)
+        other.symbol = "MSFT"
+        _ = encodeContract(other, MKT_DATA, _CAPS)
+        assert "AAPL\0" in encodeContract(contract, MKT_DATA, _CAPS)
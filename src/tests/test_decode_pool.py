@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import multiprocessing
+from decimal import Decimal
+
+from ibapi.decode_pool import DecodePool
+from ibapi.message import IN
+from ibapi.order import Order
+from ibapi.server_versions import MAX_CLIENT_VER
+from ibapi.ticktype import TickTypeEnum
+from ibapi.wrapper import EWrapper
+
+
+class _Wrapper(EWrapper):
+    def __init__(self, worker: int, results) -> None:
+        EWrapper.__init__(self)
+        self.worker = worker
+        self.results = results
+
+    def tickPrice(self, reqId, tickType, price, attrib) -> None:
+        self.results.put((self.worker, "tickPrice", reqId, price))
+
+    def orderStatus(self, orderId, status, *args) -> None:
+        self.results.put((self.worker, "orderStatus", orderId, status))
+
+    def error(self, reqId, errorCode, errorString, advancedOrderRejectJson="") -> None:
+        self.results.put((self.worker, "error", reqId, errorCode))
+
+    def connectionClosed(self) -> None:
+        self.results.put((self.worker, "connectionClosed", None, None))
+
+
+def _makeWrapper(worker: int, results) -> _Wrapper:
+    return _Wrapper(worker, results)
+
+
+def _msg(*fields) -> bytes:
+    return b"".join(str(field).encode() + b"\0" for field in fields)
+
+
+class TestDecodePool:
+    def test_dispatch_by_reqId(self) -> None:
+        context = multiprocessing.get_context("spawn")
+        results = context.Queue()
+        pool = DecodePool(
+            _makeWrapper, nWorkers=2, args=(results,), batchSize=4, context="spawn"
+        )
+        pool.start(MAX_CLIENT_VER)
+        for i in range(6):
+            for reqId in (1, 2):
+                pool.dispatch(_msg(IN.TICK_PRICE, 6, reqId, TickTypeEnum.LAST, i, 1, 0))
+        pool.dispatch(_msg(IN.ORDER_STATUS, 7, "Submitted", 0, 1, 0, 8, 0, 0, 0, "", 0))
+        pool.dispatch(_msg(IN.ERR_MSG, 2, 7, 202, "Order Canceled", ""))
+        pool.dispatch(_msg(IN.ERR_MSG, 2, 3, 200, "No security definition", ""))
+        pool.stop(timeout=30)
+
+        received = [results.get(timeout=30) for _ in range(17)]
+        for reqId, worker in ((1, 1), (2, 0)):
+            assert [
+                (w, price)
+                for w, name, r, price in received
+                if name == "tickPrice" and r == reqId
+            ] == [(worker, float(i)) for i in range(6)]
+        assert (0, "orderStatus", 7, "Submitted") in received
+        # the error of an order goes to the pinned worker, with its status
+        assert (0, "error", 7, 202) in received
+        assert (1, "error", 3, 200) in received
+        assert pool.nDispatched == [8, 7]
+        assert pool.nBatches == [2, 2]
+
+    def test_placed_order_errors_pinned(self, make_client, make_contract) -> None:
+        client, conn = make_client()
+        pool = DecodePool(_makeWrapper, nWorkers=2)
+        pool.watchOrders(client)
+        order = Order()
+        order.action = "BUY"
+        order.orderType = "LMT"
+        order.totalQuantity = Decimal(100)
+        order.lmtPrice = 10.0
+        client.placeOrder(9, make_contract(), order)
+        client.placeOrders([(11, make_contract(), order)])
+        client.placeTemplateOrder(15, client.makeOrderTemplate(make_contract(), order))
+        assert len(conn.sent) == 3
+        # an execution answering reqExecutions(5) of order 17
+        pool.workerOf(_msg(IN.EXECUTION_DATA, 5, 17, 265598, "AAPL"))
+        for reqId, worker in ((9, 0), (11, 0), (15, 0), (17, 0), (5, 1), (13, 1)):
+            msg = _msg(IN.ERR_MSG, 2, reqId, 201, "Order rejected", "")
+            assert pool.workerOf(msg) == worker
+        pool.unwatchOrders(client)
+        client.placeOrder(19, make_contract(), order)
+        assert 19 not in pool.orderIds
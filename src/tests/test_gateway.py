@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import socket
+import struct
+import threading
+import time
+from typing import Callable
+
+from ibapi.client import EClient
+from ibapi.common import TickAttrib
+from ibapi.contract import Contract
+from ibapi.gateway import Gateway, frame
+from ibapi.message import IN, OUT
+from ibapi.order import Order
+from ibapi.server_versions import MAX_CLIENT_VER
+from ibapi.wrapper import EWrapper
+
+
+class _StandInTws:
+    """Just enough of TWS: the handshake, startApi and a record of requests."""
+
+    def __init__(self) -> None:
+        self.server = socket.create_server(("127.0.0.1", 0))
+        self.port = self.server.getsockname()[1]
+        self.received: list[list[bytes]] = []
+        self.sock: socket.socket | None = None
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    def recv(self, n: int) -> bytes:
+        buf = b""
+        while len(buf) < n:
+            data = self.sock.recv(n - len(buf))
+            if not data:
+                raise ConnectionError
+            buf += data
+        return buf
+
+    def recvMsg(self) -> list[bytes]:
+        size = struct.unpack("!I", self.recv(4))[0]
+        return self.recv(size).split(b"\0")[:-1]
+
+    def serve(self) -> None:
+        self.sock, _ = self.server.accept()
+        assert self.recv(4) == b"API\0"
+        self.recvMsg()
+        self.send(str(MAX_CLIENT_VER), "20240102 10:00:00 UTC")
+        try:
+            while True:
+                fields = self.recvMsg()
+                if int(fields[0]) == OUT.START_API:
+                    self.send(IN.NEXT_VALID_ID, 1, 100)
+                    self.send(IN.MANAGED_ACCTS, 1, "DU1")
+                else:
+                    self.received.append(fields)
+        except OSError:
+            pass
+
+    def send(self, *fields) -> None:
+        self.sock.sendall(frame([str(field).encode() for field in fields]))
+
+    def close(self) -> None:
+        if self.sock is not None:
+            self.sock.close()
+        self.server.close()
+
+
+class _App(EWrapper):
+    def __init__(self) -> None:
+        EWrapper.__init__(self)
+        self.ready = threading.Event()
+        self.ticks: list[tuple] = []
+        self.statuses: list[tuple] = []
+        self.errors: list[tuple] = []
+
+    def nextValidId(self, orderId: int) -> None:
+        self.ready.set()
+
+    def tickPrice(self, reqId, tickType, price, attrib: TickAttrib) -> None:
+        self.ticks.append((reqId, tickType, price))
+
+    def orderStatus(self, orderId, status, filled, remaining, *args) -> None:
+        self.statuses.append((orderId, status))
+
+    def error(self, reqId, errorCode, errorString, advancedOrderRejectJson="") -> None:
+        self.errors.append((reqId, errorCode))
+
+
+def _connect(port: int, clientId: int) -> tuple[EClient, _App]:
+    app = _App()
+    client = EClient(app)
+    client.connect("127.0.0.1", port, clientId)
+    threading.Thread(target=client.run, daemon=True).start()
+    assert app.ready.wait(5)
+    return client, app
+
+
+def _waitFor(condition: Callable[[], bool]) -> None:
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def _contract() -> Contract:
+    contract = Contract()
+    contract.symbol = "IBM"
+    contract.secType = "STK"
+    contract.exchange = "SMART"
+    contract.currency = "USD"
+    return contract
+
+
+def _order() -> Order:
+    order = Order()
+    order.action = "BUY"
+    order.orderType = "LMT"
+    order.totalQuantity = 1
+    order.lmtPrice = 99.0
+    return order
+
+
+class TestGateway:
+    def test_shared_subscription_and_order_ids(self) -> None:
+        tws = _StandInTws()
+        gateway = Gateway("127.0.0.1", tws.port, 0, port=0)
+        gateway.start()
+        (client1, app1), (client2, app2) = (
+            _connect(gateway.port, 1),
+            _connect(gateway.port, 2),
+        )
+        try:
+            client1.reqMktData(1, _contract(), "", False, False, [])
+            _waitFor(lambda: len(tws.received) == 1)
+            upstreamId = int(tws.received[0][2])
+            tws.send(IN.TICK_PRICE, 6, upstreamId, 1, 99.5, 100, 0)
+            _waitFor(lambda: (1, 1, 99.5) in app1.ticks)
+
+            # same subscription: not sent again, the last ticks are replayed
+            client2.reqMktData(7, _contract(), "", False, False, [])
+            _waitFor(lambda: (7, 1, 99.5) in app2.ticks)
+            tws.send(IN.TICK_PRICE, 6, upstreamId, 2, 99.6, 100, 0)
+            _waitFor(lambda: (1, 2, 99.6) in app1.ticks and (7, 2, 99.6) in app2.ticks)
+
+            # each app uses order id 1, they get distinct upstream ids
+            order = _order()
+            client1.placeOrder(1, _contract(), order)
+            client2.placeOrder(1, _contract(), order)
+            _waitFor(lambda: len(tws.received) == 3)
+            orderIds = [int(fields[1]) for fields in tws.received[1:]]
+            assert orderIds[0] != orderIds[1] and min(orderIds) >= 100
+            tws.send(
+                IN.ORDER_STATUS, orderIds[1], "Submitted", 0, 1, 0, 0, 0, 0, 2, "", 0
+            )
+            _waitFor(lambda: app2.statuses == [(1, "Submitted")])
+            assert app1.statuses == []
+
+            # the upstream subscription goes with its last app
+            client1.cancelMktData(1)
+            client2.cancelMktData(7)
+            _waitFor(lambda: len(tws.received) == 4)
+            assert tws.received[3][0] == str(OUT.CANCEL_MKT_DATA).encode()
+            assert int(tws.received[3][2]) == upstreamId
+        finally:
+            client1.disconnect()
+            client2.disconnect()
+            gateway.stop()
+            tws.close()
+
+    def test_route_lifecycle_and_parent_ids(self) -> None:
+        tws = _StandInTws()
+        gateway = Gateway("127.0.0.1", tws.port, 0, port=0)
+        gateway.start()
+        client, app = _connect(gateway.port, 1)
+        try:
+            # a one-shot request is forgotten on its end
+            client.reqContractDetails(3, _contract())
+            _waitFor(lambda: len(tws.received) == 1)
+            upstreamId = int(tws.received[0][2])
+            tws.send(IN.CONTRACT_DATA_END, 1, upstreamId)
+            _waitFor(lambda: upstreamId not in gateway.routes)
+            assert 3 not in gateway.sessions[0].reqIds
+
+            client.reqTickByTickData(4, _contract(), "Last", 0, False)
+            _waitFor(lambda: len(tws.received) == 2)
+            tickByTickId = int(tws.received[1][1])
+
+            # the parent of a bracket order is the session's
+            parent = _order()
+            parent.transmit = False
+            client.placeOrder(10, _contract(), parent)
+            child = _order()
+            child.parentId = 10
+            client.placeOrder(11, _contract(), child)
+            _waitFor(lambda: len(tws.received) == 4)
+            assert tws.received[3][28] == tws.received[2][1]
+            child.parentId = 99
+            client.placeOrder(12, _contract(), child)
+            _waitFor(lambda: app.errors == [(12, 135)])
+
+            # the streams of a session leaving are cancelled
+            client.disconnect()
+            _waitFor(lambda: len(tws.received) == 5)
+            assert tws.received[4] == [
+                str(OUT.CANCEL_TICK_BY_TICK_DATA).encode(),
+                str(tickByTickId).encode(),
+            ]
+        finally:
+            client.disconnect()
+            gateway.stop()
+            tws.close()
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import json
+import threading
+from typing import TYPE_CHECKING
+
+import pytest
+
+from ibapi.common import BarData
+from ibapi.historical_downloader import DAY, HistoricalDownloader
+from ibapi.utils import barDateToEpoch
+from ibapi.wrapper import EWrapper
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+START = 1704067200  # 20240101 00:00:00 UTC
+
+
+def _answer(client, reqId: int, times: list[int]) -> None:
+    for t in times:
+        bar = BarData()
+        bar.date = str(t)
+        client.callback("historicalData", reqId, bar)
+    client.callback("historicalDataEnd", reqId, "", "")
+
+
+def _requests(client) -> list[tuple[int, str, str]]:
+    return [
+        (reqId, end, duration)
+        for reqId, _, end, duration, *_ in client.requests("reqHistoricalData")
+    ]
+
+
+class _RecordingWrapper(EWrapper):
+    def __init__(self) -> None:
+        super().__init__()
+        self.times: list[int] = []
+        self.ended = 0
+
+    def historicalData(self, reqId, bar) -> None:
+        self.times.append(barDateToEpoch(bar.date))
+
+    def historicalDataEnd(self, reqId, start, end) -> None:
+        self.ended += 1
+
+
+class TestHistoricalDownloader:
+    def test_chunks_reassembled_in_order(
+        self, tmp_path: Path, make_fake_client, make_contract
+    ) -> None:
+        clients = [make_fake_client(), make_fake_client()]
+        downloader = HistoricalDownloader(clients)
+        wrapper = _RecordingWrapper()
+        checkpoint = tmp_path / "job.json"
+        downloader.download(
+            1,
+            make_contract(),
+            START,
+            START + 3 * DAY,
+            "1 min",
+            "TRADES",
+            1,
+            wrapper,
+            str(checkpoint),
+        )
+        sent = [(client, req) for client in clients for req in _requests(client)]
+        assert len(sent) == 3
+        assert all(duration == "1 D" for _, (_, _, duration) in sent)
+        byEnd = sorted(sent, key=lambda item: item[1][1])
+        for i, (client, (reqId, _, _)) in reversed(list(enumerate(byEnd))):
+            # the last bar overlaps the next chunk and must be dropped
+            _answer(
+                client,
+                reqId,
+                [START + i * DAY, START + i * DAY + 60, START + (i + 1) * DAY],
+            )
+        assert wrapper.times == sorted({
+            START + i * DAY + s for i in range(3) for s in (0, 60)
+        })
+        assert wrapper.ended == 1
+        assert json.loads(checkpoint.read_text())["next"] == 3
+        downloader.close()
+
+    def test_resume_from_checkpoint(
+        self, tmp_path: Path, fake_client, make_contract
+    ) -> None:
+        client = fake_client
+        downloader = HistoricalDownloader([client])
+        wrapper = _RecordingWrapper()
+        contract = make_contract()
+        checkpoint = tmp_path / "job.json"
+        spec = [0, str(contract), START, START + 3 * DAY, "1 min", "TRADES", 1]
+        checkpoint.write_text(json.dumps({"job": spec, "next": 2}))
+        downloader.download(
+            1,
+            contract,
+            START,
+            START + 3 * DAY,
+            "1 min",
+            "TRADES",
+            1,
+            wrapper,
+            str(checkpoint),
+        )
+        assert [end for _, end, _ in _requests(client)] == ["20240104-00:00:00"]
+        downloader.close()
+
+    def test_next_job_started_from_end(self, fake_client, make_contract) -> None:
+        client = fake_client
+        downloader = HistoricalDownloader([client])
+        wrapper = _RecordingWrapper()
+
+        class _Chaining(_RecordingWrapper):
+            def historicalDataEnd(self, reqId, start, end) -> None:
+                super().historicalDataEnd(reqId, start, end)
+                downloader.download(
+                    2,
+                    make_contract(),
+                    START + DAY,
+                    START + 2 * DAY,
+                    "1 min",
+                    "TRADES",
+                    1,
+                    wrapper,
+                )
+
+        downloader.download(
+            1, make_contract(), START, START + DAY, "1 min", "TRADES", 1, _Chaining()
+        )
+        answering = threading.Thread(
+            target=_answer, args=(client, _requests(client)[0][0], [START]), daemon=True
+        )
+        answering.start()
+        answering.join(timeout=5)
+        assert not answering.is_alive()
+        assert len(_requests(client)) == 2
+        _answer(client, _requests(client)[1][0], [START + DAY + 60])
+        assert (wrapper.times, wrapper.ended) == ([START + DAY + 60], 1)
+        downloader.close()
+
+    def test_one_job_at_a_time(self, fake_client, make_contract) -> None:
+        client = fake_client
+        downloader = HistoricalDownloader([client])
+        wrapper = _RecordingWrapper()
+        args = (make_contract(), START, START + DAY, "1 min", "TRADES", 1, wrapper)
+        downloader.download(1, *args)
+        with pytest.raises(RuntimeError, match="running"):
+            downloader.download(2, *args)
+        ((reqId, _, _),) = _requests(client)
+        _answer(client, reqId, [START])
+        assert wrapper.times == [START]
+        assert wrapper.ended == 1
+        # another range, the pacer holds an identical request back
+        downloader.download(3, make_contract(), START + DAY, START + 2 * DAY, *args[3:])
+        assert len(_requests(client)) == 2
+        downloader.close()
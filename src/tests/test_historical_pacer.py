@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from ibapi.historical_pacer import HistoricalPacer
+from ibapi.wrapper import EWrapper
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from ibapi.contract import Contract
+
+
+class _RecordingWrapper(EWrapper):
+    def __init__(self) -> None:
+        super().__init__()
+        self.errors: list[tuple[int, int]] = []
+
+    def error(self, reqId, errorCode, *args) -> None:
+        self.errors.append((reqId, errorCode))
+
+
+def _request(
+    pacer: HistoricalPacer,
+    contract: Callable[..., Contract],
+    reqId: int,
+    end: str,
+    symbol="AAPL",
+) -> None:
+    pacer.reqHistoricalData(
+        reqId, contract(symbol), end, "1 D", "1 min", "TRADES", 1, 1, False, []
+    )
+
+
+def _sent(client) -> list[tuple[int, str]]:
+    return [(reqId, end) for reqId, _, end, *_ in client.requests("reqHistoricalData")]
+
+
+class TestHistoricalPacer:
+    def test_contract_limit(self, fake_client, clock, make_contract) -> None:
+        client = fake_client
+        pacer = HistoricalPacer(client, clock=clock)
+        for i in range(7):
+            _request(pacer, make_contract, i, f"2024010{i + 1} 00:00:00")
+        _request(pacer, make_contract, 7, "20240101 00:00:00", "MSFT")
+        assert [reqId for reqId, _ in _sent(client)] == [0, 1, 2, 3, 4, 7]
+        clock.now += 2.0
+        pacer.pump()
+        assert len(_sent(client)) == 8
+        pacer.close()
+
+    def test_identical_requests_spaced(self, fake_client, clock, make_contract) -> None:
+        client = fake_client
+        pacer = HistoricalPacer(client, clock=clock)
+        _request(pacer, make_contract, 1, "20240101 00:00:00")
+        _request(pacer, make_contract, 2, "20240101 00:00:00")
+        assert len(_sent(client)) == 1
+        clock.now += 14.0
+        pacer.pump()
+        assert len(_sent(client)) == 1
+        clock.now += 1.0
+        pacer.pump()
+        assert len(_sent(client)) == 2
+        pacer.close()
+
+    def test_pacing_violation_retried(self, fake_client, clock, make_contract) -> None:
+        client = fake_client
+        pacer = HistoricalPacer(client, clock=clock, retryDelay=5.0)
+        _request(pacer, make_contract, 1, "20240101 00:00:00")
+        _request(pacer, make_contract, 2, "20240102 00:00:00")
+        pacer.error(1, 162, "Historical data request pacing violation")
+        pacer.error(2, 162, "HMDS query returned no data")
+        clock.now += 15.0
+        pacer.pump()
+        assert [reqId for reqId, _ in _sent(client)] == [1, 2, 1]
+        assert pacer.nRetried == 1
+        assert not pacer.pending
+        pacer.close()
+
+    def test_retried_error_hidden(self, make_fake_client, clock, make_contract) -> None:
+        app = _RecordingWrapper()
+        client = make_fake_client(app)
+        pacer = HistoricalPacer(client, clock=clock, maxRetries=1)
+        _request(pacer, make_contract, 1, "20240101 00:00:00")
+        _request(pacer, make_contract, 2, "20240102 00:00:00")
+        client.callback("error", 1, 162, "Historical data request pacing violation")
+        client.callback("error", 2, 162, "HMDS query returned no data")
+        assert app.errors == [(2, 162)]
+        clock.now += 15.0
+        pacer.pump()
+        client.callback("error", 1, 162, "Historical data request pacing violation")
+        assert app.errors == [(2, 162), (1, 162)]
+        pacer.close()
+        assert client.wrapperChain().wrapper is app
+
+    def test_warnings_keep_the_slot(self, fake_client, clock, make_contract) -> None:
+        client = fake_client
+        pacer = HistoricalPacer(client, maxInFlight=1, clock=clock)
+        _request(pacer, make_contract, 1, "20240101 00:00:00", "A")
+        _request(pacer, make_contract, 2, "20240101 00:00:00", "B")
+        client.callback("error", 1, 2174, "Time zone will change")
+        assert len(_sent(client)) == 1
+        client.callback("historicalDataEnd", 1, "", "")
+        assert len(_sent(client)) == 2
+        pacer.close()
+
+    def test_close_under_a_later_proxy(
+        self, make_fake_client, clock, make_contract
+    ) -> None:
+        app = _RecordingWrapper()
+        client = make_fake_client(app)
+        pacer = HistoricalPacer(client, clock=clock)
+        chain = client.wrapperChain()
+        later = _RecordingWrapper()
+        chain.setWrapper(later)
+        pacer.close()
+        assert chain.wrapper is later
+        pacer.errorFilter.error(1, 162, "Historical data request pacing violation")
+        assert app.errors == [(1, 162)]
+
+    def test_max_in_flight(self, fake_client, clock, make_contract) -> None:
+        client = fake_client
+        pacer = HistoricalPacer(client, maxInFlight=2, clock=clock)
+        for i in range(3):
+            _request(pacer, make_contract, i, "20240101 00:00:00", f"S{i}")
+        assert len(_sent(client)) == 2
+        pacer.historicalDataEnd(0, "", "")
+        assert len(_sent(client)) == 3
+        pacer.close()
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from ibapi.bar_store import BarSeries
+from ibapi.common import HistoricalSession
+from ibapi.historical_pacer import HistoricalPacer
+from ibapi.historical_sync import HistoricalSync
+from ibapi.utils import scheduleTimeToEpoch
+from ibapi.wrapper import EWrapper
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+TZ = "US/Eastern"
+
+
+class _RecordingWrapper(EWrapper):
+    def __init__(self) -> None:
+        super().__init__()
+        self.ended = 0
+        self.errors: list[int] = []
+
+    def error(self, reqId, errorCode, *args) -> None:
+        self.errors.append(errorCode)
+
+    def historicalDataEnd(self, reqId, start, end) -> None:
+        self.ended += 1
+
+
+def _session(day: str) -> HistoricalSession:
+    session = HistoricalSession()
+    session.startDateTime = f"{day}-09:30:00"
+    session.endDateTime = f"{day}-16:00:00"
+    session.refDate = day
+    return session
+
+
+def _lastRequest(client) -> tuple[int, str, str, str]:
+    reqId, _, end, duration, _, what, *_ = client.requests("reqHistoricalData")[-1]
+    return reqId, what, end, duration
+
+
+class TestHistoricalSync:
+    def test_only_missing_sessions_requested(
+        self, tmp_path: Path, fake_client, make_contract
+    ) -> None:
+        series = BarSeries(str(tmp_path))
+        lastBar = scheduleTimeToEpoch("20240102-15:59:00", TZ)
+        series.appendBar(lastBar, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1)
+        client, wrapper = fake_client, _RecordingWrapper()
+        sync = HistoricalSync(
+            client, series, make_contract(conId=265598), "1 min", "TRADES", 1
+        )
+        end = scheduleTimeToEpoch("20240105-00:00:00", TZ)
+        sync.sync(1, lastBar - 86400, end, wrapper)
+
+        scheduleReqId, what, _, _ = _lastRequest(client)
+        assert what == "SCHEDULE"
+        sessions = [_session(day) for day in ("20240102", "20240103", "20240104")]
+        client.callback("historicalSchedule", scheduleReqId, "", "", TZ, sessions)
+        for day in ("20240103", "20240104"):
+            reqId, what, reqEnd, duration = _lastRequest(client)
+            assert (what, reqEnd, duration) == ("TRADES", f"{day}-21:00:00", "23400 S")
+            assert client.sinks[reqId] is series
+            client.callback("historicalDataEnd", reqId, "", "")
+        assert sync.nRequested == 2
+        assert wrapper.ended == 1
+        assert not client.sinks
+        series.close()
+
+    def test_years_from_head_timestamp(
+        self, tmp_path: Path, fake_client, make_contract
+    ) -> None:
+        series = BarSeries(str(tmp_path))
+        client, wrapper = fake_client, _RecordingWrapper()
+        sync = HistoricalSync(
+            client, series, make_contract(conId=265598), "1 min", "TRADES", 1
+        )
+        head = scheduleTimeToEpoch("20200102-09:30:00", TZ)
+        end = scheduleTimeToEpoch("20240105-00:00:00", TZ)
+        sync.sync(1, head - 86400, end, wrapper)
+        ((reqId, *_),) = client.requests("reqHeadTimeStamp")
+        client.callback("headTimestamp", reqId, str(head))
+        _, what, reqEnd, duration = _lastRequest(client)
+        assert (what, reqEnd, duration) == ("SCHEDULE", "20240105-05:00:00", "5 Y")
+        sync.close()
+        series.close()
+
+    def test_up_to_date(self, tmp_path: Path, fake_client, make_contract) -> None:
+        series = BarSeries(str(tmp_path))
+        series.appendBar(1704230340, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1)
+        client, wrapper = fake_client, _RecordingWrapper()
+        sync = HistoricalSync(
+            client, series, make_contract(conId=265598), "1 min", "TRADES", 1
+        )
+        sync.sync(1, 1704153600, 1704230400, wrapper)
+        assert not client.sent
+        assert wrapper.ended == 1
+        series.close()
+
+    def test_no_data_requested_again(
+        self, tmp_path: Path, fake_client, make_contract
+    ) -> None:
+        series = BarSeries(str(tmp_path))
+        lastBar = scheduleTimeToEpoch("20240102-15:59:00", TZ)
+        series.appendBar(lastBar, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1)
+        client, wrapper = fake_client, _RecordingWrapper()
+        # identical requests are sent again right away
+        pacer = HistoricalPacer(client, identicalInterval=0.0)
+        sync = HistoricalSync(
+            client, series, make_contract(conId=265598), "1 min", "TRADES", 1, pacer
+        )
+        end = scheduleTimeToEpoch("20240105-00:00:00", TZ)
+        sessions = [_session(day) for day in ("20240103", "20240104")]
+
+        sync.sync(1, lastBar, end, wrapper)
+        client.callback(
+            "historicalSchedule", _lastRequest(client)[0], "", "", TZ, sessions
+        )
+        reqId, _, reqEnd, _ = _lastRequest(client)
+        assert reqEnd == "20240103-21:00:00"
+        client.callback("error", reqId, 162, "HMDS query returned no data")
+        assert (wrapper.errors, wrapper.ended, sync.nRequested) == ([162], 0, 1)
+
+        sync.sync(2, lastBar, end, wrapper)
+        client.callback(
+            "historicalSchedule", _lastRequest(client)[0], "", "", TZ, sessions
+        )
+        reqId, _, reqEnd, _ = _lastRequest(client)
+        assert reqEnd == "20240103-21:00:00"
+        client.callback("error", reqId, 162, "HMDS query returned no data")
+        reqId, _, reqEnd, _ = _lastRequest(client)
+        assert reqEnd == "20240104-21:00:00"
+        client.callback("historicalDataEnd", reqId, "", "")
+        assert (wrapper.errors, wrapper.ended, sync.nRequested) == ([162], 1, 3)
+        sync.close()
+        pacer.close()
+        series.close()
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import pytest
+
+from ibapi.line_budget import LineBudget
+
+
+def _budget(client, clock, **kwargs) -> LineBudget:
+    budget = LineBudget(client, clock=clock, **kwargs)
+    # the tests pump by hand
+    budget.timer.schedule = lambda due, now: None
+    return budget
+
+
+class TestLineBudget:
+    def test_rotation(self, fake_client, clock, make_contract) -> None:
+        client = fake_client
+        budget = _budget(client, clock, maxLines=3, dwell=10.0)
+        budget.watch("SPY", make_contract("SPY"), priority=True)
+        for symbol in "ABCD":
+            budget.watch(symbol, make_contract(symbol))
+        assert [s for s in "ABCD" if budget.isActive(s)] == ["A", "B"]
+        assert budget.cycleTime() == 20.0
+
+        clock.now += 10.0
+        budget.pump()
+        assert [s for s in "ABCD" if budget.isActive(s)] == ["C", "D"]
+        assert budget.isActive("SPY")
+        assert budget.nSwaps == 2
+
+        clock.now += 10.0
+        budget.pump()
+        assert [s for s in "ABCD" if budget.isActive(s)] == ["A", "B"]
+        assert ("cancelMktData", budget.symbols["SPY"].reqId) not in client.sent
+        budget.close()
+        assert not budget.active
+
+    def test_message_rate(self, fake_client, clock, make_contract) -> None:
+        client = fake_client
+        budget = _budget(client, clock, maxLines=10, msgRate=4.0)
+        for i in range(8):
+            budget.watch(i, make_contract(str(i)))
+        assert len(client.sent) == 4
+        clock.now += 1.0
+        budget.pump()
+        assert len(client.sent) == 8
+
+    def test_rate_below_a_swap(self, fake_client, clock) -> None:
+        with pytest.raises(ValueError, match="swap"):
+            LineBudget(fake_client, msgRate=0.5, clock=clock)
+        assert not fake_client.listeners
+
+    def test_freshness(self, fake_client, clock, make_contract) -> None:
+        client = fake_client
+        budget = _budget(client, clock, maxLines=2)
+        reqIdA = budget.watch("A", make_contract("A"))
+        budget.watch("B", make_contract("B"))
+        assert budget.symbolOf(reqIdA) == "A"
+        budget.tickPrice(reqIdA, 4, 101.5, None)
+        clock.now += 5.0
+        assert budget.age("A") == 5.0
+        assert budget.age("B") is None
+        assert budget.stale(1.0) == ["B", "A"]
+        assert budget.stale(10.0) == ["B"]
+
+    def test_max_tickers_reached(self, fake_client, clock, make_contract) -> None:
+        client = fake_client
+        budget = _budget(client, clock, maxLines=3)
+        for symbol in "ABC":
+            budget.watch(symbol, make_contract(symbol))
+        budget.error(budget.symbols["C"].reqId, 101, "Max number of tickers reached")
+        assert budget.maxLines == 2
+        assert not budget.isActive("C")
+        assert next(iter(budget.waiting)) == "C"
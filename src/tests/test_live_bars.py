@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+from ibapi.decoder import Decoder
+from ibapi.live_bars import LiveBarSeries
+from ibapi.message import IN
+from ibapi.server_versions import MAX_CLIENT_VER
+from ibapi.wrapper import EWrapper
+
+
+def _update(decoder: Decoder, reqId: int, time: int, close: float) -> None:
+    fields = [IN.HISTORICAL_DATA_UPDATE, reqId, 3, time, 1.0, close, 2.0, 0.5, 1.1, 10]
+    decoder.interpret(tuple(str(field).encode() for field in fields))
+
+
+class TestLiveBarSeries:
+    def test_updates_in_place_and_appends(self) -> None:
+        series = LiveBarSeries(capacity=2)
+        changes: list[tuple[int, bool]] = []
+        series.addListener(lambda _, row, isNew: changes.append((row, isNew)))
+        decoder = Decoder(EWrapper(), MAX_CLIENT_VER)
+        decoder.barSinks[3] = series
+
+        _update(decoder, 3, 60, 1.0)
+        view = series.columns()["close"]
+        _update(decoder, 3, 60, 1.5)
+        assert view[0] == 1.5  # same memory, updated in place
+        _update(decoder, 3, 120, 1.6)
+        _update(decoder, 3, 180, 1.7)  # grows past the capacity
+        assert changes == [(0, True), (0, False), (1, True), (2, True)]
+        assert list(series.columns()["time"]) == [60, 120, 180]
+        assert series.last()["close"] == 1.7
+        assert not series.appendBar(0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1)
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from decimal import Decimal
+
+from ibapi.client import EClient
+from ibapi.market_data_bus import (
+    DEPTH,
+    TICK_PRICE,
+    TICK_SIZE,
+    MarketDataPublisher,
+    MarketDataReader,
+)
+from ibapi.ticktype import TickTypeEnum
+from ibapi.wrapper import EWrapper
+
+
+class TestMarketDataBus:
+    def test_readers_see_records_and_detect_overruns(self) -> None:
+        client = EClient(EWrapper())
+        publisher = MarketDataPublisher(client, capacity=4)
+        fast = MarketDataReader(publisher.name)
+        slow = MarketDataReader(publisher.name)
+        try:
+            client.wrapper.tickPrice(1, TickTypeEnum.BID, 9.5, None)
+            client.wrapper.tickSize(1, TickTypeEnum.BID_SIZE, Decimal(300))
+            client.wrapper.updateMktDepth(2, 0, 1, 1, 9.4, Decimal(7))
+            assert fast.poll() == [
+                (TICK_PRICE, 1, TickTypeEnum.BID, 0, 0, 0, 9.5, 0.0, 0.0, 0.0),
+                (TICK_SIZE, 1, TickTypeEnum.BID_SIZE, 0, 0, 0, 0.0, 300.0, 0.0, 0.0),
+                (DEPTH, 2, 1, 0, 1, 0, 9.4, 7.0, 0.0, 0.0),
+            ]
+
+            for i in range(4):
+                client.wrapper.tickPrice(1, TickTypeEnum.LAST, float(i), None)
+            assert [record[6] for record in fast.poll()] == [0.0, 1.0, 2.0, 3.0]
+            assert fast.nOverruns == 0
+            # 7 records written in a ring of 4
+            assert [record[6] for record in slow.poll()] == [0.0, 1.0, 2.0, 3.0]
+            assert (slow.nOverruns, slow.nLost) == (1, 3)
+        finally:
+            fast.close()
+            slow.close()
+            publisher.close()
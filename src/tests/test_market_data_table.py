@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import math
+
+from ibapi.client import EClient
+from ibapi.decoder import Decoder
+from ibapi.market_data_table import COLUMNS, MarketDataTable
+from ibapi.message import IN
+from ibapi.server_versions import MAX_CLIENT_VER
+from ibapi.ticktype import TickTypeEnum
+from ibapi.wrapper import EWrapper
+
+
+def _interpret(decoder: Decoder, *fields) -> None:
+    decoder.interpret(tuple(str(field).encode() for field in fields))
+
+
+class _Wrapper(EWrapper):
+    def __init__(self) -> None:
+        EWrapper.__init__(self)
+        self.ticks: list[tuple] = []
+
+    def tickGeneric(self, reqId, tickType, value) -> None:
+        self.ticks.append((reqId, tickType, value))
+
+    def tickString(self, reqId, tickType, value) -> None:
+        self.ticks.append((reqId, tickType, value))
+
+
+class TestMarketDataTable:
+    def test_decoder_fills_the_table(self) -> None:
+        wrapper = _Wrapper()
+        client = EClient(wrapper)
+        table = MarketDataTable(capacity=1)
+        client.setMarketDataTable(table)
+        decoder = Decoder(wrapper, MAX_CLIENT_VER)
+        decoder.marketDataTable = client.marketDataTable
+        table.addRequest(1)
+        table.addRequest(2)  # grows the table
+
+        _interpret(decoder, IN.TICK_PRICE, 6, 1, TickTypeEnum.BID, 9.5, 300, 0)
+        seq = table.seq
+        _interpret(decoder, IN.TICK_SIZE, 6, 2, TickTypeEnum.VOLUME, 1000)
+        _interpret(decoder, IN.TICK_GENERIC, 6, 2, TickTypeEnum.HALTED, 0.0)
+        _interpret(decoder, IN.TICK_STRING, 6, 2, TickTypeEnum.LAST_TIMESTAMP, 17)
+        _interpret(decoder, IN.TICK_PRICE, 6, 3, TickTypeEnum.BID, 1.0, 1, 0)
+
+        assert wrapper.ticks == [
+            (2, TickTypeEnum.HALTED, 0.0),
+            (2, TickTypeEnum.LAST_TIMESTAMP, "17"),
+        ]
+        view = table.view()
+        assert view.shape == (2, len(COLUMNS))
+        assert table.get(1, TickTypeEnum.BID) == 9.5
+        assert table.get(1, TickTypeEnum.BID_SIZE) == 300.0
+        assert math.isnan(table.get(1, TickTypeEnum.ASK))
+        assert table.get(2, TickTypeEnum.VOLUME) == 1000.0
+        assert table.get(2, TickTypeEnum.LAST_TIMESTAMP) == 17.0
+        assert view[1, COLUMNS.index(TickTypeEnum.HALTED)] == 0.0
+        assert table.changedSince(seq) == [2]
+
+        table.removeRequest(1)
+        assert table.addRequest(3) == 0
+        assert math.isnan(table.get(3, TickTypeEnum.BID))
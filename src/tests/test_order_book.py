@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from decimal import Decimal
+
+from ibapi.client import EClient
+from ibapi.order_book import ASK, BID, DELETE, INSERT, UPDATE, OrderBooks
+from ibapi.wrapper import EWrapper
+
+
+class TestOrderBooks:
+    def test_position_operations(self) -> None:
+        client = EClient(EWrapper())
+        books = OrderBooks(client, depth=3)
+        depth = client.wrapper.updateMktDepth
+
+        depth(1, 0, INSERT, BID, 10.0, Decimal(1))
+        depth(1, 0, INSERT, BID, 10.2, Decimal(2))  # moves 10.0 down
+        depth(1, 1, INSERT, BID, 10.1, Decimal(3))
+        depth(1, 0, INSERT, BID, 10.3, Decimal(4))  # 10.0 falls off
+        depth(1, 1, UPDATE, BID, 10.2, Decimal(5))
+        depth(1, 0, DELETE, BID, 0.0, Decimal(0))
+        depth(1, 5, DELETE, BID, 0.0, Decimal(0))  # no such row
+        depth(1, 0, INSERT, ASK, 10.4, Decimal(6))
+
+        bidPrices, bidSizes, askPrices, askSizes = books.snapshot(1)
+        assert list(bidPrices) == [10.2, 10.1]
+        assert list(bidSizes) == [5.0, 3.0]
+        assert (list(askPrices), list(askSizes)) == ([10.4], [6.0])
+        assert books.book(1).nRejected == 1
+
+    def test_smart_depth_is_aggregated_by_price(self) -> None:
+        client = EClient(EWrapper())
+        books = OrderBooks(client)
+        for position, (exchange, price, size) in enumerate([
+            ("ARCA", 10.0, 1),
+            ("ISLAND", 10.0, 2),
+            ("BATS", 9.9, 4),
+        ]):
+            client.wrapper.updateMktDepthL2(
+                2, position, exchange, INSERT, BID, price, Decimal(size), True
+            )
+
+        bidPrices, bidSizes, _, _ = books.snapshot(2)
+        assert (list(bidPrices), list(bidSizes)) == ([10.0, 9.9], [3.0, 4.0])
+        assert len(books.snapshot(2, aggregate=False)[0]) == 3
+
+    def test_reset_clears_the_book(self) -> None:
+        client = EClient(EWrapper())
+        books = OrderBooks(client)
+        depth = client.wrapper.updateMktDepth
+        depth(1, 0, INSERT, BID, 10.0, Decimal(1))
+        depth(1, 1, INSERT, BID, 9.9, Decimal(2))
+        depth(2, 0, INSERT, ASK, 20.0, Decimal(1))
+        client.wrapper.error(1, 317, "Market depth data has been RESET")
+        depth(1, 0, INSERT, BID, 10.1, Decimal(3))
+        bidPrices, bidSizes, _, _ = books.snapshot(1)
+        assert (list(bidPrices), list(bidSizes)) == ([10.1], [3.0])
+        assert list(books.snapshot(2)[2]) == [20.0]
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+from decimal import Decimal
+from types import SimpleNamespace
+from typing import TYPE_CHECKING
+
+from ibapi.order import Order
+from ibapi.order_coalescer import OrderCoalescer
+from ibapi.wrapper import EWrapper
+
+if TYPE_CHECKING:
+    from ibapi.client import EClient
+
+
+class _RecordingWrapper(EWrapper):
+    def __init__(self) -> None:
+        super().__init__()
+        self.statuses: list[int] = []
+
+    def orderStatus(self, orderId, *args) -> None:
+        self.statuses.append(orderId)
+
+
+def _order(price: float) -> Order:
+    order = Order()
+    order.action = "BUY"
+    order.orderType = "LMT"
+    order.totalQuantity = Decimal(100)
+    order.lmtPrice = price
+    return order
+
+
+def _ack(client: EClient, orderId: int) -> None:
+    client.wrapper.orderStatus(
+        orderId, "Submitted", Decimal(0), Decimal(100), 0.0, 1, 0, 0.0, 0, "", 0.0
+    )
+
+
+class TestOrderCoalescer:
+    def test_only_latest_amendment_sent_after_ack(
+        self, make_client, make_contract
+    ) -> None:
+        client, conn = make_client(wrapper=_RecordingWrapper())
+        app = client.wrapper
+        coalescer = OrderCoalescer(client)
+        for price in (10.0, 10.1, 10.2, 10.3):
+            coalescer.placeOrder(1, make_contract(), _order(price))
+        assert len(conn.sent) == 1
+        _ack(client, 1)
+        assert len(conn.sent) == 2
+        assert b"\x0010.3\x00" in conn.sent[1]
+        assert (coalescer.nSent, coalescer.nSaved, coalescer.nAcks) == (2, 2, 1)
+        assert app.statuses == [1]
+
+    def test_other_orders_not_held_back(self, make_client, make_contract) -> None:
+        client, conn = make_client(wrapper=_RecordingWrapper())
+        coalescer = OrderCoalescer(client)
+        coalescer.placeOrder(1, make_contract(), _order(10.0))
+        coalescer.placeOrder(2, make_contract(), _order(10.0))
+        assert len(conn.sent) == 2
+        _ack(client, 1)
+        coalescer.placeOrder(1, make_contract(), _order(10.5))
+        assert len(conn.sent) == 3
+
+    def test_warnings_are_no_acks(self, make_client, make_contract) -> None:
+        client, conn = make_client(wrapper=_RecordingWrapper())
+        coalescer = OrderCoalescer(client)
+        coalescer.placeOrder(1, make_contract(), _order(10.0))
+        coalescer.placeOrder(1, make_contract(), _order(10.1))
+        client.wrapper.error(1, 2104, "Market data farm connection is OK")
+        client.wrapper.error(1, 10167, "Displaying delayed market data")
+        assert len(conn.sent) == 1
+        client.wrapper.error(1, 201, "Order rejected")
+        assert len(conn.sent) == 2
+        assert coalescer.nAcks == 1
+
+    def test_ack_timeout_drops_older_amendment(
+        self, monkeypatch, make_client, make_contract
+    ) -> None:
+        now = [0.0]
+        monkeypatch.setattr(
+            "ibapi.order_coalescer.time", SimpleNamespace(monotonic=lambda: now[0])
+        )
+        client, conn = make_client(wrapper=_RecordingWrapper())
+        coalescer = OrderCoalescer(client, ackTimeout=1.0)
+        coalescer.placeOrder(1, make_contract(), _order(10.0))
+        coalescer.placeOrder(1, make_contract(), _order(10.1))
+        assert len(conn.sent) == 1
+        now[0] = 2.0
+        coalescer.placeOrder(1, make_contract(), _order(10.2))
+        assert len(conn.sent) == 2
+        assert b"\x0010.2\x00" in conn.sent[1]
+        _ack(client, 1)
+        assert len(conn.sent) == 2
+        assert (coalescer.nSent, coalescer.nSaved) == (2, 1)
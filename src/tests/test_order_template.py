@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from decimal import Decimal
+
+from ibapi.order import Order
+from ibapi.server_versions import (
+    MIN_SERVER_VER_INELIGIBILITY_REASONS,
+    ServerCapabilities,
+)
+from ibapi.tag_value import TagValue
+
+
+def _order() -> Order:
+    order = Order()
+    order.action = "BUY"
+    order.orderType = "LMT"
+    order.totalQuantity = Decimal(100)
+    order.lmtPrice = 10.5
+    return order
+
+
+class TestOrderTemplate:
+    def test_matches_place_order(self, make_client, make_contract) -> None:
+        client, conn = make_client()
+        contract, order = make_contract(), _order()
+        template = client.makeOrderTemplate(contract, order)
+        assert template is not None
+        client.placeTemplateOrder(7, template, 11.25, Decimal(5))
+        order.lmtPrice = 11.25
+        order.totalQuantity = Decimal(5)
+        client.placeOrder(7, contract, order)
+        assert conn.sent[0] == conn.sent[1]
+
+    def test_rebuilt_for_other_server_version(self, make_client, make_contract) -> None:
+        client, conn = make_client()
+        contract, order = make_contract(), _order()
+        template = client.makeOrderTemplate(contract, order)
+        assert template is not None
+        client.serverVersion_ = MIN_SERVER_VER_INELIGIBILITY_REASONS
+        client.serverCaps = ServerCapabilities(MIN_SERVER_VER_INELIGIBILITY_REASONS)
+        client.placeTemplateOrder(8, template)
+        assert template.serverVersion == MIN_SERVER_VER_INELIGIBILITY_REASONS
+        client.placeOrder(8, contract, order)
+        assert conn.sent[0] == conn.sent[1]
+
+    def test_caller_lists_not_shared(self, make_client, make_contract) -> None:
+        client, _ = make_client()
+        contract, order = make_contract(), _order()
+        order.algoStrategy = "Adaptive"
+        order.algoParams = [TagValue("adaptivePriority", "Normal")]
+        template = client.makeOrderTemplate(contract, order)
+        assert template is not None
+        order.algoParams.append(TagValue("adaptivePriority", "Urgent"))
+        order.algoParams[0].value = "Patient"
+        assert [p.value for p in template.order.algoParams] == ["Normal"]
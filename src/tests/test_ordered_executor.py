@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import threading
+from decimal import Decimal
+
+from ibapi.client import EClient
+from ibapi.execution import Execution
+from ibapi.order import Order
+from ibapi.ordered_executor import NO_ID, OrderedExecutor
+from ibapi.subscriptions import SubscriptionManager
+from ibapi.wrapper import EWrapper
+
+
+class _Wrapper(EWrapper):
+    def __init__(self) -> None:
+        EWrapper.__init__(self)
+        self.lock = threading.Lock()
+        self.calls: list[tuple] = []
+        self.release = threading.Event()
+        self.done = threading.Event()
+
+    def tickPrice(self, reqId, tickType, price, attrib) -> None:
+        if reqId == 1 and price == 0.0:
+            # a slow callback
+            self.release.wait(5)
+        with self.lock:
+            self.calls.append((reqId, price))
+
+    def execDetails(self, reqId, contract, execution) -> None:
+        with self.lock:
+            self.calls.append(("exec", execution.orderId))
+
+    def orderStatus(self, orderId, status, *args) -> None:
+        with self.lock:
+            self.calls.append(("status", orderId))
+
+    def error(self, reqId, errorCode, errorString, advancedOrderRejectJson="") -> None:
+        with self.lock:
+            self.calls.append(("error", reqId))
+
+    def position(self, account, contract, position, avgCost) -> None:
+        # a slow callback
+        self.release.wait(5)
+        with self.lock:
+            self.calls.append(("position", account))
+
+    def connectionClosed(self) -> None:
+        self.done.set()
+
+
+class TestOrderedExecutor:
+    def test_partitions_run_in_parallel_in_order(self) -> None:
+        wrapper = _Wrapper()
+        client = EClient(wrapper)
+        executor = OrderedExecutor(client, maxWorkers=2, batchSize=2)
+        for i in range(5):
+            client.wrapper.tickPrice(1, 4, float(i), None)
+            client.wrapper.tickPrice(2, 4, float(i), None)
+
+        # 2 is not held back by the slow callback of 1
+        for _ in range(100):
+            if executor.queueDepth(2) == 0:
+                break
+            threading.Event().wait(0.01)
+        assert [call for call in wrapper.calls if call[0] == 2] == [
+            (2, float(i)) for i in range(5)
+        ]
+        assert executor.queueDepths() == {1: 5}
+
+        wrapper.release.set()
+        client.wrapper.connectionClosed()
+        assert wrapper.done.wait(5)
+        executor.close()
+        assert [call for call in wrapper.calls if call[0] == 1] == [
+            (1, float(i)) for i in range(5)
+        ]
+        assert executor.maxQueueDepth == 5
+        assert client.wrapper.wrapper is wrapper
+
+    def test_order_executions_pinned(self) -> None:
+        wrapper = _Wrapper()
+        client = EClient(wrapper)
+        executor = OrderedExecutor(client)
+        execution = Execution()
+        execution.orderId = 7
+        wrapper.release.set()
+        client.wrapper.execDetails(-1, None, execution)
+        executor.close()
+        assert wrapper.calls == [("exec", 7)]
+        assert executor.queueDepth(NO_ID) == 0
+
+    def test_order_and_account_callbacks_pinned(
+        self, make_client, make_contract
+    ) -> None:
+        wrapper = _Wrapper()
+        client, _ = make_client(wrapper=wrapper)
+        executor = OrderedExecutor(client)
+        order = Order()
+        order.action = "BUY"
+        order.orderType = "LMT"
+        order.totalQuantity = Decimal(100)
+        order.lmtPrice = 10.0
+        client.placeOrder(7, make_contract(), order)
+        client.wrapper.position("DU1", None, 100, 10.0)
+        # rejected before any status
+        client.wrapper.error(7, 201, "Order rejected")
+        client.wrapper.orderStatus(7, "Cancelled", 0, 100, 0, 1, 0, 0, 0, "", 0)
+        # an order of another client, 8 is a market data reqId here
+        client.wrapper.orderStatus(8, "Submitted", 0, 100, 0, 1, 0, 0, 0, "", 0)
+        client.wrapper.error(8, 200, "No security definition")
+        for _ in range(100):
+            if executor.queueDepth(8) == 0:
+                break
+            threading.Event().wait(0.01)
+        # held back by the slow position callback, but not the error of 8
+        assert executor.queueDepths() == {NO_ID: 4}
+        assert wrapper.calls == [("error", 8)]
+        wrapper.release.set()
+        executor.close()
+        assert wrapper.calls == [
+            ("error", 8),
+            ("position", "DU1"),
+            ("error", 7),
+            ("status", 7),
+            ("status", 8),
+        ]
+        assert not client.orderIdSinks
+
+    def test_close_under_a_later_proxy(self) -> None:
+        wrapper = _Wrapper()
+        client = EClient(wrapper)
+        wrapper.release.set()
+        executor = OrderedExecutor(client)
+        manager = SubscriptionManager(client)
+        executor.close()
+        assert client.wrapper.wrapper is manager
+        client.wrapper.tickPrice(1, 4, 1.5, None)
+        assert wrapper.calls == [(1, 1.5)]
+        manager.close()
+        assert client.wrapper.wrapper is executor
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+from decimal import Decimal
+
+from ibapi.message import OUT
+from ibapi.order import Order
+from ibapi.order_cancel import OrderCancel
+from ibapi.rate_governor import (
+    CANCEL_LANE,
+    DATA_LANE,
+    FUTURE,
+    ORDER_LANE,
+    QUEUE,
+    RateGovernor,
+)
+
+
+class TestRateGovernor:
+    def test_cancels_jump_the_queue(self, fake_connection) -> None:
+        conn = fake_connection
+        governor = RateGovernor(rate=200.0, burst=2, mode=QUEUE)
+        with governor.cond:  # keeps the dispatcher out until all is queued
+            for i in range(4):
+                governor.submit(conn.sendMsg, b"data%d" % i, DATA_LANE)
+            governor.submit(conn.sendMsg, b"cancel", CANCEL_LANE)
+            assert conn.sent == [b"data0", b"data1"]
+            assert governor.queueDepth() == 3
+        governor.dispatcher.join(timeout=5)
+        assert conn.sent == [b"data0", b"data1", b"cancel", b"data2", b"data3"]
+        assert governor.nSent[CANCEL_LANE] == 1
+        assert governor.nSent[DATA_LANE] == 4
+
+    def test_cancel_held_behind_place_of_same_order(self, fake_connection) -> None:
+        conn = fake_connection
+        governor = RateGovernor(rate=200.0, burst=1, mode=QUEUE)
+        with governor.cond:
+            governor.submit(conn.sendMsg, b"data", DATA_LANE)
+            governor.submit(conn.sendMsg, b"place7", ORDER_LANE, orderIds=(7,))
+            governor.submit(conn.sendMsg, b"cancel7", CANCEL_LANE, orderIds=(7,))
+            governor.submit(conn.sendMsg, b"cancel3", CANCEL_LANE, orderIds=(3,))
+        governor.dispatcher.join(timeout=5)
+        assert conn.sent == [b"data", b"cancel3", b"place7", b"cancel7"]
+        assert not governor.queuedOrderIds
+
+    def test_order_ids_of_messages(self) -> None:
+        governor = RateGovernor()
+        msgs = ["3\x0042\x00x\x00", "4\x001\x0042\x00", "1\x0011\x0042\x00"]
+        assert governor.orderIdsOf(msgs, True) == (42, 42)
+        assert governor.orderIdsOf(msgs[:1], False) == ()
+
+    def test_client_messages_governed(self, make_client) -> None:
+        client, conn = make_client()
+        governor = RateGovernor(mode=FUTURE)
+        client.setRateGovernor(governor)
+        client.cancelOrder(5, OrderCancel())
+        assert governor.lastFuture().result(timeout=5)
+        assert governor.laneOf(conn.sent[0][4:].decode()) == CANCEL_LANE
+        assert governor.utilization() > 0
+
+    def test_global_cancel_held_behind_queued_places(
+        self, make_client, make_contract
+    ) -> None:
+        client, conn = make_client()
+        governor = RateGovernor(rate=200.0, burst=1, mode=QUEUE)
+        client.setRateGovernor(governor)
+        order = Order()
+        order.action = "BUY"
+        order.orderType = "LMT"
+        order.totalQuantity = Decimal(100)
+        order.lmtPrice = 10.0
+        with governor.cond:
+            client.reqCurrentTime()
+            client.placeOrder(1, make_contract(), order)
+            client.placeOrder(2, make_contract(), order)
+            client.reqGlobalCancel()
+            client.cancelOrder(3, OrderCancel())
+        governor.dispatcher.join(timeout=5)
+        msgIds = [int(msg[4:].split(b"\0", 1)[0]) for msg in conn.sent]
+        assert msgIds == [
+            OUT.REQ_CURRENT_TIME,
+            OUT.CANCEL_ORDER,
+            OUT.PLACE_ORDER,
+            OUT.PLACE_ORDER,
+            OUT.REQ_GLOBAL_CANCEL,
+        ]
+        assert not governor.queuedOrderIds
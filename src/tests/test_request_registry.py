@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from ibapi.common import BarData
+from ibapi.contract import ContractDetails
+from ibapi.request_registry import RequestError, RequestRegistry
+
+
+class TestRequestRegistry:
+    def test_concurrent_requests_routed_by_reqId(
+        self, fake_client, make_contract
+    ) -> None:
+        client = fake_client
+        registry = RequestRegistry(client, reqIdBase=10)
+        first = registry.reqContractDetails(make_contract())
+        second = registry.reqContractDetails(make_contract())
+        assert (first.reqId, second.reqId) == (10, 11)
+
+        details = [ContractDetails() for _ in range(3)]
+        registry.contractDetails(11, details[0])
+        registry.contractDetails(10, details[1])
+        registry.contractDetails(11, details[2])
+        registry.contractDetailsEnd(11)
+        assert second.result(0) == [details[0], details[2]]
+        assert not first.done()
+        registry.contractDetailsEnd(10)
+        assert first.result(0) == [details[1]]
+        assert not registry.requests
+
+    def test_error_raised(self, fake_client, make_contract) -> None:
+        client = fake_client
+        registry = RequestRegistry(client)
+        future = registry.reqHeadTimeStamp(make_contract(), "TRADES", 1, 1)
+        registry.error(future.reqId, 2104, "Market data farm connection is OK")
+        assert not future.done()
+        registry.error(future.reqId, 200, "No security definition has been found")
+        with pytest.raises(RequestError) as excinfo:
+            future.result(0)
+        assert excinfo.value.errorCode == 200
+
+    def test_cancel_sends_cancel_request(self, fake_client, make_contract) -> None:
+        client = fake_client
+        registry = RequestRegistry(client)
+        future = registry.reqHistoricalData(
+            make_contract(), "", "1 D", "1 min", "TRADES", 1, 1
+        )
+        registry.historicalData(future.reqId, BarData())
+        assert future.cancel()
+        assert client.sent[-1] == ("cancelHistoricalData", future.reqId)
+        registry.historicalDataEnd(future.reqId, "", "")
+        assert future.cancelled()
+
+    def test_asyncio(self, fake_client, make_contract) -> None:
+        client = fake_client
+        registry = RequestRegistry(client)
+
+        async def main() -> str:
+            future = registry.requestAsync(
+                "reqHeadTimeStamp", make_contract(), "TRADES", 1, 1
+            )
+            reqId = client.sent[-1][1]
+            # as from the thread of the client's EReader
+            asyncio.get_running_loop().run_in_executor(
+                None, registry.headTimestamp, reqId, "20000103-14:30:00"
+            )
+            return await future
+
+        assert asyncio.run(main()) == "20000103-14:30:00"
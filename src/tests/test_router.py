@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import pytest
+
+from ibapi.client import EClient
+from ibapi.decoder import Decoder
+from ibapi.message import IN
+from ibapi.server_versions import MAX_CLIENT_VER, MIN_SERVER_VER_SIZE_RULES
+from ibapi.ticktype import TickTypeEnum
+from ibapi.wrapper import EWrapper
+
+
+def _interpret(decoder: Decoder, *fields) -> None:
+    decoder.interpret(tuple(str(field).encode() for field in fields))
+
+
+class _Wrapper(EWrapper):
+    def __init__(self) -> None:
+        EWrapper.__init__(self)
+        self.calls: list[tuple] = []
+
+    def tickPrice(self, reqId, tickType, price, attrib) -> None:
+        self.calls.append(("tickPrice", reqId, price))
+
+    def tickSize(self, reqId, tickType, size) -> None:
+        self.calls.append(("tickSize", reqId, size))
+
+    def error(self, reqId, errorCode, errorString, advancedOrderRejectJson="") -> None:
+        self.calls.append(("error", reqId, errorCode))
+
+
+class TestRouter:
+    def test_routes_by_reqId_and_range(self) -> None:
+        wrapper, handler = _Wrapper(), _Wrapper()
+        client = EClient(wrapper)
+        decoder = Decoder(wrapper, MAX_CLIENT_VER)
+        client.decoder = decoder
+        prices = []
+        client.setRoute(1, handler)
+        client.setRoute(100, {"tickPrice": lambda *args: prices.append(args)}, 199)
+        assert decoder.router is client.router()
+
+        _interpret(decoder, IN.TICK_PRICE, 6, 1, TickTypeEnum.LAST, 9.5, 300, 0)
+        _interpret(decoder, IN.TICK_PRICE, 6, 150, TickTypeEnum.LAST, 2.0, 10, 0)
+        _interpret(decoder, IN.TICK_PRICE, 6, 200, TickTypeEnum.LAST, 3.0, 10, 0)
+        _interpret(decoder, IN.ERR_MSG, 2, 1, 200, "No security definition", "")
+
+        assert handler.calls == [
+            ("tickPrice", 1, 9.5),
+            ("tickSize", 1, 300),
+            ("error", 1, 200),
+        ]
+        assert [args[:3] for args in prices] == [(150, TickTypeEnum.LAST, 2.0)]
+        # the size tick of 150 is not handled by the route, 200 is not routed
+        assert wrapper.calls == [
+            ("tickSize", 150, 10),
+            ("tickPrice", 200, 3.0),
+            ("tickSize", 200, 10),
+        ]
+        assert decoder.wrapper is wrapper
+
+        client.removeRoute(100)
+        client.removeRoute(1)
+        _interpret(decoder, IN.TICK_PRICE, 6, 150, TickTypeEnum.LAST, 4.0, 10, 0)
+        assert wrapper.calls[-2] == ("tickPrice", 150, 4.0)
+        assert len(client.router()) == 0
+
+    def test_decoder_wrapper_untouched(self) -> None:
+        wrapper = _Wrapper()
+        client = EClient(wrapper)
+        decoder = Decoder(wrapper, MAX_CLIENT_VER)
+        client.decoder = decoder
+        seen = []
+
+        def tickPrice(reqId, *args) -> None:
+            # what another thread would see, and replace, meanwhile
+            seen.append(decoder.wrapper)
+            client.wrapperChain()
+
+        client.setRoute(1, {"tickPrice": tickPrice})
+        _interpret(decoder, IN.TICK_PRICE, 6, 1, TickTypeEnum.LAST, 9.5, 0, 0)
+        assert seen == [wrapper]
+        assert decoder.wrapper is client.wrapperChain()
+        _interpret(decoder, IN.TICK_PRICE, 6, 2, TickTypeEnum.LAST, 9.5, 0, 0)
+        assert wrapper.calls == [
+            ("tickSize", 1, 0),
+            ("tickPrice", 2, 9.5),
+            ("tickSize", 2, 0),
+        ]
+
+    def test_routed_decoder_per_handler(self, make_client) -> None:
+        wrapper, handler = _Wrapper(), _Wrapper()
+        client = EClient(wrapper)
+        decoder = Decoder(wrapper, MAX_CLIENT_VER)
+        client.decoder = decoder
+        client.setRoute(1, handler)
+        for price in (1.0, 2.0):
+            _interpret(decoder, IN.TICK_PRICE, 6, 1, TickTypeEnum.LAST, price, 0, 0)
+        assert len(decoder.routedDecoders) == 1
+        assert [call[2] for call in handler.calls if call[0] == "tickPrice"] == [
+            1.0,
+            2.0,
+        ]
+        client.removeRoute(1)
+        del handler
+        assert len(decoder.routedDecoders) == 0
+
+        old, _ = make_client(serverVersion=MIN_SERVER_VER_SIZE_RULES - 1)
+        with pytest.raises(ValueError, match="routing"):
+            old.setRoute(1, _Wrapper())
@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+from ibapi.server_versions import (
+    MIN_SERVER_VER_TRADING_CLASS,
+    MIN_SERVER_VERSIONS,
+    ServerCapabilities,
+)
+
+
+class TestServerCapabilities:
+    def test_flags_follow_server_version(self) -> None:
+        caps = ServerCapabilities(MIN_SERVER_VER_TRADING_CLASS)
+        assert caps.TRADING_CLASS
+        assert not ServerCapabilities(MIN_SERVER_VER_TRADING_CLASS - 1).TRADING_CLASS
+        for name, minVersion in MIN_SERVER_VERSIONS.items():
+            assert getattr(caps, name) == caps.supports(minVersion)
+
+    def test_nothing_supported_before_handshake(self) -> None:
+        caps = ServerCapabilities()
+        assert not any(getattr(caps, name) for name in MIN_SERVER_VERSIONS)
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import math
+
+import pytest
+
+from ibapi.contract import Contract
+from ibapi.snapshot_sweep import DONE, FAILED, TIMED_OUT, SnapshotSweep
+from ibapi.ticktype import TickTypeEnum
+
+
+def _contracts(n: int) -> list[Contract]:
+    contracts = []
+    for i in range(n):
+        contract = Contract()
+        contract.conId = i + 1
+        contract.exchange = "SMART"
+        contracts.append(contract)
+    return contracts
+
+
+def _sweep(client, clock, **kwargs) -> SnapshotSweep:
+    sweep = SnapshotSweep(client, clock=clock, reqIdBase=100, **kwargs)
+    # the tests pump by hand
+    sweep.timer.schedule = lambda due, now: None
+    return sweep
+
+
+class TestSnapshotSweep:
+    def test_requests_refilled_as_they_end(self, fake_client, clock) -> None:
+        client = fake_client
+        sweep = _sweep(client, clock, maxInFlight=2)
+        contracts = _contracts(3)
+        sweep.start(contracts)
+        assert client.sent == [
+            ("reqMktData", reqId, contract, "", True, False, [])
+            for reqId, contract in zip((100, 101), contracts[:2])
+        ]
+
+        sweep.tickPrice(101, TickTypeEnum.LAST, 12.5, None)
+        sweep.tickSize(101, TickTypeEnum.LAST_SIZE, 300)
+        sweep.tickSnapshotEnd(101)
+        assert client.sent[-1][:2] == ("reqMktData", 102)
+        sweep.tickPrice(100, TickTypeEnum.LAST, 10.0, None)
+        sweep.tickSnapshotEnd(100)
+        sweep.error(102, 200, "No security definition has been found")
+
+        result = sweep.wait(0)
+        assert list(result.status) == [DONE, DONE, FAILED]
+        assert list(result.column(TickTypeEnum.LAST))[:2] == [10.0, 12.5]
+        assert math.isnan(result.column(TickTypeEnum.LAST)[2])
+        assert result.values()[1, 5] == 300.0
+        assert not client.listeners
+
+    def test_stragglers_time_out(self, fake_client, clock) -> None:
+        client = fake_client
+        sweep = _sweep(client, clock, timeout=12.0)
+        sweep.start(_contracts(2))
+        sweep.tickSnapshotEnd(100)
+        assert sweep.wait(0) is None
+        clock.now += 12.0
+        sweep.pump()
+        result = sweep.wait(0)
+        assert list(result.status) == [DONE, TIMED_OUT]
+        assert client.sent[-1] == ("cancelMktData", 101)
+        assert result.elapsed == 12.0
+
+    def test_message_rate(self, fake_client, clock) -> None:
+        client = fake_client
+        sweep = _sweep(client, clock, msgRate=5.0)
+        sweep.start(_contracts(8))
+        assert len(client.sent) == 5
+        dues = []
+        sweep.timer.schedule = lambda due, now: dues.append(due)
+        sweep.pump()
+        # again once the first send leaves the window, before any timeout
+        assert dues == [clock.now + 1.0]
+        clock.now += 1.0
+        sweep.pump()
+        assert len(client.sent) == 8
+        sweep.close()
+        assert not client.listeners
+
+    def test_rate_below_a_request(self, fake_client, clock) -> None:
+        with pytest.raises(ValueError, match="msgRate"):
+            SnapshotSweep(fake_client, msgRate=0.5, clock=clock)
+        with pytest.raises(ValueError, match="maxInFlight"):
+            SnapshotSweep(fake_client, maxInFlight=0, clock=clock)
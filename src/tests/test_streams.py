@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from ibapi.request_registry import RequestError
+from ibapi.streams import CONFLATE, DROP_OLDEST, FAIL, StreamOverflow, Streams
+
+
+async def _take(stream, n: int) -> list:
+    updates = []
+    async for update in stream:
+        updates.append(update)
+        if len(updates) == n:
+            break
+    return updates
+
+
+class TestStreams:
+    def test_updates_from_another_thread(self, fake_client, make_contract) -> None:
+        client = fake_client
+        streams = Streams(client, reqIdBase=7)
+
+        async def main() -> list:
+            async with streams.streamTickByTick(
+                make_contract(conId=265598), "MidPoint"
+            ) as stream:
+
+                def produce() -> None:
+                    for i in range(3):
+                        streams.tickByTickMidPoint(7, 1700000000 + i, 100.0 + i)
+
+                asyncio.get_running_loop().run_in_executor(None, produce)
+                return await _take(stream, 3)
+
+        updates = asyncio.run(main())
+        assert updates == [
+            ("tickByTickMidPoint", 1700000000 + i, 100.0 + i) for i in range(3)
+        ]
+        assert [call[:2] for call in client.sent] == [
+            ("reqTickByTickData", 7),
+            ("cancelTickByTickData", 7),
+        ]
+        assert not streams.streams
+
+    def test_stream_left_open_after_its_loop(self, fake_client, make_contract) -> None:
+        client = fake_client
+        streams = Streams(client)
+        stream = streams.streamTickByTick(make_contract(conId=265598), "MidPoint")
+        streams.tickByTickMidPoint(stream.reqId, 1700000000, 100.0)
+        # left with a break, without async with or close()
+        assert asyncio.run(_take(stream, 1)) == [
+            ("tickByTickMidPoint", 1700000000, 100.0)
+        ]
+        streams.tickByTickMidPoint(stream.reqId, 1700000001, 100.5)
+        assert stream.closed
+        assert ("cancelTickByTickData", stream.reqId) in client.sent
+        assert not streams.streams
+
+    def test_conflation(self, fake_client, make_contract) -> None:
+        client = fake_client
+        streams = Streams(client)
+        stream = streams.streamMktData(make_contract(conId=265598), policy=CONFLATE)
+        streams.tickPrice(stream.reqId, 1, 10.0, None)
+        streams.tickPrice(stream.reqId, 2, 10.5, None)
+        streams.tickPrice(stream.reqId, 1, 10.1, None)
+        stream.close()
+        updates = asyncio.run(_take(stream, 10))
+        assert updates == [("tickPrice", 2, 10.5, None), ("tickPrice", 1, 10.1, None)]
+        assert stream.nDropped == 1
+
+    def test_bounded_buffers(self, fake_client, make_contract) -> None:
+        client = fake_client
+        streams = Streams(client)
+        dropping = streams.streamTickByTick(
+            make_contract(conId=265598), "MidPoint", maxSize=2, policy=DROP_OLDEST
+        )
+        failing = streams.streamTickByTick(
+            make_contract(conId=265598), "MidPoint", maxSize=2, policy=FAIL
+        )
+        for i in range(3):
+            streams.tickByTickMidPoint(dropping.reqId, i, 1.0)
+            streams.tickByTickMidPoint(failing.reqId, i, 1.0)
+        assert dropping.nDropped == 1
+        assert ("cancelTickByTickData", failing.reqId) in client.sent
+
+        async def drain() -> list:
+            return [update async for update in failing]
+
+        with pytest.raises(StreamOverflow):
+            asyncio.run(drain())
+
+    def test_error_ends_stream(self, fake_client, make_contract) -> None:
+        client = fake_client
+        streams = Streams(client)
+
+        async def main() -> None:
+            stream = streams.streamMktData(make_contract(conId=265598))
+            asyncio.get_running_loop().call_soon(
+                streams.error,
+                stream.reqId,
+                354,
+                "Requested market data is not subscribed",
+            )
+            await _take(stream, 1)
+
+        with pytest.raises(RequestError):
+            asyncio.run(main())
+        assert ("cancelMktData", 1 << 30) not in client.sent
+
+    def test_warning_does_not_end_stream(self, fake_client, make_contract) -> None:
+        client = fake_client
+        streams = Streams(client)
+        stream = streams.streamMktData(make_contract(conId=265598))
+        streams.error(
+            stream.reqId, 10090, "Part of requested market data is not subscribed"
+        )
+        streams.tickPrice(stream.reqId, 4, 10.0, None)
+        stream.close()
+        assert asyncio.run(_take(stream, 10)) == [("tickPrice", 4, 10.0, None)]
+
+    def test_task_cancellation_cancels_subscription(
+        self, fake_client, make_contract
+    ) -> None:
+        client = fake_client
+        streams = Streams(client)
+
+        async def main() -> None:
+            stream = streams.streamMktData(make_contract(conId=265598))
+            task = asyncio.ensure_future(_take(stream, 1))
+            await asyncio.sleep(0)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(main())
+        assert client.sent[-1] == ("cancelMktData", 1 << 30)
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import threading
+
+from ibapi.common import TickAttrib
+from ibapi.contract import ComboLeg, Contract
+from ibapi.message import OUT
+from ibapi.subscriptions import SubscriptionManager
+from ibapi.wrapper import EWrapper
+
+
+def _fields(msg: bytes) -> list[bytes]:
+    return msg[4:].split(b"\0")[:-1]
+
+
+class _Wrapper(EWrapper):
+    def __init__(self) -> None:
+        EWrapper.__init__(self)
+        self.ticks: list[tuple] = []
+
+    def tickPrice(self, reqId, tickType, price, attrib) -> None:
+        self.ticks.append((reqId, tickType, price))
+
+    def error(self, reqId, errorCode, errorString, advancedOrderRejectJson="") -> None:
+        self.ticks.append((reqId, errorCode, errorString))
+
+
+def _combo(contract: Contract, *conIds: int) -> Contract:
+    contract.secType = "BAG"
+    contract.comboLegs = []
+    for conId in conIds:
+        leg = ComboLeg()
+        leg.conId = conId
+        leg.ratio = 1
+        leg.action = "BUY"
+        leg.exchange = "SMART"
+        contract.comboLegs.append(leg)
+    return contract
+
+
+class TestSubscriptionManager:
+    def test_identical_requests_share_one_subscription(
+        self, make_client, make_contract
+    ) -> None:
+        wrapper = _Wrapper()
+        client, conn = make_client(wrapper=wrapper)
+        manager = SubscriptionManager(client, reqIdBase=1000)
+
+        manager.reqMktData(1, make_contract("IBM"), "233,100", False, False, [])
+        client.wrapper.tickPrice(1000, 1, 99.5, TickAttrib())
+        manager.reqMktData(2, make_contract("IBM"), "100,233", False, False, [])
+        client.wrapper.tickPrice(1000, 2, 99.6, TickAttrib())
+        client.wrapper.tickPrice(5, 1, 10.0, TickAttrib())  # not shared
+
+        assert len(conn.sent) == 1
+        assert _fields(conn.sent[0])[0] == str(OUT.REQ_MKT_DATA).encode()
+        assert wrapper.ticks == [
+            (1, 1, 99.5),
+            (2, 1, 99.5),  # replayed on joining
+            (1, 2, 99.6),
+            (2, 2, 99.6),
+            (5, 1, 10.0),
+        ]
+
+        manager.cancelMktData(1)
+        assert len(conn.sent) == 1
+        manager.cancelMktData(2)
+        assert _fields(conn.sent[1])[0] == str(OUT.CANCEL_MKT_DATA).encode()
+        assert _fields(conn.sent[1])[2] == b"1000"
+        manager.close()
+        assert client.wrapper.wrapper is wrapper
+
+    def test_combos_with_other_legs_not_shared(
+        self, make_client, make_contract
+    ) -> None:
+        client, conn = make_client()
+        manager = SubscriptionManager(client, reqIdBase=1000)
+        for reqId, legs in ((1, (1, 2)), (2, (1, 3)), (3, (1, 2))):
+            combo = _combo(make_contract("IBM"), *legs)
+            manager.reqMktData(reqId, combo, "", False, False, [])
+        assert len(conn.sent) == 2
+        assert manager.nSubscribers(3) == 2
+
+    def test_error_drops_subscription(self, make_client, make_contract) -> None:
+        wrapper = _Wrapper()
+        client, conn = make_client(wrapper=wrapper)
+        manager = SubscriptionManager(client, reqIdBase=1000)
+        manager.reqMktData(1, make_contract("IBM"), "", False, False, [])
+        client.wrapper.error(1000, 2104, "Market data farm connection is OK")
+        manager.reqMktData(2, make_contract("IBM"), "", False, False, [])
+        assert len(conn.sent) == 1
+        client.wrapper.error(1000, 354, "Requested market data is not subscribed")
+        assert wrapper.ticks[-2:] == [
+            (1, 354, "Requested market data is not subscribed"),
+            (2, 354, "Requested market data is not subscribed"),
+        ]
+        manager.reqMktData(3, make_contract("IBM"), "", False, False, [])
+        assert len(conn.sent) == 2  # sent again, with a reqId of its own
+        client.wrapper.error(1001, 354, "Requested market data is not subscribed")
+        assert wrapper.ticks[-1] == (3, 354, "Requested market data is not subscribed")
+        manager.cancelMktData(1)
+        manager.cancelMktData(2)
+        assert len(conn.sent) == 2  # nothing to cancel upstream
+
+    def test_replay_ordered_against_updates(self, make_client, make_contract) -> None:
+        replaying = threading.Event()
+        release = threading.Event()
+
+        class _SlowWrapper(_Wrapper):
+            def tickPrice(self, reqId, tickType, price, attrib) -> None:
+                if reqId == 2 and price == 99.5:
+                    replaying.set()
+                    release.wait(5)
+                _Wrapper.tickPrice(self, reqId, tickType, price, attrib)
+
+        wrapper = _SlowWrapper()
+        client, _ = make_client(wrapper=wrapper)
+        manager = SubscriptionManager(client, reqIdBase=1000)
+        manager.reqMktData(1, make_contract("IBM"), "", False, False, [])
+        client.wrapper.tickPrice(1000, 1, 99.5, TickAttrib())
+
+        joining = threading.Thread(
+            target=manager.reqMktData,
+            args=(2, make_contract("IBM"), "", False, False, []),
+        )
+        joining.start()
+        assert replaying.wait(5)
+        decoding = threading.Thread(
+            target=client.wrapper.tickPrice, args=(1000, 1, 99.6, TickAttrib())
+        )
+        decoding.start()
+        decoding.join(0.1)  # delivered right away if not held behind the replay
+        release.set()
+        joining.join(5)
+        decoding.join(5)
+        assert [tick for tick in wrapper.ticks if tick[0] == 2] == [
+            (2, 1, 99.5),
+            (2, 1, 99.6),
+        ]
+
+    def test_cancels_of_other_requests_forwarded(
+        self, make_client, make_contract
+    ) -> None:
+        client, conn = make_client()
+        manager = SubscriptionManager(client, reqIdBase=1000)
+        manager.cancelMktData(5)
+        manager.cancelTickByTickData(6)
+        assert [_fields(msg)[0] for msg in conn.sent] == [
+            str(OUT.CANCEL_MKT_DATA).encode(),
+            str(OUT.CANCEL_TICK_BY_TICK_DATA).encode(),
+        ]
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from decimal import Decimal
+
+from ibapi.client import EClient
+from ibapi.common import TickAttribLast
+from ibapi.tick_bars import TICK_BARS, TIME_BARS, VOLUME_BARS, TickBarAggregator
+from ibapi.wrapper import EWrapper
+
+
+def _trade(client: EClient, reqId: int, time: int, price: float, size: int) -> None:
+    client.wrapper.tickByTickAllLast(
+        reqId, 1, time, price, Decimal(size), TickAttribLast(), "", ""
+    )
+
+
+class TestTickBarAggregator:
+    def test_bars_are_emitted_in_batches(self) -> None:
+        client = EClient(EWrapper())
+        batches: list[list] = []
+        aggregator = TickBarAggregator(client, batches.append, batchSize=2, capacity=1)
+        aggregator.addInstrument(1, TIME_BARS, 60)
+        aggregator.addInstrument(2, TICK_BARS, 2)
+        aggregator.addInstrument(3, VOLUME_BARS, 10)  # grows the state table
+
+        _trade(client, 1, 100, 10.0, 1)
+        _trade(client, 1, 110, 12.0, 3)
+        _trade(client, 1, 119, 9.0, 1)
+        _trade(client, 1, 120, 11.0, 1)  # closes the 60-120 bar
+        _trade(client, 2, 100, 5.0, 1)
+        assert batches == []
+        _trade(client, 2, 101, 6.0, 1)  # second bar done, one batch
+        assert len(batches) == 1
+        timeBar, tickBar = batches[0]
+        assert (timeBar.reqId, timeBar.time, timeBar.count) == (1, 60, 3)
+        assert (timeBar.open, timeBar.high, timeBar.low, timeBar.close) == (
+            10.0,
+            12.0,
+            9.0,
+            9.0,
+        )
+        assert timeBar.vwap == (10.0 + 36.0 + 9.0) / 5
+        assert (tickBar.reqId, tickBar.open, tickBar.close) == (2, 5.0, 6.0)
+
+        client.wrapper.tickByTickBidAsk(3, 100, 1.0, 2.0, 0, 0, None)
+        _trade(client, 3, 101, 2.0, 10)
+        aggregator.close()
+        assert len(batches) == 2
+        (volumeBar,) = batches[1]
+        assert (volumeBar.open, volumeBar.close, volumeBar.volume) == (1.5, 2.0, 10)
+
+    def test_removed_instrument_frees_its_slot(self) -> None:
+        client = EClient(EWrapper())
+        batches: list[list] = []
+        aggregator = TickBarAggregator(client, batches.append, batchSize=1, capacity=1)
+        aggregator.addInstrument(1, TICK_BARS, 2)
+        _trade(client, 1, 100, 5.0, 1)
+        aggregator.removeInstrument(1)
+        _trade(client, 1, 101, 6.0, 1)  # ignored, the bar being formed dropped
+        aggregator.addInstrument(2, TICK_BARS, 1)
+        assert aggregator.capacity == 1  # the slot of 1 is reused
+        _trade(client, 2, 102, 7.0, 1)
+        assert len(batches) == 1
+        ((bar,),) = batches
+        assert (bar.reqId, bar.open, bar.count) == (2, 7.0, 1)
+        assert aggregator.reqId2slot == {2: 0}